@@ -3,15 +3,25 @@ Admin API endpoints for EVEP Platform
 Handles system administration, user management, and system statistics
 """
 
+import asyncio
 from datetime import datetime, timedelta
 from typing import Optional, List
-from fastapi import APIRouter, HTTPException, Depends, status, Request
+from fastapi import APIRouter, HTTPException, Depends, status, Request, Query
 from pydantic import BaseModel, EmailStr
 from bson import ObjectId
 
 from app.core.config import settings
 from app.core.security import verify_token, generate_blockchain_hash, hash_password
 from app.core.database import get_users_collection, get_patients_collection, get_screenings_collection, get_audit_logs_collection
+from app.services.audit_pipeline import audit_pipeline
+from app.services.audit_ledger import audit_ledger
+from app.services.notification_dispatcher import notification_dispatcher
+from app.services.search_index import search_index
+from app.services.address_index import address_autocomplete
+from app.services.master_data import master_data_cache
+from app.utils.blockchain import hash_audit_event
+from app.core.principal_cache import principal_cache
+from app.services.system_monitor import system_monitor, TIMESERIES_METRICS
 from app.api.auth import get_current_user
 
 router = APIRouter(prefix="/admin", tags=["Admin Management"])
@@ -42,10 +52,8 @@ async def log_security_event(
     details: str = "",
     severity: str = "low"
 ):
-    """Log a security event to the audit database"""
+    """Log a security event to the audit database; written in the background by the audit pipeline"""
     try:
-        audit_logs_collection = get_audit_logs_collection()
-        
         # Get client information
         client_ip = get_client_ip(request)
         user_agent = request.headers.get("User-Agent", "Unknown")
@@ -65,14 +73,12 @@ async def log_security_event(
             "status": status,
             "details": details,
             "severity": severity,
-            "audit_hash": f"admin_{event_type}_{current_user.get('id', 'unknown')}_{client_ip}_{int(datetime.utcnow().timestamp())}"
         }
+        # Content hash, so the stored event can be checked against it
+        security_event["audit_hash"] = hash_audit_event(security_event)
         
-        # Save to database - REAL IMPLEMENTATION
-        await audit_logs_collection.insert_one(security_event)
-        
-        # Log to console for debugging
-        print(f"🔒 SECURITY EVENT: {event_type} - {action} from {client_ip} by {current_user.get('email', 'unknown')}")
+        # Queued for a batched write so the request does not wait on the database
+        audit_pipeline.submit(security_event)
         
         return security_event
         
@@ -196,17 +202,29 @@ async def get_system_monitoring(
             details="Admin accessed system monitoring metrics"
         )
         
-        # Mock system monitoring data
-        # In a real implementation, these would be actual system metrics
+        # Served from the background collector's latest sample
+        sample = await system_monitor.latest()
         system_metrics = {
-            "cpu_usage": 42,
-            "memory_usage": 68,
-            "disk_usage": 45,
-            "network_usage": 25,
-            "active_connections": 15,
-            "uptime": 86400,  # 24 hours in seconds
-            "last_backup": "2025-08-28T10:00:00Z",
-            "system_health": "healthy"
+            "cpu_usage": sample["cpu_usage"],
+            "memory_usage": sample["memory_usage"],
+            "disk_usage": sample["disk_usage"],
+            "network_usage": sample["network_usage"],
+            "active_connections": sample["active_connections"],
+            "uptime": sample["uptime"],
+            "last_backup": sample["last_backup"],
+            "system_health": sample["system_health"],
+            "event_loop_lag_ms": sample["event_loop_lag_ms"],
+            "process": {
+                "cpu_percent": sample["process_cpu_percent"],
+                "rss_bytes": sample["process_rss_bytes"],
+                "open_fds": sample["process_open_fds"],
+                "threads": sample["process_threads"]
+            },
+            "network": {
+                "bytes_sent_per_sec": sample["network_bytes_sent_per_sec"],
+                "bytes_recv_per_sec": sample["network_bytes_recv_per_sec"]
+            },
+            "sampled_at": sample["timestamp"]
         }
         
         return system_metrics
@@ -217,6 +235,190 @@ async def get_system_monitoring(
             detail=f"Failed to get system monitoring data: {str(e)}"
         )
 
+@router.get("/auth-cache/stats")
+async def get_auth_cache_stats(current_user: dict = Depends(get_current_user)):
+    """Get hit ratio and saved DB calls for the auth/RBAC principal cache"""
+    
+    # Check if user has admin permissions
+    if current_user["role"] not in ["admin", "super_admin"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    
+    return principal_cache.get_stats()
+
+@router.get("/audit-pipeline/stats")
+async def get_audit_pipeline_stats(current_user: dict = Depends(get_current_user)):
+    """Get queue depth and written, dropped and spilled counts for the audit pipeline"""
+    
+    # Check if user has admin permissions
+    if current_user["role"] not in ["admin", "super_admin"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    
+    return audit_pipeline.get_stats()
+
+@router.get("/audit-ledger/stats")
+async def get_audit_ledger_stats(current_user: dict = Depends(get_current_user)):
+    """Get sealing progress of the audit ledger"""
+
+    # Check if user has admin permissions
+    if current_user["role"] not in ["admin", "super_admin"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+
+    head = await audit_ledger.head()
+    return {
+        **audit_ledger.get_stats(),
+        "head_block": head["_id"] if head else None,
+        "head_hash": head["block_hash"] if head else None,
+    }
+
+@router.get("/audit-ledger/proof/{event_id}")
+async def get_audit_event_proof(event_id: str, current_user: dict = Depends(get_current_user)):
+    """Get the Merkle inclusion proof of one audit event"""
+
+    # Check if user has admin permissions
+    if current_user["role"] not in ["admin", "super_admin"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+
+    if not ObjectId.is_valid(event_id):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid event ID")
+
+    proof = await audit_ledger.prove(ObjectId(event_id))
+    if proof is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Audit event not found or not sealed yet"
+        )
+    return {**proof, "verified": audit_ledger.verify_proof(proof)}
+
+@router.post("/audit-ledger/verify")
+async def verify_audit_ledger(
+    from_block: int = Query(0, ge=0),
+    to_block: Optional[int] = Query(None, ge=0),
+    checkpoint: Optional[str] = Query(None, description="Trusted block_hash of the block before from_block"),
+    current_user: dict = Depends(get_current_user)
+):
+    """Verify the hash chain and every sealed event of a range of ledger blocks"""
+
+    # Check if user has admin permissions
+    if current_user["role"] not in ["admin", "super_admin"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+
+    return await audit_ledger.verify(from_block, to_block, checkpoint)
+
+@router.get("/notifications/stats")
+async def get_notification_stats(current_user: dict = Depends(get_current_user)):
+    """Get sent, retried and dead-lettered counts and limits per notification channel"""
+
+    # Check if user has admin permissions
+    if current_user["role"] not in ["admin", "super_admin"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+
+    return {
+        "channels": notification_dispatcher.get_stats(),
+        "dead_letters": await notification_dispatcher.get_dead_letters().count_documents({}),
+    }
+
+@router.post("/notifications/dead-letters/redeliver")
+async def redeliver_dead_letter_notifications(
+    limit: int = Query(100, ge=1, le=1000),
+    current_user: dict = Depends(get_current_user)
+):
+    """Retry the oldest dead-lettered notifications"""
+
+    # Check if user has admin permissions
+    if current_user["role"] not in ["admin", "super_admin"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+
+    return await notification_dispatcher.redeliver_dead_letters(limit)
+
+@router.get("/search-index/stats")
+async def get_search_index_stats(current_user: dict = Depends(get_current_user)):
+    """Get size, load time and catch-up refresh counts of the patient and student search index"""
+
+    # Check if user has admin permissions
+    if current_user["role"] not in ["admin", "super_admin"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+
+    return search_index.get_stats()
+
+@router.get("/master-data-cache/stats")
+async def get_master_data_cache_stats(current_user: dict = Depends(get_current_user)):
+    """Get snapshot sizes, versions and 304 counts of the AOC master data cache and the address index built on it"""
+
+    # Check if user has admin permissions
+    if current_user["role"] not in ["admin", "super_admin"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+
+    return {**master_data_cache.get_stats(), "address_index": address_autocomplete.get_stats()}
+
+@router.get("/embedding-cache/stats")
+async def get_embedding_cache_stats_endpoint(current_user: dict = Depends(get_current_user)):
+    """Get hit ratio and memory/disk bytes for the embedding cache of each model"""
+    
+    # Check if user has admin permissions
+    if current_user["role"] not in ["admin", "super_admin"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    
+    # Imported here: the embedding cache pulls in sentence_transformers, which admin routes do not otherwise need
+    from app.modules.ai_insights.embedding_cache import get_embedding_cache_stats
+    
+    # Counting the SQLite tier is file I/O
+    return await asyncio.to_thread(get_embedding_cache_stats)
+
+@router.get("/system-monitoring/timeseries")
+async def get_system_monitoring_timeseries(
+    metrics: Optional[str] = Query(None, description="Comma-separated metric names; all when omitted"),
+    minutes: Optional[float] = Query(None, gt=0, description="Only samples from the last N minutes"),
+    current_user: dict = Depends(get_current_user)
+):
+    """Get sampled system metric history for the monitoring charts"""
+    
+    # Check if user has admin permissions
+    if current_user["role"] not in ["admin", "super_admin"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    
+    requested = [name.strip() for name in metrics.split(",") if name.strip()] if metrics else list(TIMESERIES_METRICS)
+    unknown = [name for name in requested if name not in TIMESERIES_METRICS]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown metrics: {', '.join(unknown)}"
+        )
+    
+    return system_monitor.timeseries(requested, minutes)
+
 @router.get("/users")
 async def get_users(
     request: Request,
@@ -403,6 +605,7 @@ async def update_user(
             {"_id": ObjectId(user_id)},
             {"$set": update_data}
         )
+        principal_cache.invalidate(user_id)
         
         if result.modified_count == 0:
             raise HTTPException(
@@ -488,6 +691,7 @@ async def update_user_status(
                 }
             }
         )
+        principal_cache.invalidate(user_id)
         
         if result.modified_count == 0:
             raise HTTPException(
@@ -579,6 +783,7 @@ async def delete_user(
                 }
             }
         )
+        principal_cache.invalidate(user_id)
         
         if result.modified_count == 0:
             raise HTTPException(
@@ -1411,58 +1616,26 @@ async def get_database_stats(request: Request, current_user: dict = Depends(get_
             details="Admin accessed database statistics"
         )
         
-        # Get collections
-        users_collection = get_users_collection()
-        patients_collection = get_patients_collection()
-        screenings_collection = get_screenings_collection()
-        audit_logs_collection = get_audit_logs_collection()
-        
-        # Calculate real statistics
-        total_users = await users_collection.count_documents({})
-        total_patients = await patients_collection.count_documents({})
-        total_screenings = await screenings_collection.count_documents({})
-        
-        # Get recent activity count (last 24 hours)
-        yesterday = datetime.utcnow() - timedelta(days=1)
-        recent_activity = await audit_logs_collection.count_documents({
-            "timestamp": {"$gte": yesterday.isoformat()}
-        })
-        
-        # Get system status
-        system_status = "Healthy"
-        pending_updates = 0  # This would be calculated based on actual system updates
-        
-        # Get last backup time (mock for now)
-        last_backup = "2 hours ago"  # This would come from actual backup system
-        
-        # Calculate user distribution
-        admin_users = await users_collection.count_documents({"role": {"$in": ["admin", "super_admin"]}})
-        medical_users = await users_collection.count_documents({"role": {"$in": ["doctor", "nurse", "teacher", "parent", "medical_staff"]}})
-        
-        # Get recent security events
-        recent_security_events = await audit_logs_collection.count_documents({
-            "timestamp": {"$gte": yesterday.isoformat()},
-            "portal": "admin"
-        })
-        
-        # Mock database size calculation (in real implementation, would use actual database stats)
-        total_size = 2.5 * 1024 * 1024 * 1024  # 2.5 GB mock
-        
-        # Database stats
+        # Served from the background collector's latest dbStats/serverStatus snapshot
+        database = await system_monitor.latest_database_stats()
+        sample = await system_monitor.latest()
         stats = {
-            "name": "evep_database",
-            "size": total_size,
-            "collections": 4,  # We have 4 main collections
-            "indexes": 24,  # Mock value
-            "status": "online",
-            "connections": 15,  # Mock value
-            "operations_per_sec": 1250,  # Mock value
-            "memory_usage": 68,  # Mock value
-            "disk_usage": 45,  # Mock value
-            "data_size": total_size * 0.8,  # Mock calculation
-            "index_size": total_size * 0.1,  # Mock calculation
-            "storage_size": total_size * 0.9,  # Mock calculation
-            "objects": total_users + total_patients + total_screenings + recent_activity
+            "name": database.get("name", "evep"),
+            "size": database.get("size", 0),
+            "collections": database.get("collections", 0),
+            "indexes": database.get("indexes", 0),
+            "status": database.get("status", "offline"),
+            "connections": database.get("connections", 0),
+            "operations_per_sec": database.get("operations_per_sec", 0),
+            "memory_usage": sample["memory_usage"],
+            "disk_usage": sample["disk_usage"],
+            "data_size": database.get("data_size", 0),
+            "index_size": database.get("index_size", 0),
+            "storage_size": database.get("storage_size", 0),
+            "objects": database.get("objects", 0),
+            "resident_memory_mb": database.get("resident_memory_mb", 0),
+            "collection_stats": database.get("collection_stats", []),
+            "sampled_at": database.get("sampled_at")
         }
         
         return stats
@@ -1625,25 +1798,8 @@ async def get_database_backups(request: Request, current_user: dict = Depends(ge
             details="Admin accessed database backups"
         )
         
-        # Mock backup data (in real implementation, this would come from backup system)
-        backups = [
-            {
-                "id": "1",
-                "name": "backup_2024_01_15_full",
-                "size": 2.3 * 1024 * 1024 * 1024,  # 2.3 GB
-                "created_at": "2024-01-15T02:00:00Z",
-                "status": "completed",
-                "type": "full"
-            },
-            {
-                "id": "2",
-                "name": "backup_2024_01_16_incremental",
-                "size": 125 * 1024 * 1024,  # 125 MB
-                "created_at": "2024-01-16T02:00:00Z",
-                "status": "completed",
-                "type": "incremental"
-            }
-        ]
+        # mongodump archives found in the backup directory by the background collector
+        backups = await system_monitor.latest_backups()
         
         return {"backups": backups}
         
@@ -1936,6 +2092,7 @@ async def approve_user(
                     }
                 }
             )
+            principal_cache.invalidate(user_id)
             
             action_message = "approved"
             
@@ -1955,6 +2112,7 @@ async def approve_user(
                     }
                 }
             )
+            principal_cache.invalidate(user_id)
             
             action_message = "rejected"
             
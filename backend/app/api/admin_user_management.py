@@ -13,6 +13,7 @@ from bson import ObjectId
 from app.core.config import settings
 from app.core.security import hash_password, verify_password, generate_blockchain_hash
 from app.core.database import get_users_collection, get_audit_logs_collection
+from app.core.principal_cache import principal_cache
 from app.api.auth import get_current_user
 from app.core.rbac import check_permission
 
@@ -463,6 +464,7 @@ async def admin_update_user(
             {"_id": ObjectId(user_id)},
             {"$set": update_data}
         )
+        principal_cache.invalidate(user_id)
         
         if result.modified_count == 0:
             raise HTTPException(
@@ -545,6 +547,7 @@ async def admin_delete_user(
                 }
             }
         )
+        principal_cache.invalidate(user_id)
         
         if result.modified_count == 0:
             raise HTTPException(
@@ -601,6 +604,7 @@ async def admin_activate_user(
                 "$unset": {"deleted_at": ""}
             }
         )
+        principal_cache.invalidate(user_id)
         
         if result.modified_count == 0:
             raise HTTPException(
@@ -656,6 +660,7 @@ async def admin_verify_user(
                 }
             }
         )
+        principal_cache.invalidate(user_id)
         
         if result.modified_count == 0:
             raise HTTPException(
@@ -787,6 +792,7 @@ async def admin_reset_user_password(
                 }
             }
         )
+        principal_cache.invalidate(user_id)
         
         if result.modified_count == 0:
             raise HTTPException(
@@ -3,12 +3,13 @@ Master Geographic Data, Hospital Data API endpoints
 Provides access to master data collections including hospitals, provinces, districts, subdistricts, and hospital types
 """
 
-from fastapi import APIRouter, HTTPException, Query, Depends, Body
+from fastapi import APIRouter, HTTPException, Query, Depends, Body, Request
 from typing import List, Optional, Dict, Any
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from pydantic import BaseModel
 from bson import ObjectId
 import json
+import re
 from app.core.database import (
     get_database,
     get_allhospitals_collection,
@@ -19,24 +20,16 @@ from app.core.database import (
     get_migration_summaries_collection
 )
 from app.api.auth import get_current_user
+from app.core.pagination import COUNT_PATTERN, Page, paginate
+from app.core.serialization import BSONJSONResponse
+from app.services.address_index import address_autocomplete
+from app.services.master_data import MASTER_DATA_PROJECTION, master_data_cache
 from app.shared.models.user import User
 import logging
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
-# Helper function to convert ObjectId to string
-def convert_objectid_to_str(obj):
-    """Convert ObjectId to string recursively"""
-    if isinstance(obj, ObjectId):
-        return str(obj)
-    elif isinstance(obj, dict):
-        return {key: convert_objectid_to_str(value) for key, value in obj.items()}
-    elif isinstance(obj, list):
-        return [convert_objectid_to_str(item) for item in obj]
-    else:
-        return obj
-
 # Helper function to get zipcode based on province and subdistrict code
 def get_zipcode_for_subdistrict(province_name, subdistrict_code=None):
     """Get zipcode based on province name and optionally subdistrict code"""
@@ -213,10 +206,39 @@ class HospitalUpdate(BaseModel):
     visible: Optional[bool] = None
     remark: Optional[str] = None
 
+def page_response(key: str, page: Page, skip: int, limit: int) -> Dict[str, Any]:
+    """Body of a master data list response"""
+    return {
+        key: page.items,
+        "total_count": page.total_count,
+        "skip": skip,
+        "limit": limit,
+        "has_more": page.has_more,
+        "next_cursor": page.next_cursor
+    }
+
+def fill_zipcodes(subdistricts: List[Dict[str, Any]], province_names: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Subdistricts with a zipcode generated from the province where none is stored"""
+    filled = []
+    for subdistrict in subdistricts:
+        if not subdistrict.get('zipcode'):
+            province_name = province_names.get(str(subdistrict.get('provinceId')))
+            zipcode = get_zipcode_for_subdistrict(province_name, subdistrict.get('code')) if province_name else ''
+            subdistrict = {**subdistrict, 'zipcode': zipcode}
+        filled.append(subdistrict)
+    return filled
+
+def status_filter(status: Optional[str]) -> Optional[bool]:
+    """active value selected by the status query parameter"""
+    return {"active": True, "inactive": False}.get(status)
+
 @router.get("/hospitals", response_model=Dict[str, Any])
 async def get_hospitals(
+    request: Request,
     skip: int = Query(0, ge=0, description="Number of documents to skip"),
     limit: int = Query(100, ge=1, le=1000, description="Number of documents to return"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page; replaces skip"),
+    count: str = Query("cached", pattern=COUNT_PATTERN, description="How total_count is computed: exact, estimated, cached or none"),
     province_id: Optional[str] = Query(None, description="Filter by province ID"),
     district_id: Optional[str] = Query(None, description="Filter by district ID"),
     subdistrict_id: Optional[str] = Query(None, description="Filter by subdistrict ID"),
@@ -226,6 +248,24 @@ async def get_hospitals(
 ):
     """Get hospitals with optional filtering and pagination"""
     try:
+        # Served from the master data cache once it is loaded
+        hospitals_table = master_data_cache.table("hospitals")
+        if hospitals_table is not None:
+            parents = {
+                "provinceId": province_id,
+                "districtId": district_id,
+                "subDistrictId": subdistrict_id,
+                "hospitalType": hospital_type_id
+            }
+            etag = master_data_cache.etag([hospitals_table], {
+                **parents, "skip": skip, "limit": limit, "cursor": cursor, "count": count, "search": search
+            })
+            return master_data_cache.respond(request.headers.get("if-none-match"), etag, lambda: page_response(
+                "hospitals",
+                hospitals_table.page(hospitals_table.select(parents, search), limit, cursor, skip, count),
+                skip, limit
+            ))
+        
         # Build filter query
         filter_query = {}
         
@@ -238,35 +278,19 @@ async def get_hospitals(
         if hospital_type_id:
             filter_query["hospitalType"] = hospital_type_id
         if search:
-            filter_query["name"] = {"$regex": search, "$options": "i"}
+            filter_query["name"] = {"$regex": re.escape(search), "$options": "i"}
         
         # Get hospitals collection using proper getter
         hospitals_collection = get_allhospitals_collection()
         
-        # Get total count
-        total_count = await hospitals_collection.count_documents(filter_query)
-        
-        # Get hospitals
-        cursor = hospitals_collection.find(filter_query).skip(skip).limit(limit)
-        hospitals = await cursor.to_list(length=limit)
-        
-        # Remove migration metadata from response and convert ObjectId to string
-        for hospital in hospitals:
-            hospital.pop('_migration_metadata', None)
-            hospital.pop('_created_at', None)
-            hospital.pop('_updated_at', None)
+        # Get one page of hospitals
+        page = await paginate(hospitals_collection, filter_query, limit, cursor=cursor, skip=skip,
+                              projection=MASTER_DATA_PROJECTION, count=count)
         
-        # Convert ObjectId to string for JSON serialization
-        hospitals = convert_objectid_to_str(hospitals)
-        
-        return {
-            "hospitals": hospitals,
-            "total_count": total_count,
-            "skip": skip,
-            "limit": limit,
-            "has_more": skip + limit < total_count
-        }
+        return BSONJSONResponse(page_response("hospitals", page, skip, limit))
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching hospitals: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
@@ -274,22 +298,26 @@ async def get_hospitals(
 @router.get("/hospitals/{hospital_id}")
 async def get_hospital_by_id(
     hospital_id: str,
+    request: Request,
     db: AsyncIOMotorDatabase = Depends(get_database),
     current_user: User = Depends(get_current_user)
 ):
     """Get a specific hospital by ID"""
     try:
-        hospital = await db.allhospitals.find_one({"_id": hospital_id})
+        hospitals_table = master_data_cache.table("hospitals")
+        if hospitals_table is not None:
+            hospital = hospitals_table.get(hospital_id)
+            if not hospital:
+                raise HTTPException(status_code=404, detail="Hospital not found")
+            etag = master_data_cache.etag([hospitals_table], {"hospital_id": hospital_id})
+            return master_data_cache.respond(request.headers.get("if-none-match"), etag, lambda: hospital)
+        
+        hospital = await db.allhospitals.find_one({"_id": hospital_id}, MASTER_DATA_PROJECTION)
         
         if not hospital:
             raise HTTPException(status_code=404, detail="Hospital not found")
         
-        # Remove migration metadata
-        hospital.pop('_migration_metadata', None)
-        hospital.pop('_created_at', None)
-        hospital.pop('_updated_at', None)
-        
-        return hospital
+        return BSONJSONResponse(hospital)
         
     except HTTPException:
         raise
@@ -299,53 +327,55 @@ async def get_hospital_by_id(
 
 @router.get("/provinces", response_model=Dict[str, Any])
 async def get_provinces(
+    request: Request,
     skip: int = Query(0, ge=0, description="Number of documents to skip"),
     limit: int = Query(100, ge=1, le=1000, description="Number of documents to return"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page; replaces skip"),
+    count: str = Query("cached", pattern=COUNT_PATTERN, description="How total_count is computed: exact, estimated, cached or none"),
     search: Optional[str] = Query(None, description="Search in province name"),
     current_user: User = Depends(get_current_user)
 ):
     """Get provinces with optional filtering and pagination"""
     try:
+        # Served from the master data cache once it is loaded
+        provinces_table = master_data_cache.table("provinces")
+        if provinces_table is not None:
+            etag = master_data_cache.etag([provinces_table], {
+                "skip": skip, "limit": limit, "cursor": cursor, "count": count, "search": search
+            })
+            return master_data_cache.respond(request.headers.get("if-none-match"), etag, lambda: page_response(
+                "provinces",
+                provinces_table.page(provinces_table.select(search=search), limit, cursor, skip, count),
+                skip, limit
+            ))
+        
         # Build filter query
         filter_query = {}
         if search:
-            filter_query["name"] = {"$regex": search, "$options": "i"}
+            filter_query["name"] = {"$regex": re.escape(search), "$options": "i"}
         
         # Get provinces collection using proper getter
         provinces_collection = get_provinces_collection()
         
-        # Get total count
-        total_count = await provinces_collection.count_documents(filter_query)
-        
-        # Get provinces
-        cursor = provinces_collection.find(filter_query).skip(skip).limit(limit)
-        provinces = await cursor.to_list(length=limit)
+        # Get one page of provinces
+        page = await paginate(provinces_collection, filter_query, limit, cursor=cursor, skip=skip,
+                              projection=MASTER_DATA_PROJECTION, count=count)
         
-        # Remove migration metadata from response and convert ObjectId to string
-        for province in provinces:
-            province.pop('_migration_metadata', None)
-            province.pop('_created_at', None)
-            province.pop('_updated_at', None)
-        
-        # Convert ObjectId to string for JSON serialization
-        provinces = convert_objectid_to_str(provinces)
-        
-        return {
-            "provinces": provinces,
-            "total_count": total_count,
-            "skip": skip,
-            "limit": limit,
-            "has_more": skip + limit < total_count
-        }
+        return BSONJSONResponse(page_response("provinces", page, skip, limit))
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching provinces: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
 @router.get("/districts", response_model=Dict[str, Any])
 async def get_districts(
+    request: Request,
     skip: int = Query(0, ge=0, description="Number of documents to skip"),
     limit: int = Query(100, ge=1, le=1000, description="Number of documents to return"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page; replaces skip"),
+    count: str = Query("cached", pattern=COUNT_PATTERN, description="How total_count is computed: exact, estimated, cached or none"),
     province_id: Optional[str] = Query(None, description="Filter by province ID"),
     search: Optional[str] = Query(None, description="Search in district name"),
     status: Optional[str] = Query(None, description="Filter by status (active/inactive)"),
@@ -353,54 +383,54 @@ async def get_districts(
 ):
     """Get districts with optional filtering and pagination"""
     try:
+        # Served from the master data cache once it is loaded
+        districts_table = master_data_cache.table("districts")
+        if districts_table is not None:
+            etag = master_data_cache.etag([districts_table], {
+                "province_id": province_id, "status": status,
+                "skip": skip, "limit": limit, "cursor": cursor, "count": count, "search": search
+            })
+            return master_data_cache.respond(request.headers.get("if-none-match"), etag, lambda: page_response(
+                "districts",
+                districts_table.page(
+                    districts_table.select({"provinceId": province_id}, search, status_filter(status)),
+                    limit, cursor, skip, count
+                ),
+                skip, limit
+            ))
+        
         # Build filter query
         filter_query = {}
         
         if province_id:
             filter_query["provinceId"] = ObjectId(province_id)
         if search:
-            filter_query["name"] = {"$regex": search, "$options": "i"}
-        if status:
-            if status == "active":
-                filter_query["active"] = True
-            elif status == "inactive":
-                filter_query["active"] = False
+            filter_query["name"] = {"$regex": re.escape(search), "$options": "i"}
+        if status_filter(status) is not None:
+            filter_query["active"] = status_filter(status)
         
         # Get districts collection using proper getter
         districts_collection = get_districts_collection()
         
-        # Get total count
-        total_count = await districts_collection.count_documents(filter_query)
+        # Get one page of districts
+        page = await paginate(districts_collection, filter_query, limit, cursor=cursor, skip=skip,
+                              projection=MASTER_DATA_PROJECTION, count=count)
         
-        # Get districts
-        cursor = districts_collection.find(filter_query).skip(skip).limit(limit)
-        districts = await cursor.to_list(length=limit)
-        
-        # Remove migration metadata from response and convert ObjectId to string
-        for district in districts:
-            district.pop('_migration_metadata', None)
-            district.pop('_created_at', None)
-            district.pop('_updated_at', None)
-        
-        # Convert ObjectId to string for JSON serialization
-        districts = convert_objectid_to_str(districts)
-        
-        return {
-            "districts": districts,
-            "total_count": total_count,
-            "skip": skip,
-            "limit": limit,
-            "has_more": skip + limit < total_count
-        }
+        return BSONJSONResponse(page_response("districts", page, skip, limit))
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching districts: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
 @router.get("/subdistricts", response_model=Dict[str, Any])
 async def get_subdistricts(
+    request: Request,
     skip: int = Query(0, ge=0, description="Number of documents to skip"),
     limit: int = Query(100, ge=1, le=1000, description="Number of documents to return"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page; replaces skip"),
+    count: str = Query("cached", pattern=COUNT_PATTERN, description="How total_count is computed: exact, estimated, cached or none"),
     province_id: Optional[str] = Query(None, description="Filter by province ID"),
     district_id: Optional[str] = Query(None, description="Filter by district ID"),
     search: Optional[str] = Query(None, description="Search in subdistrict name"),
@@ -409,6 +439,29 @@ async def get_subdistricts(
 ):
     """Get subdistricts with optional filtering and pagination"""
     try:
+        # Served from the master data cache once it is loaded; generated zipcodes depend on the provinces too
+        subdistricts_table = master_data_cache.table("subdistricts")
+        provinces_table = master_data_cache.table("provinces")
+        if subdistricts_table is not None and provinces_table is not None:
+            etag = master_data_cache.etag([subdistricts_table, provinces_table], {
+                "province_id": province_id, "district_id": district_id, "status": status,
+                "skip": skip, "limit": limit, "cursor": cursor, "count": count, "search": search
+            })
+            
+            def build():
+                page = subdistricts_table.page(
+                    subdistricts_table.select({"provinceId": province_id, "districtId": district_id}, search, status_filter(status)),
+                    limit, cursor, skip, count
+                )
+                province_names = {}
+                for subdistrict in page.items:
+                    province = provinces_table.get(subdistrict.get('provinceId'))
+                    if province and 'name' in province:
+                        province_names[str(subdistrict.get('provinceId'))] = province['name']
+                return page_response("subdistricts", page._replace(items=fill_zipcodes(page.items, province_names)), skip, limit)
+            
+            return master_data_cache.respond(request.headers.get("if-none-match"), etag, build)
+        
         # Build filter query
         filter_query = {}
         
@@ -417,67 +470,100 @@ async def get_subdistricts(
         if district_id:
             filter_query["districtId"] = ObjectId(district_id)
         if search:
-            filter_query["name"] = {"$regex": search, "$options": "i"}
-        if status:
-            if status == "active":
-                filter_query["active"] = True
-            elif status == "inactive":
-                filter_query["active"] = False
+            filter_query["name"] = {"$regex": re.escape(search), "$options": "i"}
+        if status_filter(status) is not None:
+            filter_query["active"] = status_filter(status)
         
         # Get subdistricts collection using proper getter
         subdistricts_collection = get_subdistricts_collection()
         
-        # Get total count
-        total_count = await subdistricts_collection.count_documents(filter_query)
+        # Get one page of subdistricts
+        page = await paginate(subdistricts_collection, filter_query, limit, cursor=cursor, skip=skip,
+                              projection=MASTER_DATA_PROJECTION, count=count)
         
-        # Get subdistricts
-        cursor = subdistricts_collection.find(filter_query).skip(skip).limit(limit)
-        subdistricts = await cursor.to_list(length=limit)
+        # Province names for subdistricts without a stored zipcode, in one query
+        province_ids = {
+            ObjectId(subdistrict['provinceId'])
+            for subdistrict in page.items
+            if not subdistrict.get('zipcode') and ObjectId.is_valid(subdistrict.get('provinceId'))
+        }
+        province_names = {}
+        if province_ids:
+            provinces_collection = get_provinces_collection()
+            async for province in provinces_collection.find({"_id": {"$in": list(province_ids)}}, {"name": 1}):
+                if 'name' in province:
+                    province_names[str(province['_id'])] = province['name']
         
-        # Get provinces collection to fetch province names for zipcode mapping
-        provinces_collection = get_provinces_collection()
+        # Add zipcode information - use stored zipcode if available, otherwise generate
+        page = page._replace(items=fill_zipcodes(page.items, province_names))
         
-        # Remove migration metadata from response and convert ObjectId to string
-        for subdistrict in subdistricts:
-            subdistrict.pop('_migration_metadata', None)
-            subdistrict.pop('_created_at', None)
-            subdistrict.pop('_updated_at', None)
-            
-            # Add zipcode information - use stored zipcode if available, otherwise generate
-            if 'zipcode' not in subdistrict or not subdistrict['zipcode']:
-                if 'provinceId' in subdistrict:
-                    try:
-                        province = await provinces_collection.find_one({"_id": ObjectId(subdistrict['provinceId'])})
-                        if province and 'name' in province:
-                            # Get subdistrict code if available
-                            subdistrict_code = subdistrict.get('code', None)
-                            zipcode = get_zipcode_for_subdistrict(province['name'], subdistrict_code)
-                            subdistrict['zipcode'] = zipcode
-                    except Exception as e:
-                        logger.warning(f"Could not fetch province for zipcode: {e}")
-                        subdistrict['zipcode'] = ''
-                else:
-                    subdistrict['zipcode'] = ''
-        
-        # Convert ObjectId to string for JSON serialization
-        subdistricts = convert_objectid_to_str(subdistricts)
-        
-        return {
-            "subdistricts": subdistricts,
-            "total_count": total_count,
-            "skip": skip,
-            "limit": limit,
-            "has_more": skip + limit < total_count
-        }
+        return BSONJSONResponse(page_response("subdistricts", page, skip, limit))
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching subdistricts: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+@router.get("/address/autocomplete", response_model=Dict[str, Any])
+async def autocomplete_address(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=100, description="Typed address, Thai or English, optionally with a zipcode"),
+    level: Optional[str] = Query(None, pattern="^(province|district|subdistrict)$", description="Only return places of this level"),
+    limit: int = Query(10, ge=1, le=50, description="Number of matches to return"),
+    current_user: User = Depends(get_current_user)
+):
+    """Fully qualified province, district and subdistrict matches of a typed address"""
+    try:
+        index = await address_autocomplete.index()
+        if index is None:
+            raise HTTPException(status_code=503, detail="Address data is still loading")
+        
+        etag = master_data_cache.etag(index.tables, {"q": q, "level": level, "limit": limit})
+        return master_data_cache.respond(request.headers.get("if-none-match"), etag, lambda: {
+            "matches": index.search(q, limit, level)
+        })
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error autocompleting address {q!r}: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@router.get("/address/zipcodes/{zipcode}", response_model=Dict[str, Any])
+async def get_address_by_zipcode(
+    zipcode: str,
+    request: Request,
+    current_user: User = Depends(get_current_user)
+):
+    """Subdistricts with a zipcode, with their district and province"""
+    try:
+        index = await address_autocomplete.index()
+        if index is None:
+            raise HTTPException(status_code=503, detail="Address data is still loading")
+        
+        matches = index.by_zipcode(zipcode)
+        if not matches:
+            raise HTTPException(status_code=404, detail="Zipcode not found")
+        
+        etag = master_data_cache.etag(index.tables, {"zipcode": zipcode})
+        return master_data_cache.respond(request.headers.get("if-none-match"), etag, lambda: {
+            "zipcode": zipcode,
+            "matches": matches
+        })
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error looking up zipcode {zipcode}: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
 @router.get("/hospital-types", response_model=Dict[str, Any])
 async def get_hospital_types(
     skip: int = Query(0, ge=0, description="Number of documents to skip"),
     limit: int = Query(100, ge=1, le=1000, description="Number of documents to return"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page; replaces skip"),
+    count: str = Query("cached", pattern=COUNT_PATTERN, description="How total_count is computed: exact, estimated, cached or none"),
     search: Optional[str] = Query(None, description="Search in hospital type name"),
     current_user: User = Depends(get_current_user)
 ):
@@ -486,35 +572,27 @@ async def get_hospital_types(
         # Build filter query
         filter_query = {}
         if search:
-            filter_query["name"] = {"$regex": search, "$options": "i"}
+            filter_query["name"] = {"$regex": re.escape(search), "$options": "i"}
         
         # Get hospital types collection using proper getter
         hospital_types_collection = get_hospitaltypes_collection()
         
-        # Get total count
-        total_count = await hospital_types_collection.count_documents(filter_query)
-        
-        # Get hospital types
-        cursor = hospital_types_collection.find(filter_query).skip(skip).limit(limit)
-        hospital_types = await cursor.to_list(length=limit)
-        
-        # Remove migration metadata from response and convert ObjectId to string
-        for hospital_type in hospital_types:
-            hospital_type.pop('_migration_metadata', None)
-            hospital_type.pop('_created_at', None)
-            hospital_type.pop('_updated_at', None)
+        # Get one page of hospital types
+        page = await paginate(hospital_types_collection, filter_query, limit, cursor=cursor, skip=skip,
+                              projection=MASTER_DATA_PROJECTION, count=count)
+        hospital_types = page.items
         
-        # Convert ObjectId to string for JSON serialization
-        hospital_types = convert_objectid_to_str(hospital_types)
-        
-        return {
+        return BSONJSONResponse({
             "hospital_types": hospital_types,
-            "total_count": total_count,
+            "total_count": page.total_count,
             "skip": skip,
             "limit": limit,
-            "has_more": skip + limit < total_count
-        }
+            "has_more": page.has_more,
+            "next_cursor": page.next_cursor
+        })
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching hospital types: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
@@ -599,6 +677,8 @@ async def create_province(
         
         result = await provinces_collection.insert_one(province_doc)
         
+        await master_data_cache.invalidate("provinces")
+        
         return {
             "id": str(result.inserted_id),
             "message": "Province created successfully",
@@ -640,6 +720,8 @@ async def update_province(
         if result.modified_count == 0:
             raise HTTPException(status_code=400, detail="No changes made")
         
+        await master_data_cache.invalidate("provinces")
+        
         return {"message": "Province updated successfully"}
         
     except HTTPException:
@@ -680,6 +762,8 @@ async def delete_province(
         if result.deleted_count == 0:
             raise HTTPException(status_code=400, detail="Failed to delete province")
         
+        await master_data_cache.invalidate("provinces")
+        
         return {"message": "Province deleted successfully"}
         
     except HTTPException:
@@ -727,6 +811,8 @@ async def create_district(
         
         result = await districts_collection.insert_one(district_doc)
         
+        await master_data_cache.invalidate("districts")
+        
         return {
             "id": str(result.inserted_id),
             "message": "District created successfully",
@@ -775,6 +861,8 @@ async def update_district(
         if result.modified_count == 0:
             raise HTTPException(status_code=400, detail="No changes made")
         
+        await master_data_cache.invalidate("districts")
+        
         return {"message": "District updated successfully"}
         
     except HTTPException:
@@ -809,6 +897,8 @@ async def delete_district(
         if result.deleted_count == 0:
             raise HTTPException(status_code=400, detail="Failed to delete district")
         
+        await master_data_cache.invalidate("districts")
+        
         return {"message": "District deleted successfully"}
         
     except HTTPException:
@@ -876,6 +966,8 @@ async def create_subdistrict(
         
         result = await subdistricts_collection.insert_one(subdistrict_doc)
         
+        await master_data_cache.invalidate("subdistricts")
+        
         return {
             "id": str(result.inserted_id),
             "message": "Subdistrict created successfully",
@@ -943,6 +1035,8 @@ async def update_subdistrict(
         if result.modified_count == 0:
             raise HTTPException(status_code=400, detail="No changes made")
         
+        await master_data_cache.invalidate("subdistricts")
+        
         return {"message": "Subdistrict updated successfully"}
         
     except HTTPException:
@@ -977,6 +1071,8 @@ async def delete_subdistrict(
         if result.deleted_count == 0:
             raise HTTPException(status_code=400, detail="Failed to delete subdistrict")
         
+        await master_data_cache.invalidate("subdistricts")
+        
         return {"message": "Subdistrict deleted successfully"}
         
     except HTTPException:
@@ -1169,6 +1265,8 @@ async def create_hospital(
         
         result = await allhospitals_collection.insert_one(hospital_doc)
         
+        await master_data_cache.invalidate("hospitals")
+        
         return {
             "id": str(result.inserted_id),
             "message": "Hospital created successfully",
@@ -1248,6 +1346,8 @@ async def update_hospital(
         if result.modified_count == 0:
             raise HTTPException(status_code=400, detail="No changes made")
         
+        await master_data_cache.invalidate("hospitals")
+        
         return {"message": "Hospital updated successfully"}
         
     except HTTPException:
@@ -1276,6 +1376,8 @@ async def delete_hospital(
         if result.deleted_count == 0:
             raise HTTPException(status_code=400, detail="Failed to delete hospital")
         
+        await master_data_cache.invalidate("hospitals")
+        
         return {"message": "Hospital deleted successfully"}
         
     except HTTPException:
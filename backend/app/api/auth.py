@@ -14,6 +14,8 @@ from app.core.config import settings
 from app.core.security import hash_password, verify_password, generate_blockchain_hash
 from app.core.jwt_service import verify_jwt_token, create_jwt_token, create_jwt_token_pair
 from app.core.database import get_users_collection, get_admin_users_collection, get_audit_logs_collection
+from app.core.principal_cache import principal_cache
+from app.core.serialization import stringify_object_ids
 from bson import ObjectId
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
@@ -71,13 +73,9 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
         )
     
     # Check if token was issued before user's last logout
-    users_collection = get_users_collection()
-    admin_users_collection = get_admin_users_collection()
-    
-    # Try to find user in both collections
-    user = await users_collection.find_one({"_id": ObjectId(payload["user_id"])})
-    if not user:
-        user = await admin_users_collection.find_one({"_id": ObjectId(payload["user_id"])})
+    # The user document is resolved once and shared with the DB RBAC checks
+    principal = await principal_cache.get_principal(payload["user_id"])
+    user = principal.user
     
     if user and user.get("last_logout"):
         token_issued_at = datetime.fromtimestamp(payload["iat"])
@@ -92,18 +90,7 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
             )
     
     # Ensure payload doesn't contain any ObjectIds (handle nested structures)
-    def convert_objectids_to_strings(obj):
-        """Recursively convert all ObjectId instances to strings"""
-        if isinstance(obj, ObjectId):
-            return str(obj)
-        elif isinstance(obj, dict):
-            return {key: convert_objectids_to_strings(value) for key, value in obj.items()}
-        elif isinstance(obj, list):
-            return [convert_objectids_to_strings(item) for item in obj]
-        else:
-            return obj
-    
-    clean_payload = convert_objectids_to_strings(payload)
+    clean_payload = stringify_object_ids(payload)
     return clean_payload
 
 @router.post("/register")
@@ -279,18 +266,7 @@ async def login_user(login_data: UserLogin):
     client_ip = "127.0.0.1"  # Placeholder for now
     
     # Convert ObjectIds to strings before creating JWT tokens (handle nested structures)
-    def convert_objectids_to_strings(obj):
-        """Recursively convert all ObjectId instances to strings"""
-        if isinstance(obj, ObjectId):
-            return str(obj)
-        elif isinstance(obj, dict):
-            return {key: convert_objectids_to_strings(value) for key, value in obj.items()}
-        elif isinstance(obj, list):
-            return [convert_objectids_to_strings(item) for item in obj]
-        else:
-            return obj
-    
-    user_for_jwt = convert_objectids_to_strings(user)
+    user_for_jwt = stringify_object_ids(user)
     
     # Create access and refresh tokens using enhanced JWT service with blockchain
     token_data = create_jwt_token_pair(user_for_jwt, client_ip)
@@ -405,18 +381,7 @@ async def refresh_token(current_user: dict = Depends(get_current_user)):
         )
     
     # Convert ObjectIds to strings before creating JWT token (handle nested structures)
-    def convert_objectids_to_strings(obj):
-        """Recursively convert all ObjectId instances to strings"""
-        if isinstance(obj, ObjectId):
-            return str(obj)
-        elif isinstance(obj, dict):
-            return {key: convert_objectids_to_strings(value) for key, value in obj.items()}
-        elif isinstance(obj, list):
-            return [convert_objectids_to_strings(item) for item in obj]
-        else:
-            return obj
-    
-    user_for_jwt = convert_objectids_to_strings(user)
+    user_for_jwt = stringify_object_ids(user)
     
     # Create new access token using centralized JWT service
     access_token = create_jwt_token(user_for_jwt)
@@ -462,6 +427,7 @@ async def logout_user(
         {"_id": ObjectId(current_user["user_id"])},
         {"$set": {"last_logout": logout_timestamp}}
     )
+    principal_cache.invalidate(current_user["user_id"])
     
     # Log logout with enhanced security information
     await audit_logs_collection.insert_one({
@@ -17,7 +17,7 @@ import aiofiles
 
 from app.core.config import settings
 from app.api.auth import get_current_user
-from app.core.database import get_database
+from app.core.database import get_database, get_files_collection
 
 router = APIRouter()
 
@@ -82,6 +82,11 @@ async def serve_public_file(file_id: str):
     if not file_path.exists():
         raise HTTPException(status_code=404, detail="File not found")
     
+    # Patient and student photos and files uploaded as private are only served through signed URLs
+    file_doc = await get_files_collection().find_one({"file_id": file_id}, {"is_public": 1, "blob_id": 1})
+    if file_doc and (file_doc.get("blob_id") or file_doc.get("is_public") is False):
+        raise HTTPException(status_code=404, detail="File not found")
+    
     # Determine media type
     media_type = mimetypes.guess_type(str(file_path))[0] or 'application/octet-stream'
     
@@ -91,6 +96,30 @@ async def serve_public_file(file_id: str):
         media_type=media_type
     )
 
+@router.get("/photos/{file_id}")
+async def serve_photo(
+    file_id: str,
+    expires: int = Query(..., description="Expiry of the signed URL (Unix time)"),
+    signature: str = Query(..., description="Signature of the file id and expiry"),
+):
+    """Serve a patient or student photo through a signed, expiring URL"""
+    from app.services.blob_store import verify_photo_signature
+    
+    if not verify_photo_signature(file_id, expires, signature):
+        raise HTTPException(status_code=403, detail="Invalid or expired photo URL")
+    
+    file_path = get_file_path(file_id)
+    if not file_path.exists():
+        raise HTTPException(status_code=404, detail="File not found")
+    
+    media_type = mimetypes.guess_type(str(file_path))[0] or 'application/octet-stream'
+    max_age = max(0, expires - int(datetime.now().timestamp()))
+    return FileResponse(
+        path=str(file_path),
+        media_type=media_type,
+        headers={"Cache-Control": f"private, max-age={max_age}"}
+    )
+
 @router.options("/upload")
 async def upload_options(response: Response):
     """Handle CORS preflight for upload endpoint"""
@@ -6,16 +6,19 @@ allowing users to ask questions about screening, inventory, students, and medica
 """
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from typing import Dict, Any, List, Optional
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from typing import Dict, Any, List, Optional, AsyncIterator
 from datetime import datetime
 from pydantic import BaseModel
 import json
-import re
+from bson import ObjectId
 
 from app.api.auth import get_current_user
 from app.modules.ai_insights import InsightGenerator
 from app.core.database import get_database
 from app.core.chat_database import get_chat_database, ChatDatabase
+from app.core.intent_matcher import IntentMatcher
 from app.modules.ai_agents.agent_manager import agent_manager, UserType
 from app.modules.ai_agents.database_agent_manager import database_agent_manager
 from app.modules.ai_agents.vector_learning import vector_learning_system
@@ -160,57 +163,32 @@ RESPONSE_TEMPLATES = {
     }
 }
 
+# Intent patterns compiled once per process and reloaded when their version stamp changes
+intent_matcher = IntentMatcher(FALLBACK_INTENT_PATTERNS)
+
 async def detect_intent(message: str, chat_db: Optional[ChatDatabase]) -> tuple[str, float]:
     """Detect the intent of a user message using database patterns"""
     message_lower = message.lower()
     
-    best_intent = "system_help"
-    best_confidence = 0.0
-    
     # Use fallback patterns if database is not available
     if chat_db is None:
-        for intent, patterns in FALLBACK_INTENT_PATTERNS.items():
-            for pattern in patterns:
-                if re.search(pattern, message_lower):
-                    confidence = 0.8
-                    if confidence > best_confidence:
-                        best_intent = intent
-                        best_confidence = confidence
-        return best_intent, best_confidence
+        intent = intent_matcher.fallback.best(message_lower)
+        return (intent, 0.8) if intent else ("system_help", 0.0)
     
     try:
-        # Get intent patterns from database
-        intent_patterns = await chat_db.get_intent_patterns()
-        
-        # If database is empty, use fallback patterns
-        if not intent_patterns:
-            intent_patterns = FALLBACK_INTENT_PATTERNS
-        
-        for intent, patterns in intent_patterns.items():
-            for pattern in patterns:
-                if re.search(pattern, message_lower):
-                    confidence = 0.8  # High confidence for pattern matches
-                    if confidence > best_confidence:
-                        best_intent = intent
-                        best_confidence = confidence
-        
-        # If no specific intent found, use system help
-        if best_confidence == 0.0:
-            best_intent = "system_help"
-            best_confidence = 0.5
-            
+        compiled = await intent_matcher.get(chat_db)
     except Exception as e:
         # Fallback to hardcoded patterns if database fails
         print(f"Error loading intent patterns from database: {e}")
-        for intent, patterns in FALLBACK_INTENT_PATTERNS.items():
-            for pattern in patterns:
-                if re.search(pattern, message_lower):
-                    confidence = 0.8
-                    if confidence > best_confidence:
-                        best_intent = intent
-                        best_confidence = confidence
+        intent = intent_matcher.fallback.best(message_lower)
+        return (intent, 0.8) if intent else ("system_help", 0.0)
     
-    return best_intent, best_confidence
+    intent = compiled.best(message_lower)
+    if intent:
+        return intent, 0.8  # High confidence for pattern matches
+    
+    # If no specific intent found, use system help
+    return "system_help", 0.5
 
 async def generate_response(intent: str, message: str, user_role: str, chat_db: Optional[ChatDatabase], context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     """Generate a response based on intent and context using database templates"""
@@ -288,15 +266,8 @@ async def chat_with_bot(
             intent, confidence = await detect_intent(chat_message.message, None)
             response_data = await generate_response(intent, chat_message.message, user_role, None, chat_message.context)
         else:
-            # Check if conversation exists, create if not
-            conversation = await chat_db.get_conversation(conversation_id)
-            if not conversation:
-                await chat_db.create_conversation(user_id, conversation_id)
-            
-            # Add user message to conversation
-            await chat_db.add_message_to_conversation(
-                conversation_id=conversation_id,
-                message=chat_message.message,
+            user_message = chat_db.build_message(
+                chat_message.message,
                 is_user=True,
                 metadata={"user_role": user_role}
             )
@@ -307,25 +278,26 @@ async def chat_with_bot(
             # Generate response using database templates
             response_data = await generate_response(intent, chat_message.message, user_role, chat_db, chat_message.context)
             
-            # Store learning data for AI/ML
-            learning_id = await chat_db.store_learning_data(
+            # Learning data for AI/ML, referenced by the bot message
+            learning_record = chat_db.build_learning_record(
                 user_id=user_id,
-                conversation_id=conversation_id,
                 message=chat_message.message,
+                response=response_data["response"],
                 intent=intent,
                 confidence=confidence,
-                response=response_data["response"]
+                conversation_id=conversation_id
             )
-            
-            # Add bot response to conversation
-            await chat_db.add_message_to_conversation(
-                conversation_id=conversation_id,
-                message=response_data["response"],
+            learning_record["_id"] = ObjectId()
+            bot_message = chat_db.build_message(
+                response_data["response"],
                 is_user=False,
                 intent=intent,
                 confidence=confidence,
-                metadata={"learning_id": learning_id}
+                metadata={"learning_id": str(learning_record["_id"])}
             )
+            
+            # Store the turn, creating the conversation if needed
+            await chat_db.record_turn(conversation_id, user_id, [user_message, bot_message], [learning_record])
         
         # Create response
         response = ChatResponse(
@@ -378,7 +350,7 @@ async def get_conversations(
                 "updated_at": conv["updated_at"].isoformat(),
                 "message_count": conv["metadata"]["total_messages"],
                 "intents_used": conv["metadata"]["intents_used"],
-                "last_message": conv["messages"][-1]["message"] if conv["messages"] else None
+                "last_message": conv.get("last_message") or (conv["messages"][-1]["message"] if conv.get("messages") else None)
             }
             formatted_conversations.append(formatted_conv)
         
@@ -578,6 +550,108 @@ async def submit_chat_feedback(
             detail=f"Error submitting feedback: {str(e)}"
         )
 
+# Map user role to UserType enum
+USER_TYPE_MAPPING = {
+    "parent": UserType.PARENT,
+    "teacher": UserType.TEACHER,
+    "doctor": UserType.DOCTOR,
+    "nurse": UserType.NURSE,
+    "optometrist": UserType.OPTOMETRIST,
+    "medical_staff": UserType.MEDICAL_STAFF,
+    "hospital_staff": UserType.HOSPITAL_STAFF,
+    "hospital_exclusive": UserType.HOSPITAL_EXCLUSIVE,
+    "medical_admin": UserType.MEDICAL_ADMIN,
+    "system_admin": UserType.SYSTEM_ADMIN,
+    "super_admin": UserType.SUPER_ADMIN,
+    "admin": UserType.SUPER_ADMIN,  # Map admin to super_admin
+    "executive": UserType.EXECUTIVE
+}
+
+# Conversation history passed to AI agents
+AGENT_HISTORY_MESSAGES = 10
+
+def get_agent_user(current_user: Dict[str, Any]) -> tuple[str, str, UserType]:
+    """User ID, role and agent user type of the current user"""
+    user_role = current_user.get("role", "")
+    user_id = current_user.get("user_id", "")
+    if not user_role or not user_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="User role or ID not found"
+        )
+    return user_id, user_role, USER_TYPE_MAPPING.get(user_role, UserType.PARENT)
+
+async def get_conversation_history(chat_db: Optional[ChatDatabase], conversation_id: Optional[str]) -> List[Dict[str, Any]]:
+    """Messages of an existing conversation, empty when there is none"""
+    if conversation_id and chat_db:
+        try:
+            # Agents read the last AGENT_HISTORY_MESSAGES messages
+            return await chat_db.get_recent_messages(conversation_id, limit=AGENT_HISTORY_MESSAGES)
+        except Exception as e:
+            print(f"Error retrieving conversation history: {e}")
+    return []
+
+def new_ai_conversation_id(user_id: str) -> str:
+    return f"ai_conv_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}_{user_id}"
+
+async def store_ai_agent_turn(
+    chat_db: Optional[ChatDatabase],
+    conversation_id: str,
+    user_id: str,
+    user_role: str,
+    message: str,
+    agent_response: Dict[str, Any]
+):
+    """Store an AI agent exchange and its learning data if database is available"""
+    if not chat_db:
+        return
+    try:
+        confidence = agent_response.get("confidence", 0.8)
+        agent_type = agent_response.get("agent_type", "unknown")
+        intent = agent_response.get("intent", "ai_agent_response")
+        messages = [
+            chat_db.build_message(
+                message,
+                is_user=True,
+                metadata={"user_role": user_role, "agent_type": "ai_agent"}
+            ),
+            chat_db.build_message(
+                agent_response["response"],
+                is_user=False,
+                intent="ai_agent_response",
+                confidence=confidence,
+                metadata={
+                    "agent_type": agent_response.get("agent_type", "ai_agent"),
+                    "model": agent_response.get("model", "gpt-4"),
+                    "fallback_mode": agent_response.get("fallback_mode", False)
+                }
+            )
+        ]
+        # Learning data and the detailed conversation turn for AI/ML
+        learning_records = [
+            chat_db.build_learning_record(user_id, message, agent_response["response"], intent, confidence, agent_type),
+            chat_db.build_conversation_turn(conversation_id, user_id, message, agent_response["response"], agent_type, intent, confidence)
+        ]
+        await chat_db.record_turn(conversation_id, user_id, messages, learning_records)
+        
+    except Exception as e:
+        print(f"Error storing conversation: {e}")
+
+def ai_agent_chat_response(agent_response: Dict[str, Any], conversation_id: str) -> ChatResponse:
+    return ChatResponse(
+        response=agent_response["response"],
+        conversation_id=conversation_id,
+        intent="ai_agent_response",
+        confidence=agent_response.get("confidence", 0.8),
+        suggestions=[],  # AI agents provide contextual responses
+        quick_actions=[],  # AI agents provide contextual actions
+        timestamp=datetime.utcnow().isoformat()
+    )
+
+def sse_event(event: str, data: Any) -> str:
+    """One Server-Sent Events frame; Thai text is sent as UTF-8, not escaped"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
 @router.post("/ai-agent")
 async def chat_with_ai_agent(
     chat_message: ChatMessage,
@@ -591,45 +665,13 @@ async def chat_with_ai_agent(
     """
     try:
         # Validate user permissions
-        user_role = current_user.get("role", "")
-        user_id = current_user.get("user_id", "")
-        if not user_role or not user_id:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="User role or ID not found"
-            )
-        
-        # Map user role to UserType enum
-        user_type_mapping = {
-            "parent": UserType.PARENT,
-            "teacher": UserType.TEACHER,
-            "doctor": UserType.DOCTOR,
-            "nurse": UserType.NURSE,
-            "optometrist": UserType.OPTOMETRIST,
-            "medical_staff": UserType.MEDICAL_STAFF,
-            "hospital_staff": UserType.HOSPITAL_STAFF,
-            "hospital_exclusive": UserType.HOSPITAL_EXCLUSIVE,
-            "medical_admin": UserType.MEDICAL_ADMIN,
-            "system_admin": UserType.SYSTEM_ADMIN,
-            "super_admin": UserType.SUPER_ADMIN,
-            "admin": UserType.SUPER_ADMIN,  # Map admin to super_admin
-            "executive": UserType.EXECUTIVE
-        }
-        
-        user_type = user_type_mapping.get(user_role, UserType.PARENT)
+        user_id, user_role, user_type = get_agent_user(current_user)
         
         # Get chat database instance
         chat_db = get_chat_database()
         
         # Get conversation history if available
-        conversation_history = []
-        if chat_message.conversation_id and chat_db:
-            try:
-                conversation = await chat_db.get_conversation(chat_message.conversation_id)
-                if conversation:
-                    conversation_history = conversation.get("messages", [])
-            except Exception as e:
-                print(f"Error retrieving conversation history: {e}")
+        conversation_history = await get_conversation_history(chat_db, chat_message.conversation_id)
         
         # Get AI agent response
         agent_response = await agent_manager.get_agent_response(
@@ -640,74 +682,12 @@ async def chat_with_ai_agent(
         )
         
         # Generate conversation ID if not provided
-        conversation_id = chat_message.conversation_id or f"ai_conv_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}_{user_id}"
+        conversation_id = chat_message.conversation_id or new_ai_conversation_id(user_id)
         
         # Store conversation if database is available
-        if chat_db:
-            try:
-                # Check if conversation exists, create if not
-                conversation = await chat_db.get_conversation(conversation_id)
-                if not conversation:
-                    await chat_db.create_conversation(user_id, conversation_id)
-                
-                # Add user message to conversation
-                await chat_db.add_message_to_conversation(
-                    conversation_id=conversation_id,
-                    message=chat_message.message,
-                    is_user=True,
-                    metadata={"user_role": user_role, "agent_type": "ai_agent"}
-                )
-                
-                # Add AI response to conversation
-                await chat_db.add_message_to_conversation(
-                    conversation_id=conversation_id,
-                    message=agent_response["response"],
-                    is_user=False,
-                    intent="ai_agent_response",
-                    confidence=agent_response.get("confidence", 0.8),
-                    metadata={
-                        "agent_type": agent_response.get("agent_type", "ai_agent"),
-                        "model": agent_response.get("model", "gpt-4"),
-                        "fallback_mode": agent_response.get("fallback_mode", False)
-                    }
-                )
-                
-                # Store learning data for AI/ML
-                await chat_db.store_learning_data(
-                    user_id=user_id,
-                    message=chat_message.message,
-                    response=agent_response["response"],
-                    intent=agent_response.get("intent", "ai_agent_response"),
-                    confidence=agent_response.get("confidence", 0.8),
-                    agent_type=agent_response.get("agent_type", "unknown")
-                )
-                
-                # Store conversation turn for detailed learning
-                await chat_db.store_conversation_turn(
-                    conversation_id=conversation_id,
-                    user_id=user_id,
-                    user_message=chat_message.message,
-                    bot_response=agent_response["response"],
-                    agent_type=agent_response.get("agent_type", "unknown"),
-                    intent=agent_response.get("intent", "ai_agent_response"),
-                    confidence=agent_response.get("confidence", 0.8)
-                )
-                
-            except Exception as e:
-                print(f"Error storing conversation: {e}")
+        await store_ai_agent_turn(chat_db, conversation_id, user_id, user_role, chat_message.message, agent_response)
         
-        # Create response
-        response = ChatResponse(
-            response=agent_response["response"],
-            conversation_id=conversation_id,
-            intent="ai_agent_response",
-            confidence=agent_response.get("confidence", 0.8),
-            suggestions=[],  # AI agents provide contextual responses
-            quick_actions=[],  # AI agents provide contextual actions
-            timestamp=datetime.utcnow().isoformat()
-        )
-        
-        return response
+        return ai_agent_chat_response(agent_response, conversation_id)
         
     except HTTPException:
         raise
@@ -717,6 +697,61 @@ async def chat_with_ai_agent(
             detail=f"Error processing AI agent message: {str(e)}"
         )
 
+@router.post("/ai-agent/stream")
+async def stream_chat_with_ai_agent(
+    chat_message: ChatMessage,
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    """
+    Chat with specialized AI agent, streaming the answer as Server-Sent Events
+    
+    Emits a "start" event with the conversation ID, a "token" event for each
+    piece of generated text and a final "done" event carrying the same fields
+    as /ai-agent. A failure mid-stream is reported as an "error" event. The
+    conversation is stored after the stream has been sent.
+    """
+    user_id, user_role, user_type = get_agent_user(current_user)
+    chat_db = get_chat_database()
+    conversation_history = await get_conversation_history(chat_db, chat_message.conversation_id)
+    conversation_id = chat_message.conversation_id or new_ai_conversation_id(user_id)
+    completed: Dict[str, Any] = {}
+    
+    async def events() -> AsyncIterator[str]:
+        yield sse_event("start", {"conversation_id": conversation_id})
+        try:
+            async for event in agent_manager.stream_agent_response(
+                user_type=user_type,
+                message=chat_message.message,
+                context=chat_message.context,
+                conversation_history=conversation_history
+            ):
+                if event["type"] == "token":
+                    yield sse_event("token", {"text": event["text"]})
+                else:
+                    completed.update(event["response"])
+                    done = ai_agent_chat_response(completed, conversation_id).dict()
+                    done["cached"] = completed.get("cached", False)
+                    yield sse_event("done", done)
+        except Exception as e:
+            print(f"Error streaming AI agent response: {e}")
+            yield sse_event("error", {"detail": f"Error processing AI agent message: {str(e)}"})
+    
+    async def store_completed_turn():
+        # Runs once the stream has been sent; a failed or disconnected stream stores nothing
+        if completed:
+            await store_ai_agent_turn(chat_db, conversation_id, user_id, user_role, chat_message.message, completed)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            # Stop nginx from buffering the stream
+            "X-Accel-Buffering": "no"
+        },
+        background=BackgroundTask(store_completed_turn)
+    )
+
 @router.get("/health")
 async def chat_bot_health_check():
     """
@@ -735,6 +770,7 @@ async def chat_bot_health_check():
             "service": "Chat Bot",
             "database_connected": True,
             "intents_available": len(intent_patterns),
+            "intent_matcher": intent_matcher.get_stats(),
             "suggestions_available": len(suggestions),
             "features": {
                 "conversation_storage": True,
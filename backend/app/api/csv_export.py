@@ -1,6 +1,7 @@
 """
 CSV Export API endpoints for EVEP Platform
-This module provides CSV export functionality for various data types.
+This module provides streaming CSV, NDJSON and Parquet exports for various
+data types, plus resumable export jobs written to disk.
 """
 
 import csv
@@ -8,280 +9,228 @@ import io
 from datetime import datetime
 from typing import List, Dict, Any, Optional
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from fastapi.responses import StreamingResponse
+from fastapi.responses import FileResponse, StreamingResponse
 from pydantic import BaseModel, Field
 
 from app.api.auth import get_current_user
+from app.core.config import settings
 from app.core.database import get_database
 from app.core.db_rbac import has_permission_db
+from app.services.export_engine import (
+    ExportColumn,
+    ExportJobManager,
+    ExportSpec,
+    export_filename,
+    export_media_type,
+    stream_export,
+)
 
 router = APIRouter(prefix="/csv-export", tags=["CSV Export"])
 
+FORMAT_PATTERN = "^(csv|ndjson|parquet)$"
+
+def _str(value: Any) -> str:
+    return str(value)
+
+def build_students_query(school_name: Optional[str] = None, grade_level: Optional[str] = None, status: Optional[str] = "active") -> Dict[str, Any]:
+    """Students export query"""
+    query = {"status": status}
+    if school_name:
+        query["school_name"] = school_name
+    if grade_level:
+        query["grade_level"] = grade_level
+    return query
+
+def build_teachers_query(school_name: Optional[str] = None, status: Optional[str] = "active") -> Dict[str, Any]:
+    """Teachers export query"""
+    query = {"status": status}
+    if school_name:
+        query["school_name"] = school_name
+    return query
+
+def build_schools_query(status: Optional[str] = "active") -> Dict[str, Any]:
+    """Schools export query"""
+    return {"status": status}
+
+def build_users_query(role: Optional[str] = None, status: Optional[str] = "active") -> Dict[str, Any]:
+    """Users export query"""
+    query = {"is_active": status == "active"}
+    if role:
+        query["role"] = role
+    return query
+
+def build_screenings_query(
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    screening_type: Optional[str] = None,
+    status: Optional[str] = None
+) -> Dict[str, Any]:
+    """Screenings export query"""
+    query = {}
+    if date_from:
+        query["created_at"] = {"$gte": datetime.fromisoformat(date_from)}
+    if date_to:
+        if "created_at" not in query:
+            query["created_at"] = {}
+        query["created_at"]["$lte"] = datetime.fromisoformat(date_to)
+    if screening_type:
+        query["screening_type"] = screening_type
+    if status:
+        query["status"] = status
+    return query
+
+EXPORT_SPECS = {
+    "students": ExportSpec("students", "evep.students", [
+        ExportColumn("Student ID", "_id", transform=_str),
+        ExportColumn("Student Code", "student_code"),
+        ExportColumn("Title", "title"),
+        ExportColumn("First Name", "first_name"),
+        ExportColumn("Last Name", "last_name"),
+        ExportColumn("CID", "cid"),
+        ExportColumn("Grade Level", "grade_level"),
+        ExportColumn("Grade Number", "grade_number"),
+        ExportColumn("School Name", "school_name"),
+        ExportColumn("Birth Date", "birth_date"),
+        ExportColumn("Gender", "gender"),
+        ExportColumn("Parent ID", "parent_id", transform=_str),
+        ExportColumn("Teacher ID", "teacher_id", transform=_str),
+        ExportColumn("Consent Document", "consent_document", default=False),
+        ExportColumn("Status", "status"),
+    ], build_students_query),
+    "teachers": ExportSpec("teachers", "teachers", [
+        ExportColumn("Teacher ID", "_id", transform=_str),
+        ExportColumn("Teacher Code", "teacher_code"),
+        ExportColumn("Title", "title"),
+        ExportColumn("First Name", "first_name"),
+        ExportColumn("Last Name", "last_name"),
+        ExportColumn("CID", "cid"),
+        ExportColumn("School Name", "school_name"),
+        ExportColumn("Subject", "subject"),
+        ExportColumn("Phone", "phone"),
+        ExportColumn("Email", "email"),
+        ExportColumn("Status", "status"),
+    ], build_teachers_query),
+    "schools": ExportSpec("schools", "schools", [
+        ExportColumn("School ID", "_id", transform=_str),
+        ExportColumn("School Code", "school_code"),
+        ExportColumn("School Name", "school_name"),
+        ExportColumn("School Type", "school_type"),
+        ExportColumn("Address", "address", default={}, transform=_str),
+        ExportColumn("Phone", "phone"),
+        ExportColumn("Email", "email"),
+        ExportColumn("Principal Name", "principal_name"),
+        ExportColumn("Status", "status"),
+    ], build_schools_query),
+    "users": ExportSpec("users", "users", [
+        ExportColumn("User ID", "_id", transform=_str),
+        ExportColumn("Email", "email"),
+        ExportColumn("First Name", "first_name"),
+        ExportColumn("Last Name", "last_name"),
+        ExportColumn("Role", "role"),
+        ExportColumn("Organization", "organization"),
+        ExportColumn("Phone", "phone"),
+        ExportColumn("Status", "is_active", default=False, transform=lambda active: "active" if active else "inactive"),
+        ExportColumn("Created At", "created_at"),
+        ExportColumn("Updated At", "updated_at"),
+    ], build_users_query),
+    "screenings": ExportSpec("screenings", "screenings", [
+        ExportColumn("Session ID", "_id", transform=_str),
+        ExportColumn("Patient ID", "patient_id", transform=_str),
+        ExportColumn("Examiner ID", "examiner_id", transform=_str),
+        ExportColumn("Screening Type", "screening_type"),
+        ExportColumn("Screening Category", "screening_category"),
+        ExportColumn("Equipment Used", "equipment_used"),
+        ExportColumn("Status", "status"),
+        ExportColumn("Created At", "created_at"),
+        ExportColumn("Completed At", "completed_at"),
+        ExportColumn("Notes", "notes"),
+    ], build_screenings_query),
+}
+
+# Resumable on-disk export jobs
+export_jobs = ExportJobManager(EXPORT_SPECS, settings.EXPORT_STORAGE_PATH, settings.EXPORT_BATCH_SIZE)
+
 class ExportRequest(BaseModel):
     """Request model for CSV export"""
     data_type: str = Field(..., description="Type of data to export: 'students', 'teachers', 'schools', 'screenings', 'users'")
     filters: Optional[Dict[str, Any]] = None
     date_from: Optional[str] = None
     date_to: Optional[str] = None
+    format: str = Field("csv", pattern=FORMAT_PATTERN, description="Output format: 'csv', 'ndjson' or 'parquet'")
+    gzip: bool = Field(False, description="Gzip-compress the output file")
 
-@router.get("/students")
-async def export_students_csv(
-    current_user: dict = Depends(get_current_user),
-    school_name: Optional[str] = Query(None, description="Filter by school name"),
-    grade_level: Optional[str] = Query(None, description="Filter by grade level"),
-    status: Optional[str] = Query("active", description="Filter by status")
-):
-    """Export students data to CSV"""
-    
-    # Check permissions
+async def check_export_permission(current_user: dict) -> None:
+    """Allow super_admin and admin roles, or users with the export_data permission"""
     user_id = current_user.get("id")
     user_role = current_user.get("role")
     
-    # Allow super_admin and admin roles to export data
     if user_role not in ["super_admin", "admin"]:
         if not await has_permission_db(user_id, "export_data"):
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Insufficient permissions to export data"
             )
-    
-    db = get_database()
-    
-    # Build query
-    query = {"status": status}
-    if school_name:
-        query["school_name"] = school_name
-    if grade_level:
-        query["grade_level"] = grade_level
-    
-    # Get students
-    students = await db.evep["evep.students"].find(query).to_list(length=None)
-    
-    # Create CSV content
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    # Write header
-    writer.writerow([
-        "Student ID", "Student Code", "Title", "First Name", "Last Name", 
-        "CID", "Grade Level", "Grade Number", "School Name", "Birth Date", 
-        "Gender", "Parent ID", "Teacher ID", "Consent Document", "Status"
-    ])
-    
-    # Write data
-    for student in students:
-        writer.writerow([
-            str(student.get("_id", "")),
-            student.get("student_code", ""),
-            student.get("title", ""),
-            student.get("first_name", ""),
-            student.get("last_name", ""),
-            student.get("cid", ""),
-            student.get("grade_level", ""),
-            student.get("grade_number", ""),
-            student.get("school_name", ""),
-            student.get("birth_date", ""),
-            student.get("gender", ""),
-            str(student.get("parent_id", "")),
-            str(student.get("teacher_id", "")),
-            student.get("consent_document", False),
-            student.get("status", "")
-        ])
-    
-    output.seek(0)
-    
-    # Return CSV file
+
+def streaming_export_response(spec: ExportSpec, query: Dict[str, Any], export_format: str, compress: bool) -> StreamingResponse:
+    """Stream an export straight from the cursor to the client"""
+    collection = get_database().evep[spec.collection]
     return StreamingResponse(
-        io.BytesIO(output.getvalue().encode('utf-8')),
-        media_type="text/csv",
-        headers={"Content-Disposition": f"attachment; filename=students_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"}
+        stream_export(collection, spec, query, export_format, compress, settings.EXPORT_BATCH_SIZE),
+        media_type=export_media_type(export_format, compress),
+        headers={"Content-Disposition": f"attachment; filename={export_filename(spec.name, export_format, compress)}"}
     )
 
+@router.get("/students")
+async def export_students_csv(
+    current_user: dict = Depends(get_current_user),
+    school_name: Optional[str] = Query(None, description="Filter by school name"),
+    grade_level: Optional[str] = Query(None, description="Filter by grade level"),
+    status: Optional[str] = Query("active", description="Filter by status"),
+    export_format: str = Query("csv", alias="format", pattern=FORMAT_PATTERN, description="Output format"),
+    compress: bool = Query(False, alias="gzip", description="Gzip-compress the output")
+):
+    """Export students data to CSV, NDJSON or Parquet"""
+    await check_export_permission(current_user)
+    query = build_students_query(school_name, grade_level, status)
+    return streaming_export_response(EXPORT_SPECS["students"], query, export_format, compress)
+
 @router.get("/teachers")
 async def export_teachers_csv(
     current_user: dict = Depends(get_current_user),
     school_name: Optional[str] = Query(None, description="Filter by school name"),
-    status: Optional[str] = Query("active", description="Filter by status")
+    status: Optional[str] = Query("active", description="Filter by status"),
+    export_format: str = Query("csv", alias="format", pattern=FORMAT_PATTERN, description="Output format"),
+    compress: bool = Query(False, alias="gzip", description="Gzip-compress the output")
 ):
-    """Export teachers data to CSV"""
-    
-    # Check permissions
-    user_id = current_user.get("id")
-    user_role = current_user.get("role")
-    
-    # Allow super_admin and admin roles to export data
-    if user_role not in ["super_admin", "admin"]:
-        if not await has_permission_db(user_id, "export_data"):
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Insufficient permissions to export data"
-            )
-    
-    db = get_database()
-    
-    # Build query
-    query = {"status": status}
-    if school_name:
-        query["school_name"] = school_name
-    
-    # Get teachers
-    teachers = await db.evep.teachers.find(query).to_list(length=None)
-    
-    # Create CSV content
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    # Write header
-    writer.writerow([
-        "Teacher ID", "Teacher Code", "Title", "First Name", "Last Name", 
-        "CID", "School Name", "Subject", "Phone", "Email", "Status"
-    ])
-    
-    # Write data
-    for teacher in teachers:
-        writer.writerow([
-            str(teacher.get("_id", "")),
-            teacher.get("teacher_code", ""),
-            teacher.get("title", ""),
-            teacher.get("first_name", ""),
-            teacher.get("last_name", ""),
-            teacher.get("cid", ""),
-            teacher.get("school_name", ""),
-            teacher.get("subject", ""),
-            teacher.get("phone", ""),
-            teacher.get("email", ""),
-            teacher.get("status", "")
-        ])
-    
-    output.seek(0)
-    
-    # Return CSV file
-    return StreamingResponse(
-        io.BytesIO(output.getvalue().encode('utf-8')),
-        media_type="text/csv",
-        headers={"Content-Disposition": f"attachment; filename=teachers_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"}
-    )
+    """Export teachers data to CSV, NDJSON or Parquet"""
+    await check_export_permission(current_user)
+    query = build_teachers_query(school_name, status)
+    return streaming_export_response(EXPORT_SPECS["teachers"], query, export_format, compress)
 
 @router.get("/schools")
 async def export_schools_csv(
     current_user: dict = Depends(get_current_user),
-    status: Optional[str] = Query("active", description="Filter by status")
+    status: Optional[str] = Query("active", description="Filter by status"),
+    export_format: str = Query("csv", alias="format", pattern=FORMAT_PATTERN, description="Output format"),
+    compress: bool = Query(False, alias="gzip", description="Gzip-compress the output")
 ):
-    """Export schools data to CSV"""
-    
-    # Check permissions
-    user_id = current_user.get("id")
-    user_role = current_user.get("role")
-    
-    # Allow super_admin and admin roles to export data
-    if user_role not in ["super_admin", "admin"]:
-        if not await has_permission_db(user_id, "export_data"):
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Insufficient permissions to export data"
-            )
-    
-    db = get_database()
-    
-    # Get schools
-    schools = await db.evep.schools.find({"status": status}).to_list(length=None)
-    
-    # Create CSV content
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    # Write header
-    writer.writerow([
-        "School ID", "School Code", "School Name", "School Type", 
-        "Address", "Phone", "Email", "Principal Name", "Status"
-    ])
-    
-    # Write data
-    for school in schools:
-        writer.writerow([
-            str(school.get("_id", "")),
-            school.get("school_code", ""),
-            school.get("school_name", ""),
-            school.get("school_type", ""),
-            str(school.get("address", {})),
-            school.get("phone", ""),
-            school.get("email", ""),
-            school.get("principal_name", ""),
-            school.get("status", "")
-        ])
-    
-    output.seek(0)
-    
-    # Return CSV file
-    return StreamingResponse(
-        io.BytesIO(output.getvalue().encode('utf-8')),
-        media_type="text/csv",
-        headers={"Content-Disposition": f"attachment; filename=schools_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"}
-    )
+    """Export schools data to CSV, NDJSON or Parquet"""
+    await check_export_permission(current_user)
+    query = build_schools_query(status)
+    return streaming_export_response(EXPORT_SPECS["schools"], query, export_format, compress)
 
 @router.get("/users")
 async def export_users_csv(
     current_user: dict = Depends(get_current_user),
     role: Optional[str] = Query(None, description="Filter by role"),
-    status: Optional[str] = Query("active", description="Filter by status")
+    status: Optional[str] = Query("active", description="Filter by status"),
+    export_format: str = Query("csv", alias="format", pattern=FORMAT_PATTERN, description="Output format"),
+    compress: bool = Query(False, alias="gzip", description="Gzip-compress the output")
 ):
-    """Export users data to CSV"""
-    
-    # Check permissions
-    user_id = current_user.get("id")
-    user_role = current_user.get("role")
-    
-    # Allow super_admin and admin roles to export data
-    if user_role not in ["super_admin", "admin"]:
-        if not await has_permission_db(user_id, "export_data"):
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Insufficient permissions to export data"
-            )
-    
-    db = get_database()
-    
-    # Build query
-    query = {"is_active": status == "active"}
-    if role:
-        query["role"] = role
-    
-    # Get users
-    users = await db.evep.users.find(query).to_list(length=None)
-    
-    # Create CSV content
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    # Write header
-    writer.writerow([
-        "User ID", "Email", "First Name", "Last Name", "Role", 
-        "Organization", "Phone", "Status", "Created At", "Updated At"
-    ])
-    
-    # Write data
-    for user in users:
-        writer.writerow([
-            str(user.get("_id", "")),
-            user.get("email", ""),
-            user.get("first_name", ""),
-            user.get("last_name", ""),
-            user.get("role", ""),
-            user.get("organization", ""),
-            user.get("phone", ""),
-            "active" if user.get("is_active", False) else "inactive",
-            user.get("created_at", ""),
-            user.get("updated_at", "")
-        ])
-    
-    output.seek(0)
-    
-    # Return CSV file
-    return StreamingResponse(
-        io.BytesIO(output.getvalue().encode('utf-8')),
-        media_type="text/csv",
-        headers={"Content-Disposition": f"attachment; filename=users_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"}
-    )
+    """Export users data to CSV, NDJSON or Parquet"""
+    await check_export_permission(current_user)
+    query = build_users_query(role, status)
+    return streaming_export_response(EXPORT_SPECS["users"], query, export_format, compress)
 
 @router.get("/screenings")
 async def export_screenings_csv(
@@ -289,76 +238,102 @@ async def export_screenings_csv(
     date_from: Optional[str] = Query(None, description="Filter from date (YYYY-MM-DD)"),
     date_to: Optional[str] = Query(None, description="Filter to date (YYYY-MM-DD)"),
     screening_type: Optional[str] = Query(None, description="Filter by screening type"),
-    status: Optional[str] = Query(None, description="Filter by status")
+    status: Optional[str] = Query(None, description="Filter by status"),
+    export_format: str = Query("csv", alias="format", pattern=FORMAT_PATTERN, description="Output format"),
+    compress: bool = Query(False, alias="gzip", description="Gzip-compress the output")
 ):
-    """Export screenings data to CSV"""
-    
-    # Check permissions
-    user_id = current_user.get("id")
-    user_role = current_user.get("role")
-    
-    # Allow super_admin and admin roles to export data
-    if user_role not in ["super_admin", "admin"]:
-        if not await has_permission_db(user_id, "export_data"):
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Insufficient permissions to export data"
-            )
-    
-    db = get_database()
-    
-    # Build query
-    query = {}
-    if date_from:
-        query["created_at"] = {"$gte": datetime.fromisoformat(date_from)}
-    if date_to:
-        if "created_at" not in query:
-            query["created_at"] = {}
-        query["created_at"]["$lte"] = datetime.fromisoformat(date_to)
-    if screening_type:
-        query["screening_type"] = screening_type
-    if status:
-        query["status"] = status
-    
-    # Get screenings
+    """Export screenings data to CSV, NDJSON or Parquet"""
+    await check_export_permission(current_user)
+    query = build_screenings_query(date_from, date_to, screening_type, status)
+    return streaming_export_response(EXPORT_SPECS["screenings"], query, export_format, compress)
+
+def _job_response(job: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "job_id": job["_id"],
+        "data_type": job["data_type"],
+        "format": job["format"],
+        "gzip": job["compress"],
+        "status": job["status"],
+        "rows_written": job.get("rows_written", 0),
+        "bytes_written": job.get("bytes_written", 0),
+        "error": job.get("error"),
+        "created_at": job["created_at"].isoformat() if job.get("created_at") else None,
+        "completed_at": job["completed_at"].isoformat() if job.get("completed_at") else None,
+    }
+
+async def _get_owned_job(job_id: str, current_user: dict) -> Dict[str, Any]:
+    job = await export_jobs.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Export job not found")
+    if current_user.get("role") not in ["super_admin", "admin"] and job.get("created_by") != current_user.get("user_id"):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Access denied to this export job")
+    return job
+
+@router.post("/jobs", status_code=status.HTTP_202_ACCEPTED)
+async def create_export_job(
+    request: ExportRequest,
+    current_user: dict = Depends(get_current_user)
+):
+    """Start a background export written to disk for download once complete"""
+    await check_export_permission(current_user)
+    
+    spec = EXPORT_SPECS.get(request.data_type)
+    if not spec:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unknown data type: {request.data_type}")
+    
+    filters = dict(request.filters or {})
+    if request.date_from:
+        filters["date_from"] = request.date_from
+    if request.date_to:
+        filters["date_to"] = request.date_to
     try:
-        screenings = await db.evep["screenings"].find(query).to_list(length=None)
-    except:
-        screenings = []
-    
-    # Create CSV content
-    output = io.StringIO()
-    writer = csv.writer(output)
+        spec.build_query(**filters)
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid export filters: {e}")
     
-    # Write header
-    writer.writerow([
-        "Session ID", "Patient ID", "Examiner ID", "Screening Type", 
-        "Screening Category", "Equipment Used", "Status", "Created At", 
-        "Completed At", "Notes"
-    ])
-    
-    # Write data
-    for screening in screenings:
-        writer.writerow([
-            str(screening.get("_id", "")),
-            str(screening.get("patient_id", "")),
-            str(screening.get("examiner_id", "")),
-            screening.get("screening_type", ""),
-            screening.get("screening_category", ""),
-            screening.get("equipment_used", ""),
-            screening.get("status", ""),
-            screening.get("created_at", ""),
-            screening.get("completed_at", ""),
-            screening.get("notes", "")
-        ])
-    
-    output.seek(0)
-    
-    # Return CSV file
-    return StreamingResponse(
-        io.BytesIO(output.getvalue().encode('utf-8')),
-        media_type="text/csv",
-        headers={"Content-Disposition": f"attachment; filename=screenings_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"}
+    job = await export_jobs.create_job(request.data_type, filters, request.format, request.gzip, current_user.get("user_id"))
+    return _job_response(job)
+
+@router.get("/jobs/{job_id}")
+async def get_export_job(
+    job_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """Get the progress of an export job"""
+    return _job_response(await _get_owned_job(job_id, current_user))
+
+@router.post("/jobs/{job_id}/resume")
+async def resume_export_job(
+    job_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """Resume a failed or interrupted export job from its last checkpoint"""
+    job = await _get_owned_job(job_id, current_user)
+    if not await export_jobs.resume(job_id):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Export job cannot be resumed while {job['status']}"
+        )
+    return _job_response(await export_jobs.get_job(job_id))
+
+@router.get("/jobs/{job_id}/download")
+async def download_export_job(
+    job_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """Download the file of a completed export job"""
+    job = await _get_owned_job(job_id, current_user)
+    if job["status"] != "completed":
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Export job is {job['status']}")
+    
+    path = export_jobs.job_path(job)
+    if not path.exists():
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail="Export file is no longer available")
+    
+    return FileResponse(
+        path,
+        media_type=export_media_type(job["format"], job["compress"]),
+        filename=export_filename(job["data_type"], job["format"], job["compress"])
     )
 
 @router.get("/dashboard-summary")
@@ -367,17 +342,7 @@ async def export_dashboard_summary_csv(
 ):
     """Export dashboard summary data to CSV"""
     
-    # Check permissions
-    user_id = current_user.get("id")
-    user_role = current_user.get("role")
-    
-    # Allow super_admin and admin roles to export data
-    if user_role not in ["super_admin", "admin"]:
-        if not await has_permission_db(user_id, "export_data"):
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Insufficient permissions to export data"
-            )
+    await check_export_permission(current_user)
     
     db = get_database()
     
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from typing import List, Dict, Any
 from datetime import datetime, timedelta
 from bson import ObjectId
@@ -6,22 +6,125 @@ from app.core.config import settings
 from app.core.database import get_database
 from app.core.db_rbac import has_permission_db, has_role_db, has_any_role_db
 from app.api.auth import get_current_user
-from app.utils.blockchain import generate_blockchain_hash
+from app.services.audit_pipeline import audit_pipeline
+from app.services.dashboard_stats import CounterScope, StatQuery, dashboard_stats
+from app.utils.blockchain import hash_audit_event
 from app.utils.timezone import get_current_thailand_time
 
 router = APIRouter(prefix="/dashboard", tags=["Dashboard"])
 
+async def build_stat_queries(db, user_id: str, user_role: str, organization) -> Dict[str, StatQuery]:
+    """Map each dashboard stat visible to the user onto materialized counter scopes"""
+    queries: Dict[str, StatQuery] = {}
+    view_all = (
+        user_role == "super_admin"
+        or await has_permission_db(user_id, "full_access")
+        or await has_permission_db(user_id, "view_all_data")
+        or await has_permission_db(user_id, "*")
+    )
+    
+    def screening_queries(scopes) -> Dict[str, StatQuery]:
+        scopes = tuple(scopes)
+        return {
+            "totalScreenings": StatQuery(scopes),
+            "pendingScreenings": StatQuery(scopes, "pending"),
+            "completedScreenings": StatQuery(scopes, "completed"),
+        }
+    
+    # Patients visible to the user
+    if view_all:
+        # Super admin and users with view_all_data permission see all patients
+        queries["totalPatients"] = StatQuery((CounterScope("patients"),))
+    elif await has_permission_db(user_id, "view_patients"):
+        if await has_role_db(user_id, "doctor"):
+            # Doctor sees patients in their organization
+            if organization:
+                queries["totalPatients"] = StatQuery((CounterScope("patients", "organization", organization),))
+            else:
+                queries["totalPatients"] = StatQuery((CounterScope("patients", "created_by", ObjectId(user_id)),))
+        elif await has_role_db(user_id, "teacher"):
+            # Teacher sees students in their class/school
+            if organization:
+                queries["totalPatients"] = StatQuery((CounterScope("evep.students", "school_name", organization),))
+        elif await has_role_db(user_id, "parent"):
+            # Parent sees only their children
+            queries["totalPatients"] = StatQuery((CounterScope("evep.students", "parent_id", ObjectId(user_id)),))
+        else:
+            # Default: users with view_patients permission see their own patients
+            queries["totalPatients"] = StatQuery((CounterScope("patients", "created_by", ObjectId(user_id)),))
+    
+    # Screenings visible to the user
+    if view_all:
+        queries.update(screening_queries([CounterScope("screenings")]))
+    elif await has_permission_db(user_id, "manage_screenings") or await has_permission_db(user_id, "view_screenings"):
+        if await has_role_db(user_id, "doctor"):
+            if organization:
+                queries.update(screening_queries([CounterScope("screenings", "organization", organization)]))
+            else:
+                queries.update(screening_queries([CounterScope("screenings", "examiner_id", ObjectId(user_id))]))
+        elif await has_role_db(user_id, "teacher"):
+            if organization:
+                # Teachers see school screenings for their school
+                queries.update(screening_queries([CounterScope("school_screenings", "school_name", organization)]))
+        elif await has_role_db(user_id, "parent"):
+            # Screenings for parent's children, summed over one counter per child
+            children = await db.evep.students.find(
+                {"parent_id": ObjectId(user_id)},
+                {"_id": 1}
+            ).to_list(None)
+            if children:
+                queries.update(screening_queries(
+                    CounterScope("school_screenings", "student_id", child["_id"]) for child in children
+                ))
+        else:
+            # Default: users with screening permissions see their own screenings
+            queries.update(screening_queries([CounterScope("screenings", "examiner_id", ObjectId(user_id))]))
+    
+    # EVEP-specific statistics (students, teachers, schools)
+    if view_all:
+        queries["totalStudents"] = StatQuery((CounterScope("evep.students"),), "active")
+        queries["totalTeachers"] = StatQuery((CounterScope("teachers"),), "active")
+        queries["totalSchools"] = StatQuery((CounterScope("schools"),), "active")
+        queries["totalSchoolScreenings"] = StatQuery((CounterScope("school_screenings"),))
+        # Vision screenings come from the screenings collection; completed ones are
+        # standard screenings and pending ones are handled by the hospital mobile unit
+        queries["totalVisionScreenings"] = StatQuery((CounterScope("screenings"),))
+        queries["totalStandardVisionScreenings"] = StatQuery((CounterScope("screenings"),), "completed")
+        queries["totalHospitalMobileUnit"] = StatQuery((CounterScope("screenings"),), "pending")
+    elif await has_permission_db(user_id, "manage_school_data"):
+        if organization:
+            # Filter by organization if user has one
+            queries["totalStudents"] = StatQuery((CounterScope("evep.students", "school_name", organization),), "active")
+            queries["totalTeachers"] = StatQuery((CounterScope("teachers", "school_name", organization),), "active")
+            queries["totalSchoolScreenings"] = StatQuery((CounterScope("school_screenings", "school_name", organization),))
+        else:
+            # Show all school data if no organization filter
+            queries["totalStudents"] = StatQuery((CounterScope("evep.students"),), "active")
+            queries["totalTeachers"] = StatQuery((CounterScope("teachers"),), "active")
+            queries["totalSchoolScreenings"] = StatQuery((CounterScope("school_screenings"),))
+    
+    return queries
+
 @router.get("/stats")
-async def get_dashboard_stats(current_user: dict = Depends(get_current_user)):
+async def get_dashboard_stats(
+    recompute: bool = Query(False, description="Recompute counters from the source collections (admins only)"),
+    current_user: dict = Depends(get_current_user)
+):
     """Get dashboard statistics based on user role"""
+    # Get user role and organization
+    user_role = current_user.get("role")
+    user_id = current_user.get("user_id")  # JWT payload contains "user_id"
+    organization = current_user.get("organization")
+    
+    if recompute and user_role not in ["admin", "super_admin"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only administrators can recompute dashboard statistics"
+        )
+    
     try:
         db = get_database()
         
-        # Get user role and organization
-        user_role = current_user.get("role")
-        user_id = current_user.get("user_id")  # JWT payload contains "user_id"
-        organization = current_user.get("organization")
-        
         # Initialize stats
         stats = {
             "totalPatients": 0,
@@ -38,165 +141,10 @@ async def get_dashboard_stats(current_user: dict = Depends(get_current_user)):
             "recentActivity": []
         }
         
-        # Get patients count based on database RBAC permissions
-        if user_role == "super_admin" or await has_permission_db(user_id, "full_access") or await has_permission_db(user_id, "view_all_data") or await has_permission_db(user_id, "*"):
-            # Super admin and users with view_all_data permission see all patients
-            stats["totalPatients"] = await db.evep["patients"].count_documents({})
-        elif await has_permission_db(user_id, "view_patients"):
-            # Users with view_patients permission see patients based on their scope
-            if await has_role_db(user_id, "doctor"):
-                # Doctor sees patients in their organization
-                if organization:
-                    stats["totalPatients"] = await db.evep["patients"].count_documents({
-                        "organization": organization
-                    })
-                else:
-                    stats["totalPatients"] = await db.evep["patients"].count_documents({
-                        "created_by": ObjectId(user_id)
-                    })
-            elif await has_role_db(user_id, "teacher"):
-                # Teacher sees students in their class/school
-                if organization:
-                    stats["totalPatients"] = await db.evep.students.count_documents({
-                        "school_name": organization
-                    })
-            elif await has_role_db(user_id, "parent"):
-                # Parent sees only their children
-                stats["totalPatients"] = await db.evep.students.count_documents({
-                    "parent_id": ObjectId(user_id)
-                })
-            else:
-                # Default: users with view_patients permission see their own patients
-                stats["totalPatients"] = await db.evep["patients"].count_documents({
-                    "created_by": ObjectId(user_id)
-                })
-        
-        # Get screenings count based on database RBAC permissions
-        if user_role == "super_admin" or await has_permission_db(user_id, "full_access") or await has_permission_db(user_id, "view_all_data") or await has_permission_db(user_id, "*"):
-            # Super admin and users with view_all_data permission see all screenings
-            stats["totalScreenings"] = await db.evep.screenings.count_documents({})
-            stats["pendingScreenings"] = await db.evep.screenings.count_documents({
-                "status": "pending"
-            })
-            stats["completedScreenings"] = await db.evep.screenings.count_documents({
-                "status": "completed"
-            })
-        elif await has_permission_db(user_id, "manage_screenings") or await has_permission_db(user_id, "view_screenings"):
-            # Users with screening permissions see screenings based on their scope
-            if await has_role_db(user_id, "doctor"):
-                if organization:
-                    stats["totalScreenings"] = await db.evep.screenings.count_documents({
-                        "organization": organization
-                    })
-                    stats["pendingScreenings"] = await db.evep.screenings.count_documents({
-                        "organization": organization,
-                        "status": "pending"
-                    })
-                    stats["completedScreenings"] = await db.evep.screenings.count_documents({
-                        "organization": organization,
-                        "status": "completed"
-                    })
-                else:
-                    stats["totalScreenings"] = await db.evep.screenings.count_documents({
-                        "examiner_id": ObjectId(user_id)
-                    })
-                    stats["pendingScreenings"] = await db.evep.screenings.count_documents({
-                        "examiner_id": ObjectId(user_id),
-                        "status": "pending"
-                    })
-                    stats["completedScreenings"] = await db.evep.screenings.count_documents({
-                        "examiner_id": ObjectId(user_id),
-                        "status": "completed"
-                    })
-            elif await has_role_db(user_id, "teacher"):
-                if organization:
-                    # Teachers see school screenings for their school
-                    stats["totalScreenings"] = await db.evep["school_screenings"].count_documents({
-                        "school_name": organization
-                    })
-                    stats["pendingScreenings"] = await db.evep["school_screenings"].count_documents({
-                        "school_name": organization,
-                        "status": "pending"
-                    })
-                    stats["completedScreenings"] = await db.evep["school_screenings"].count_documents({
-                        "school_name": organization,
-                        "status": "completed"
-                    })
-            elif await has_role_db(user_id, "parent"):
-                # Get screenings for parent's children
-                children = await db.evep.students.find(
-                    {"parent_id": ObjectId(user_id)},
-                    {"_id": 1}
-                ).to_list(None)
-                
-                if children:
-                    children_ids = [child["_id"] for child in children]
-                    stats["totalScreenings"] = await db.evep["school_screenings"].count_documents({
-                        "student_id": {"$in": children_ids}
-                    })
-                    stats["pendingScreenings"] = await db.evep["school_screenings"].count_documents({
-                        "student_id": {"$in": children_ids},
-                        "status": "pending"
-                    })
-                    stats["completedScreenings"] = await db.evep["school_screenings"].count_documents({
-                        "student_id": {"$in": children_ids},
-                        "status": "completed"
-                    })
-            else:
-                # Default: users with screening permissions see their own screenings
-                stats["totalScreenings"] = await db.evep.screenings.count_documents({
-                    "examiner_id": ObjectId(user_id)
-                })
-                stats["pendingScreenings"] = await db.evep.screenings.count_documents({
-                    "examiner_id": ObjectId(user_id),
-                    "status": "pending"
-                })
-                stats["completedScreenings"] = await db.evep.screenings.count_documents({
-                    "examiner_id": ObjectId(user_id),
-                    "status": "completed"
-                })
-        
-        # Get EVEP-specific statistics (students, teachers, schools) based on database RBAC
-        print(f"DEBUG: Checking permissions for user {user_id}, role: {user_role}")
-        
-        # For now, use simple role check for super_admin
-        if user_role == "super_admin" or await has_permission_db(user_id, "full_access") or await has_permission_db(user_id, "view_all_data") or await has_permission_db(user_id, "*"):
-            # Users with view_all_data permission see all EVEP statistics
-            stats["totalStudents"] = await db.evep.students.count_documents({"status": "active"})
-            stats["totalTeachers"] = await db.evep.teachers.count_documents({"status": "active"})
-            stats["totalSchools"] = await db.evep.schools.count_documents({"status": "active"})
-            
-            # Count school screenings
-            stats["totalSchoolScreenings"] = await db.evep["school_screenings"].count_documents({})
-            
-            # Count vision screenings (from screenings collection)
-            stats["totalVisionScreenings"] = await db.evep.screenings.count_documents({})
-            
-            # Count standard vision screenings (completed screenings)
-            stats["totalStandardVisionScreenings"] = await db.evep.screenings.count_documents({"status": "completed"})
-            
-            # Count hospital mobile unit (pending screenings)
-            stats["totalHospitalMobileUnit"] = await db.evep.screenings.count_documents({"status": "pending"})
-        elif await has_permission_db(user_id, "manage_school_data"):
-            # Users with school data management permissions see school-related statistics
-            if organization:
-                # Filter by organization if user has one
-                stats["totalStudents"] = await db.evep.students.count_documents({
-                    "status": "active",
-                    "school_name": organization
-                })
-                stats["totalTeachers"] = await db.evep.teachers.count_documents({
-                    "status": "active",
-                    "school_name": organization
-                })
-                stats["totalSchoolScreenings"] = await db.evep["school_screenings"].count_documents({
-                    "school_name": organization
-                })
-            else:
-                # Show all school data if no organization filter
-                stats["totalStudents"] = await db.evep.students.count_documents({"status": "active"})
-                stats["totalTeachers"] = await db.evep.teachers.count_documents({"status": "active"})
-                stats["totalSchoolScreenings"] = await db.evep["school_screenings"].count_documents({})
+        # Counters are read from dashboard_counters in one query; missing or stale
+        # ones are computed with one $facet aggregation per collection
+        queries = await build_stat_queries(db, user_id, user_role, organization)
+        stats.update(await dashboard_stats.resolve(queries, force=recompute))
         
         # Get recent activity
         recent_activity = await get_recent_activity(db, current_user)
@@ -214,11 +162,11 @@ async def get_dashboard_stats(current_user: dict = Depends(get_current_user)):
                     "patients": stats["totalPatients"],
                     "screenings": stats["totalScreenings"]
                 }
-            },
-            "audit_hash": generate_blockchain_hash(f"dashboard_stats_viewed:{user_id}")
+            }
         }
+        audit_data["audit_hash"] = hash_audit_event(audit_data)
         
-        await db.evep["audit_logs"].insert_one(audit_data)
+        audit_pipeline.submit(audit_data)
         
         return stats
         
@@ -1,8 +1,7 @@
-from fastapi import APIRouter, HTTPException, Depends, Request, status, UploadFile, File
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, status, UploadFile, File
 from typing import List, Optional
 from bson import ObjectId
 from datetime import datetime, date
-import base64
 
 from app.models.evep_models import (
     Parent, ParentResponse, Student, StudentResponse, 
@@ -13,46 +12,61 @@ from app.core.security import log_security_event
 from app.core.db_rbac import has_permission_db, has_role_db, has_any_role_db, get_user_permissions_from_db
 from app.utils.timezone import get_current_thailand_time
 from app.api.auth import get_current_user
+from app.services.blob_store import blob_store, photo_urls, pop_photo_blob, sign_photo_url, signed_photos
+from app.services.dashboard_stats import publish_change
+from app.services.search_index import search_index, fetch_hits, regex_filter
+from app.core import metrics
+from app.core.pagination import COUNT_PATTERN, paginate
+from app.core.serialization import BSONJSONResponse, DocumentView
 
 router = APIRouter()
 
-def convert_objectids_to_strings(obj):
-    """Recursively convert all ObjectId instances to strings"""
-    if isinstance(obj, ObjectId):
-        return str(obj)
-    elif isinstance(obj, dict):
-        return {key: convert_objectids_to_strings(value) for key, value in obj.items()}
-    elif isinstance(obj, list):
-        return [convert_objectids_to_strings(item) for item in obj]
-    else:
-        return obj
+# Response shapes of the list endpoints; their projections are what is read from MongoDB
+PARENT_VIEW = DocumentView([
+    ("first_name", ""), ("last_name", ""), ("email", ""), ("phone", ""), ("relationship", ""), ("status", ""),
+])
+STUDENT_VIEW = DocumentView(
+    [
+        ("title", ""), ("first_name", ""), ("last_name", ""), ("cid", ""), ("student_code", ""),
+        ("grade_level", ""), ("grade_number", ""), ("school_name", ""), ("birth_date", ""), ("gender", ""),
+        ("parent_id", ""), ("teacher_id", ""), ("consent_document", False), ("address", {}),
+        ("disease", ""), ("status", ""),
+    ],
+    extra=photo_urls,
+    extra_fields=("profile_photo", "profile_photo_blob", "extra_photos", "photo_metadata"),
+)
+TEACHER_VIEW = DocumentView([
+    ("first_name", ""), ("last_name", ""), ("email", ""), ("position", ""), ("school", ""), ("phone", ""), ("status", ""),
+])
+SCHOOL_VIEW = DocumentView(
+    [
+        ("name", ""), ("code", ""), ("type", ""), ("address", {}), ("phone", ""), ("email", ""),
+        ("principal_name", ""), ("status", ""),
+    ],
+    rename={"code": "school_code"},
+    extra=lambda school: {
+        "district": (school.get("address") or {}).get("district", ""),
+        "province": (school.get("address") or {}).get("province", ""),
+    },
+)
 
 # ==================== PARENTS CRUD ENDPOINTS ====================
 
 @router.get("/parents")
 async def get_parents(
     current_user: dict = Depends(get_current_user),
-    skip: int = 0,
-    limit: int = 100
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page; replaces skip"),
+    count: str = Query("cached", pattern=COUNT_PATTERN, description="How total_count is computed: exact, estimated, cached or none")
 ):
-    """Get all parents with pagination"""
+    """Get all parents with cursor or skip/limit pagination"""
     db = get_database()
     if current_user["role"] not in ["admin", "super_admin", "system_admin", "medical_admin", "teacher", "medical_staff", "doctor"]:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Insufficient permissions to view parents")
-    parents = await db.evep["evep.parents"].find({"status": "active"}).skip(skip).limit(limit).to_list(length=None)
-    result = []
-    for parent in parents:
-        result.append({
-            "id": str(parent["_id"]),
-            "first_name": parent.get("first_name", ""),
-            "last_name": parent.get("last_name", ""),
-            "email": parent.get("email", ""),
-            "phone": parent.get("phone", ""),
-            "relationship": parent.get("relationship", ""),
-            "status": parent.get("status", "")
-        })
-    total_count = await db.evep["evep.parents"].count_documents({"status": "active"})
-    return {"parents": result, "total_count": total_count}
+    page = await paginate(db.evep["evep.parents"], {"status": "active"}, limit, cursor=cursor, skip=skip,
+                          projection=PARENT_VIEW.projection, count=count)
+    return BSONJSONResponse({"parents": PARENT_VIEW.render_many(page.items), "total_count": page.total_count, **page.meta()})
 
 @router.get("/parents/{parent_id}")
 async def get_parent(
@@ -185,40 +199,92 @@ async def delete_parent(
 @router.get("/students")
 async def get_students(
     current_user: dict = Depends(get_current_user),
-    skip: int = 0,
-    limit: int = 100
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    search: Optional[str] = None,
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page; replaces skip"),
+    count: str = Query("cached", pattern=COUNT_PATTERN, description="How total_count is computed: exact, estimated, cached or none")
 ):
-    """Get all students with pagination"""
+    """Get all students with cursor or skip/limit pagination and optional ranked search by name, CID, student code or school"""
     db = get_database()
     if current_user["role"] not in ["admin", "super_admin", "system_admin", "medical_admin", "teacher", "medical_staff", "doctor"]:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Insufficient permissions to view students")
-    students = await db.evep["evep.students"].find({"status": "active"}).skip(skip).limit(limit).to_list(length=None)
-    result = []
-    for student in students:
-        result.append({
-            "id": str(student["_id"]),
-            "title": student.get("title", ""),
-            "first_name": student.get("first_name", ""),
-            "last_name": student.get("last_name", ""),
-            "cid": student.get("cid", ""),
-            "student_code": student.get("student_code", ""),
-            "grade_level": student.get("grade_level", ""),
-            "grade_number": student.get("grade_number", ""),
-            "school_name": student.get("school_name", ""),
-            "birth_date": student.get("birth_date", ""),
-            "gender": student.get("gender", ""),
-            "parent_id": str(student.get("parent_id", "")),
-            "teacher_id": str(student.get("teacher_id", "")),
-            "consent_document": student.get("consent_document", False),
-            "profile_photo": student.get("profile_photo", ""),
-            "extra_photos": student.get("extra_photos", []),
-            "photo_metadata": student.get("photo_metadata", {}),
-            "address": student.get("address", {}),
-            "disease": student.get("disease", ""),
-            "status": student.get("status", "")
-        })
-    total_count = await db.evep["evep.students"].count_documents({"status": "active"})
-    return {"students": result, "total_count": total_count}
+    if search and search_index.ready:
+        # Ranked results page by skip; the index count is exact
+        metrics.SEARCH_QUERIES.labels(endpoint="students", mode="index").inc()
+        hits, total_count = search_index.search(search, kind="students", active=True, limit=limit, skip=skip)
+        students = await fetch_hits(db.evep["evep.students"], hits, STUDENT_VIEW.projection)
+        meta = {"next_cursor": None, "has_more": skip + limit < total_count}
+    else:
+        query = {"status": "active"}
+        if search:
+            metrics.SEARCH_QUERIES.labels(endpoint="students", mode="regex").inc()
+            query.update(regex_filter(search, ["first_name", "last_name", "cid", "student_code", "school_name"]))
+        page = await paginate(db.evep["evep.students"], query, limit, cursor=cursor, skip=skip,
+                              projection=STUDENT_VIEW.projection, count=count)
+        students, total_count, meta = page.items, page.total_count, page.meta()
+    return BSONJSONResponse({"students": STUDENT_VIEW.render_many(students), "total_count": total_count, **meta})
+
+def build_ready_for_registration_pipeline(skip: int, limit: int) -> list:
+    """Build the school_screenings aggregation for one page of students ready for registration"""
+    # Served by the school_screenings (status, student_id, created_at) and
+    # student_patient_mapping (student_id, status) compound indexes
+    return [
+        {"$match": {"status": "completed"}},
+        # Latest completed screening per student_id value
+        {"$sort": {"student_id": 1, "created_at": -1}},
+        {"$group": {
+            "_id": "$student_id",
+            "screening_completed_at": {"$first": "$created_at"},
+            "screening_results": {"$first": "$results"}
+        }},
+        # student_id is stored as a string or an ObjectId; both forms of one student merge here
+        {"$project": {
+            "_id": {"$convert": {"input": "$_id", "to": "objectId", "onError": None, "onNull": None}},
+            "screening_completed_at": 1,
+            "screening_results": 1
+        }},
+        {"$match": {"_id": {"$ne": None}}},
+        {"$sort": {"screening_completed_at": -1}},
+        {"$group": {
+            "_id": "$_id",
+            "screening_completed_at": {"$first": "$screening_completed_at"},
+            "screening_results": {"$first": "$screening_results"}
+        }},
+        # Drop students already registered as patients
+        {"$lookup": {
+            "from": "student_patient_mapping",
+            "let": {"student_id": "$_id"},
+            "pipeline": [
+                {"$match": {"$expr": {"$and": [
+                    {"$eq": ["$student_id", "$$student_id"]},
+                    {"$eq": ["$status", "active"]}
+                ]}}},
+                {"$limit": 1},
+                {"$project": {"_id": 1}}
+            ],
+            "as": "patient_mapping"
+        }},
+        {"$match": {"patient_mapping": {"$size": 0}}},
+        {"$lookup": {
+            "from": "evep.students",
+            "let": {"student_id": "$_id"},
+            "pipeline": [
+                {"$match": {"$expr": {"$and": [
+                    {"$eq": ["$_id", "$$student_id"]},
+                    {"$eq": ["$status", "active"]}
+                ]}}},
+                {"$project": {"extra_photo_blobs": 0}}
+            ],
+            "as": "student"
+        }},
+        {"$unwind": "$student"},
+        {"$sort": {"_id": 1}},
+        {"$facet": {
+            "students": [{"$skip": skip}, {"$limit": limit}],
+            "total": [{"$count": "count"}]
+        }}
+    ]
 
 @router.get("/students/ready-for-patient-registration")
 async def get_students_ready_for_patient_registration(
@@ -236,48 +302,13 @@ async def get_students_ready_for_patient_registration(
             detail="Insufficient permissions to view students ready for patient registration"
         )
     
-    # Get students who have completed school screening
-    # First, get all completed school screenings
-    completed_screenings = await db.evep["school_screenings"].find({
-        "status": "completed"
-    }).to_list(length=None)
-    
-    # Extract student IDs from completed screenings
-    student_ids = [ObjectId(screening["student_id"]) for screening in completed_screenings]
-    
-    if not student_ids:
-        return {"students": [], "total_count": 0}
-    
-    # Get students who have completed screening and are not already registered as patients
-    # Check which students are already registered as patients
-    existing_patients = await db.evep["student_patient_mapping"].find({
-        "student_id": {"$in": student_ids},
-        "status": "active"
-    }).to_list(length=None)
-    
-    # Get student IDs that are already registered as patients
-    already_registered_ids = [mapping["student_id"] for mapping in existing_patients]
-    
-    # Filter out students who are already registered as patients
-    available_student_ids = [sid for sid in student_ids if sid not in already_registered_ids]
-    
-    if not available_student_ids:
-        return {"students": [], "total_count": 0}
-    
-    # Get student details for available students
-    students = await db.evep["evep.students"].find({
-        "_id": {"$in": available_student_ids},
-        "status": "active"
-    }).skip(skip).limit(limit).to_list(length=None)
+    pipeline = build_ready_for_registration_pipeline(skip, limit)
+    page = await db.evep["school_screenings"].aggregate(pipeline, allowDiskUse=True).to_list(length=1)
+    page = page[0] if page else {}
     
     result = []
-    for student in students:
-        # Get the latest screening for this student
-        latest_screening = await db.evep["school_screenings"].find_one({
-            "student_id": student["_id"],
-            "status": "completed"
-        }, sort=[("created_at", -1)])
-        
+    for row in page.get("students", []):
+        student = row["student"]
         result.append({
             "id": str(student["_id"]),
             "title": student.get("title", ""),
@@ -293,17 +324,16 @@ async def get_students_ready_for_patient_registration(
             "parent_id": str(student.get("parent_id", "")),
             "teacher_id": str(student.get("teacher_id", "")),
             "consent_document": student.get("consent_document", False),
-            "profile_photo": student.get("profile_photo", ""),
-            "extra_photos": student.get("extra_photos", []),
-            "photo_metadata": student.get("photo_metadata", {}),
+            **photo_urls(student),
             "address": student.get("address", {}),
             "disease": student.get("disease", ""),
             "status": student.get("status", ""),
-            "screening_completed_at": latest_screening.get("created_at") if latest_screening else None,
-            "screening_results": latest_screening.get("results", {}) if latest_screening else {}
+            "screening_completed_at": row.get("screening_completed_at"),
+            "screening_results": row.get("screening_results") or {}
         })
     
-    total_count = len(available_student_ids)
+    total = page.get("total")
+    total_count = total[0]["count"] if total else 0
     return {"students": result, "total_count": total_count}
 
 @router.get("/students/{student_id}")
@@ -343,8 +373,8 @@ async def get_student(
         "parent_id": str(student.get("parent_id", "")),
         "teacher_id": str(student.get("teacher_id", "")),
         "consent_document": student.get("consent_document", False),
-        "profile_photo": student.get("profile_photo", ""),
-        "extra_photos": student.get("extra_photos", []),
+        "profile_photo": sign_photo_url(student.get("profile_photo", "")),
+        "extra_photos": [sign_photo_url(photo) for photo in student.get("extra_photos", [])],
         "photo_metadata": student.get("photo_metadata", {}),
         "address": student.get("address", {}),
         "disease": student.get("disease", ""),
@@ -372,6 +402,7 @@ async def create_student(
     
     if not result.inserted_id:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Failed to create student")
+    await publish_change("evep.students", after=student_dict)
     
     # Log security event
     log_security_event(
@@ -422,6 +453,7 @@ async def update_student(
     
     if result.modified_count == 0:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Failed to update student")
+    await publish_change("evep.students", before=existing_student, after={**existing_student, **update_data})
     
     # Log security event
     log_security_event(
@@ -456,6 +488,7 @@ async def delete_student(
     
     if result.modified_count == 0:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Failed to delete student")
+    await publish_change("evep.students", before=existing_student, after={**existing_student, "status": "inactive"})
     
     # Log security event
     log_security_event(
@@ -472,28 +505,18 @@ async def delete_student(
 @router.get("/teachers")
 async def get_teachers(
     current_user: dict = Depends(get_current_user),
-    skip: int = 0,
-    limit: int = 100
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page; replaces skip"),
+    count: str = Query("cached", pattern=COUNT_PATTERN, description="How total_count is computed: exact, estimated, cached or none")
 ):
-    """Get all teachers with pagination"""
+    """Get all teachers with cursor or skip/limit pagination"""
     db = get_database()
     if current_user["role"] not in ["admin", "super_admin", "system_admin", "medical_admin", "teacher", "medical_staff", "doctor"]:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Insufficient permissions to view teachers")
-    teachers = await db.evep.teachers.find({"status": "active"}).skip(skip).limit(limit).to_list(length=None)
-    result = []
-    for teacher in teachers:
-        result.append({
-            "id": str(teacher["_id"]),
-            "first_name": teacher.get("first_name", ""),
-            "last_name": teacher.get("last_name", ""),
-            "email": teacher.get("email", ""),
-            "position": teacher.get("position", ""),
-            "school": teacher.get("school", ""),
-            "phone": teacher.get("phone", ""),
-            "status": teacher.get("status", "")
-        })
-    total_count = await db.evep.teachers.count_documents({"status": "active"})
-    return {"teachers": result, "total_count": total_count}
+    page = await paginate(db.evep.teachers, {"status": "active"}, limit, cursor=cursor, skip=skip,
+                          projection=TEACHER_VIEW.projection, count=count)
+    return BSONJSONResponse({"teachers": TEACHER_VIEW.render_many(page.items), "total_count": page.total_count, **page.meta()})
 
 @router.get("/teachers/{teacher_id}")
 async def get_teacher(
@@ -627,32 +650,18 @@ async def delete_teacher(
 @router.get("/schools")
 async def get_schools(
     current_user: dict = Depends(get_current_user),
-    skip: int = 0,
-    limit: int = 100
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page; replaces skip"),
+    count: str = Query("cached", pattern=COUNT_PATTERN, description="How total_count is computed: exact, estimated, cached or none")
 ):
-    """Get all schools with pagination"""
+    """Get all schools with cursor or skip/limit pagination"""
     db = get_database()
     if current_user["role"] not in ["admin", "super_admin", "system_admin", "medical_admin", "teacher", "medical_staff", "doctor"]:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Insufficient permissions to view schools")
-    schools = await db.evep.schools.find({"status": "active"}).skip(skip).limit(limit).to_list(length=None)
-    result = []
-    for school in schools:
-        address = school.get("address", {})
-        result.append({
-            "id": str(school["_id"]),
-            "name": school.get("name", ""),
-            "code": school.get("school_code", ""),
-            "type": school.get("type", ""),
-            "address": address,
-            "district": address.get("district", ""),
-            "province": address.get("province", ""),
-            "phone": school.get("phone", ""),
-            "email": school.get("email", ""),
-            "principal_name": school.get("principal_name", ""),
-            "status": school.get("status", "")
-        })
-    total_count = await db.evep.schools.count_documents({"status": "active"})
-    return {"schools": result, "total_count": total_count}
+    page = await paginate(db.evep.schools, {"status": "active"}, limit, cursor=cursor, skip=skip,
+                          projection=SCHOOL_VIEW.projection, count=count)
+    return BSONJSONResponse({"schools": SCHOOL_VIEW.render_many(page.items), "total_count": page.total_count, **page.meta()})
 
 @router.get("/schools/statistics")
 async def get_school_statistics(
@@ -1113,10 +1122,12 @@ async def get_parent_students(
 @router.get("/teachers")
 async def get_teachers(
     current_user: dict = Depends(get_current_user),
-    skip: int = 0,
-    limit: int = 100
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page; replaces skip"),
+    count: str = Query("cached", pattern=COUNT_PATTERN, description="How total_count is computed: exact, estimated, cached or none")
 ):
-    """Get all teachers with pagination"""
+    """Get all teachers with cursor or skip/limit pagination"""
     db = get_database()
     
     # Check permissions
@@ -1127,24 +1138,10 @@ async def get_teachers(
         )
     
     # Get teachers with pagination
-    teachers = await db.evep.teachers.find({"status": "active"}).skip(skip).limit(limit).to_list(length=None)
+    page = await paginate(db.evep.teachers, {"status": "active"}, limit, cursor=cursor, skip=skip,
+                          projection=TEACHER_VIEW.projection, count=count)
     
-    result = []
-    for teacher in teachers:
-        result.append({
-            "id": str(teacher["_id"]),
-            "first_name": teacher.get("first_name", ""),
-            "last_name": teacher.get("last_name", ""),
-            "email": teacher.get("email", ""),
-            "position": teacher.get("position", ""),
-            "school": teacher.get("school", ""),
-            "phone": teacher.get("phone", ""),
-            "status": teacher.get("status", "")
-        })
-    
-    total_count = await db.evep.teachers.count_documents({"status": "active"})
-    
-    return {"teachers": result, "total_count": total_count}
+    return BSONJSONResponse({"teachers": TEACHER_VIEW.render_many(page.items), "total_count": page.total_count, **page.meta()})
 
 
 @router.get("/teachers/{teacher_id}")
@@ -1212,16 +1209,17 @@ async def upload_student_profile_photo(
             detail="File must be an image"
         )
     
-    # Read file content and encode as base64
+    # Store the image in the blob store; the student document keeps only URLs
     file_content = await file.read()
-    photo_base64 = base64.b64encode(file_content).decode('utf-8')
+    photo_blob = await blob_store.put_image(file_content, file.content_type, current_user.get("user_id"))
     
     # Update student with profile photo
     result = await db.evep.students.update_one(
         {"_id": ObjectId(student_id)},
         {
             "$set": {
-                "profile_photo": photo_base64,
+                "profile_photo": photo_blob["url"],
+                "profile_photo_blob": {k: v for k, v in photo_blob.items() if k != "deduplicated"},
                 "updated_at": get_current_thailand_time()
             }
         }
@@ -1233,6 +1231,9 @@ async def upload_student_profile_photo(
             detail="Failed to update student profile photo"
         )
     
+    # The replaced photo no longer references its blob
+    await blob_store.release(student.get("profile_photo_blob"))
+    
     return {"message": "Profile photo uploaded successfully", "student_id": student_id}
 
 
@@ -1268,12 +1269,13 @@ async def upload_student_extra_photo(
             detail="File must be an image"
         )
     
-    # Read file content and encode as base64
+    # Store the image in the blob store; the student document keeps only URLs
     file_content = await file.read()
-    photo_base64 = base64.b64encode(file_content).decode('utf-8')
+    photo_blob = await blob_store.put_image(file_content, file.content_type, current_user.get("user_id"))
     
     # Create photo metadata
     photo_metadata = {
+        **{k: v for k, v in photo_blob.items() if k != "deduplicated"},
         "description": description,
         "uploaded_by": current_user.get("email", "unknown"),
         "uploaded_at": get_current_thailand_time().isoformat(),
@@ -1286,7 +1288,8 @@ async def upload_student_extra_photo(
         {"_id": ObjectId(student_id)},
         {
             "$push": {
-                "extra_photos": photo_base64
+                "extra_photos": photo_blob["url"],
+                "extra_photo_blobs": photo_metadata
             },
             "$set": {
                 "updated_at": get_current_thailand_time()
@@ -1328,9 +1331,7 @@ async def get_student_photos(
     
     return {
         "student_id": student_id,
-        "profile_photo": student.get("profile_photo"),
-        "extra_photos": student.get("extra_photos", []),
-        "photo_metadata": student.get("photo_metadata", {})
+        **signed_photos(student)
     }
 
 
@@ -1366,13 +1367,17 @@ async def delete_student_extra_photo(
         )
     
     # Remove photo at specified index
-    extra_photos.pop(photo_index)
+    removed_photo = extra_photos.pop(photo_index)
+    # Matched by file id: legacy documents have no blob list aligned with their photos
+    extra_photo_blobs = student.get("extra_photo_blobs", [])
+    removed_blob = pop_photo_blob(extra_photo_blobs, removed_photo)
     
     result = await db.evep.students.update_one(
         {"_id": ObjectId(student_id)},
         {
             "$set": {
                 "extra_photos": extra_photos,
+                "extra_photo_blobs": extra_photo_blobs,
                 "updated_at": get_current_thailand_time()
             }
         }
@@ -1384,6 +1389,8 @@ async def delete_student_extra_photo(
             detail="Failed to delete photo"
         )
     
+    await blob_store.release(removed_blob)
+    
     return {"message": "Photo deleted successfully", "student_id": student_id}
 
 
@@ -1553,6 +1560,7 @@ async def create_school_screening(
     
     if not result.inserted_id:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Failed to create school screening")
+    await publish_change("school_screenings", after=screening_data_dict)
     
     # Log security event
     log_security_event(
@@ -1698,6 +1706,7 @@ async def update_school_screening(
     
     if result.modified_count == 0:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Failed to update school screening")
+    await publish_change("school_screenings", before=screening, after={**screening, **update_data})
     
     # Log security event
     log_security_event(
@@ -1774,6 +1783,7 @@ async def rescreen_student(
     
     if not result.inserted_id:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Failed to create re-screen")
+    await publish_change("school_screenings", after=screening_data_dict)
     
     # Log security event
     log_security_event(
@@ -1822,6 +1832,7 @@ async def delete_school_screening(
     
     if result.deleted_count == 0:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="School screening not found")
+    await publish_change("school_screenings", before=screening)
     
     return {"message": "School screening deleted successfully"}
 
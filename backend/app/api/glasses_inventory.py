@@ -8,6 +8,7 @@ from app.core.database import get_database
 from app.core.security import log_security_event
 from app.api.auth import get_current_user
 from app.utils.timezone import get_current_thailand_time
+from app.core.serialization import BSONJSONResponse, DocumentView
 
 router = APIRouter()
 
@@ -85,6 +86,16 @@ class GlassesItemResponse(BaseModel):
     created_at: str
     updated_at: str
 
+# GlassesItemResponse fields read from an inventory document for list responses
+GLASSES_ITEM_VIEW = DocumentView(
+    [
+        "item_code", "item_name", "category", "brand", "model", ("specifications", {}),
+        "unit_price", "cost_price", "current_stock", "reorder_level", ("supplier_info", {}),
+        "notes", ("is_active", True), "created_at", "updated_at",
+    ],
+    id_field="item_id",
+)
+
 class GlassesOrderResponse(BaseModel):
     order_id: str
     patient_id: str
@@ -252,30 +263,9 @@ async def get_glasses_inventory(
             query["current_stock"] = {"$lte": 0}
     
     # Get items
-    items = await db.evep.glasses_inventory.find(query).sort("item_name", 1).to_list(None)
+    items = await db.evep.glasses_inventory.find(query, GLASSES_ITEM_VIEW.projection).sort("item_name", 1).to_list(None)
     
-    result = []
-    for item in items:
-        result.append(GlassesItemResponse(
-            item_id=str(item["_id"]),
-            item_code=item["item_code"],
-            item_name=item["item_name"],
-            category=item["category"],
-            brand=item.get("brand"),
-            model=item.get("model"),
-            specifications=item.get("specifications", {}),
-            unit_price=item["unit_price"],
-            cost_price=item["cost_price"],
-            current_stock=item["current_stock"],
-            reorder_level=item["reorder_level"],
-            supplier_info=item.get("supplier_info", {}),
-            notes=item.get("notes"),
-            is_active=item.get("is_active", True),
-            created_at=item["created_at"].isoformat(),
-            updated_at=item["updated_at"].isoformat()
-        ))
-    
-    return result
+    return BSONJSONResponse(GLASSES_ITEM_VIEW.render_many(items))
 
 
 @router.get("/inventory/glasses/{item_id}", response_model=GlassesItemResponse)
@@ -8,6 +8,7 @@ from pydantic import BaseModel, Field
 from app.core.database import get_database
 from app.core.security import log_security_event
 from app.api.auth import get_current_user
+from app.services.notification_dispatcher import line_push_payload, notification_dispatcher
 from app.utils.timezone import get_current_thailand_time
 
 router = APIRouter()
@@ -78,6 +79,21 @@ class NotificationTemplate(BaseModel):
     created_at: str
     updated_at: str
 
+def push_line_notification(db, notification_id: ObjectId, line_user_id: str, text: str) -> None:
+    """Queue a notification's message for LINE; its status leaves "pending" once delivery finishes"""
+    async def record(sent: bool) -> None:
+        now = get_current_thailand_time()
+        update = {"status": "sent", "sent_at": now, "updated_at": now} if sent else {
+            "status": "failed",
+            "error_message": "LINE push failed; kept in notification_dead_letters for redelivery",
+            "updated_at": now,
+        }
+        await db.evep.line_notifications.update_one({"_id": notification_id}, {"$set": update})
+
+    # Rate limited and retried by the dispatcher in the background; a push that still fails is dead-lettered
+    notification_dispatcher.submit("line", "push", line_push_payload(line_user_id, {"type": "text", "text": text}), on_result=record)
+
+
 # LINE Notification Endpoints
 @router.post("/notifications/line/send", response_model=LineNotificationResponse)
 async def send_line_notification(
@@ -143,41 +159,7 @@ async def send_line_notification(
     
     result = await db.evep.line_notifications.insert_one(notification_doc)
     
-    # TODO: Integrate with actual LINE Bot API
-    # For now, simulate sending
-    try:
-        # Simulate LINE Bot API call
-        # line_bot_api.push_message(line_user_id, TextSendMessage(text=notification_data.message_template))
-        
-        # Update status to sent
-        await db.evep.line_notifications.update_one(
-            {"_id": result.inserted_id},
-            {
-                "$set": {
-                    "status": "sent",
-                    "sent_at": get_current_thailand_time(),
-                    "updated_at": get_current_thailand_time()
-                }
-            }
-        )
-        
-        notification_doc["status"] = "sent"
-        notification_doc["sent_at"] = get_current_thailand_time()
-        
-    except Exception as e:
-        # Update status to failed
-        await db.evep.line_notifications.update_one(
-            {"_id": result.inserted_id},
-            {
-                "$set": {
-                    "status": "failed",
-                    "error_message": str(e),
-                    "updated_at": get_current_thailand_time()
-                }
-            }
-        )
-        
-        notification_doc["status"] = "failed"
+    push_line_notification(db, result.inserted_id, line_user_id, notification_data.message_template)
     
     # Log audit
     await log_security_event(
@@ -295,40 +277,7 @@ Reply with your choice to proceed.
     
     notification_result = await db.evep.line_notifications.insert_one(notification_doc)
     
-    # TODO: Integrate with actual LINE Bot API
-    try:
-        # Simulate LINE Bot API call
-        # line_bot_api.push_message(line_user_id, TextSendMessage(text=consent_message))
-        
-        # Update status to sent
-        await db.evep.line_notifications.update_one(
-            {"_id": notification_result.inserted_id},
-            {
-                "$set": {
-                    "status": "sent",
-                    "sent_at": get_current_thailand_time(),
-                    "updated_at": get_current_thailand_time()
-                }
-            }
-        )
-        
-        notification_doc["status"] = "sent"
-        notification_doc["sent_at"] = get_current_thailand_time()
-        
-    except Exception as e:
-        # Update status to failed
-        await db.evep.line_notifications.update_one(
-            {"_id": notification_result.inserted_id},
-            {
-                "$set": {
-                    "status": "failed",
-                    "error_message": str(e),
-                    "updated_at": get_current_thailand_time()
-                }
-            }
-        )
-        
-        notification_doc["status"] = "failed"
+    push_line_notification(db, notification_result.inserted_id, line_user_id, consent_message)
     
     # Log audit
     await log_security_event(
@@ -7,6 +7,8 @@ import json
 
 # Import database functions
 from app.core.database import get_audit_logs_collection
+from app.services.audit_pipeline import audit_pipeline
+from app.utils.blockchain import hash_audit_event
 from app.api.auth import get_current_user
 
 # Security scheme
@@ -39,10 +41,8 @@ async def log_medical_security_event(
     details: str = "",
     severity: str = "low"
 ):
-    """Log a medical portal security event to the audit database"""
+    """Log a medical portal security event to the audit database; written in the background by the audit pipeline"""
     try:
-        audit_logs_collection = get_audit_logs_collection()
-        
         # Get client information
         client_ip = get_client_ip(request)
         user_agent = request.headers.get("User-Agent", "Unknown")
@@ -64,18 +64,12 @@ async def log_medical_security_event(
             "status": status,
             "details": details,
             "severity": severity,
-            "audit_hash": f"medical_{event_type}_{current_user.get('id', 'unknown')}_{client_ip}_{int(datetime.utcnow().timestamp())}"
         }
+        # Content hash, so the stored event can be checked against it
+        security_event["audit_hash"] = hash_audit_event(security_event)
         
-        # Save to database - REAL IMPLEMENTATION
-        await audit_logs_collection.insert_one(security_event)
-        
-        # Log to console for debugging
-        print(f"🏥 MEDICAL SECURITY EVENT: {event_type} - {action} from {client_ip} by {current_user.get('email', 'unknown')}")
-        if patient_id:
-            print(f"   📋 Patient ID: {patient_id}")
-        if screening_id:
-            print(f"   👁️ Screening ID: {screening_id}")
+        # Queued for a batched write so the request does not wait on the database
+        audit_pipeline.submit(security_event)
         
         return security_event
         
@@ -6,6 +6,7 @@ from datetime import datetime
 import bcrypt
 
 from app.core.database import get_users_collection, get_audit_logs_collection
+from app.core.principal_cache import principal_cache
 from app.api.auth import get_current_user
 
 router = APIRouter()
@@ -327,6 +328,7 @@ async def update_medical_staff(
             {"_id": ObjectId(staff_id)},
             {"$set": update_data}
         )
+        principal_cache.invalidate(staff_id)
         
         # Log audit event
         await log_audit_event(
@@ -389,6 +391,7 @@ async def deactivate_medical_staff(
             {"_id": ObjectId(staff_id)},
             {"$set": {"is_active": False, "updated_at": datetime.now().isoformat()}}
         )
+        principal_cache.invalidate(staff_id)
         
         # Log audit event
         await log_audit_event(
@@ -432,6 +435,7 @@ async def activate_medical_staff(
             {"_id": ObjectId(staff_id)},
             {"$set": {"is_active": True, "updated_at": datetime.now().isoformat()}}
         )
+        principal_cache.invalidate(staff_id)
         
         # Log audit event
         await log_audit_event(
@@ -8,6 +8,7 @@ from app.core.database import get_database
 from app.core.security import log_security_event
 from app.api.auth import get_current_user
 from app.utils.timezone import get_current_thailand_time
+from app.services.dashboard_stats import publish_change
 
 router = APIRouter()
 
@@ -124,6 +125,7 @@ async def register_student_as_patient(
         
         patient_result = await db.evep.patients.insert_one(patient_doc)
         patient_id = patient_result.inserted_id
+        await publish_change("patients", after={**patient_doc, "_id": patient_id})
         
         # Create student-patient mapping
         mapping_doc = {
@@ -9,13 +9,16 @@ from fastapi import APIRouter, HTTPException, Depends, status, UploadFile, File,
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel, EmailStr
 from bson import ObjectId
-import base64
 
 from app.core.config import settings
 from app.core.security import verify_token, generate_blockchain_hash
 from app.core.database import get_database, get_patients_collection, get_audit_logs_collection
 from app.api.auth import get_current_user
 from app.core.db_rbac import has_permission_db, has_role_db, get_user_roles_from_db
+from app.services.blob_store import blob_store, pop_photo_blob, signed_photos
+from app.services.dashboard_stats import publish_change
+from app.services.search_index import search_index, fetch_hits, regex_filter
+from app.core import metrics
 
 router = APIRouter(prefix="/patients", tags=["Patient Management"])
 
@@ -186,6 +189,7 @@ async def create_patient(
     # Insert patient into database
     result = await patients_collection.insert_one(patient_doc)
     patient_doc["_id"] = result.inserted_id
+    await publish_change("patients", after=patient_doc)
     
     # Log patient creation
     await audit_logs_collection.insert_one({
@@ -227,35 +231,28 @@ async def get_patients(
     
     patients_collection = get_patients_collection()
     
-    # Build query based on user role and search
-    query = {}
-    
-    # Add search functionality if search term provided
-    if search:
-        query["$or"] = [
-            {"first_name": {"$regex": search, "$options": "i"}},
-            {"last_name": {"$regex": search, "$options": "i"}},
-            {"cid": {"$regex": search, "$options": "i"}},
-            {"citizen_id": {"$regex": search, "$options": "i"}},
-            {"parent_email": {"$regex": search, "$options": "i"}},
-            {"school": {"$regex": search, "$options": "i"}}
-        ]
-    
+    # Parents can only see their own children
+    parent_email = None
     if user_id and (await has_role_db(user_id, "parent") or await has_permission_db(user_id, "view_patients")):
-        # Parents can only see their own children
-        if "parent_email" in query:
-            # If already filtering by parent_email in search, combine with user's email
-            query["$and"] = [
-                {"$or": query["$or"]},
-                {"parent_email": current_user["email"]}
-            ]
-            del query["$or"]
-        else:
-            query["parent_email"] = current_user["email"]
-    
-    # Get patients with pagination
-    cursor = patients_collection.find(query).skip(skip).limit(limit)
-    patients = await cursor.to_list(length=limit)
+        parent_email = current_user["email"]
+    
+    if search and search_index.ready:
+        # Ranked matches from the search index
+        metrics.SEARCH_QUERIES.labels(endpoint="list", mode="index").inc()
+        hits, _ = search_index.search(search, kind="patients", owner=parent_email, limit=limit, skip=skip)
+        patients = await fetch_hits(patients_collection, hits)
+    else:
+        # Build query based on user role and search
+        query = {}
+        if search:
+            metrics.SEARCH_QUERIES.labels(endpoint="list", mode="regex").inc()
+            query.update(regex_filter(search, ["first_name", "last_name", "cid", "citizen_id", "parent_email", "school"]))
+        if parent_email:
+            query["parent_email"] = parent_email
+        
+        # Get patients with pagination
+        cursor = patients_collection.find(query).skip(skip).limit(limit)
+        patients = await cursor.to_list(length=limit)
     
     # Convert to response format
     return [
@@ -266,6 +263,50 @@ async def get_patients(
         for patient in patients
     ]
 
+@router.get("/typeahead")
+async def typeahead_patients(
+    q: str = Query(..., min_length=1, max_length=100, description="Name, CID or student code prefix"),
+    limit: int = Query(10, ge=1, le=50),
+    include_students: bool = Query(False, description="Also suggest EVEP students not yet registered as patients"),
+    current_user: dict = Depends(get_current_user)
+):
+    """Ranked patient (and student) suggestions for a search box, served from the search index"""
+    
+    if current_user["role"] not in ["doctor", "parent", "admin", "medical_staff", "super_admin"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Insufficient permissions to search patients"
+        )
+    if not search_index.ready:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Search index is loading"
+        )
+    
+    user_id = current_user.get("user_id")
+    parent_email = None
+    if user_id and (await has_role_db(user_id, "parent") or await has_permission_db(user_id, "view_patients")):
+        parent_email = current_user["email"]
+    # Students are not tied to a parent email, so parents only get their patients
+    kind = None if include_students and parent_email is None else "patients"
+    
+    metrics.SEARCH_QUERIES.labels(endpoint="typeahead", mode="index").inc()
+    hits, _ = search_index.search(q, kind=kind, owner=parent_email, active=True, limit=limit, exhaustive=False)
+    return {
+        "query": q,
+        "suggestions": [
+            {
+                "kind": hit.entry.kind,
+                "id": hit.entry.id,
+                "label": hit.entry.label,
+                "school": hit.entry.school,
+                "grade": hit.entry.grade,
+                "score": hit.score
+            }
+            for hit in hits
+        ]
+    }
+
 @router.get("/{patient_id}", response_model=PatientResponse)
 async def get_patient(
     patient_id: str,
@@ -364,6 +405,7 @@ async def update_patient(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="No changes were made"
         )
+    await publish_change("patients", before=existing_patient, after={**existing_patient, **update_data})
     
     # Log patient update
     await audit_logs_collection.insert_one({
@@ -441,6 +483,7 @@ async def delete_patient(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Failed to delete patient"
         )
+    await publish_change("patients", before=existing_patient, after={**existing_patient, "is_active": False})
     
     # Log patient deletion
     await audit_logs_collection.insert_one({
@@ -471,20 +514,47 @@ async def search_patients(
             detail="Insufficient permissions to search patients"
         )
     
-    db = get_database()
+    # Get user_id for RBAC checks
+    user_id = current_user.get("user_id")
+    
+    # Filter by parent email for parent role
+    parent_email = None
+    if user_id and (await has_role_db(user_id, "parent") or await has_permission_db(user_id, "view_patients")):
+        parent_email = current_user["email"]
+    
+    patients_collection = get_patients_collection()
+    
+    if search_data.query and search_index.ready:
+        # Ranked matches from the search index; the count is exact
+        metrics.SEARCH_QUERIES.labels(endpoint="search", mode="index").inc()
+        hits, total_count = search_index.search(
+            search_data.query,
+            kind="patients",
+            owner=parent_email,
+            school=search_data.school,
+            grade=search_data.grade,
+            active=search_data.is_active,
+            limit=search_data.limit,
+            skip=search_data.skip,
+        )
+        patients = await fetch_hits(patients_collection, hits)
+        return {
+            "patients": [
+                {"patient_id": str(patient["_id"]), **{k: v for k, v in patient.items() if k != "_id"}}
+                for patient in patients
+            ],
+            "total_count": total_count,
+            "limit": search_data.limit,
+            "skip": search_data.skip
+        }
     
     # Build search query
     query = {}
     
     # Text search
     if search_data.query:
-        query["$or"] = [
-            {"first_name": {"$regex": search_data.query, "$options": "i"}},
-            {"last_name": {"$regex": search_data.query, "$options": "i"}},
-            {"cid": {"$regex": search_data.query, "$options": "i"}},  # Search by CID
-            {"parent_email": {"$regex": search_data.query, "$options": "i"}},
-            {"school": {"$regex": search_data.query, "$options": "i"}}
-        ]
+        metrics.SEARCH_QUERIES.labels(endpoint="search", mode="regex").inc()
+        query.update(regex_filter(search_data.query, ["first_name", "last_name", "cid", "parent_email", "school"]))
     
     # Filter by school
     if search_data.school:
@@ -498,15 +568,10 @@ async def search_patients(
     if search_data.is_active is not None:
         query["is_active"] = search_data.is_active
     
-    # Get user_id for RBAC checks
-    user_id = current_user.get("user_id")
-    
-    # Filter by parent email for parent role
-    if user_id and (await has_role_db(user_id, "parent") or await has_permission_db(user_id, "view_patients")):
-        query["parent_email"] = current_user["email"]
+    if parent_email:
+        query["parent_email"] = parent_email
     
     # Execute search
-    patients_collection = get_patients_collection()
     patients = await patients_collection.find(query).skip(search_data.skip).limit(search_data.limit).to_list(length=None)
     
     # Convert to response format
@@ -758,6 +823,7 @@ async def register_student_as_patient(
     # Insert patient into database
     result = await patients_collection.insert_one(patient_doc)
     patient_doc["_id"] = result.inserted_id
+    await publish_change("patients", after=patient_doc)
     
     # Log patient creation from student
     await audit_logs_collection.insert_one({
@@ -822,9 +888,9 @@ async def upload_patient_profile_photo(
             detail="File must be an image"
         )
     
-    # Read file content and encode as base64
+    # Store the image in the blob store; the patient document keeps only URLs
     file_content = await file.read()
-    photo_base64 = base64.b64encode(file_content).decode('utf-8')
+    photo_blob = await blob_store.put_image(file_content, file.content_type, current_user["user_id"])
     
     # Generate blockchain hash for audit
     audit_hash = generate_blockchain_hash(
@@ -836,7 +902,8 @@ async def upload_patient_profile_photo(
         {"_id": ObjectId(patient_id)},
         {
             "$set": {
-                "profile_photo": photo_base64,
+                "profile_photo": photo_blob["url"],
+                "profile_photo_blob": {k: v for k, v in photo_blob.items() if k != "deduplicated"},
                 "updated_at": datetime.utcnow().isoformat(),
                 "audit_hash": audit_hash
             }
@@ -849,6 +916,9 @@ async def upload_patient_profile_photo(
             detail="Failed to update patient profile photo"
         )
     
+    # The replaced photo no longer references its blob
+    await blob_store.release(patient.get("profile_photo_blob"))
+    
     # Log photo upload
     await audit_logs_collection.insert_one({
         "action": "patient_photo_uploaded",
@@ -907,12 +977,13 @@ async def upload_patient_extra_photo(
             detail="File must be an image"
         )
     
-    # Read file content and encode as base64
+    # Store the image in the blob store; the patient document keeps only URLs
     file_content = await file.read()
-    photo_base64 = base64.b64encode(file_content).decode('utf-8')
+    photo_blob = await blob_store.put_image(file_content, file.content_type, current_user["user_id"])
     
     # Create photo metadata
     photo_metadata = {
+        **{k: v for k, v in photo_blob.items() if k != "deduplicated"},
         "description": description,
         "uploaded_by": current_user.get("email", "unknown"),
         "uploaded_at": datetime.utcnow().isoformat(),
@@ -930,7 +1001,8 @@ async def upload_patient_extra_photo(
         {"_id": ObjectId(patient_id)},
         {
             "$push": {
-                "extra_photos": photo_base64
+                "extra_photos": photo_blob["url"],
+                "extra_photo_blobs": photo_metadata
             },
             "$set": {
                 "updated_at": datetime.utcnow().isoformat(),
@@ -1004,9 +1076,7 @@ async def get_patient_photos(
     
     return {
         "patient_id": patient_id,
-        "profile_photo": patient.get("profile_photo"),
-        "extra_photos": patient.get("extra_photos", []),
-        "photo_metadata": patient.get("photo_metadata", {})
+        **signed_photos(patient)
     }
 
 
@@ -1056,13 +1126,17 @@ async def delete_patient_extra_photo(
     )
     
     # Remove photo at specified index
-    extra_photos.pop(photo_index)
+    removed_photo = extra_photos.pop(photo_index)
+    # Matched by file id: legacy documents have no blob list aligned with their photos
+    extra_photo_blobs = patient.get("extra_photo_blobs", [])
+    removed_blob = pop_photo_blob(extra_photo_blobs, removed_photo)
     
     result = await patients_collection.update_one(
         {"_id": ObjectId(patient_id)},
         {
             "$set": {
                 "extra_photos": extra_photos,
+                "extra_photo_blobs": extra_photo_blobs,
                 "updated_at": datetime.utcnow().isoformat(),
                 "audit_hash": audit_hash
             }
@@ -1075,6 +1149,8 @@ async def delete_patient_extra_photo(
             detail="Failed to delete photo"
         )
     
+    await blob_store.release(removed_blob)
+    
     # Log photo deletion
     await audit_logs_collection.insert_one({
         "action": "patient_photo_deleted",
@@ -15,6 +15,7 @@ import traceback
 
 from app.api.auth import get_current_user
 from app.core.database import get_database
+from app.core.principal_cache import principal_cache
 from app.utils.comprehensivePermissions import COMPREHENSIVE_PERMISSIONS
 
 logger = logging.getLogger(__name__)
@@ -121,6 +122,7 @@ async def save_role_to_mongodb(role: Role) -> bool:
             role_dict,
             upsert=True
         )
+        principal_cache.invalidate_all()
         return True
     except Exception as e:
         print(f"Error saving role to MongoDB: {e}")
@@ -166,6 +168,7 @@ async def save_permissions_to_mongodb(permissions: List[Permission]) -> bool:
         if permissions_data:
             await collection.insert_many(permissions_data)
         
+        principal_cache.invalidate_all()
         return True
     except Exception as e:
         print(f"Error saving permissions to MongoDB: {e}")
@@ -201,6 +204,7 @@ async def save_user_role_to_mongodb(user_role: UserRole) -> bool:
             user_role_dict,
             upsert=True
         )
+        principal_cache.invalidate(user_role.user_id)
         
         logger.info(f"User role saved successfully: matched={result.matched_count}, modified={result.modified_count}, upserted={result.upserted_id}")
         return True
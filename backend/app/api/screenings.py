@@ -6,6 +6,7 @@ Handles vision screening sessions, results, and analysis
 from datetime import datetime, timedelta
 from typing import Optional, List
 from fastapi import APIRouter, HTTPException, Depends, status, Query
+from pymongo import DESCENDING
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel, Field
 from bson import ObjectId
@@ -15,6 +16,9 @@ from app.core.security import verify_token, generate_blockchain_hash
 from app.core.database import get_database
 from app.core.db_rbac import has_permission_db, has_role_db, has_any_role_db, get_user_permissions_from_db
 from app.utils.timezone import get_current_thailand_time, format_datetime_for_frontend
+from app.services.dashboard_stats import publish_change
+from app.core.pagination import paginate
+from app.core.serialization import BSONJSONResponse, DocumentView
 
 router = APIRouter(prefix="/screenings", tags=["Screenings"])
 
@@ -99,6 +103,16 @@ class ScreeningSessionResponse(BaseModel):
     current_step_name: Optional[str] = None
     workflow_data: Optional[dict] = None
 
+# ScreeningSessionResponse fields read from a session document for list responses
+SESSION_LIST_VIEW = DocumentView(
+    [
+        "patient_id", ("examiner_id", ""), "screening_type", ("screening_category", "medical_screening"), "status",
+        "created_at", "completed_at", "conclusion", "recommendations", "follow_up_date",
+        "current_step", "current_step_name", "workflow_data",
+    ],
+    id_field="session_id",
+)
+
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
     """Get current authenticated user"""
     payload = verify_token(credentials.credentials)
@@ -200,6 +214,7 @@ async def create_screening_session(
     
     result = await db.evep.screenings.insert_one(session_doc)
     session_doc["_id"] = result.inserted_id
+    await publish_change("screenings", after=session_doc)
     
     # Log audit
     await db.evep.audit_logs.insert_one({
@@ -381,6 +396,7 @@ async def update_screening_session(
         {"_id": ObjectId(session_id)},
         {"$set": update_doc}
     )
+    await publish_change("screenings", before=session, after={**session, **update_doc})
     
     # Log audit
     await db.evep.audit_logs.insert_one({
@@ -455,9 +471,15 @@ async def list_screening_sessions(
     screening_category: Optional[str] = Query(None, description="Filter by screening category"),
     limit: int = Query(50, ge=1, le=100, description="Number of results to return"),
     skip: int = Query(0, ge=0, description="Number of results to skip"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page; replaces skip"),
     current_user: dict = Depends(auth_get_current_user)
 ):
-    """List screening sessions with optional filtering"""
+    """
+    List screening sessions with optional filtering, newest first
+
+    The body stays a plain list; the cursor for the next page is returned
+    in the X-Next-Cursor and X-Has-More headers.
+    """
     
     db = get_database()
     
@@ -514,62 +536,43 @@ async def list_screening_sessions(
         )
     
     # Get sessions
-    cursor = db.evep.screenings.find(filter_query).sort("created_at", -1).skip(skip).limit(limit)
-    sessions = await cursor.to_list(length=limit)
+    page = await paginate(db.evep.screenings, filter_query, limit, cursor=cursor, skip=skip,
+                          sort_field="created_at", direction=DESCENDING,
+                          projection=SESSION_LIST_VIEW.projection, count="none")
+    sessions = page.items
+    headers = {"X-Has-More": "true" if page.has_more else "false"}
+    if page.next_cursor:
+        headers["X-Next-Cursor"] = page.next_cursor
+    
+    # Enrich sessions with patient and examiner names, one query per collection
+    patient_ids = {ObjectId(session["patient_id"]) for session in sessions if ObjectId.is_valid(session.get("patient_id"))}
+    examiner_ids = {ObjectId(session["examiner_id"]) for session in sessions if ObjectId.is_valid(session.get("examiner_id"))}
+    name_fields = {"first_name": 1, "last_name": 1}
+    patient_names = {}
+    if patient_ids:
+        async for patient in db.evep.patients.find({"_id": {"$in": list(patient_ids)}}, name_fields):
+            patient_names[str(patient["_id"])] = f"{patient.get('first_name', '')} {patient.get('last_name', '')}".strip()
+        # Try students collection for the ones not in patients
+        student_ids = [patient_id for patient_id in patient_ids if str(patient_id) not in patient_names]
+        if student_ids:
+            async for student in db.evep.students.find({"_id": {"$in": student_ids}}, name_fields):
+                patient_names[str(student["_id"])] = f"{student.get('first_name', '')} {student.get('last_name', '')}".strip()
+    examiner_names = {}
+    if examiner_ids:
+        async for examiner in db.evep.users.find({"_id": {"$in": list(examiner_ids)}}, {**name_fields, "username": 1}):
+            examiner_name = f"{examiner.get('first_name', '')} {examiner.get('last_name', '')}".strip()
+            examiner_names[str(examiner["_id"])] = examiner_name or examiner.get('username', 'Unknown Examiner')
     
-    # Enrich sessions with patient and examiner names
     enriched_sessions = []
     for session in sessions:
-        # Get patient name
-        patient_name = None
-        if session.get("patient_id"):
-            try:
-                patient = await db.evep.patients.find_one({"_id": ObjectId(session["patient_id"])})
-                if patient:
-                    patient_name = f"{patient.get('first_name', '')} {patient.get('last_name', '')}".strip()
-                else:
-                    # Try students collection if not in patients
-                    student = await db.evep.students.find_one({"_id": ObjectId(session["patient_id"])})
-                    if student:
-                        patient_name = f"{student.get('first_name', '')} {student.get('last_name', '')}".strip()
-            except:
-                patient_name = "Unknown Patient"
-        
-        # Get examiner name
-        examiner_name = None
-        if session.get("examiner_id"):
-            try:
-                examiner = await db.evep.users.find_one({"_id": ObjectId(session["examiner_id"])})
-                if examiner:
-                    examiner_name = f"{examiner.get('first_name', '')} {examiner.get('last_name', '')}".strip()
-                    if not examiner_name:
-                        examiner_name = examiner.get('username', 'Unknown Examiner')
-            except:
-                examiner_name = "Unknown Examiner"
-        
-        enriched_sessions.append(
-            ScreeningSessionResponse(
-                session_id=str(session["_id"]),
-                patient_id=str(session["patient_id"]),
-                patient_name=patient_name or "Unknown Patient",
-                examiner_id=str(session.get("examiner_id", "")),
-                examiner_name=examiner_name or "Unknown Examiner",
-                screening_type=session["screening_type"],
-                screening_category=session.get("screening_category", "medical_screening"),
-                status=session["status"],
-                created_at=session["created_at"].isoformat() if isinstance(session["created_at"], datetime) else session["created_at"],
-                completed_at=session.get("completed_at").isoformat() if session.get("completed_at") and isinstance(session["completed_at"], datetime) else session.get("completed_at"),
-                results=None,  # Skip results for now to avoid validation issues
-                conclusion=session.get("conclusion"),
-                recommendations=session.get("recommendations"),
-                follow_up_date=session.get("follow_up_date"),
-                current_step=session.get("current_step"),
-                current_step_name=session.get("current_step_name"),
-                workflow_data=session.get("workflow_data")
-            )
-        )
-    
-    return enriched_sessions
+        rendered = SESSION_LIST_VIEW.render(session)
+        rendered["patient_name"] = patient_names.get(str(session.get("patient_id"))) or "Unknown Patient"
+        rendered["examiner_name"] = examiner_names.get(str(session.get("examiner_id"))) or "Unknown Examiner"
+        rendered["results"] = None  # Skip results for now to avoid validation issues
+        enriched_sessions.append(rendered)
+    
+    # Documents are rendered to the ScreeningSessionResponse shape, so they are not validated again
+    return BSONJSONResponse(enriched_sessions, headers=headers)
 
 @router.delete("/sessions/{session_id}")
 async def delete_screening_session(
@@ -618,6 +621,7 @@ async def delete_screening_session(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Screening session not found or already deleted"
             )
+        await publish_change("screenings", before=session)
         
         # Log audit for hard delete
         await db.evep.audit_logs.insert_one({
@@ -648,6 +652,7 @@ async def delete_screening_session(
                 }
             }
         )
+        await publish_change("screenings", before=session, after={**session, "status": "cancelled"})
         
         # Log audit for soft delete
         await db.evep.audit_logs.insert_one({
@@ -821,6 +826,7 @@ async def create_screening_outcome(
                 }
             }
         )
+        await publish_change("screenings", before=session, after={**session, "status": "completed"})
     
     # Log audit
     await log_security_event(
@@ -13,6 +13,7 @@ from bson import ObjectId
 from app.core.config import settings
 from app.core.security import hash_password, verify_password, generate_blockchain_hash
 from app.core.database import get_users_collection, get_audit_logs_collection
+from app.core.principal_cache import principal_cache
 from app.api.auth import get_current_user
 # from app.core.rbac import check_permission  # Temporarily disabled
 
@@ -389,6 +390,7 @@ async def update_user(
             {"_id": ObjectId(user_id)},
             {"$set": update_data}
         )
+        principal_cache.invalidate(user_id)
         
         if result.modified_count == 0:
             raise HTTPException(
@@ -467,6 +469,7 @@ async def delete_user(
                 }
             }
         )
+        principal_cache.invalidate(user_id)
         
         if result.modified_count == 0:
             raise HTTPException(
@@ -522,6 +525,7 @@ async def activate_user(
                 "$unset": {"deleted_at": ""}
             }
         )
+        principal_cache.invalidate(user_id)
         
         if result.modified_count == 0:
             raise HTTPException(
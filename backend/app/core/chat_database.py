@@ -2,7 +2,7 @@
 Database models and operations for Chat Bot system
 
 This module provides database operations for:
-- Chat conversations storage
+- Chat conversations storage (a header per conversation, messages in fixed-size buckets)
 - LLM suggestions and predefined messages
 - Intent patterns and response templates
 - AI/ML learning data
@@ -12,15 +12,22 @@ from typing import List, Dict, Any, Optional
 from datetime import datetime
 from bson import ObjectId
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument, UpdateOne
+from app.core.config import settings
 from app.core.database import get_database
 
 # Collection names
 CHAT_CONVERSATIONS_COLLECTION = "chat_conversations"
+CHAT_MESSAGE_BUCKETS_COLLECTION = "chat_message_buckets"
 CHAT_SUGGESTIONS_COLLECTION = "chat_suggestions"
 CHAT_INTENT_PATTERNS_COLLECTION = "chat_intent_patterns"
 CHAT_RESPONSE_TEMPLATES_COLLECTION = "chat_response_templates"
 CHAT_LEARNING_DATA_COLLECTION = "chat_learning_data"
 AI_AGENT_CONFIGS_COLLECTION = "ai_agent_configs"
+CHAT_METADATA_COLLECTION = "chat_metadata"
+
+# Version stamp bumped on every intent pattern write so compiled matchers reload
+INTENT_PATTERNS_VERSION_ID = "intent_patterns_version"
 
 class ChatDatabase:
     """Database operations for chat bot system"""
@@ -28,21 +35,31 @@ class ChatDatabase:
     def __init__(self, db: AsyncIOMotorDatabase):
         self.db = db
         self.conversations = db[CHAT_CONVERSATIONS_COLLECTION]
+        self.message_buckets = db[CHAT_MESSAGE_BUCKETS_COLLECTION]
+        self.bucket_size = max(1, settings.CHAT_MESSAGE_BUCKET_SIZE)
         self.suggestions = db[CHAT_SUGGESTIONS_COLLECTION]
         self.intent_patterns = db[CHAT_INTENT_PATTERNS_COLLECTION]
         self.response_templates = db[CHAT_RESPONSE_TEMPLATES_COLLECTION]
         self.learning_data = db[CHAT_LEARNING_DATA_COLLECTION]
         self.ai_agent_configs = db[AI_AGENT_CONFIGS_COLLECTION]
+        self.metadata = db[CHAT_METADATA_COLLECTION]
 
     # Conversation Management
+    #
+    # A conversation is a header document in chat_conversations holding its
+    # counters, and its messages live in chat_message_buckets documents of
+    # bucket_size messages each. Message n goes to bucket n // bucket_size,
+    # so no document grows without bound and recent history is one read.
+    # Conversations stored before bucketing keep their embedded messages,
+    # which are read in front of any bucketed ones.
     async def create_conversation(self, user_id: str, conversation_id: str) -> Dict[str, Any]:
         """Create a new conversation"""
         conversation = {
             "conversation_id": conversation_id,
             "user_id": user_id,
-            "messages": [],
             "created_at": datetime.utcnow(),
             "updated_at": datetime.utcnow(),
+            "last_message": None,
             "metadata": {
                 "total_messages": 0,
                 "user_role": None,
@@ -53,59 +70,169 @@ class ChatDatabase:
         
         result = await self.conversations.insert_one(conversation)
         conversation["_id"] = result.inserted_id
+        conversation["messages"] = []
         return conversation
 
-    async def add_message_to_conversation(
-        self, 
-        conversation_id: str, 
+    @staticmethod
+    def build_message(
         message: str, 
         is_user: bool, 
         intent: Optional[str] = None,
         confidence: Optional[float] = None,
-        metadata: Optional[Dict[str, Any]] = None
-    ) -> bool:
-        """Add a message to an existing conversation"""
-        message_data = {
+        metadata: Optional[Dict[str, Any]] = None,
+        timestamp: Optional[datetime] = None
+    ) -> Dict[str, Any]:
+        """Message document for add_messages()"""
+        return {
             "message": message,
             "is_user": is_user,
-            "timestamp": datetime.utcnow(),
+            "timestamp": timestamp or datetime.utcnow(),
             "intent": intent,
             "confidence": confidence,
             "metadata": metadata or {}
         }
+
+    async def add_messages(
+        self, 
+        conversation_id: str, 
+        messages: List[Dict[str, Any]], 
+        user_id: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Append messages to a conversation, creating it for user_id if it does not exist
         
-        result = await self.conversations.update_one(
-            {"conversation_id": conversation_id},
-            {
-                "$push": {"messages": message_data},
-                "$set": {"updated_at": datetime.utcnow()},
-                "$inc": {"metadata.total_messages": 1}
+        The header update reserves sequence numbers for the messages, and every
+        bucket they fall into is written by one bulk_write. Returns the updated
+        header, or None when the conversation does not exist and no user_id
+        was given.
+        """
+        if not messages:
+            return await self.conversations.find_one({"conversation_id": conversation_id})
+        now = datetime.utcnow()
+        update: Dict[str, Any] = {
+            "$inc": {"metadata.total_messages": len(messages)},
+            "$set": {"updated_at": now, "last_message": messages[-1]["message"]}
+        }
+        intents = [message["intent"] for message in messages if message.get("intent")]
+        if intents:
+            update["$addToSet"] = {"metadata.intents_used": {"$each": intents}}
+        if user_id is not None:
+            update["$setOnInsert"] = {
+                "user_id": user_id,
+                "created_at": now,
+                "metadata.user_role": None,
+                "metadata.satisfaction_score": None
             }
+            if not intents:
+                update["$setOnInsert"]["metadata.intents_used"] = []
+        header = await self.conversations.find_one_and_update(
+            {"conversation_id": conversation_id},
+            update,
+            projection={"messages": 0},
+            upsert=user_id is not None,
+            return_document=ReturnDocument.AFTER
         )
+        if header is None:
+            return None
         
-        # Update intent tracking
-        if intent:
-            await self.conversations.update_one(
-                {"conversation_id": conversation_id},
-                {"$addToSet": {"metadata.intents_used": intent}}
+        first_seq = header["metadata"]["total_messages"] - len(messages)
+        buckets: Dict[int, List[Dict[str, Any]]] = {}
+        for offset, message in enumerate(messages):
+            seq = first_seq + offset
+            buckets.setdefault(seq // self.bucket_size, []).append({**message, "seq": seq})
+        await self.message_buckets.bulk_write([
+            UpdateOne(
+                {"conversation_id": conversation_id, "bucket": bucket},
+                {
+                    # Concurrent turns may land out of order; $sort keeps the bucket in sequence
+                    "$push": {"messages": {"$each": bucket_messages, "$sort": {"seq": 1}}},
+                    "$inc": {"count": len(bucket_messages)},
+                    "$set": {"updated_at": now},
+                    "$setOnInsert": {"created_at": now}
+                },
+                upsert=True
             )
-        
-        return result.modified_count > 0
+            for bucket, bucket_messages in buckets.items()
+        ], ordered=False)
+        return header
+
+    async def record_turn(
+        self, 
+        conversation_id: str, 
+        user_id: str, 
+        messages: List[Dict[str, Any]], 
+        learning_records: Optional[List[Dict[str, Any]]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Store a chat turn: its messages and learning data in one write per collection"""
+        header = await self.add_messages(conversation_id, messages, user_id=user_id)
+        if learning_records:
+            await self.learning_data.insert_many(learning_records, ordered=False)
+        return header
+
+    async def add_message_to_conversation(
+        self, 
+        conversation_id: str, 
+        message: str, 
+        is_user: bool, 
+        intent: Optional[str] = None,
+        confidence: Optional[float] = None,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> bool:
+        """Add a message to an existing conversation"""
+        message_data = self.build_message(message, is_user, intent, confidence, metadata)
+        return await self.add_messages(conversation_id, [message_data]) is not None
 
     async def get_conversation(self, conversation_id: str) -> Optional[Dict[str, Any]]:
-        """Get a conversation by ID"""
-        return await self.conversations.find_one({"conversation_id": conversation_id})
+        """Get a conversation by ID with all of its messages"""
+        conversation = await self.conversations.find_one({"conversation_id": conversation_id})
+        if conversation is None:
+            return None
+        messages = conversation.get("messages", [])
+        async for bucket in self.message_buckets.find({"conversation_id": conversation_id}).sort("bucket", 1):
+            messages.extend(bucket["messages"])
+        conversation["messages"] = messages
+        return conversation
+
+    async def get_recent_messages(self, conversation_id: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Last messages of a conversation, oldest first
+        
+        The header's message count locates the buckets holding them: the
+        newest bucket alone unless it has fewer than limit messages.
+        """
+        header = await self.conversations.find_one(
+            {"conversation_id": conversation_id},
+            {"metadata.total_messages": 1}
+        )
+        total = header["metadata"]["total_messages"] if header else 0
+        if total <= 0 or limit <= 0:
+            return []
+        first_seq = max(0, total - limit)
+        messages: List[Dict[str, Any]] = []
+        async for bucket in self.message_buckets.find({
+            "conversation_id": conversation_id,
+            "bucket": {"$gte": first_seq // self.bucket_size, "$lte": (total - 1) // self.bucket_size}
+        }).sort("bucket", 1):
+            messages.extend(message for message in bucket["messages"] if message["seq"] >= first_seq)
+        
+        missing = total - first_seq - len(messages)
+        if missing > 0:
+            # Conversations stored before bucketing embed their first messages in the header
+            legacy = await self.conversations.find_one(
+                {"conversation_id": conversation_id},
+                {"messages": {"$slice": -missing}}
+            )
+            messages = (legacy or {}).get("messages", []) + messages
+        return messages
 
     async def get_user_conversations(self, user_id: str, limit: int = 10) -> List[Dict[str, Any]]:
         """Get user's recent conversations"""
-        cursor = self.conversations.find(
-            {"user_id": user_id}
-        ).sort("updated_at", -1).limit(limit)
-        
-        conversations = []
-        async for conv in cursor:
-            conversations.append(conv)
-        return conversations
+        pipeline = [
+            {"$match": {"user_id": user_id}},
+            {"$sort": {"updated_at": -1}},
+            {"$limit": limit},
+            # Headers only; conversations stored before bucketing keep just their last embedded message
+            {"$addFields": {"messages": {"$slice": [{"$ifNull": ["$messages", []]}, -1]}}}
+        ]
+        return await self.conversations.aggregate(pipeline).to_list(limit)
 
     async def update_conversation_metadata(
         self, 
@@ -189,6 +316,19 @@ class ChatDatabase:
         
         return patterns
 
+    async def get_intent_patterns_version(self) -> Optional[int]:
+        """Get the intent patterns version stamp, None before the first write"""
+        doc = await self.metadata.find_one({"_id": INTENT_PATTERNS_VERSION_ID})
+        return doc["version"] if doc else None
+
+    async def bump_intent_patterns_version(self) -> None:
+        """Mark intent patterns as changed for every compiled matcher"""
+        await self.metadata.update_one(
+            {"_id": INTENT_PATTERNS_VERSION_ID},
+            {"$inc": {"version": 1}, "$set": {"updated_at": datetime.utcnow()}},
+            upsert=True
+        )
+
     async def create_intent_pattern(
         self, 
         intent_name: str, 
@@ -210,6 +350,7 @@ class ChatDatabase:
             pattern_doc,
             upsert=True
         )
+        await self.bump_intent_patterns_version()
         
         if result.upserted_id:
             return str(result.upserted_id)
@@ -401,19 +542,40 @@ class ChatDatabase:
         return results
 
     # Learning Data Management
+    @staticmethod
+    def build_learning_record(user_id: str, message: str, response: str, intent: str, confidence: float, agent_type: str = None, **extra) -> Dict[str, Any]:
+        """Learning data document as stored by store_learning_data()"""
+        return {
+            "user_id": user_id,
+            "message": message,
+            "response": response,
+            "intent": intent,
+            "confidence": confidence,
+            "agent_type": agent_type,
+            **extra,
+            "timestamp": datetime.utcnow(),
+            "created_at": datetime.utcnow()
+        }
+
+    @staticmethod
+    def build_conversation_turn(conversation_id: str, user_id: str, user_message: str, bot_response: str, agent_type: str = None, intent: str = None, confidence: float = None) -> Dict[str, Any]:
+        """Conversation turn document as stored by store_conversation_turn()"""
+        return {
+            "conversation_id": conversation_id,
+            "user_id": user_id,
+            "user_message": user_message,
+            "bot_response": bot_response,
+            "agent_type": agent_type,
+            "intent": intent,
+            "confidence": confidence,
+            "timestamp": datetime.utcnow(),
+            "created_at": datetime.utcnow()
+        }
+
     async def store_learning_data(self, user_id: str, message: str, response: str, intent: str, confidence: float, agent_type: str = None):
         """Store learning data for AI improvement"""
         try:
-            learning_data = {
-                "user_id": user_id,
-                "message": message,
-                "response": response,
-                "intent": intent,
-                "confidence": confidence,
-                "agent_type": agent_type,
-                "timestamp": datetime.utcnow(),
-                "created_at": datetime.utcnow()
-            }
+            learning_data = self.build_learning_record(user_id, message, response, intent, confidence, agent_type)
             result = await self.learning_data.insert_one(learning_data)
             return result.inserted_id
         except Exception as e:
@@ -423,17 +585,7 @@ class ChatDatabase:
     async def store_conversation_turn(self, conversation_id: str, user_id: str, user_message: str, bot_response: str, agent_type: str = None, intent: str = None, confidence: float = None):
         """Store individual conversation turn for learning"""
         try:
-            turn_data = {
-                "conversation_id": conversation_id,
-                "user_id": user_id,
-                "user_message": user_message,
-                "bot_response": bot_response,
-                "agent_type": agent_type,
-                "intent": intent,
-                "confidence": confidence,
-                "timestamp": datetime.utcnow(),
-                "created_at": datetime.utcnow()
-            }
+            turn_data = self.build_conversation_turn(conversation_id, user_id, user_message, bot_response, agent_type, intent, confidence)
             result = await self.learning_data.insert_one(turn_data)
             return result.inserted_id
         except Exception as e:
@@ -208,12 +208,71 @@ class Settings(BaseSettings):
     CDN_ENABLED: bool = Field(default=True, env="CDN_ENABLED")
     FILE_STORAGE_PATH: str = Field(default="/tmp/uploads", env="FILE_STORAGE_PATH")
     SECURE_FILE_ACCESS: bool = Field(default=True, env="SECURE_FILE_ACCESS")
+    # Patient and student photo URLs are signed and valid for one to two of these windows
+    PHOTO_URL_TTL_SECONDS: int = Field(default=3600, env="PHOTO_URL_TTL_SECONDS")
+    
+    # Data export
+    EXPORT_STORAGE_PATH: str = Field(default="/tmp/exports", env="EXPORT_STORAGE_PATH")
+    EXPORT_BATCH_SIZE: int = Field(default=1000, env="EXPORT_BATCH_SIZE")
+    
+    # Audit log pipeline (events are written behind the request in batches)
+    AUDIT_QUEUE_MAX_SIZE: int = Field(default=10000, env="AUDIT_QUEUE_MAX_SIZE")
+    AUDIT_BATCH_SIZE: int = Field(default=500, env="AUDIT_BATCH_SIZE")
+    AUDIT_FLUSH_INTERVAL_SECONDS: float = Field(default=1.0, env="AUDIT_FLUSH_INTERVAL_SECONDS")
+    AUDIT_SPILL_PATH: str = Field(default="/tmp/evep_audit_spill.{pid}.jsonl", env="AUDIT_SPILL_PATH")  # {pid} gives each worker its own file
+    
+    # Audit ledger (audit_logs sealed into hash-chained Merkle blocks)
+    AUDIT_LEDGER_BLOCK_SIZE: int = Field(default=1024, env="AUDIT_LEDGER_BLOCK_SIZE")
+    AUDIT_LEDGER_SEAL_INTERVAL_SECONDS: float = Field(default=5.0, env="AUDIT_LEDGER_SEAL_INTERVAL_SECONDS")
+    AUDIT_LEDGER_LEASE_SECONDS: float = Field(default=60.0, env="AUDIT_LEDGER_LEASE_SECONDS")
+    AUDIT_LEDGER_VERIFY_WORKERS: int = Field(default=4, env="AUDIT_LEDGER_VERIFY_WORKERS")
     
     # JWT Configuration
     JWT_SECRET_KEY: str = Field(default="hardcoded_secret_key", env="JWT_SECRET_KEY")
     JWT_ALGORITHM: str = Field(default="HS256", env="JWT_ALGORITHM")
     JWT_EXPIRATION_HOURS: int = Field(default=24, env="JWT_EXPIRATION_HOURS")
     
+    # Auth/RBAC principal cache
+    PRINCIPAL_CACHE_TTL_SECONDS: int = Field(default=30, env="PRINCIPAL_CACHE_TTL_SECONDS")
+    PRINCIPAL_CACHE_MAX_SIZE: int = Field(default=10000, env="PRINCIPAL_CACHE_MAX_SIZE")
+    # Invalidations are broadcast to the other workers through Redis (falls back to SOCKETIO_REDIS_URL)
+    PRINCIPAL_CACHE_REDIS_URL: str = Field(default="", env="PRINCIPAL_CACHE_REDIS_URL")
+    PRINCIPAL_CACHE_REDIS_CHANNEL: str = Field(default="evep-principals", env="PRINCIPAL_CACHE_REDIS_CHANNEL")
+    
+    # Dashboard counters (materialized stats are recomputed once older than this)
+    DASHBOARD_COUNTERS_MAX_AGE_SECONDS: int = Field(default=3600, env="DASHBOARD_COUNTERS_MAX_AGE_SECONDS")
+    
+    # System monitor (admin monitoring endpoints serve from its sample history)
+    SYSTEM_MONITOR_INTERVAL_SECONDS: float = Field(default=5.0, env="SYSTEM_MONITOR_INTERVAL_SECONDS")
+    SYSTEM_MONITOR_HISTORY_SIZE: int = Field(default=720, env="SYSTEM_MONITOR_HISTORY_SIZE")
+    SYSTEM_MONITOR_DB_INTERVAL_SECONDS: float = Field(default=30.0, env="SYSTEM_MONITOR_DB_INTERVAL_SECONDS")
+    BACKUP_STORAGE_PATH: str = Field(default="backups", env="BACKUP_STORAGE_PATH")
+    
+    # Socket.IO scaling (empty URL keeps events and presence in process memory)
+    SOCKETIO_REDIS_URL: str = Field(default="", env="SOCKETIO_REDIS_URL")
+    SOCKETIO_REDIS_CHANNEL: str = Field(default="evep-socketio", env="SOCKETIO_REDIS_CHANNEL")
+    
+    # Embedding executor (concurrent single-text requests are coalesced into one model call)
+    EMBEDDING_MAX_BATCH_SIZE: int = Field(default=32, env="EMBEDDING_MAX_BATCH_SIZE")
+    EMBEDDING_MAX_WAIT_MS: float = Field(default=5.0, env="EMBEDDING_MAX_WAIT_MS")
+    EMBEDDING_WORKER_THREADS: int = Field(default=1, env="EMBEDDING_WORKER_THREADS")
+    
+    # Embedding cache (empty path keeps only the in-memory tier)
+    EMBEDDING_CACHE_MEMORY_MB: int = Field(default=64, env="EMBEDDING_CACHE_MEMORY_MB")
+    EMBEDDING_CACHE_PATH: str = Field(default="/tmp/evep_embedding_cache/embeddings.sqlite3", env="EMBEDDING_CACHE_PATH")
+    
+    # AI agent response cache (empty Redis URL keeps responses in process memory only)
+    AI_RESPONSE_CACHE_TTL_SECONDS: float = Field(default=3600.0, env="AI_RESPONSE_CACHE_TTL_SECONDS")
+    AI_RESPONSE_CACHE_MAX_ENTRIES: int = Field(default=1000, env="AI_RESPONSE_CACHE_MAX_ENTRIES")
+    AI_RESPONSE_CACHE_MAX_MB: int = Field(default=32, env="AI_RESPONSE_CACHE_MAX_MB")
+    AI_RESPONSE_CACHE_REDIS_URL: str = Field(default="", env="AI_RESPONSE_CACHE_REDIS_URL")
+    
+    # Chat message storage (messages per conversation bucket document)
+    CHAT_MESSAGE_BUCKET_SIZE: int = Field(default=50, env="CHAT_MESSAGE_BUCKET_SIZE")
+    
+    # Chat bot intent matcher (seconds between checks of the intent patterns version stamp)
+    INTENT_PATTERNS_REFRESH_SECONDS: float = Field(default=5.0, env="INTENT_PATTERNS_REFRESH_SECONDS")
+    
     # Database Configuration
     DATABASE_URL: str = Field(default="mongodb://localhost:27017/evep", env="DATABASE_URL")
     
@@ -226,6 +285,48 @@ class Settings(BaseSettings):
     # Telegram Configuration
     TELEGRAM_BOT_TOKEN: str = Field(default="", env="TELEGRAM_BOT_TOKEN")
     TELEGRAM_CHAT_ID: str = Field(default="", env="TELEGRAM_CHAT_ID")
+    TELEGRAM_API_BASE_URL: str = Field(default="https://api.telegram.org", env="TELEGRAM_API_BASE_URL")
+    
+    # LINE Messaging API Configuration
+    LINE_CHANNEL_ACCESS_TOKEN: str = Field(default="", env="LINE_CHANNEL_ACCESS_TOKEN")
+    LINE_API_BASE_URL: str = Field(default="https://api.line.me", env="LINE_API_BASE_URL")
+    
+    # Email (SMTP) Configuration
+    SMTP_HOST: str = Field(default="", env="SMTP_HOST")
+    SMTP_PORT: int = Field(default=587, env="SMTP_PORT")
+    SMTP_USERNAME: str = Field(default="", env="SMTP_USERNAME")
+    SMTP_PASSWORD: str = Field(default="", env="SMTP_PASSWORD")
+    SMTP_USE_TLS: bool = Field(default=True, env="SMTP_USE_TLS")
+    EMAIL_FROM: str = Field(default="noreply@evep.my-firstcare.com", env="EMAIL_FROM")
+    
+    # Outbound notification dispatcher (rates and concurrency are per worker process)
+    NOTIFY_HTTP_TIMEOUT_SECONDS: float = Field(default=10.0, env="NOTIFY_HTTP_TIMEOUT_SECONDS")
+    NOTIFY_HTTP_MAX_CONNECTIONS: int = Field(default=64, env="NOTIFY_HTTP_MAX_CONNECTIONS")
+    NOTIFY_MAX_ATTEMPTS: int = Field(default=5, env="NOTIFY_MAX_ATTEMPTS")
+    NOTIFY_BACKOFF_BASE_SECONDS: float = Field(default=0.5, env="NOTIFY_BACKOFF_BASE_SECONDS")
+    NOTIFY_BACKOFF_MAX_SECONDS: float = Field(default=30.0, env="NOTIFY_BACKOFF_MAX_SECONDS")
+    NOTIFY_LINE_RATE_PER_SECOND: float = Field(default=100.0, env="NOTIFY_LINE_RATE_PER_SECOND")
+    NOTIFY_LINE_BURST: int = Field(default=200, env="NOTIFY_LINE_BURST")
+    NOTIFY_LINE_CONCURRENCY: int = Field(default=32, env="NOTIFY_LINE_CONCURRENCY")
+    NOTIFY_TELEGRAM_RATE_PER_SECOND: float = Field(default=1.0, env="NOTIFY_TELEGRAM_RATE_PER_SECOND")
+    NOTIFY_TELEGRAM_BURST: int = Field(default=20, env="NOTIFY_TELEGRAM_BURST")
+    NOTIFY_TELEGRAM_CONCURRENCY: int = Field(default=4, env="NOTIFY_TELEGRAM_CONCURRENCY")
+    NOTIFY_EMAIL_RATE_PER_SECOND: float = Field(default=5.0, env="NOTIFY_EMAIL_RATE_PER_SECOND")
+    NOTIFY_EMAIL_BURST: int = Field(default=10, env="NOTIFY_EMAIL_BURST")
+    NOTIFY_EMAIL_CONCURRENCY: int = Field(default=4, env="NOTIFY_EMAIL_CONCURRENCY")
+
+    # Patient and student search index (held in memory by every worker process)
+    SEARCH_INDEX_ENABLED: bool = Field(default=True, env="SEARCH_INDEX_ENABLED")
+    SEARCH_INDEX_REFRESH_SECONDS: float = Field(default=5.0, env="SEARCH_INDEX_REFRESH_SECONDS")
+    SEARCH_INDEX_LOAD_BATCH_SIZE: int = Field(default=1000, env="SEARCH_INDEX_LOAD_BATCH_SIZE")
+
+    # Keyset pagination: how long list endpoints reuse a total count
+    PAGINATION_COUNT_CACHE_SECONDS: float = Field(default=30.0, env="PAGINATION_COUNT_CACHE_SECONDS")
+    PAGINATION_COUNT_CACHE_SIZE: int = Field(default=1000, env="PAGINATION_COUNT_CACHE_SIZE")
+
+    # AOC master data (provinces, districts, subdistricts, hospitals) held in memory
+    MASTER_DATA_CACHE_ENABLED: bool = Field(default=True, env="MASTER_DATA_CACHE_ENABLED")
+    MASTER_DATA_REFRESH_SECONDS: float = Field(default=60.0, env="MASTER_DATA_REFRESH_SECONDS")
     
     # AI Service Configuration
     ai_service_enabled: bool = Field(default=False, env="AI_SERVICE_ENABLED")
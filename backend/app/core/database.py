@@ -7,6 +7,7 @@ from pymongo import MongoClient
 from typing import Optional
 
 from app.core.config import Config
+from app.core.metrics import mongo_command_metrics
 
 # Global database client
 _database: Optional[AsyncIOMotorClient] = None
@@ -27,7 +28,8 @@ def get_database() -> AsyncIOMotorClient:
             # Add security options
             ssl=False,  # Set to True in production with SSL certificates
             retryWrites=True,
-            w='majority'  # Write concern for data consistency
+            w='majority',  # Write concern for data consistency
+            event_listeners=[mongo_command_metrics]
         )
     return _database
 
@@ -43,7 +45,8 @@ def get_sync_database() -> MongoClient:
         serverSelectionTimeoutMS=5000,
         ssl=False,  # Set to True in production with SSL certificates
         retryWrites=True,
-        w='majority'  # Write concern for data consistency
+        w='majority',  # Write concern for data consistency
+        event_listeners=[mongo_command_metrics]
     )
 
 async def close_database():
@@ -82,6 +85,10 @@ def get_patients_collection():
     """Get the patients collection"""
     return get_database().evep.patients
 
+def get_students_collection():
+    """Get the EVEP students collection"""
+    return get_database().evep["evep.students"]
+
 def get_screenings_collection():
     """Get the screenings collection"""
     return get_database().evep.screenings
@@ -98,6 +105,14 @@ def get_audit_logs_collection():
     """Get the audit logs collection"""
     return get_database().evep.audit_logs
 
+def get_audit_ledger_collection():
+    """Get the audit ledger (sealed Merkle blocks) collection"""
+    return get_database().evep.audit_ledger
+
+def get_notification_dead_letters_collection():
+    """Get the collection of outbound notifications that could not be delivered"""
+    return get_database().evep.notification_dead_letters
+
 def get_vector_embeddings_collection():
     """Get the vector embeddings collection"""
     return get_database().evep.vector_embeddings
@@ -135,6 +150,10 @@ def get_subdistricts_collection():
     """Get the subdistricts collection"""
     return get_database().evep.subdistricts
 
+def get_master_data_versions_collection():
+    """Get the master data versions collection"""
+    return get_database().evep.master_data_versions
+
 def get_migration_summaries_collection():
     """Get the migration summaries collection"""
     return get_database().evep.migration_summaries
@@ -9,86 +9,25 @@ from functools import wraps
 from bson import ObjectId
 
 from app.core.database import get_database
+from app.core.principal_cache import principal_cache, DEFAULT_PERMISSIONS
 from app.utils.timezone import get_current_thailand_time
 
 async def get_user_permissions_from_db(user_id: str) -> List[str]:
-    """Get all permissions for a user from MongoDB"""
+    """Get all permissions for a user from MongoDB (served from the principal cache)"""
     try:
-        db = get_database()
-        
-        # First, check if user has a default role in admin_users collection
-        try:
-            admin_users_collection = db.evep.admin_users
-            user = await admin_users_collection.find_one({"_id": ObjectId(user_id)})
-            if user and user.get("role"):
-                # For super_admin, return full access
-                if user["role"] == "super_admin":
-                    return ["*"]
-                # For other roles, return basic permissions
-                return ["view_patients", "view_screenings", "access_medical_portal"]
-        except:
-            pass
-        
-        # Try to get user roles from rbac_user_roles collection (if it exists)
-        try:
-            user_roles_collection = db.evep["rbac_user_roles"]
-            user_roles = await user_roles_collection.find({"user_id": user_id}).to_list(length=None)
-            
-            if user_roles:
-                # Get all role IDs
-                role_ids = [user_role["role_id"] for user_role in user_roles]
-                
-                # Get roles from rbac_roles collection
-                roles_collection = db.evep["rbac_roles"]
-                roles = await roles_collection.find({"id": {"$in": role_ids}}).to_list(length=None)
-                
-                # Collect all permissions
-                all_permissions = set()
-                for role in roles:
-                    role_permissions = role.get("permissions", [])
-                    if "*" in role_permissions:
-                        # If role has wildcard permission, return all permissions
-                        return ["*"]
-                    all_permissions.update(role_permissions)
-                
-                return list(all_permissions)
-        except:
-            pass
-        
-        # Default fallback - return basic permissions
-        return ["view_patients", "view_screenings", "access_medical_portal"]
+        principal = await principal_cache.get_principal(user_id)
+        return list(principal.permissions)
         
     except Exception as e:
         print(f"Error getting user permissions from database: {e}")
         # Fallback to basic permissions
-        return ["view_patients", "view_screenings", "access_medical_portal"]
+        return list(DEFAULT_PERMISSIONS)
 
 async def get_user_roles_from_db(user_id: str) -> List[str]:
-    """Get all role IDs for a user from MongoDB"""
+    """Get all role IDs for a user from MongoDB (served from the principal cache)"""
     try:
-        db = get_database()
-        
-        # First, check if user has a default role in admin_users collection
-        try:
-            admin_users_collection = db.evep.admin_users
-            user = await admin_users_collection.find_one({"_id": ObjectId(user_id)})
-            if user and user.get("role"):
-                return [user["role"]]
-        except:
-            pass
-        
-        # Try to get user roles from rbac_user_roles collection (if it exists)
-        try:
-            user_roles_collection = db.evep["rbac_user_roles"]
-            user_roles = await user_roles_collection.find({"user_id": user_id}).to_list(length=None)
-            
-            if user_roles:
-                return [user_role["role_id"] for user_role in user_roles]
-        except:
-            pass
-        
-        # Default fallback - return empty list
-        return []
+        principal = await principal_cache.get_principal(user_id)
+        return list(principal.roles)
         
     except Exception as e:
         print(f"Error getting user roles from database: {e}")
@@ -97,14 +36,8 @@ async def get_user_roles_from_db(user_id: str) -> List[str]:
 async def has_permission_db(user_id: str, permission: str) -> bool:
     """Check if user has specific permission from database"""
     try:
-        permissions = await get_user_permissions_from_db(user_id)
-        
-        # Check for wildcard permission
-        if "*" in permissions:
-            return True
-        
-        # Check for specific permission
-        return permission in permissions
+        principal = await principal_cache.get_principal(user_id)
+        return principal.has_permission(permission)
         
     except Exception as e:
         print(f"Error checking permission from database: {e}")
@@ -113,8 +46,8 @@ async def has_permission_db(user_id: str, permission: str) -> bool:
 async def has_role_db(user_id: str, role: str) -> bool:
     """Check if user has specific role from database"""
     try:
-        roles = await get_user_roles_from_db(user_id)
-        return role in roles
+        principal = await principal_cache.get_principal(user_id)
+        return principal.has_role(role)
         
     except Exception as e:
         print(f"Error checking role from database: {e}")
@@ -123,8 +56,8 @@ async def has_role_db(user_id: str, role: str) -> bool:
 async def has_any_role_db(user_id: str, roles: List[str]) -> bool:
     """Check if user has any of the specified roles from database"""
     try:
-        user_roles = await get_user_roles_from_db(user_id)
-        return any(role in user_roles for role in roles)
+        principal = await principal_cache.get_principal(user_id)
+        return principal.has_any_role(roles)
         
     except Exception as e:
         print(f"Error checking roles from database: {e}")
@@ -227,6 +160,7 @@ async def ensure_user_has_role_in_db(user_id: str, role_id: str) -> bool:
         }
         
         result = await user_roles_collection.insert_one(user_role)
+        principal_cache.invalidate(user_id)
         return result.inserted_id is not None
         
     except Exception as e:
@@ -244,6 +178,7 @@ async def remove_user_role_from_db(user_id: str, role_id: str) -> bool:
             "role_id": role_id
         })
         
+        principal_cache.invalidate(user_id)
         return result.deleted_count > 0
         
     except Exception as e:
@@ -0,0 +1,156 @@
+"""
+Intent matcher for EVEP Platform
+Compiles the chat bot's intent patterns once into a keyword automaton plus
+precompiled regexes, scores every intent in one pass over a message and
+reloads when the intent_patterns version stamp changes
+"""
+
+import logging
+import re
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+try:
+    import re._parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+from app.core.config import settings
+from app.core.keyword_automaton import KeywordAutomaton
+
+logger = logging.getLogger(__name__)
+
+_LITERAL = sre_parse.LITERAL
+
+
+def required_literal(pattern: str) -> Tuple[Optional[str], bool]:
+    """Longest literal run every match of the pattern must contain, if any,
+    and whether the pattern is nothing but that literal
+
+    Only runs at the top level of the pattern are mandatory; alternations,
+    optional groups and case-insensitive flags give no usable anchor, in which
+    case the pattern is always checked with its regex.
+    """
+    try:
+        parsed = sre_parse.parse(pattern)
+    except re.error:
+        return None, False
+    if parsed.state.flags & (re.IGNORECASE | re.VERBOSE):
+        return None, False
+    best, run = "", []
+    for op, value in list(parsed) + [(None, None)]:
+        if op is _LITERAL:
+            run.append(chr(value))
+            continue
+        if len(run) > len(best):
+            best = "".join(run)
+        run = []
+    return best or None, bool(best) and len(best) == len(parsed)
+
+
+class CompiledIntents:
+    """Immutable index over one set of intent patterns
+
+    Each pattern is compiled once and, where possible, anchored on a literal it
+    requires. One automaton pass over the message yields the patterns whose
+    anchors occur; only those, plus the few unanchored ones, run their regex.
+    """
+
+    def __init__(self, intent_patterns: Dict[str, Sequence[str]], version: Any = None):
+        self.version = version
+        self.intents: List[str] = list(intent_patterns)
+        self.pattern_count = 0
+        self._regexes: List[Tuple[int, "re.Pattern"]] = []
+        self._unanchored: List[int] = []
+        anchors: List[Tuple[str, int]] = []
+
+        for intent_index, intent in enumerate(self.intents):
+            for pattern in intent_patterns[intent]:
+                try:
+                    regex = re.compile(pattern)
+                except re.error as e:
+                    logger.warning(f"Skipping invalid pattern {pattern!r} for intent {intent}: {e}")
+                    continue
+                pattern_index = len(self._regexes)
+                self._regexes.append((intent_index, regex))
+                literal, exact = required_literal(pattern)
+                if literal is None:
+                    self._unanchored.append(pattern_index)
+                elif exact:
+                    # The pattern is the literal itself, the automaton hit is the match
+                    anchors.append((literal, -pattern_index - 1))
+                else:
+                    anchors.append((literal, pattern_index))
+        self.pattern_count = len(self._regexes)
+        self._automaton: KeywordAutomaton[int] = KeywordAutomaton(anchors)
+
+    def score(self, message: str) -> Dict[str, int]:
+        """Number of matching patterns per intent, for intents with at least one"""
+        hits = [0] * len(self.intents)
+        candidates = self._automaton.find_all(message)
+        for candidate in candidates:
+            if candidate < 0:
+                hits[self._regexes[-candidate - 1][0]] += 1
+            elif self._regexes[candidate][1].search(message):
+                hits[self._regexes[candidate][0]] += 1
+        for pattern_index in self._unanchored:
+            intent_index, regex = self._regexes[pattern_index]
+            if regex.search(message):
+                hits[intent_index] += 1
+        return {self.intents[index]: count for index, count in enumerate(hits) if count}
+
+    def best(self, message: str) -> Optional[str]:
+        """First intent, in pattern order, with any matching pattern"""
+        scores = self.score(message)
+        return next((intent for intent in self.intents if intent in scores), None)
+
+
+class IntentMatcher:
+    """Process-wide compiled intents, reloaded when the stored patterns change
+
+    Writes through ChatDatabase bump a version stamp. The stamp is read at most
+    once per INTENT_PATTERNS_REFRESH_SECONDS, so other workers pick up edits
+    within that window while messages never wait on a collection scan.
+    """
+
+    def __init__(
+        self,
+        fallback_patterns: Dict[str, Sequence[str]],
+        refresh_seconds: float = settings.INTENT_PATTERNS_REFRESH_SECONDS,
+    ):
+        self.fallback_patterns = fallback_patterns
+        self.fallback = CompiledIntents(fallback_patterns, version="fallback")
+        self.refresh_seconds = refresh_seconds
+        self._compiled: Optional[CompiledIntents] = None
+        self._checked_at = float("-inf")
+        self._stats = {"reloads": 0, "version_checks": 0}
+
+    def invalidate(self):
+        """Check the version stamp on the next message"""
+        self._checked_at = float("-inf")
+
+    async def get(self, chat_db) -> CompiledIntents:
+        """Current compiled intents, reloading from the database if the stamp moved"""
+        now = time.monotonic()
+        if self._compiled is not None and now - self._checked_at < self.refresh_seconds:
+            return self._compiled
+        # Claim the check first so concurrent messages keep using the current index
+        self._checked_at = now
+        self._stats["version_checks"] += 1
+        version = await chat_db.get_intent_patterns_version()
+        if self._compiled is None or version != self._compiled.version:
+            # An empty collection keeps the built-in patterns
+            intent_patterns = await chat_db.get_intent_patterns() or self.fallback_patterns
+            self._compiled = CompiledIntents(intent_patterns, version)
+            self._stats["reloads"] += 1
+            logger.info(f"Loaded {self._compiled.pattern_count} intent patterns (version {version})")
+        return self._compiled
+
+    def get_stats(self) -> Dict[str, Any]:
+        compiled = self._compiled
+        return {
+            **self._stats,
+            "version": compiled.version if compiled else None,
+            "intents": len(compiled.intents) if compiled else 0,
+            "patterns": compiled.pattern_count if compiled else 0,
+        }
@@ -0,0 +1,85 @@
+"""
+Keyword automaton for EVEP Platform
+Aho-Corasick matcher that finds every occurrence of a set of literal strings
+in a single pass over the text, regardless of how many strings it holds
+"""
+
+from collections import deque
+from typing import Dict, Generic, Iterable, Iterator, List, Set, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class KeywordAutomaton(Generic[T]):
+    """Immutable Aho-Corasick automaton mapping literal keywords to payloads
+
+    Works on Unicode code points, so Thai text needs no word segmentation:
+    keywords are found wherever they occur, including inside longer words.
+    """
+
+    __slots__ = ("_goto", "_fail", "_output", "size")
+
+    def __init__(self, keywords: Iterable[Tuple[str, T]]):
+        # Node 0 is the root; each node has a transition dict and the
+        # (length, payload) of every keyword ending there, suffixes included
+        self._goto: List[Dict[str, int]] = [{}]
+        self._output: List[List[Tuple[int, T]]] = [[]]
+        self.size = 0
+        for keyword, payload in keywords:
+            if not keyword:
+                continue
+            node = 0
+            for char in keyword:
+                next_node = self._goto[node].get(char)
+                if next_node is None:
+                    next_node = len(self._goto)
+                    self._goto[node][char] = next_node
+                    self._goto.append({})
+                    self._output.append([])
+                node = next_node
+            self._output[node].append((len(keyword), payload))
+            self.size += 1
+        self._fail: List[int] = [0] * len(self._goto)
+        self._build_failure_links()
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                # Keywords that are suffixes of this one end here as well
+                if self._output[self._fail[child]]:
+                    self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int, T]]:
+        """Yield (start, end, payload) for every keyword occurrence, in order of end position"""
+        goto, fail, output = self._goto, self._fail, self._output
+        node = 0
+        for index, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for length, payload in output[node]:
+                yield index + 1 - length, index + 1, payload
+
+    def find_all(self, text: str) -> Set[T]:
+        """Payloads of every keyword that occurs in the text"""
+        goto, fail, output = self._goto, self._fail, self._output
+        found: Set[T] = set()
+        node = 0
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for _, payload in output[node]:
+                found.add(payload)
+        return found
+
+    def __len__(self) -> int:
+        return self.size
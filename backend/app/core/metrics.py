@@ -0,0 +1,387 @@
+"""
+Prometheus metrics for EVEP Platform
+Request, MongoDB, Socket.IO, event loop, LLM and embedding instrumentation exposed on /metrics
+"""
+
+import asyncio
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional, Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    REGISTRY,
+    generate_latest,
+    multiprocess,
+)
+from pymongo import monitoring
+
+# Set by the process manager before the workers start; prometheus_client then
+# writes every value to mmap files in this directory instead of process memory
+MULTIPROC_DIR_ENV = "PROMETHEUS_MULTIPROC_DIR"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+LLM_LATENCY_BUCKETS = (0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0, 120.0)
+LOOP_LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+SEARCH_LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+# Label used for requests that did not match any route, so scanners cannot
+# explode the route label cardinality with arbitrary paths
+UNMATCHED_ROUTE = "<unmatched>"
+
+# Server handshakes and heartbeats carry no collection and would drown the real queries
+IGNORED_COMMANDS = frozenset({
+    "hello", "ismaster", "isMaster", "ping", "saslStart", "saslContinue",
+    "buildInfo", "getLastError", "endSessions", "killCursors",
+})
+
+# HTTP
+HTTP_REQUESTS = Counter(
+    "evep_http_requests_total",
+    "HTTP requests by method, route template and status code",
+    ["method", "route", "status"],
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "evep_http_request_duration_seconds",
+    "HTTP request latency by method and route template",
+    ["method", "route"],
+    buckets=LATENCY_BUCKETS,
+)
+HTTP_REQUESTS_IN_PROGRESS = Gauge(
+    "evep_http_requests_in_progress",
+    "HTTP requests currently being served",
+    ["method"],
+    multiprocess_mode="livesum",
+)
+
+# MongoDB
+MONGO_COMMAND_DURATION = Histogram(
+    "evep_mongo_command_duration_seconds",
+    "MongoDB command latency by collection and operation",
+    ["collection", "operation"],
+    buckets=LATENCY_BUCKETS,
+)
+MONGO_COMMAND_FAILURES = Counter(
+    "evep_mongo_command_failures_total",
+    "Failed MongoDB commands by collection and operation",
+    ["collection", "operation"],
+)
+
+# Socket.IO
+SOCKETIO_CONNECTED_CLIENTS = Gauge(
+    "evep_socketio_connected_clients",
+    "Socket.IO clients currently connected",
+    multiprocess_mode="livesum",
+)
+SOCKETIO_CONNECTIONS = Counter(
+    "evep_socketio_connections_total",
+    "Socket.IO connection events",
+    ["event"],
+)
+SOCKETIO_ROOM_OPERATIONS = Counter(
+    "evep_socketio_room_operations_total",
+    "Socket.IO room joins and leaves",
+    ["operation"],
+)
+SOCKETIO_EMITS = Counter(
+    "evep_socketio_emits_total",
+    "Socket.IO events emitted by event name and target",
+    ["event", "target"],
+)
+
+# Event loop
+EVENT_LOOP_LAG = Histogram(
+    "evep_event_loop_lag_seconds",
+    "Delay between when the event loop lag probe was scheduled and when it ran",
+    buckets=LOOP_LAG_BUCKETS,
+)
+EVENT_LOOP_LAG_CURRENT = Gauge(
+    "evep_event_loop_lag_current_seconds",
+    "Most recent event loop lag sample",
+    multiprocess_mode="max",
+)
+
+# LLM providers
+LLM_REQUEST_DURATION = Histogram(
+    "evep_llm_request_duration_seconds",
+    "LLM API call latency by provider, model and outcome",
+    ["provider", "model", "outcome"],
+    buckets=LLM_LATENCY_BUCKETS,
+)
+LLM_TIME_TO_FIRST_TOKEN = Histogram(
+    "evep_llm_time_to_first_token_seconds",
+    "Time from a streaming LLM API call to its first content token",
+    ["provider", "model"],
+    buckets=LLM_LATENCY_BUCKETS,
+)
+LLM_TOKENS = Counter(
+    "evep_llm_tokens_total",
+    "LLM tokens consumed by provider, model and direction",
+    ["provider", "model", "direction"],
+)
+
+# AI agent response cache
+AI_RESPONSE_CACHE_REQUESTS = Counter(
+    "evep_ai_response_cache_requests_total",
+    "AI agent responses by cache and where they were served from",
+    ["cache", "source"],
+)
+
+# Embeddings
+EMBEDDING_BATCH_SIZE = Histogram(
+    "evep_embedding_batch_size",
+    "Texts encoded per embedding model call",
+    ["model"],
+    buckets=BATCH_SIZE_BUCKETS,
+)
+EMBEDDING_QUEUE_DEPTH = Gauge(
+    "evep_embedding_queue_depth",
+    "Texts waiting for the embedding executor",
+    ["model"],
+    multiprocess_mode="livesum",
+)
+EMBEDDING_LATENCY = Histogram(
+    "evep_embedding_latency_seconds",
+    "Time from an embedding request to its result, including queueing",
+    ["model"],
+    buckets=LATENCY_BUCKETS,
+)
+EMBEDDING_ENCODE_DURATION = Histogram(
+    "evep_embedding_encode_duration_seconds",
+    "Embedding model time per batch",
+    ["model"],
+    buckets=LATENCY_BUCKETS,
+)
+
+# Audit log pipeline
+AUDIT_QUEUE_DEPTH = Gauge(
+    "evep_audit_queue_depth",
+    "Audit events waiting to be written",
+    multiprocess_mode="livesum",
+)
+AUDIT_EVENTS = Counter(
+    "evep_audit_events_total",
+    "Audit events by outcome: queued, written, dropped, spilled or replayed",
+    ["outcome"],
+)
+AUDIT_BATCH_SIZE = Histogram(
+    "evep_audit_batch_size",
+    "Audit events per insert_many",
+    buckets=BATCH_SIZE_BUCKETS,
+)
+AUDIT_LEDGER_SEALED = Counter(
+    "evep_audit_ledger_sealed_events_total",
+    "Audit events sealed into ledger blocks",
+)
+AUDIT_LEDGER_VERIFY_DURATION = Histogram(
+    "evep_audit_ledger_verify_duration_seconds",
+    "Time to verify a range of audit ledger blocks",
+    buckets=LATENCY_BUCKETS,
+)
+
+# Outbound notifications
+NOTIFICATIONS = Counter(
+    "evep_notifications_total",
+    "Outbound notifications by channel and outcome: sent, retried, dead_lettered",
+    ["channel", "outcome"],
+)
+NOTIFICATION_DURATION = Histogram(
+    "evep_notification_delivery_duration_seconds",
+    "Time from dispatch to final outcome, retries and rate limiting included",
+    ["channel"],
+    buckets=LATENCY_BUCKETS,
+)
+NOTIFICATIONS_IN_FLIGHT = Gauge(
+    "evep_notifications_in_flight",
+    "Outbound notifications being delivered",
+    ["channel"],
+    multiprocess_mode="livesum",
+)
+
+# Patient and student search
+SEARCH_QUERIES = Counter(
+    "evep_search_queries_total",
+    "Patient and student searches by endpoint and how they were served: index or regex fallback",
+    ["endpoint", "mode"],
+)
+SEARCH_DURATION = Histogram(
+    "evep_search_index_query_duration_seconds",
+    "Time to resolve a search against the in-memory index",
+    ["endpoint"],
+    buckets=SEARCH_LATENCY_BUCKETS,
+)
+SEARCH_INDEX_ENTRIES = Gauge(
+    "evep_search_index_entries",
+    "Patients and students held in the search index",
+    multiprocess_mode="max",
+)
+
+
+def route_template(scope: Dict[str, Any]) -> str:
+    """Return the path template of the route that handled a request"""
+    route = scope.get("route")
+    path = getattr(route, "path", None)
+    return path if path else UNMATCHED_ROUTE
+
+
+def observe_request(method: str, route: str, status: int, duration: float) -> None:
+    """Record one served HTTP request"""
+    HTTP_REQUESTS.labels(method, route, str(status)).inc()
+    HTTP_REQUEST_DURATION.labels(method, route).observe(duration)
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """pymongo command listener timing every command Motor sends, keyed by collection and operation"""
+
+    def __init__(self):
+        self._pending: Dict[Tuple[Any, int], Tuple[str, str]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _labels(event: monitoring.CommandStartedEvent) -> Tuple[str, str]:
+        command = event.command
+        operation = event.command_name
+        if operation == "getMore":
+            collection = command.get("collection")
+        else:
+            collection = command.get(operation)
+        if not isinstance(collection, str):
+            collection = ""
+        return collection, operation
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        if event.command_name in IGNORED_COMMANDS:
+            return
+        with self._lock:
+            self._pending[(event.connection_id, event.request_id)] = self._labels(event)
+
+    def _finish(self, event) -> Optional[Tuple[str, str]]:
+        with self._lock:
+            labels = self._pending.pop((event.connection_id, event.request_id), None)
+        if labels is not None:
+            MONGO_COMMAND_DURATION.labels(*labels).observe(event.duration_micros / 1_000_000)
+        return labels
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        self._finish(event)
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        labels = self._finish(event)
+        if labels is not None:
+            MONGO_COMMAND_FAILURES.labels(*labels).inc()
+
+
+mongo_command_metrics = MongoCommandMetrics()
+
+
+class LLMCall:
+    """Token accounting for one LLM API call inside track_llm_call()"""
+
+    def __init__(self, provider: str, model: str):
+        self.provider = provider
+        self.model = model
+        self.started = time.perf_counter()
+        self.first_token_seconds: Optional[float] = None
+
+    def record_first_token(self) -> None:
+        """Mark the first streamed token; later calls are ignored"""
+        if self.first_token_seconds is None:
+            self.first_token_seconds = time.perf_counter() - self.started
+            LLM_TIME_TO_FIRST_TOKEN.labels(self.provider, self.model).observe(self.first_token_seconds)
+
+    def record_usage(self, usage: Any) -> None:
+        """Count tokens from an OpenAI (prompt/completion) or Anthropic (input/output) usage object"""
+        if usage is None:
+            return
+        prompt_tokens = getattr(usage, "prompt_tokens", None)
+        if prompt_tokens is None:
+            prompt_tokens = getattr(usage, "input_tokens", None)
+        completion_tokens = getattr(usage, "completion_tokens", None)
+        if completion_tokens is None:
+            completion_tokens = getattr(usage, "output_tokens", None)
+        if isinstance(prompt_tokens, int):
+            LLM_TOKENS.labels(self.provider, self.model, "prompt").inc(prompt_tokens)
+        if isinstance(completion_tokens, int):
+            LLM_TOKENS.labels(self.provider, self.model, "completion").inc(completion_tokens)
+
+
+@contextmanager
+def track_llm_call(provider: str, model: str):
+    """Time an LLM API call; the outcome label is "error" when the block raises"""
+    call = LLMCall(provider, model)
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        yield call
+        outcome = "success"
+    finally:
+        LLM_REQUEST_DURATION.labels(provider, model, outcome).observe(time.perf_counter() - started)
+
+
+class EventLoopLagMonitor:
+    """Samples how late the event loop runs a periodic probe"""
+
+    def __init__(self, interval: float = 0.5):
+        self.interval = interval
+        self.current = 0.0
+        self._peak = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            scheduled = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - scheduled)
+            EVENT_LOOP_LAG.observe(lag)
+            EVENT_LOOP_LAG_CURRENT.set(lag)
+            self.current = lag
+            self._peak = max(self._peak, lag)
+
+    def take_peak(self) -> float:
+        """Largest lag (seconds) seen since the previous call, for samplers slower than the probe"""
+        peak, self._peak = max(self._peak, self.current), 0.0
+        return peak
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+event_loop_lag_monitor = EventLoopLagMonitor()
+
+
+def is_multiprocess() -> bool:
+    return bool(os.environ.get(MULTIPROC_DIR_ENV))
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Render the exposition text, aggregating all worker processes in multiprocess mode"""
+    if is_multiprocess():
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead() -> None:
+    """Drop this worker's live gauges from the shared multiprocess directory"""
+    if is_multiprocess():
+        multiprocess.mark_process_dead(os.getpid())
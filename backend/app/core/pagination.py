@@ -0,0 +1,194 @@
+"""
+Keyset pagination for EVEP Platform
+Pages list endpoints on (sort key, _id) with opaque cursor tokens instead of
+skip, so deep pages cost the same as the first one, and serves total counts
+from estimated_document_count or a short-lived count cache instead of a full
+count_documents on every page
+"""
+
+import base64
+import binascii
+import time
+from collections import OrderedDict
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from bson import Decimal128, ObjectId, json_util
+from fastapi import HTTPException, status
+from pymongo import ASCENDING, DESCENDING
+
+from app.core.config import settings
+
+# How endpoints may count the matching documents
+COUNT_MODES = ("exact", "estimated", "cached", "none")
+COUNT_PATTERN = "^(exact|estimated|cached|none)$"
+
+# BSON comparison order of the type brackets a sort key can fall in; keyset
+# filters have to step over brackets because $gt and $lt stay within one
+TYPE_BRACKETS = ("null", "number", "string", "object", "array", "binData", "objectId", "bool", "date")
+
+
+def type_bracket(value: Any) -> int:
+    """Position of a value's type in the BSON sort order"""
+    if value is None:
+        return 0
+    if isinstance(value, bool):
+        return 7
+    if isinstance(value, (int, float, Decimal, Decimal128)):
+        return 1
+    if isinstance(value, str):
+        return 2
+    if isinstance(value, dict):
+        return 3
+    if isinstance(value, (list, tuple)):
+        return 4
+    if isinstance(value, bytes):
+        return 5
+    if isinstance(value, ObjectId):
+        return 6
+    if isinstance(value, datetime):
+        return 8
+    raise ValueError(f"Unsupported sort key type: {type(value).__name__}")
+
+
+class Page(NamedTuple):
+    """One page of a list endpoint"""
+    items: List[Dict[str, Any]]
+    next_cursor: Optional[str]
+    has_more: bool
+    total_count: Optional[int]
+
+    def meta(self) -> Dict[str, Any]:
+        """Cursor fields every paginated response carries"""
+        return {"next_cursor": self.next_cursor, "has_more": self.has_more}
+
+
+def encode_cursor(sort_field: str, document: Dict[str, Any]) -> str:
+    """Opaque token resuming after a document"""
+    payload = json_util.dumps([sort_field, document.get(sort_field) if sort_field != "_id" else None, document["_id"]])
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str, sort_field: str) -> Tuple[Any, Any]:
+    """Sort key value and _id a cursor resumes after"""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        field, value, document_id = json_util.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        type_bracket(value)
+    except (ValueError, TypeError, binascii.Error, UnicodeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid pagination cursor")
+    if field != sort_field:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Pagination cursor belongs to another sort order")
+    return value, document_id
+
+
+def keyset_filter(sort_field: str, direction: int, value: Any, document_id: Any) -> Dict[str, Any]:
+    """Filter for the documents sorting after (value, document_id)"""
+    after = "$gt" if direction == ASCENDING else "$lt"
+    if sort_field == "_id":
+        return {"_id": {after: document_id}}
+
+    clauses: List[Dict[str, Any]] = [{sort_field: value, "_id": {after: document_id}}]
+    if value is not None:
+        clauses.append({sort_field: {after: value}})
+    bracket = type_bracket(value)
+    beyond = TYPE_BRACKETS[bracket + 1:] if direction == ASCENDING else TYPE_BRACKETS[1:bracket]
+    # One $type per clause; the array form is not understood by mongomock
+    clauses.extend({sort_field: {"$type": bracket_type}} for bracket_type in beyond)
+    if direction == DESCENDING and bracket > 0:
+        # Missing and null keys sort last in descending order
+        clauses.append({sort_field: None})
+    return {"$or": clauses}
+
+
+class CountCache:
+    """TTL/LRU cache of count_documents results keyed by collection and filter"""
+
+    def __init__(self, ttl_seconds: Optional[float] = None, max_size: Optional[int] = None):
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else settings.PAGINATION_COUNT_CACHE_SECONDS
+        self.max_size = max_size or settings.PAGINATION_COUNT_CACHE_SIZE
+        self._entries: "OrderedDict[str, Tuple[float, int]]" = OrderedDict()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    @staticmethod
+    def key(collection, query: Dict[str, Any]) -> str:
+        return f"{collection.name}:{json_util.dumps(query, sort_keys=True)}"
+
+    async def count(self, collection, query: Dict[str, Any]) -> int:
+        """Cached count_documents of a filter"""
+        key = self.key(collection, query)
+        entry = self._entries.get(key)
+        if entry is not None and time.monotonic() - entry[0] <= self.ttl_seconds:
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry[1]
+        self._stats["misses"] += 1
+        total = await collection.count_documents(query)
+        self._entries[key] = (time.monotonic(), total)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+        return total
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self._stats, "entries": len(self._entries), "ttl_seconds": self.ttl_seconds}
+
+
+async def count_documents(collection, query: Dict[str, Any], mode: str = "cached") -> Optional[int]:
+    """Count a filter exactly, from collection metadata, from the count cache, or not at all"""
+    if mode == "none":
+        return None
+    if mode == "exact":
+        return await collection.count_documents(query)
+    if mode == "estimated" and not query:
+        return await collection.estimated_document_count()
+    return await count_cache.count(collection, query)
+
+
+async def paginate(
+    collection,
+    query: Dict[str, Any],
+    limit: int,
+    cursor: Optional[str] = None,
+    skip: int = 0,
+    sort_field: str = "_id",
+    direction: int = ASCENDING,
+    projection: Optional[Dict[str, int]] = None,
+    count: str = "cached",
+) -> Page:
+    """
+    Fetch one page of a filter in (sort_field, _id) order
+
+    With a cursor the page starts right after the document it was issued
+    for and skip is ignored. Without one, skip still works for older
+    clients. One extra document is fetched to tell whether more follow.
+    """
+    if limit < 1:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="limit must be at least 1")
+    page_query = query
+    if cursor:
+        value, document_id = decode_cursor(cursor, sort_field)
+        after = keyset_filter(sort_field, direction, value, document_id)
+        page_query = {"$and": [query, after]} if query else after
+        skip = 0
+
+    sort = [(sort_field, direction)] if sort_field == "_id" else [(sort_field, direction), ("_id", direction)]
+    find = collection.find(page_query, projection).sort(sort)
+    if skip:
+        find = find.skip(skip)
+    documents = await find.limit(limit + 1).to_list(length=limit + 1)
+
+    has_more = len(documents) > limit
+    documents = documents[:limit]
+    next_cursor = encode_cursor(sort_field, documents[-1]) if has_more and documents else None
+    total_count = await count_documents(collection, query, count)
+    return Page(documents, next_cursor, has_more, total_count)
+
+
+# Global count cache instance
+count_cache = CountCache()
@@ -0,0 +1,173 @@
+"""
+Patient priority queue for EVEP Platform
+Screening queue ordered by priority and then arrival, with an index from
+patient id to queue node. Each priority keeps its patients in arrival slots
+counted by a Fenwick tree, so insert, remove and position lookups are
+O(log n) and patients of equal priority stay in FIFO order
+"""
+
+from dataclasses import dataclass
+from typing import Dict, Generic, Iterator, List, Optional, Tuple, TypeVar
+
+# Served first to last; unknown priorities queue as normal
+PRIORITY_ORDER = ("high", "normal", "low")
+DEFAULT_PRIORITY = "normal"
+
+T = TypeVar("T")
+
+
+def priority_rank(priority: str) -> int:
+    """Index of a priority in PRIORITY_ORDER"""
+    try:
+        return PRIORITY_ORDER.index(priority)
+    except ValueError:
+        return PRIORITY_ORDER.index(DEFAULT_PRIORITY)
+
+
+class _FenwickTree:
+    """Prefix counts over a growable array of 0/1 slots"""
+
+    def __init__(self):
+        self._tree = [0]
+
+    def __len__(self) -> int:
+        return len(self._tree) - 1
+
+    def append(self, value: int) -> None:
+        index = len(self._tree)
+        # A node covers (index - lowbit, index], so its initial sum is that range plus the new value
+        lowbit = index & -index
+        self._tree.append(self.prefix(index - 1) - self.prefix(index - lowbit) + value)
+
+    def add(self, index: int, delta: int) -> None:
+        while index < len(self._tree):
+            self._tree[index] += delta
+            index += index & -index
+
+    def prefix(self, index: int) -> int:
+        total = 0
+        while index > 0:
+            total += self._tree[index]
+            index -= index & -index
+        return total
+
+    def find(self, k: int) -> int:
+        """Smallest index whose prefix count reaches k"""
+        index = 0
+        step = 1 << (len(self).bit_length())
+        while step:
+            nxt = index + step
+            if nxt < len(self._tree) and self._tree[nxt] < k:
+                index = nxt
+                k -= self._tree[nxt]
+            step >>= 1
+        return index + 1
+
+
+@dataclass
+class _QueueNode(Generic[T]):
+    key: str
+    value: T
+    rank: int
+    slot: int
+
+
+class _PriorityLane(Generic[T]):
+    """Patients of one priority in arrival order"""
+
+    def __init__(self):
+        self.slots: List[Optional[_QueueNode[T]]] = []
+        self.counts = _FenwickTree()
+        self.size = 0
+
+    def append(self, node: _QueueNode[T]) -> None:
+        self.slots.append(node)
+        self.counts.append(1)
+        node.slot = len(self.slots)
+        self.size += 1
+
+    def remove(self, node: _QueueNode[T]) -> None:
+        self.slots[node.slot - 1] = None
+        self.counts.add(node.slot, -1)
+        self.size -= 1
+        if len(self.slots) > 2 * self.size + 64:
+            self._compact()
+
+    def position(self, node: _QueueNode[T]) -> int:
+        return self.counts.prefix(node.slot)
+
+    def at(self, position: int) -> _QueueNode[T]:
+        return self.slots[self.counts.find(position) - 1]
+
+    def __iter__(self) -> Iterator[_QueueNode[T]]:
+        return (node for node in self.slots if node is not None)
+
+    def _compact(self) -> None:
+        """Drop the empty slots left by removals once they outnumber the live ones"""
+        live = list(self)
+        self.slots, self.counts, self.size = [], _FenwickTree(), 0
+        for node in live:
+            self.append(node)
+
+
+class PriorityQueue(Generic[T]):
+    """Keyed queue served by priority, FIFO within a priority"""
+
+    def __init__(self):
+        self._lanes: Tuple[_PriorityLane[T], ...] = tuple(_PriorityLane() for _ in PRIORITY_ORDER)
+        self._nodes: Dict[str, _QueueNode[T]] = {}
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._nodes
+
+    def __iter__(self) -> Iterator[T]:
+        for lane in self._lanes:
+            for node in lane:
+                yield node.value
+
+    def push(self, key: str, value: T, priority: str = DEFAULT_PRIORITY) -> int:
+        """Queue a value behind everything of the same or higher priority; returns its position"""
+        if key in self._nodes:
+            raise KeyError(f"{key} is already queued")
+        node = _QueueNode(key, value, priority_rank(priority), 0)
+        self._lanes[node.rank].append(node)
+        self._nodes[key] = node
+        return self.position(key)
+
+    def remove(self, key: str) -> Optional[T]:
+        node = self._nodes.pop(key, None)
+        if node is None:
+            return None
+        self._lanes[node.rank].remove(node)
+        return node.value
+
+    def get(self, key: str) -> Optional[T]:
+        node = self._nodes.get(key)
+        return node.value if node is not None else None
+
+    def position(self, key: str) -> Optional[int]:
+        """1-based place in the queue, or None when not queued"""
+        node = self._nodes.get(key)
+        if node is None:
+            return None
+        ahead = sum(lane.size for lane in self._lanes[:node.rank])
+        return ahead + self._lanes[node.rank].position(node)
+
+    def at(self, position: int) -> Optional[T]:
+        """Value at a 1-based position"""
+        if not 1 <= position <= len(self._nodes):
+            return None
+        for lane in self._lanes:
+            if position <= lane.size:
+                return lane.at(position).value
+            position -= lane.size
+        return None
+
+    def peek(self) -> Optional[T]:
+        return self.at(1)
+
+    def clear(self) -> None:
+        self.__init__()
@@ -0,0 +1,313 @@
+"""
+Shared real-time state for EVEP Platform
+Presence records for connected Socket.IO clients, indexed by room and user,
+and the patient queue's lock and version counter, kept in Redis when several workers or replicas serve
+Socket.IO and in process memory otherwise, behind the same interface
+"""
+
+import asyncio
+import heapq
+import json
+import logging
+import time
+import uuid
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Client record fields holding datetimes, restored from ISO strings on read
+DATETIME_FIELDS = ("connected_at", "last_activity", "auth_time")
+
+# A server that has not heartbeated for this long is considered gone and its clients pruned
+SERVER_TIMEOUT_SECONDS = 90
+
+
+def encode_state(state: Any) -> str:
+    """Serialize presence or queue state, writing datetimes as ISO strings"""
+    return json.dumps(state, default=lambda value: value.isoformat() if isinstance(value, datetime) else str(value))
+
+
+def decode_record(raw: str) -> Dict[str, Any]:
+    """Parse a client record, restoring its datetime fields"""
+    record = json.loads(raw)
+    for field in DATETIME_FIELDS:
+        value = record.get(field)
+        if isinstance(value, str):
+            try:
+                record[field] = datetime.fromisoformat(value)
+            except ValueError:
+                pass
+    return record
+
+
+class PresenceTimers:
+    """Heap of activity deadlines; a client whose deadline passes without a touch becomes away
+
+    Touching pushes a new deadline and leaves the old heap entry behind; stale
+    entries are skipped when they surface, so every operation is O(log n)
+    """
+
+    def __init__(self, timeout: float = 60.0):
+        self.timeout = timeout
+        self._heap: List[Tuple[float, str]] = []
+        self._deadlines: Dict[str, float] = {}
+
+    def touch(self, sid: str, now: Optional[float] = None) -> None:
+        deadline = (time.monotonic() if now is None else now) + self.timeout
+        self._deadlines[sid] = deadline
+        heapq.heappush(self._heap, (deadline, sid))
+        if len(self._heap) > 4 * len(self._deadlines) + 64:
+            # Drop the superseded entries once they dominate the heap
+            self._heap = [(deadline, sid) for sid, deadline in self._deadlines.items()]
+            heapq.heapify(self._heap)
+
+    def discard(self, sid: str) -> None:
+        self._deadlines.pop(sid, None)
+
+    def expired(self, now: Optional[float] = None) -> List[str]:
+        """Pop and return the clients whose deadline has passed"""
+        now = time.monotonic() if now is None else now
+        expired = []
+        while self._heap and self._heap[0][0] <= now:
+            deadline, sid = heapq.heappop(self._heap)
+            if self._deadlines.get(sid) == deadline:
+                del self._deadlines[sid]
+                expired.append(sid)
+        return expired
+
+    def next_deadline(self) -> Optional[float]:
+        while self._heap and self._deadlines.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+
+
+class InMemoryPresenceStore:
+    """Presence and queue state for a single process"""
+
+    def __init__(self, server_id: Optional[str] = None):
+        self.server_id = server_id or uuid.uuid4().hex
+        self._clients: Dict[str, str] = {}
+        self._room_members: Dict[str, Set[str]] = defaultdict(set)
+        self._client_rooms: Dict[str, Set[str]] = defaultdict(set)
+        self._users: Dict[str, str] = {}
+        self._servers: Dict[str, float] = {}
+        self._queue_version = 0
+        self._locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+
+    async def save_client(self, sid: str, record: Dict[str, Any]) -> None:
+        self._clients[sid] = encode_state({**record, "server_id": self.server_id})
+        if record.get("user_id"):
+            self._users[record["user_id"]] = sid
+
+    async def remove_client(self, sid: str) -> None:
+        self._clients.pop(sid, None)
+        for room in self._client_rooms.pop(sid, ()):
+            members = self._room_members[room]
+            members.discard(sid)
+            if not members:
+                del self._room_members[room]
+
+    async def get_client(self, sid: str) -> Optional[Dict[str, Any]]:
+        raw = self._clients.get(sid)
+        return decode_record(raw) if raw is not None else None
+
+    async def list_clients(self) -> Dict[str, Dict[str, Any]]:
+        return {sid: decode_record(raw) for sid, raw in self._clients.items()}
+
+    async def join_room(self, sid: str, room: str) -> None:
+        self._room_members[room].add(sid)
+        self._client_rooms[sid].add(room)
+
+    async def leave_room(self, sid: str, room: str) -> None:
+        if room in self._room_members:
+            self._room_members[room].discard(sid)
+            if not self._room_members[room]:
+                del self._room_members[room]
+        if sid in self._client_rooms:
+            self._client_rooms[sid].discard(room)
+
+    async def rooms_of(self, sid: str) -> Set[str]:
+        return set(self._client_rooms.get(sid, ()))
+
+    async def room_members(self, room: str) -> Dict[str, Dict[str, Any]]:
+        """Records of the clients in a room, without scanning other clients"""
+        return {
+            sid: decode_record(self._clients[sid])
+            for sid in self._room_members.get(room, ())
+            if sid in self._clients
+        }
+
+    async def find_user(self, user_id: str) -> Optional[str]:
+        """Sid of the user's most recent connection"""
+        sid = self._users.get(user_id)
+        if sid is None:
+            return None
+        record = await self.get_client(sid)
+        if record is None or record.get("user_id") != user_id:
+            # The connection went away or re-authenticated as someone else
+            del self._users[user_id]
+            return None
+        return sid
+
+    async def client_count(self) -> int:
+        return len(self._clients)
+
+    async def queue_version(self) -> int:
+        return self._queue_version
+
+    async def bump_queue_version(self) -> int:
+        self._queue_version += 1
+        return self._queue_version
+
+    @asynccontextmanager
+    async def lock(self, name: str):
+        async with self._locks[name]:
+            yield
+
+    async def heartbeat(self) -> None:
+        self._servers[self.server_id] = time.time()
+
+    async def prune_stale_servers(self, timeout: float = SERVER_TIMEOUT_SECONDS) -> List[str]:
+        """Drop clients owned by servers that stopped heartbeating; returns the pruned sids"""
+        cutoff = time.time() - timeout
+        stale = {server for server, seen in self._servers.items() if seen < cutoff}
+        pruned = [sid for sid, raw in self._clients.items() if json.loads(raw).get("server_id") in stale]
+        for sid in pruned:
+            await self.remove_client(sid)
+        for server in stale:
+            del self._servers[server]
+        return pruned
+
+    async def close(self) -> None:
+        pass
+
+
+class RedisPresenceStore:
+    """Presence and queue state shared by every worker through Redis"""
+
+    def __init__(self, redis, prefix: str = "evep:presence", server_id: Optional[str] = None):
+        self.redis = redis
+        self.server_id = server_id or uuid.uuid4().hex
+        self.clients_key = f"{prefix}:clients"
+        self.users_key = f"{prefix}:users"
+        self.room_prefix = f"{prefix}:room"
+        self.client_rooms_prefix = f"{prefix}:client_rooms"
+        self.servers_key = f"{prefix}:servers"
+        self.queue_version_key = f"{prefix}:queue_version"
+        self.lock_prefix = f"{prefix}:lock"
+
+    async def save_client(self, sid: str, record: Dict[str, Any]) -> None:
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hset(self.clients_key, sid, encode_state({**record, "server_id": self.server_id}))
+        if record.get("user_id"):
+            pipe.hset(self.users_key, record["user_id"], sid)
+        await pipe.execute()
+
+    async def remove_client(self, sid: str) -> None:
+        client_rooms_key = f"{self.client_rooms_prefix}:{sid}"
+        rooms = await self.redis.smembers(client_rooms_key)
+        pipe = self.redis.pipeline(transaction=False)
+        for room in rooms:
+            pipe.srem(f"{self.room_prefix}:{_text(room)}", sid)
+        pipe.delete(client_rooms_key)
+        pipe.hdel(self.clients_key, sid)
+        await pipe.execute()
+
+    async def get_client(self, sid: str) -> Optional[Dict[str, Any]]:
+        raw = await self.redis.hget(self.clients_key, sid)
+        return decode_record(raw) if raw is not None else None
+
+    async def list_clients(self) -> Dict[str, Dict[str, Any]]:
+        raw_clients = await self.redis.hgetall(self.clients_key)
+        return {_text(sid): decode_record(raw) for sid, raw in raw_clients.items()}
+
+    async def client_count(self) -> int:
+        return await self.redis.hlen(self.clients_key)
+
+    async def join_room(self, sid: str, room: str) -> None:
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.sadd(f"{self.room_prefix}:{room}", sid)
+        pipe.sadd(f"{self.client_rooms_prefix}:{sid}", room)
+        await pipe.execute()
+
+    async def leave_room(self, sid: str, room: str) -> None:
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.srem(f"{self.room_prefix}:{room}", sid)
+        pipe.srem(f"{self.client_rooms_prefix}:{sid}", room)
+        await pipe.execute()
+
+    async def rooms_of(self, sid: str) -> Set[str]:
+        return {_text(room) for room in await self.redis.smembers(f"{self.client_rooms_prefix}:{sid}")}
+
+    async def room_members(self, room: str) -> Dict[str, Dict[str, Any]]:
+        """Records of the clients in a room, without scanning other clients"""
+        sids = sorted(_text(sid) for sid in await self.redis.smembers(f"{self.room_prefix}:{room}"))
+        if not sids:
+            return {}
+        records = await self.redis.hmget(self.clients_key, sids)
+        return {sid: decode_record(raw) for sid, raw in zip(sids, records) if raw is not None}
+
+    async def find_user(self, user_id: str) -> Optional[str]:
+        """Sid of the user's most recent connection"""
+        sid = await self.redis.hget(self.users_key, user_id)
+        if sid is None:
+            return None
+        sid = _text(sid)
+        record = await self.get_client(sid)
+        if record is None or record.get("user_id") != user_id:
+            # The connection went away or re-authenticated as someone else
+            await self.redis.hdel(self.users_key, user_id)
+            return None
+        return sid
+
+    async def queue_version(self) -> int:
+        """Bumped on every queue change, so workers know when their copy is stale"""
+        return int(await self.redis.get(self.queue_version_key) or 0)
+
+    async def bump_queue_version(self) -> int:
+        return await self.redis.incr(self.queue_version_key)
+
+    @asynccontextmanager
+    async def lock(self, name: str):
+        # Expires on its own if the holder dies mid-update
+        async with self.redis.lock(f"{self.lock_prefix}:{name}", timeout=10, blocking_timeout=10):
+            yield
+
+    async def heartbeat(self) -> None:
+        await self.redis.hset(self.servers_key, self.server_id, time.time())
+
+    async def prune_stale_servers(self, timeout: float = SERVER_TIMEOUT_SECONDS) -> List[str]:
+        """Drop clients owned by servers that stopped heartbeating; returns the pruned sids"""
+        cutoff = time.time() - timeout
+        servers = await self.redis.hgetall(self.servers_key)
+        stale = {_text(server) for server, seen in servers.items() if float(seen) < cutoff}
+        if not stale:
+            return []
+        clients = await self.list_clients()
+        pruned = [sid for sid, record in clients.items() if record.get("server_id") in stale]
+        for sid in pruned:
+            await self.remove_client(sid)
+        await self.redis.hdel(self.servers_key, *stale)
+        return pruned
+
+    async def close(self) -> None:
+        await self.redis.close()
+
+
+def _text(value) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def create_presence_store():
+    """Redis-backed store when SOCKETIO_REDIS_URL is configured, in-memory otherwise"""
+    if settings.SOCKETIO_REDIS_URL:
+        from redis import asyncio as aioredis
+
+        logger.info("Socket.IO presence shared through Redis")
+        return RedisPresenceStore(aioredis.Redis.from_url(settings.SOCKETIO_REDIS_URL))
+    return InMemoryPresenceStore()
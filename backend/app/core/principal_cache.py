@@ -0,0 +1,314 @@
+"""
+Resolved principal cache for EVEP Platform
+Resolves a user's document, roles and flattened permissions once and keeps
+the result in a process-level TTL/LRU cache shared by auth and DB RBAC checks.
+Invalidations (logout, deactivation, role changes) are published over Redis
+when it is configured, so every worker drops the principal, not only the one
+that handled the write.
+"""
+
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, FrozenSet, Set
+import asyncio
+import json
+import logging
+import time
+import uuid
+
+from bson import ObjectId
+
+from app.core.config import settings
+from app.core.database import get_database
+
+logger = logging.getLogger(__name__)
+
+# Permissions granted when no explicit RBAC assignment exists
+DEFAULT_PERMISSIONS = ["view_patients", "view_screenings", "access_medical_portal"]
+
+
+class ResolvedPrincipal:
+    """User document, roles and permission set resolved for one user"""
+
+    __slots__ = ("user_id", "user", "roles", "permissions", "db_calls", "resolved_at")
+
+    def __init__(
+        self,
+        user_id: str,
+        user: Optional[Dict[str, Any]],
+        roles: List[str],
+        permissions: List[str],
+        db_calls: int,
+    ):
+        self.user_id = user_id
+        self.user = user
+        self.roles = roles
+        self.permissions: FrozenSet[str] = frozenset(permissions)
+        self.db_calls = db_calls
+        self.resolved_at = time.monotonic()
+
+    def has_permission(self, permission: str) -> bool:
+        """Check a permission, honouring the wildcard"""
+        return "*" in self.permissions or permission in self.permissions
+
+    def has_role(self, role: str) -> bool:
+        """Check a single role"""
+        return role in self.roles
+
+    def has_any_role(self, roles: List[str]) -> bool:
+        """Check whether any of the given roles is held"""
+        return any(role in self.roles for role in roles)
+
+
+async def load_principal(user_id: str) -> ResolvedPrincipal:
+    """Resolve a principal from MongoDB without consulting the cache"""
+    db = get_database()
+    db_calls = 0
+
+    try:
+        object_id = ObjectId(user_id) if user_id else None
+    except Exception:
+        object_id = None
+
+    user = None
+    admin_user = None
+    if object_id is not None:
+        user = await db.evep.users.find_one({"_id": object_id})
+        admin_user = await db.evep.admin_users.find_one({"_id": object_id})
+        db_calls += 2
+
+    # Admin users carry their role on the document itself
+    if admin_user and admin_user.get("role"):
+        role = admin_user["role"]
+        permissions = ["*"] if role == "super_admin" else list(DEFAULT_PERMISSIONS)
+        return ResolvedPrincipal(user_id, user or admin_user, [role], permissions, db_calls)
+
+    user_roles = await db.evep["rbac_user_roles"].find({"user_id": user_id}).to_list(length=None)
+    db_calls += 1
+    if not user_roles:
+        return ResolvedPrincipal(user_id, user or admin_user, [], list(DEFAULT_PERMISSIONS), db_calls)
+
+    role_ids = [user_role["role_id"] for user_role in user_roles]
+    roles = await db.evep["rbac_roles"].find({"id": {"$in": role_ids}}).to_list(length=None)
+    db_calls += 1
+
+    all_permissions = set()
+    for role in roles:
+        role_permissions = role.get("permissions", [])
+        if "*" in role_permissions:
+            all_permissions = {"*"}
+            break
+        all_permissions.update(role_permissions)
+
+    return ResolvedPrincipal(user_id, user or admin_user, role_ids, list(all_permissions), db_calls)
+
+
+class PrincipalCache:
+    """TTL/LRU cache of resolved principals keyed by user_id"""
+
+    def __init__(self, ttl_seconds: float = 30.0, max_size: int = 10000, redis=None, channel: str = "evep-principals"):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self.redis = redis
+        self.channel = channel
+        # Identifies this worker's own messages on the invalidation channel
+        self.origin = uuid.uuid4().hex
+        self._listener: Optional[asyncio.Task] = None
+        self._subscribed = asyncio.Event()
+        self._publishes: Set[asyncio.Task] = set()
+        self._entries: "OrderedDict[str, ResolvedPrincipal]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "invalidations": 0,
+            "remote_invalidations": 0,
+            "publish_errors": 0,
+            "db_calls": 0,
+            "db_calls_saved": 0,
+        }
+
+    def _lookup(self, user_id: str) -> Optional[ResolvedPrincipal]:
+        principal = self._entries.get(user_id)
+        if principal is None:
+            return None
+        if time.monotonic() - principal.resolved_at > self.ttl_seconds:
+            del self._entries[user_id]
+            self._stats["expirations"] += 1
+            return None
+        self._entries.move_to_end(user_id)
+        return principal
+
+    def _store(self, principal: ResolvedPrincipal) -> None:
+        self._entries[principal.user_id] = principal
+        self._entries.move_to_end(principal.user_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    async def get_principal(self, user_id: str) -> ResolvedPrincipal:
+        """Return the cached principal, resolving it from MongoDB on a miss"""
+        principal = self._lookup(user_id)
+        if principal is not None:
+            self._stats["hits"] += 1
+            self._stats["db_calls_saved"] += principal.db_calls
+            return principal
+
+        # Concurrent misses for the same user share a single resolution
+        pending = self._inflight.get(user_id)
+        if pending is not None:
+            principal = await asyncio.shield(pending)
+            self._stats["hits"] += 1
+            self._stats["db_calls_saved"] += principal.db_calls
+            return principal
+
+        self._stats["misses"] += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[user_id] = future
+        try:
+            principal = await load_principal(user_id)
+        except Exception as e:
+            future.set_exception(e)
+            # Mark the exception retrieved so a failure with no waiters is not logged as unhandled
+            future.exception()
+            raise
+        else:
+            self._stats["db_calls"] += principal.db_calls
+            # An invalidation during the load means the result may already be stale
+            if self._inflight.get(user_id) is future:
+                self._store(principal)
+            future.set_result(principal)
+            return principal
+        finally:
+            if self._inflight.get(user_id) is future:
+                del self._inflight[user_id]
+
+    def _drop(self, user_id: str) -> None:
+        self._inflight.pop(user_id, None)
+        if self._entries.pop(user_id, None) is not None:
+            self._stats["invalidations"] += 1
+            logger.debug(f"Invalidated principal cache for user: {user_id}")
+
+    def _drop_all(self) -> None:
+        self._inflight.clear()
+        self._stats["invalidations"] += len(self._entries)
+        self._entries.clear()
+
+    def invalidate(self, user_id: str) -> None:
+        """Drop a single user's principal after a role, permission or logout write, on every worker"""
+        user_id = str(user_id)
+        self._drop(user_id)
+        self._publish(user_id)
+
+    def invalidate_all(self) -> None:
+        """Drop every cached principal, e.g. after a role definition changes, on every worker"""
+        self._drop_all()
+        self._publish("*")
+        logger.info("Invalidated all cached principals")
+
+    def _publish(self, user_id: str) -> None:
+        """Announce an invalidation to the other workers without blocking the write handler"""
+        if self.redis is None:
+            return
+        message = json.dumps({"origin": self.origin, "user_id": user_id})
+        try:
+            task = asyncio.get_running_loop().create_task(self._send(message))
+        except RuntimeError:
+            return
+        self._publishes.add(task)
+        task.add_done_callback(self._publishes.discard)
+
+    async def _send(self, message: str) -> None:
+        try:
+            await self.redis.publish(self.channel, message)
+        except Exception as e:
+            self._stats["publish_errors"] += 1
+            logger.error(f"Principal invalidation publish failed: {e}")
+
+    def _receive(self, data: Any) -> None:
+        try:
+            message = json.loads(data)
+        except (TypeError, ValueError):
+            return
+        if message.get("origin") == self.origin:
+            return
+        self._stats["remote_invalidations"] += 1
+        if message.get("user_id") == "*":
+            self._drop_all()
+        else:
+            self._drop(str(message.get("user_id")))
+
+    async def _listen(self) -> None:
+        while True:
+            pubsub = self.redis.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                # Whatever was cached before the subscription may have missed invalidations
+                self._drop_all()
+                self._subscribed.set()
+                async for message in pubsub.listen():
+                    if message.get("type") == "message":
+                        self._receive(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._subscribed.clear()
+                logger.error(f"Principal invalidation subscription failed: {e}")
+                await asyncio.sleep(1.0)
+            finally:
+                await pubsub.close()
+
+    def start(self) -> None:
+        """Subscribe to invalidations published by the other workers"""
+        if self.redis is not None and (self._listener is None or self._listener.done()):
+            self._listener = asyncio.get_running_loop().create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+            self._subscribed.clear()
+        if self._publishes:
+            await asyncio.gather(*self._publishes, return_exceptions=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache hit ratio and DB call savings"""
+        lookups = self._stats["hits"] + self._stats["misses"]
+        return {
+            **self._stats,
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "hit_ratio": round(self._stats["hits"] / lookups, 4) if lookups else 0.0,
+            "shared": self.redis is not None,
+        }
+
+    def reset_stats(self) -> None:
+        """Reset counters without dropping cached entries"""
+        for key in self._stats:
+            self._stats[key] = 0
+
+
+def create_principal_cache() -> PrincipalCache:
+    """Principal cache whose invalidations reach every worker when Redis is configured"""
+    redis = None
+    redis_url = settings.PRINCIPAL_CACHE_REDIS_URL or settings.SOCKETIO_REDIS_URL
+    if redis_url:
+        from redis import asyncio as aioredis
+        redis = aioredis.Redis.from_url(redis_url)
+        logger.info("Principal cache invalidations shared through Redis")
+    return PrincipalCache(
+        ttl_seconds=settings.PRINCIPAL_CACHE_TTL_SECONDS,
+        max_size=settings.PRINCIPAL_CACHE_MAX_SIZE,
+        redis=redis,
+        channel=settings.PRINCIPAL_CACHE_REDIS_CHANNEL,
+    )
+
+
+# Global principal cache instance
+principal_cache = create_principal_cache()
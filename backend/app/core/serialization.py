@@ -0,0 +1,126 @@
+"""
+Response serialization for EVEP Platform
+Declared document views that push their projection down to MongoDB and
+render documents without copying them field by field, a single-pass JSON
+encoder for the BSON types MongoDB returns (ObjectId, datetime, Decimal128),
+and a response class that writes the result with orjson. Handlers that return
+BSONJSONResponse directly skip FastAPI's jsonable_encoder and response_model
+validation, which only re-check what came out of the database.
+"""
+
+import json
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Tuple, Union
+
+from bson import Decimal128, ObjectId
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # plain json keeps working, only slower
+    orjson = None
+
+
+def encode_default(value: Any) -> Any:
+    """JSON form of a value the encoder has no native representation for"""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal128):
+        return float(value.to_decimal())
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    if isinstance(value, bytes):
+        return value.decode("utf-8", errors="replace")
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """Encode a response body in one pass, BSON types included"""
+    if orjson is not None:
+        return orjson.dumps(content, default=encode_default)
+    return json.dumps(content, default=encode_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class BSONJSONResponse(JSONResponse):
+    """JSON response that encodes MongoDB documents as they come from the driver"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header lists an ETag (weak comparison, as RFC 9110 asks for GET)"""
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or (tag[2:] if tag.startswith("W/") else tag) == etag:
+            return True
+    return False
+
+
+def stringify_object_ids(value: Any) -> Any:
+    """Copy of a document with every ObjectId replaced by its string, other values untouched"""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, dict):
+        return {key: stringify_object_ids(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [stringify_object_ids(item) for item in value]
+    return value
+
+
+FieldSpec = Union[str, Tuple[str, Any]]
+
+
+class DocumentView:
+    """
+    Declared response shape of one kind of document
+
+    Fields are listed as names, or as (name, default) where a missing value
+    should not come out as null. `rename` maps response names to document
+    paths, `extra` adds fields computed from the whole document, and the
+    document _id is returned under `id_field`. The MongoDB projection covers
+    exactly what render() reads.
+    """
+
+    def __init__(
+        self,
+        fields: Iterable[FieldSpec],
+        id_field: Optional[str] = "id",
+        rename: Optional[Mapping[str, str]] = None,
+        extra: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None,
+        extra_fields: Iterable[str] = (),
+    ):
+        self.id_field = id_field
+        self.extra = extra
+        self.fields: List[Tuple[str, str, Any]] = []
+        rename = rename or {}
+        for spec in fields:
+            name, default = (spec, None) if isinstance(spec, str) else spec
+            self.fields.append((name, rename.get(name, name), default))
+        self.projection: Dict[str, int] = {source: 1 for _, source, _ in self.fields}
+        self.projection.update({field: 1 for field in extra_fields})
+
+    def render(self, document: Dict[str, Any]) -> Dict[str, Any]:
+        """Response dict of a document; BSON values are left for the encoder"""
+        rendered: Dict[str, Any] = {}
+        if self.id_field is not None:
+            rendered[self.id_field] = document.get("_id")
+        for name, source, default in self.fields:
+            value = document.get(source, default)
+            rendered[name] = default if value is None else value
+        if self.extra is not None:
+            rendered.update(self.extra(document))
+        return rendered
+
+    def render_many(self, documents: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return [self.render(document) for document in documents]
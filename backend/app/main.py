@@ -1,6 +1,6 @@
 from fastapi import FastAPI, Request, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 import logging
 import time
 from typing import Dict, Any
@@ -9,6 +9,7 @@ from typing import Dict, Any
 from app.core.module_registry import module_registry
 from app.core.config import Config
 from app.core.event_bus import event_bus
+from app.core import metrics
 
 # Import modules
 from app.modules.auth import AuthModule
@@ -92,9 +93,18 @@ app.add_middleware(
 # Request timing middleware
 @app.middleware("http")
 async def add_process_time_header(request: Request, call_next):
-    start_time = time.time()
-    response = await call_next(request)
-    process_time = time.time() - start_time
+    start_time = time.perf_counter()
+    method = request.method
+    status_code = 500
+    metrics.HTTP_REQUESTS_IN_PROGRESS.labels(method).inc()
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+    finally:
+        process_time = time.perf_counter() - start_time
+        metrics.HTTP_REQUESTS_IN_PROGRESS.labels(method).dec()
+        # The router records the matched route in the shared scope, giving a bounded label
+        metrics.observe_request(method, metrics.route_template(request.scope), status_code, process_time)
     response.headers["X-Process-Time"] = str(process_time)
     return response
 
@@ -175,6 +185,37 @@ async def startup_event():
     logger.info("Starting EVEP Platform API...")
     await initialize_modules()
     
+    # Sample event loop lag for /metrics
+    metrics.event_loop_lag_monitor.start()
+    
+    # Receive principal cache invalidations made by the other workers
+    from app.core.principal_cache import principal_cache
+    principal_cache.start()
+    
+    # Collect host, process and MongoDB stats for the admin monitoring endpoints
+    from app.services.system_monitor import system_monitor
+    system_monitor.start()
+    
+    # Write audit events behind the request in batches
+    from app.services.audit_pipeline import audit_pipeline
+    audit_pipeline.start()
+    
+    # Seal written audit events into the hash-chained ledger
+    from app.services.audit_ledger import audit_ledger
+    audit_ledger.start()
+    
+    # Keep materialized dashboard counters current from write events
+    from app.services.dashboard_stats import dashboard_stats
+    dashboard_stats.register()
+    
+    # Load the patient and student search index and keep it current
+    from app.services.search_index import search_index
+    search_index.start()
+    
+    # Hold the AOC master data in memory for the address dropdowns
+    from app.services.master_data import master_data_cache
+    master_data_cache.start()
+    
     # Include admin API router
     app.include_router(admin_router, prefix="/api/v1", tags=["admin"])
     logger.info("Admin API router included successfully!")
@@ -482,6 +523,38 @@ async def startup_event():
 async def shutdown_event():
     """Application shutdown event"""
     logger.info("Shutting down EVEP Platform API...")
+    
+    # Mark running export jobs interrupted so they can be resumed
+    from app.api.csv_export import export_jobs
+    await export_jobs.shutdown()
+    
+    from app.services.system_monitor import system_monitor
+    await system_monitor.stop()
+    
+    await socketio_service.shutdown()
+    
+    # Flush buffered audit events (spilled to disk if MongoDB is unreachable)
+    from app.services.audit_pipeline import audit_pipeline
+    await audit_pipeline.stop()
+    
+    from app.services.audit_ledger import audit_ledger
+    await audit_ledger.stop()
+    
+    from app.services.search_index import search_index
+    await search_index.stop()
+    
+    from app.services.master_data import master_data_cache
+    await master_data_cache.stop()
+    
+    # Finish queued notifications and close their HTTP connection pool
+    from app.services.notification_dispatcher import notification_dispatcher
+    await notification_dispatcher.stop()
+    
+    from app.core.principal_cache import principal_cache
+    await principal_cache.stop()
+    
+    await metrics.event_loop_lag_monitor.stop()
+    metrics.mark_process_dead()
 
 # Health check endpoint
 @app.get("/health")
@@ -543,6 +616,13 @@ async def get_school_screenings_direct():
         }
     ]
 
+# Prometheus metrics endpoint
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Prometheus scrape endpoint, aggregated across workers in multiprocess mode"""
+    content, content_type = metrics.render_metrics()
+    return Response(content=content, media_type=content_type)
+
 # Module information endpoint
 @app.get("/modules")
 async def get_modules():
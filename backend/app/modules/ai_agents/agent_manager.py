@@ -14,7 +14,7 @@ This module manages specialized AI agents for different user types:
 
 import os
 import json
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, AsyncIterator
 from datetime import datetime, timedelta
 from openai import AsyncOpenAI
 from enum import Enum
@@ -22,6 +22,9 @@ import hashlib
 import json
 import asyncio
 
+from app.core.metrics import track_llm_call
+from app.modules.ai_agents.response_cache import create_response_cache
+
 class UserType(Enum):
     PARENT = "parent"
     TEACHER = "teacher"
@@ -54,12 +57,8 @@ class AIAgentManager:
             self._initialize_openai()
             self._initialize_agents()
             
-            # Initialize caching system
-            self.response_cache = {}
-            self.cache_ttl = timedelta(hours=1)  # Cache responses for 1 hour
-            self.max_cache_size = 1000  # Maximum number of cached responses
-            self._cache_hits = 0
-            self._total_requests = 0
+            # TTL-LRU response cache with request coalescing, shared through Redis when configured
+            self.response_cache = create_response_cache("agent")
             
             AIAgentManager._initialized = True
     
@@ -100,35 +99,6 @@ class AIAgentManager:
         cache_string = json.dumps(cache_data, sort_keys=True)
         return hashlib.md5(cache_string.encode()).hexdigest()
     
-    def _get_cached_response(self, cache_key: str) -> Optional[Dict[str, Any]]:
-        """Get cached response if available and not expired"""
-        if cache_key in self.response_cache:
-            cached_data = self.response_cache[cache_key]
-            if datetime.utcnow() - cached_data["timestamp"] < self.cache_ttl:
-                return cached_data["response"]
-            else:
-                # Remove expired cache entry
-                del self.response_cache[cache_key]
-        return None
-    
-    def _cache_response(self, cache_key: str, response: Dict[str, Any]):
-        """Cache the response"""
-        # Clean up old cache entries if we're at the limit
-        if len(self.response_cache) >= self.max_cache_size:
-            # Remove oldest entries (simple LRU-like behavior)
-            oldest_keys = sorted(
-                self.response_cache.keys(),
-                key=lambda k: self.response_cache[k]["timestamp"]
-            )[:len(self.response_cache) - self.max_cache_size + 1]
-            for key in oldest_keys:
-                del self.response_cache[key]
-        
-        # Cache the new response
-        self.response_cache[cache_key] = {
-            "response": response,
-            "timestamp": datetime.utcnow()
-        }
-    
     async def get_agent_response(
         self, 
         user_type: UserType, 
@@ -138,53 +108,100 @@ class AIAgentManager:
     ) -> Dict[str, Any]:
         """Get response from specialized agent with caching"""
         
-        # Track total requests
-        self._total_requests += 1
-        
         # Generate cache key
         cache_key = self._generate_cache_key(user_type, message, context)
         
-        # Check cache first
-        cached_response = self._get_cached_response(cache_key)
-        if cached_response:
-            self._cache_hits += 1
-            cached_response["cached"] = True
-            return cached_response
+        async def compute() -> Dict[str, Any]:
+            agent = self.agents.get(user_type)
+            if not agent:
+                return {
+                    "response": "I'm sorry, I don't have a specialized agent for your user type. Please contact support.",
+                    "agent_type": "fallback",
+                    "confidence": 0.0
+                }
+            
+            # Use OpenAI if available, otherwise use fallback
+            if self.openai_client:
+                return await agent.get_openai_response(
+                    self.openai_client, 
+                    message, 
+                    context, 
+                    conversation_history
+                )
+            return await agent.get_fallback_response(message, context)
+        
+        # Identical concurrent requests share one upstream call
+        response, source = await self.response_cache.get_or_compute(cache_key, compute)
+        response["cached"] = source != "miss"
+        
+        return response
+    
+    async def stream_agent_response(
+        self, 
+        user_type: UserType, 
+        message: str, 
+        context: Optional[Dict[str, Any]] = None,
+        conversation_history: Optional[List[Dict[str, Any]]] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Stream a response as {"type": "token", "text"} events and one final {"type": "done", "response"}
+        
+        Cached and fallback responses arrive as a single token. A streamed
+        OpenAI response is assembled and cached once the stream completes.
+        """
+        cache_key = self._generate_cache_key(user_type, message, context)
+        found = await self.response_cache.lookup(cache_key)
+        if found:
+            response, _ = found
+            response["cached"] = True
+            yield {"type": "token", "text": response["response"]}
+            yield {"type": "done", "response": response}
+            return
         
         agent = self.agents.get(user_type)
-        if not agent:
-            response = {
-                "response": "I'm sorry, I don't have a specialized agent for your user type. Please contact support.",
-                "agent_type": "fallback",
-                "confidence": 0.0,
-                "cached": False
-            }
-            return response
+        response = None
+        if agent and self.openai_client:
+            parts = []
+            try:
+                async for text in agent.stream_openai_response(
+                    self.openai_client, 
+                    message, 
+                    context, 
+                    conversation_history
+                ):
+                    parts.append(text)
+                    yield {"type": "token", "text": text}
+            except Exception as e:
+                # Tokens already sent cannot be replaced by a fallback answer
+                if parts:
+                    raise
+                print(f"OpenAI API error: {e}")
+            else:
+                response = agent.build_openai_response("".join(parts))
         
-        # Use OpenAI if available, otherwise use fallback
-        if self.openai_client:
-            response = await agent.get_openai_response(
-                self.openai_client, 
-                message, 
-                context, 
-                conversation_history
-            )
-        else:
-            response = await agent.get_fallback_response(message, context)
+        if response is None:
+            if agent:
+                response = await agent.get_fallback_response(message, context)
+            else:
+                response = {
+                    "response": "I'm sorry, I don't have a specialized agent for your user type. Please contact support.",
+                    "agent_type": "fallback",
+                    "confidence": 0.0
+                }
+            yield {"type": "token", "text": response["response"]}
         
-        # Add cache flag and cache the response
+        await self.response_cache.store(cache_key, response)
         response["cached"] = False
-        self._cache_response(cache_key, response)
-        
-        return response
+        yield {"type": "done", "response": response}
     
     def get_cache_stats(self) -> Dict[str, Any]:
         """Get cache statistics for monitoring"""
+        stats = self.response_cache.get_stats()
         return {
-            "cache_size": len(self.response_cache),
-            "max_cache_size": self.max_cache_size,
-            "cache_ttl_hours": self.cache_ttl.total_seconds() / 3600,
-            "cache_hit_ratio": getattr(self, '_cache_hits', 0) / max(getattr(self, '_total_requests', 1), 1)
+            "cache_size": stats["size"],
+            "max_cache_size": stats["max_entries"],
+            "cache_ttl_hours": stats["ttl_seconds"] / 3600,
+            "cache_hit_ratio": stats["hit_ratio"],
+            **stats
         }
     
     def clear_cache(self):
@@ -201,6 +218,14 @@ class AIAgentManager:
             "available_agents": [agent_type.value for agent_type in self.agents.keys()]
         }
 
+# Sampling parameters shared by blocking and streaming agent calls
+OPENAI_COMPLETION_PARAMS = {
+    "max_tokens": 500,
+    "temperature": 0.7,
+    "presence_penalty": 0.1,
+    "frequency_penalty": 0.1
+}
+
 class BaseAgent:
     """Base class for all AI agents"""
     
@@ -220,46 +245,79 @@ class BaseAgent:
         """Get response using OpenAI API"""
         
         try:
-            # Prepare conversation messages
-            messages = [{"role": "system", "content": self.system_prompt}]
-            
-            # Add conversation history if available
-            if conversation_history:
-                for msg in conversation_history[-10:]:  # Last 10 messages
-                    messages.append({
-                        "role": "user" if msg.get("is_user") else "assistant",
-                        "content": msg.get("message", "")
-                    })
-            
-            # Add context if available
-            if context:
-                context_str = f"\n\nContext: {json.dumps(context, indent=2)}"
-                messages.append({"role": "user", "content": f"{message}{context_str}"})
-            else:
-                messages.append({"role": "user", "content": message})
-            
             # Call OpenAI API
-            response = await client.chat.completions.create(
-                model="gpt-4",
-                messages=messages,
-                max_tokens=500,
-                temperature=0.7,
-                presence_penalty=0.1,
-                frequency_penalty=0.1
-            )
+            with track_llm_call("openai", "gpt-4") as call:
+                response = await client.chat.completions.create(
+                    model="gpt-4",
+                    messages=self._build_messages(message, context, conversation_history),
+                    **OPENAI_COMPLETION_PARAMS
+                )
+                call.record_usage(response.usage)
             
-            return {
-                "response": response.choices[0].message.content,
-                "agent_type": self.agent_type,
-                "confidence": 0.9,
-                "model": "gpt-4",
-                "timestamp": datetime.utcnow().isoformat()
-            }
+            return self.build_openai_response(response.choices[0].message.content)
             
         except Exception as e:
             print(f"OpenAI API error: {e}")
             return await self.get_fallback_response(message, context)
     
+    async def stream_openai_response(
+        self, 
+        client: AsyncOpenAI, 
+        message: str, 
+        context: Optional[Dict[str, Any]] = None,
+        conversation_history: Optional[List[Dict[str, Any]]] = None
+    ) -> AsyncIterator[str]:
+        """Yield response text from OpenAI as it is generated"""
+        with track_llm_call("openai", "gpt-4") as call:
+            stream = await client.chat.completions.create(
+                model="gpt-4",
+                messages=self._build_messages(message, context, conversation_history),
+                stream=True,
+                # Ask for a final usage chunk so streamed calls are still token-accounted
+                extra_body={"stream_options": {"include_usage": True}},
+                **OPENAI_COMPLETION_PARAMS
+            )
+            async for chunk in stream:
+                call.record_usage(getattr(chunk, "usage", None))
+                if chunk.choices and chunk.choices[0].delta.content:
+                    call.record_first_token()
+                    yield chunk.choices[0].delta.content
+    
+    def _build_messages(
+        self, 
+        message: str, 
+        context: Optional[Dict[str, Any]] = None,
+        conversation_history: Optional[List[Dict[str, Any]]] = None
+    ) -> List[Dict[str, str]]:
+        """Prepare conversation messages for the OpenAI API"""
+        messages = [{"role": "system", "content": self.system_prompt}]
+        
+        # Add conversation history if available
+        if conversation_history:
+            for msg in conversation_history[-10:]:  # Last 10 messages
+                messages.append({
+                    "role": "user" if msg.get("is_user") else "assistant",
+                    "content": msg.get("message", "")
+                })
+        
+        # Add context if available
+        if context:
+            context_str = f"\n\nContext: {json.dumps(context, indent=2)}"
+            messages.append({"role": "user", "content": f"{message}{context_str}"})
+        else:
+            messages.append({"role": "user", "content": message})
+        return messages
+    
+    def build_openai_response(self, content: str) -> Dict[str, Any]:
+        """Agent response for text generated by OpenAI"""
+        return {
+            "response": content,
+            "agent_type": self.agent_type,
+            "confidence": 0.9,
+            "model": "gpt-4",
+            "timestamp": datetime.utcnow().isoformat()
+        }
+    
     async def get_fallback_response(
         self, 
         message: str, 
@@ -15,6 +15,8 @@ import hashlib
 import asyncio
 
 from app.core.chat_database import get_chat_database
+from app.core.metrics import track_llm_call
+from app.modules.ai_agents.response_cache import create_response_cache
 from app.modules.ai_agents.vector_learning import vector_learning_system
 
 class UserType(Enum):
@@ -49,12 +51,8 @@ class DatabaseAgentManager:
             self.vector_learning = None
             self._initialize_openai()
             
-            # Initialize caching system
-            self.response_cache = {}
-            self.cache_ttl = timedelta(hours=1)
-            self.max_cache_size = 1000
-            self._cache_hits = 0
-            self._total_requests = 0
+            # TTL-LRU response cache with request coalescing, shared through Redis when configured
+            self.response_cache = create_response_cache("database_agent")
             
             DatabaseAgentManager._initialized = True
     
@@ -152,31 +150,6 @@ class DatabaseAgentManager:
         cache_string = json.dumps(cache_data, sort_keys=True)
         return hashlib.md5(cache_string.encode()).hexdigest()
     
-    def _get_cached_response(self, cache_key: str) -> Optional[Dict[str, Any]]:
-        """Get cached response if available and not expired"""
-        if cache_key in self.response_cache:
-            cached_data = self.response_cache[cache_key]
-            if datetime.utcnow() - cached_data["timestamp"] < self.cache_ttl:
-                return cached_data["response"]
-            else:
-                del self.response_cache[cache_key]
-        return None
-    
-    def _cache_response(self, cache_key: str, response: Dict[str, Any]):
-        """Cache the response"""
-        if len(self.response_cache) >= self.max_cache_size:
-            oldest_keys = sorted(
-                self.response_cache.keys(),
-                key=lambda k: self.response_cache[k]["timestamp"]
-            )[:len(self.response_cache) - self.max_cache_size + 1]
-            for key in oldest_keys:
-                del self.response_cache[key]
-        
-        self.response_cache[cache_key] = {
-            "response": response,
-            "timestamp": datetime.utcnow()
-        }
-    
     async def get_agent_response(
         self, 
         user_type: UserType, 
@@ -187,9 +160,6 @@ class DatabaseAgentManager:
         """Get response from database-configured agent with enhanced error handling"""
         
         try:
-            # Track total requests
-            self._total_requests += 1
-            
             # Validate input parameters
             if not message or not message.strip():
                 return self._get_error_response("Empty message provided", user_type)
@@ -197,69 +167,73 @@ class DatabaseAgentManager:
             # Generate cache key
             cache_key = self._generate_cache_key(user_type, message, context)
             
-            # Check cache first
-            cached_response = self._get_cached_response(cache_key)
-            if cached_response:
-                self._cache_hits += 1
-                cached_response["cached"] = True
-                return cached_response
-            
-            # Load agent configs if not loaded
-            if not self.agent_configs:
-                await self.load_agent_configs()
-            
-            # Get agent configuration
-            agent_type = f"{user_type.value}_agent"
-            agent_config = self.agent_configs.get(agent_type)
-            
-            if not agent_config:
-                # Fallback to default response
-                response = {
-                    "response": f"I'm sorry, I don't have a specialized agent configured for {user_type.value}. Please contact support.",
-                    "agent_type": "fallback",
-                    "confidence": 0.0,
-                    "cached": False,
-                    "error": "agent_not_configured"
-                }
-                return response
-            
-            # Use OpenAI if available, otherwise use fallback
-            if self.openai_client and agent_config.get("system_prompt"):
-                try:
-                    response = await self._get_openai_response(
-                        agent_config, message, context, conversation_history
-                    )
-                except Exception as e:
-                    print(f"OpenAI error: {e}")
-                    response = await self._get_fallback_response(agent_config, message, context)
-                    response["error"] = "openai_error"
-            else:
-                response = await self._get_fallback_response(agent_config, message, context)
-            
-            # Add cache flag and cache the response
-            response["cached"] = False
-            self._cache_response(cache_key, response)
-            
-            # Learn from interaction if vector learning is available
-            if self.vector_learning:
-                try:
-                    await self.vector_learning.learn_from_interaction(
-                        user_id=context.get("user_id", "unknown") if context else "unknown",
-                        user_type=user_type.value,
-                        message=message,
-                        response=response["response"],
-                        agent_type=response.get("agent_type", "unknown"),
-                        context=context
-                    )
-                except Exception as e:
-                    print(f"⚠️ Vector learning error: {e}")
-            
+            # Identical concurrent requests share one upstream call
+            response, source = await self.response_cache.get_or_compute(
+                cache_key,
+                lambda: self._generate_response(user_type, message, context, conversation_history)
+            )
+            response["cached"] = source != "miss"
             return response
             
         except Exception as e:
             print(f"❌ Critical error in get_agent_response: {e}")
             return self._get_error_response(f"System error: {str(e)}", user_type)
     
+    async def _generate_response(
+        self, 
+        user_type: UserType, 
+        message: str, 
+        context: Optional[Dict[str, Any]] = None,
+        conversation_history: Optional[List[Dict[str, Any]]] = None
+    ) -> Dict[str, Any]:
+        """Generate an uncached response and learn from it"""
+        
+        # Load agent configs if not loaded
+        if not self.agent_configs:
+            await self.load_agent_configs()
+        
+        # Get agent configuration
+        agent_type = f"{user_type.value}_agent"
+        agent_config = self.agent_configs.get(agent_type)
+        
+        if not agent_config:
+            # Fallback to default response
+            return {
+                "response": f"I'm sorry, I don't have a specialized agent configured for {user_type.value}. Please contact support.",
+                "agent_type": "fallback",
+                "confidence": 0.0,
+                "error": "agent_not_configured"
+            }
+        
+        # Use OpenAI if available, otherwise use fallback
+        if self.openai_client and agent_config.get("system_prompt"):
+            try:
+                response = await self._get_openai_response(
+                    agent_config, message, context, conversation_history
+                )
+            except Exception as e:
+                print(f"OpenAI error: {e}")
+                response = await self._get_fallback_response(agent_config, message, context)
+                response["error"] = "openai_error"
+        else:
+            response = await self._get_fallback_response(agent_config, message, context)
+        
+        # Learn from interaction if vector learning is available
+        if self.vector_learning:
+            try:
+                await self.vector_learning.learn_from_interaction(
+                    user_id=context.get("user_id", "unknown") if context else "unknown",
+                    user_type=user_type.value,
+                    message=message,
+                    response=response["response"],
+                    agent_type=response.get("agent_type", "unknown"),
+                    context=context
+                )
+            except Exception as e:
+                print(f"⚠️ Vector learning error: {e}")
+        
+        return response
+    
     def _get_error_response(self, error_message: str, user_type: UserType) -> Dict[str, Any]:
         """Generate standardized error response"""
         return {
@@ -298,12 +272,14 @@ class DatabaseAgentManager:
         messages.append({"role": "user", "content": message})
         
         # Call OpenAI
-        response = await self.openai_client.chat.completions.create(
-            model="gpt-4",
-            messages=messages,
-            max_tokens=1000,
-            temperature=0.7
-        )
+        with track_llm_call("openai", "gpt-4") as call:
+            response = await self.openai_client.chat.completions.create(
+                model="gpt-4",
+                messages=messages,
+                max_tokens=1000,
+                temperature=0.7
+            )
+            call.record_usage(response.usage)
         
         return {
             "response": response.choices[0].message.content,
@@ -335,11 +311,13 @@ class DatabaseAgentManager:
     
     def get_cache_stats(self) -> Dict[str, Any]:
         """Get cache statistics for monitoring"""
+        stats = self.response_cache.get_stats()
         return {
-            "cache_size": len(self.response_cache),
-            "max_cache_size": self.max_cache_size,
-            "cache_ttl_hours": self.cache_ttl.total_seconds() / 3600,
-            "cache_hit_ratio": self._cache_hits / max(self._total_requests, 1)
+            "cache_size": stats["size"],
+            "max_cache_size": stats["max_entries"],
+            "cache_ttl_hours": stats["ttl_seconds"] / 3600,
+            "cache_hit_ratio": stats["hit_ratio"],
+            **stats
         }
     
     def clear_cache(self):
@@ -0,0 +1,243 @@
+"""
+AI Agent Response Cache for EVEP Platform
+
+TTL-bounded LRU of agent responses with a byte budget, request coalescing so
+identical concurrent questions share one upstream call, and an optional Redis
+tier through which every worker shares hits.
+"""
+
+import asyncio
+import copy
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from app.core import metrics
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+Response = Dict[str, Any]
+
+_STAT_BY_SOURCE = {"hit": "hits", "shared_hit": "shared_hits", "coalesced": "coalesced", "miss": "misses"}
+
+
+def response_size(response: Response) -> int:
+    """Approximate memory held by a response: its serialized size"""
+    return len(json.dumps(response, default=str).encode("utf-8"))
+
+
+def is_cacheable(response: Response) -> bool:
+    """Error and not-configured responses are retried rather than cached"""
+    return not response.get("error")
+
+
+class ResponseCache:
+    """In-process TTL-LRU in front of an optional shared Redis tier
+
+    Lookups, inserts and evictions are O(1). Every entry lives for the same
+    TTL, so insertion order is expiry order and expired entries are purged
+    from the front of a second ordered dict on each write.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        ttl_seconds: float = settings.AI_RESPONSE_CACHE_TTL_SECONDS,
+        max_entries: int = settings.AI_RESPONSE_CACHE_MAX_ENTRIES,
+        max_bytes: int = settings.AI_RESPONSE_CACHE_MAX_MB * 1024 * 1024,
+        redis=None,
+    ):
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max(1, max_entries)
+        self.max_bytes = max_bytes
+        self.redis = redis
+        # key -> (response, size, expires_at); order is recency of use
+        self._entries: "OrderedDict[str, Tuple[Response, int, float]]" = OrderedDict()
+        # key -> expires_at; order is insertion, which is also expiry order
+        self._expiry: "OrderedDict[str, float]" = OrderedDict()
+        self._bytes = 0
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._stats = {
+            "requests": 0, "hits": 0, "shared_hits": 0, "coalesced": 0, "misses": 0,
+            "evictions": 0, "expirations": 0, "shared_errors": 0,
+        }
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[Response]]) -> Tuple[Response, str]:
+        """Cached response for the key, computing it at most once across concurrent callers
+
+        Returns a copy of the response and where it came from: "hit",
+        "shared_hit", "coalesced" or "miss".
+        """
+        self._stats["requests"] += 1
+        response = self.get(key)
+        if response is not None:
+            return self._record("hit", response)
+
+        task = self._inflight.get(key)
+        if task is not None:
+            response, _ = await asyncio.shield(task)
+            return self._record("coalesced", response)
+
+        # The lookup runs as its own task so a caller that disconnects does not cancel it for the others
+        task = asyncio.ensure_future(self._load(key, compute))
+        self._inflight[key] = task
+        task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        response, source = await asyncio.shield(task)
+        return self._record(source, response)
+
+    async def lookup(self, key: str) -> Optional[Tuple[Response, str]]:
+        """Cached, in-flight or shared response for the key, or None (a miss) when the caller must generate it
+
+        Used by streaming requests, which produce their response incrementally
+        and hand the assembled result to store().
+        """
+        self._stats["requests"] += 1
+        response = self.get(key)
+        if response is not None:
+            return self._record("hit", response)
+        task = self._inflight.get(key)
+        if task is not None:
+            response, _ = await asyncio.shield(task)
+            return self._record("coalesced", response)
+        shared = await self._shared_get(key)
+        if shared is not None:
+            self.put(key, shared)
+            return self._record("shared_hit", shared)
+        self._stats["misses"] += 1
+        metrics.AI_RESPONSE_CACHE_REQUESTS.labels(self.namespace, "miss").inc()
+        return None
+
+    async def store(self, key: str, response: Response) -> None:
+        """Cache a generated response locally and in the shared tier"""
+        if is_cacheable(response):
+            self.put(key, response)
+            await self._shared_set(key, response)
+
+    async def _load(self, key: str, compute: Callable[[], Awaitable[Response]]) -> Tuple[Response, str]:
+        shared = await self._shared_get(key)
+        if shared is not None:
+            self.put(key, shared)
+            return shared, "shared_hit"
+        response = await compute()
+        await self.store(key, response)
+        return response, "miss"
+
+    def _record(self, source: str, response: Response) -> Tuple[Response, str]:
+        self._stats[_STAT_BY_SOURCE[source]] += 1
+        metrics.AI_RESPONSE_CACHE_REQUESTS.labels(self.namespace, source).inc()
+        return copy.deepcopy(response), source
+
+    def get(self, key: str) -> Optional[Response]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[2] <= time.monotonic():
+            self._drop(key)
+            self._stats["expirations"] += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def put(self, key: str, response: Response) -> None:
+        size = response_size(response)
+        if key in self._entries:
+            self._drop(key)
+        if size > self.max_bytes:
+            return
+        now = time.monotonic()
+        self._purge_expired(now)
+        expires_at = now + self.ttl_seconds
+        self._entries[key] = (copy.deepcopy(response), size, expires_at)
+        self._expiry[key] = expires_at
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self._stats["evictions"] += 1
+
+    def _purge_expired(self, now: float) -> None:
+        while self._expiry:
+            key, expires_at = next(iter(self._expiry.items()))
+            if expires_at > now:
+                break
+            self._drop(key)
+            self._stats["expirations"] += 1
+
+    def _drop(self, key: str) -> None:
+        _, size, _ = self._entries.pop(key)
+        self._expiry.pop(key, None)
+        self._bytes -= size
+
+    def _shared_key(self, key: str) -> str:
+        return f"evep:ai_response:{self.namespace}:{key}"
+
+    async def _shared_get(self, key: str) -> Optional[Response]:
+        if self.redis is None:
+            return None
+        try:
+            raw = await self.redis.get(self._shared_key(key))
+            return json.loads(raw) if raw else None
+        except Exception as e:
+            self._stats["shared_errors"] += 1
+            logger.error(f"Error reading shared AI response cache: {e}")
+            return None
+
+    async def _shared_set(self, key: str, response: Response) -> None:
+        if self.redis is None:
+            return
+        try:
+            await self.redis.set(self._shared_key(key), json.dumps(response, default=str), ex=max(1, int(self.ttl_seconds)))
+        except Exception as e:
+            self._stats["shared_errors"] += 1
+            logger.error(f"Error writing shared AI response cache: {e}")
+
+    async def _shared_clear(self) -> None:
+        try:
+            keys = [key async for key in self.redis.scan_iter(match=self._shared_key("*"))]
+            if keys:
+                await self.redis.delete(*keys)
+        except Exception as e:
+            logger.error(f"Error clearing shared AI response cache: {e}")
+
+    def clear(self) -> None:
+        """Drop every cached response, in Redis too when called from the event loop"""
+        self._entries.clear()
+        self._expiry.clear()
+        self._bytes = 0
+        if self.redis is not None:
+            try:
+                asyncio.get_running_loop().create_task(self._shared_clear())
+            except RuntimeError:
+                logger.warning("Shared AI response cache not cleared: no running event loop")
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = dict(self._stats)
+        served = stats["hits"] + stats["shared_hits"] + stats["coalesced"]
+        return {
+            **stats,
+            "hit_ratio": round(served / stats["requests"], 4) if stats["requests"] else 0.0,
+            "size": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "inflight": len(self._inflight),
+            "shared": self.redis is not None,
+        }
+
+
+def create_response_cache(namespace: str) -> ResponseCache:
+    """Response cache shared through Redis when AI_RESPONSE_CACHE_REDIS_URL is configured"""
+    redis = None
+    if settings.AI_RESPONSE_CACHE_REDIS_URL:
+        from redis import asyncio as aioredis
+        redis = aioredis.Redis.from_url(settings.AI_RESPONSE_CACHE_REDIS_URL)
+        logger.info(f"AI response cache '{namespace}' shared through Redis")
+    return ResponseCache(namespace, redis=redis)
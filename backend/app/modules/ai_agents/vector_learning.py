@@ -117,7 +117,7 @@ class VectorLearningSystem:
             embedding_text = f"User: {message}\nContext: {json.dumps(context or {})}\nUserType: {user_type}"
             
             # Store in vector database
-            success = self.vector_store.add_document(
+            success = await self.vector_store.add_document_async(
                 collection_name="user_chat_behavior",
                 document_id=doc_id,
                 text=embedding_text,
@@ -179,7 +179,7 @@ class VectorLearningSystem:
             embedding_text = f"Conversation: {conversation_summary}\nOutcome: {outcome}"
             
             # Store in vector database
-            success = self.vector_store.add_document(
+            success = await self.vector_store.add_document_async(
                 collection_name="conversation_patterns",
                 document_id=doc_id,
                 text=embedding_text,
@@ -226,7 +226,7 @@ class VectorLearningSystem:
             embedding_text = f"UserType: {user_type}\nPreferences: {json.dumps(preferences)}\nHistory: {len(interaction_history)} interactions"
             
             # Store in vector database
-            success = self.vector_store.add_document(
+            success = await self.vector_store.add_document_async(
                 collection_name="user_preferences",
                 document_id=doc_id,
                 text=embedding_text,
@@ -274,7 +274,7 @@ class VectorLearningSystem:
             embedding_text = f"Message: {message}\nResponse: {response}\nAgent: {agent_type}\nMetrics: {json.dumps(effectiveness_metrics)}"
             
             # Store in vector database
-            success = self.vector_store.add_document(
+            success = await self.vector_store.add_document_async(
                 collection_name="response_effectiveness",
                 document_id=doc_id,
                 text=embedding_text,
@@ -304,7 +304,7 @@ class VectorLearningSystem:
                 await self.initialize()
             
             # Search for similar behavior
-            similar_behaviors = self.vector_store.search_similar(
+            similar_behaviors = await self.vector_store.search_similar_async(
                 collection_name="user_chat_behavior",
                 query=f"UserType: {user_type}\nMessage: {message}",
                 n_results=n_results,
@@ -329,7 +329,7 @@ class VectorLearningSystem:
                 await self.initialize()
             
             # Search for user preferences
-            preferences = self.vector_store.search_similar(
+            preferences = await self.vector_store.search_similar_async(
                 collection_name="user_preferences",
                 query=f"UserID: {user_id}\nUserType: {user_type}",
                 n_results=1,
@@ -359,7 +359,7 @@ class VectorLearningSystem:
                 await self.initialize()
             
             # Search for effective responses
-            effective_responses = self.vector_store.search_similar(
+            effective_responses = await self.vector_store.search_similar_async(
                 collection_name="response_effectiveness",
                 query=f"UserType: {user_type}\nMessage: {message}",
                 n_results=n_results,
@@ -461,7 +461,7 @@ class VectorLearningSystem:
             # Get behavior analytics
             if user_id:
                 # User-specific analytics
-                user_behaviors = self.vector_store.search_similar(
+                user_behaviors = await self.vector_store.search_similar_async(
                     collection_name="user_chat_behavior",
                     query=f"UserID: {user_id}",
                     n_results=100,
@@ -0,0 +1,224 @@
+"""
+Embedding Cache for EVEP Platform
+
+This module caches sentence-transformer embeddings by model name and a hash of
+the normalized text, so repeated questions, canned suggestions and unchanged
+screening summaries are encoded once. A byte-bounded in-memory LRU sits in
+front of a SQLite file that survives restarts and is shared by the workers.
+"""
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+VECTOR_DTYPE = np.float32
+
+
+def normalize_text(text: str) -> str:
+    """Canonical form used for cache keys: NFC with whitespace runs collapsed"""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def cache_key(model_name: str, text: str) -> str:
+    return hashlib.sha256(f"{model_name}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """Two-tier embedding cache for one model"""
+
+    def __init__(
+        self,
+        model_name: str,
+        memory_bytes: int = settings.EMBEDDING_CACHE_MEMORY_MB * 1024 * 1024,
+        path: Optional[str] = settings.EMBEDDING_CACHE_PATH,
+    ):
+        self.model_name = model_name
+        self.memory_bytes = memory_bytes
+        self.path = path or None
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._memory_used = 0
+        # Memory lookups never wait behind SQLite I/O, which holds only the disk lock
+        self._memory_lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "writes": 0}
+        self._db: Optional[sqlite3.Connection] = None
+        if self.path:
+            try:
+                self._db = self._open(self.path)
+            except sqlite3.Error as e:
+                logger.error(f"Embedding cache file {self.path} unavailable, caching in memory only: {e}")
+
+    @staticmethod
+    def _open(path: str) -> sqlite3.Connection:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        db = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        # WAL lets several workers read while one writes
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, model TEXT NOT NULL, dim INTEGER NOT NULL, vector BLOB NOT NULL)"
+        )
+        db.commit()
+        return db
+
+    def get_memory(self, text: str) -> Optional[List[float]]:
+        """Memory-tier lookup only, cheap enough for the event loop; None on a miss"""
+        key = cache_key(self.model_name, text)
+        with self._memory_lock:
+            vector = self._memory.get(key)
+            if vector is None:
+                return None
+            self._memory.move_to_end(key)
+            self._stats["memory_hits"] += 1
+        return vector.tolist()
+
+    def get_many(self, texts: Sequence[str]) -> List[Optional[List[float]]]:
+        """Cached embeddings in input order, None where neither tier has the text"""
+        keys = [cache_key(self.model_name, text) for text in texts]
+        found: Dict[str, np.ndarray] = {}
+        with self._memory_lock:
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = vector
+        in_memory = set(found)
+
+        missing = [key for key in dict.fromkeys(keys) if key not in found]
+        on_disk = []
+        if missing:
+            with self._disk_lock:
+                if self._db is not None:
+                    on_disk = self._read(missing)
+
+        with self._memory_lock:
+            for key, dim, blob in on_disk:
+                vector = np.frombuffer(blob, dtype=VECTOR_DTYPE, count=dim)
+                found[key] = vector
+                self._remember(key, vector)
+            for key in keys:
+                tier = "memory_hits" if key in in_memory else "disk_hits" if key in found else "misses"
+                self._stats[tier] += 1
+        return [found[key].tolist() if key in found else None for key in keys]
+
+    def get(self, text: str) -> Optional[List[float]]:
+        return self.get_many([text])[0]
+
+    def put_many(self, texts: Sequence[str], embeddings: Sequence[Sequence[float]]) -> None:
+        rows = []
+        with self._memory_lock:
+            for text, embedding in zip(texts, embeddings):
+                key = cache_key(self.model_name, text)
+                vector = np.asarray(embedding, dtype=VECTOR_DTYPE)
+                self._remember(key, vector)
+                rows.append((key, self.model_name, vector.shape[0], vector.tobytes()))
+        if not rows:
+            return
+        with self._disk_lock:
+            if self._db is None:
+                return
+            try:
+                self._db.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)", rows)
+                self._db.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Error writing embedding cache: {e}")
+                return
+        with self._memory_lock:
+            self._stats["writes"] += len(rows)
+
+    def put(self, text: str, embedding: Sequence[float]) -> None:
+        self.put_many([text], [embedding])
+
+    def _read(self, keys: List[str]):
+        rows = []
+        try:
+            # Stay under SQLite's bound-parameter limit
+            for offset in range(0, len(keys), 500):
+                chunk = keys[offset:offset + 500]
+                rows.extend(self._db.execute(
+                    f"SELECT key, dim, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                ).fetchall())
+        except sqlite3.Error as e:
+            logger.error(f"Error reading embedding cache: {e}")
+        return rows
+
+    def _remember(self, key: str, vector: np.ndarray) -> None:
+        """Add to the memory tier, evicting least recently used vectors past the byte budget; caller holds the memory lock"""
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_used -= previous.nbytes
+        if vector.nbytes > self.memory_bytes:
+            return
+        self._memory[key] = vector
+        self._memory_used += vector.nbytes
+        while self._memory_used > self.memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_used -= evicted.nbytes
+            self._stats["evictions"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit ratio per tier and the bytes each tier holds; scans SQLite, so call it off the event loop"""
+        with self._memory_lock:
+            stats = dict(self._stats)
+            memory_entries, memory_used = len(self._memory), self._memory_used
+        disk_entries = disk_bytes = 0
+        with self._disk_lock:
+            if self._db is not None:
+                try:
+                    disk_entries, disk_bytes = self._db.execute(
+                        "SELECT COUNT(*), COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings WHERE model = ?",
+                        (self.model_name,),
+                    ).fetchone()
+                except sqlite3.Error as e:
+                    logger.error(f"Error reading embedding cache stats: {e}")
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        hits = stats["memory_hits"] + stats["disk_hits"]
+        return {
+            "model": self.model_name,
+            **stats,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            "memory_entries": memory_entries,
+            "memory_bytes": memory_used,
+            "memory_budget_bytes": self.memory_bytes,
+            "disk_path": self.path,
+            "disk_entries": disk_entries,
+            "disk_vector_bytes": disk_bytes,
+            "disk_file_bytes": os.path.getsize(self.path) if self.path and os.path.exists(self.path) else 0,
+        }
+
+    def close(self) -> None:
+        with self._disk_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+# One cache per model, shared by every VectorStore in the process
+_caches: Dict[str, EmbeddingCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_embedding_cache(model_name: str) -> EmbeddingCache:
+    with _caches_lock:
+        if model_name not in _caches:
+            _caches[model_name] = EmbeddingCache(model_name)
+        return _caches[model_name]
+
+
+def get_embedding_cache_stats() -> Dict[str, Any]:
+    return {"caches": [cache.get_stats() for cache in list(_caches.values())]}
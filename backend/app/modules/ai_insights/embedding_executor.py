@@ -0,0 +1,157 @@
+"""
+Embedding Executor for EVEP Platform
+
+This module runs the sentence-transformer model off the event loop. Single-text
+requests that arrive close together are coalesced into one model call, which
+costs little more than encoding a single text.
+"""
+
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core import metrics
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingExecutor:
+    """Awaitable front end to an embedding model running in a dedicated thread pool
+
+    Requests queue up while the model is busy and are encoded together as soon
+    as a batch is full or the oldest request has waited max_wait_ms. The model
+    call releases the GIL inside torch, so threads keep the loop responsive
+    without loading a copy of the model per process.
+    """
+
+    def __init__(
+        self,
+        encode: Callable[[List[str]], Any],
+        model_name: str = "default",
+        max_batch_size: int = settings.EMBEDDING_MAX_BATCH_SIZE,
+        max_wait_ms: float = settings.EMBEDDING_MAX_WAIT_MS,
+        workers: int = settings.EMBEDDING_WORKER_THREADS,
+    ):
+        self.encode = encode
+        self.model_name = model_name
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000
+        self.workers = max(1, workers)
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="embedding")
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queue: Optional["asyncio.Queue[Tuple[str, asyncio.Future, float]]"] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._queue_depth = metrics.EMBEDDING_QUEUE_DEPTH.labels(model_name)
+
+    async def embed(self, text: str) -> List[float]:
+        """Embedding for one text, batched with other concurrent requests"""
+        self._ensure_started()
+        future = self._loop.create_future()
+        self._queue.put_nowait((text, future, time.perf_counter()))
+        self._queue_depth.inc()
+        return await future
+
+    async def embed_many(self, texts: Sequence[str]) -> List[List[float]]:
+        """Embeddings for a caller's own batch, encoded in chunks of max_batch_size"""
+        self._ensure_started()
+        started = time.perf_counter()
+        embeddings: List[List[float]] = []
+        for offset in range(0, len(texts), self.max_batch_size):
+            async with self._slots:
+                embeddings.extend(await self._encode_batch(list(texts[offset:offset + self.max_batch_size])))
+        metrics.EMBEDDING_LATENCY.labels(self.model_name).observe(time.perf_counter() - started)
+        return embeddings
+
+    async def close(self):
+        """Stop dispatching, fail anything still queued and release the threads"""
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            try:
+                await self._dispatcher
+            except asyncio.CancelledError:
+                pass
+            self._dispatcher = None
+        while self._queue is not None and not self._queue.empty():
+            _, future, _ = self._queue.get_nowait()
+            self._queue_depth.dec()
+            if not future.done():
+                future.set_exception(RuntimeError("Embedding executor closed"))
+        self._pool.shutdown(wait=False)
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._dispatcher is None or self._dispatcher.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._slots = asyncio.Semaphore(self.workers)
+            self._dispatcher = loop.create_task(self._dispatch())
+
+    async def _dispatch(self):
+        while True:
+            first = await self._queue.get()
+            try:
+                # Requests keep gathering in the queue while every worker is busy
+                await self._slots.acquire()
+            except BaseException:
+                self._queue.put_nowait(first)
+                raise
+            try:
+                batch = await self._collect_batch(first)
+            except BaseException:
+                self._slots.release()
+                raise
+            self._loop.create_task(self._run_batch(batch))
+
+    async def _collect_batch(self, first: Tuple[str, asyncio.Future, float]) -> List[Tuple[str, asyncio.Future, float]]:
+        batch = [first]
+        deadline = self._loop.time() + self.max_wait
+        try:
+            while len(batch) < self.max_batch_size:
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                remaining = deadline - self._loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+        except BaseException:
+            # Cancelled while collecting; leave the requests for close() to fail
+            for item in batch:
+                self._queue.put_nowait(item)
+            raise
+        self._queue_depth.dec(len(batch))
+        return batch
+
+    async def _run_batch(self, batch: List[Tuple[str, asyncio.Future, float]]):
+        try:
+            embeddings = await self._encode_batch([text for text, _, _ in batch])
+        except Exception as e:
+            logger.error(f"Error generating batched embeddings: {e}")
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self._slots.release()
+
+        finished = time.perf_counter()
+        for (_, future, enqueued), embedding in zip(batch, embeddings):
+            if not future.done():
+                future.set_result(embedding)
+            metrics.EMBEDDING_LATENCY.labels(self.model_name).observe(finished - enqueued)
+
+    async def _encode_batch(self, texts: List[str]) -> List[List[float]]:
+        started = time.perf_counter()
+        vectors = await self._loop.run_in_executor(self._pool, self.encode, texts)
+        metrics.EMBEDDING_ENCODE_DURATION.labels(self.model_name).observe(time.perf_counter() - started)
+        metrics.EMBEDDING_BATCH_SIZE.labels(self.model_name).observe(len(texts))
+        return np.asarray(vectors).tolist()
@@ -44,7 +44,7 @@ class InsightGenerator:
         """
         try:
             # Find similar cases using vector search
-            similar_cases = self.vector_store.search_similar_screenings(
+            similar_cases = await self.vector_store.search_similar_screenings_async(
                 screening_data, n_results=3
             )
             
@@ -78,11 +78,11 @@ class InsightGenerator:
             
             # Store insight in vector store
             insight_id = f"insight_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}"
-            self._store_insight(insight_id, insight_result, screening_data, role, insight_type)
+            await self._store_insight(insight_id, insight_result, screening_data, role, insight_type)
             
             # Add screening result to vector store for future similarity search
             if patient_info:
-                self.vector_store.add_screening_result(
+                await self.vector_store.add_screening_result_async(
                     screening_id=screening_data.get("screening_id", insight_id),
                     screening_data=screening_data,
                     patient_info=patient_info
@@ -221,7 +221,7 @@ class InsightGenerator:
         
         return "\n".join(formatted_cases)
     
-    def _store_insight(
+    async def _store_insight(
         self,
         insight_id: str,
         insight_result: Dict[str, Any],
@@ -245,7 +245,7 @@ class InsightGenerator:
             }
             
             # Add to vector store
-            self.vector_store.add_document(
+            await self.vector_store.add_document_async(
                 collection_name="ai_insights",
                 document_id=insight_id,
                 text=insight_text,
@@ -348,7 +348,7 @@ class InsightGenerator:
                 metadata_filter["insight_type"] = insight_type
             
             # Search in vector store
-            results = self.vector_store.search_similar(
+            results = await self.vector_store.search_similar_async(
                 collection_name="ai_insights",
                 query=query,
                 n_results=n_results,
@@ -12,6 +12,7 @@ import asyncio
 from openai import AsyncOpenAI
 import anthropic
 from app.core.config import settings
+from app.core.metrics import track_llm_call
 
 logger = logging.getLogger(__name__)
 
@@ -105,12 +106,14 @@ class LLMService:
             ]
             
             # Make API call
-            response = await self.openai_client.chat.completions.create(
-                model=model,
-                messages=messages,
-                max_tokens=max_tokens,
-                temperature=temperature
-            )
+            with track_llm_call("openai", model) as call:
+                response = await self.openai_client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    max_tokens=max_tokens,
+                    temperature=temperature
+                )
+                call.record_usage(response.usage)
             
             return {
                 "success": True,
@@ -144,21 +147,24 @@ class LLMService:
             # Make API call using the correct Anthropic API syntax
             # For Anthropic API v0.7.7, we need to use the correct method
             try:
-                response = await self.claude_client.messages.create(
-                    model=model,
-                    max_tokens=max_tokens,
-                    temperature=temperature,
-                    system=system_prompt,
-                    messages=[{"role": "user", "content": prompt}]
-                )
+                with track_llm_call("anthropic", model) as call:
+                    response = await self.claude_client.messages.create(
+                        model=model,
+                        max_tokens=max_tokens,
+                        temperature=temperature,
+                        system=system_prompt,
+                        messages=[{"role": "user", "content": prompt}]
+                    )
+                    call.record_usage(response.usage)
             except AttributeError:
                 # Fallback to older API syntax if messages attribute doesn't exist
-                response = await self.claude_client.completions.create(
-                    model=model,
-                    max_tokens_to_sample=max_tokens,
-                    temperature=temperature,
-                    prompt=f"{system_prompt}\n\nHuman: {prompt}\n\nAssistant:"
-                )
+                with track_llm_call("anthropic", model):
+                    response = await self.claude_client.completions.create(
+                        model=model,
+                        max_tokens_to_sample=max_tokens,
+                        temperature=temperature,
+                        prompt=f"{system_prompt}\n\nHuman: {prompt}\n\nAssistant:"
+                    )
                 return {
                     "success": True,
                     "content": response.completion,
@@ -2,8 +2,12 @@
 Vector Store for EVEP Platform
 
 This module provides vector embedding generation and similarity search capabilities.
+The async methods encode through an EmbeddingExecutor and run ChromaDB calls in
+worker threads, so they never block the event loop. Embeddings are looked up in
+the shared EmbeddingCache before the model is asked for them.
 """
 
+import asyncio
 import logging
 from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime
@@ -11,6 +15,9 @@ import numpy as np
 from sentence_transformers import SentenceTransformer
 import chromadb
 
+from .embedding_cache import get_embedding_cache
+from .embedding_executor import EmbeddingExecutor
+
 logger = logging.getLogger(__name__)
 
 class VectorStore:
@@ -19,6 +26,8 @@ class VectorStore:
     def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
         self.model_name = model_name
         self.embedding_model = None
+        self.embedding_executor = None
+        self.embedding_cache = get_embedding_cache(model_name)
         self.chroma_client = None
         self.collections = {}
         self._initialize_components()
@@ -28,6 +37,7 @@ class VectorStore:
         try:
             # Initialize sentence transformer model
             self.embedding_model = SentenceTransformer(self.model_name)
+            self.embedding_executor = EmbeddingExecutor(self.generate_embeddings_batch, model_name=self.model_name)
             logger.info(f"Embedding model {self.model_name} loaded successfully")
             
             # Initialize ChromaDB client with telemetry disabled
@@ -72,11 +82,7 @@ class VectorStore:
     def generate_embedding(self, text: str) -> List[float]:
         """Generate embedding for a text string"""
         try:
-            if not self.embedding_model:
-                raise ValueError("Embedding model not initialized")
-            
-            embedding = self.embedding_model.encode(text)
-            return embedding.tolist()
+            return self.generate_embeddings_batch([text])[0]
         except Exception as e:
             logger.error(f"Error generating embedding: {e}")
             raise
@@ -87,18 +93,43 @@ class VectorStore:
             if not self.embedding_model:
                 raise ValueError("Embedding model not initialized")
             
-            embeddings = self.embedding_model.encode(texts)
-            return embeddings.tolist()
+            embeddings = self.embedding_cache.get_many(texts)
+            
+            # Encode each distinct missing text once
+            missing = list(dict.fromkeys(text for text, embedding in zip(texts, embeddings) if embedding is None))
+            if missing:
+                encoded = dict(zip(missing, self.embedding_model.encode(missing).tolist()))
+                self.embedding_cache.put_many(missing, [encoded[text] for text in missing])
+                embeddings = [embedding if embedding is not None else encoded[text] for text, embedding in zip(texts, embeddings)]
+            
+            return embeddings
         except Exception as e:
             logger.error(f"Error generating batch embeddings: {e}")
             raise
     
+    async def generate_embedding_async(self, text: str) -> List[float]:
+        """Generate embedding for a text string without blocking the event loop"""
+        if not self.embedding_executor:
+            raise ValueError("Embedding model not initialized")
+        # Memory-tier hits skip the executor queue entirely
+        cached = self.embedding_cache.get_memory(text)
+        if cached is not None:
+            return cached
+        return await self.embedding_executor.embed(text)
+    
+    async def generate_embeddings_batch_async(self, texts: List[str]) -> List[List[float]]:
+        """Generate embeddings for multiple text strings without blocking the event loop"""
+        if not self.embedding_executor:
+            raise ValueError("Embedding model not initialized")
+        return await self.embedding_executor.embed_many(texts)
+    
     def add_document(
         self,
         collection_name: str,
         document_id: str,
         text: str,
-        metadata: Optional[Dict[str, Any]] = None
+        metadata: Optional[Dict[str, Any]] = None,
+        embedding: Optional[List[float]] = None
     ) -> bool:
         """Add a document to the vector store"""
         try:
@@ -108,7 +139,8 @@ class VectorStore:
             collection = self.collections[collection_name]
             
             # Generate embedding
-            embedding = self.generate_embedding(text)
+            if embedding is None:
+                embedding = self.generate_embedding(text)
             
             # Prepare metadata
             doc_metadata = metadata or {}
@@ -130,6 +162,21 @@ class VectorStore:
             logger.error(f"Error adding document to vector store: {e}")
             return False
     
+    async def add_document_async(
+        self,
+        collection_name: str,
+        document_id: str,
+        text: str,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> bool:
+        """Add a document to the vector store without blocking the event loop"""
+        try:
+            embedding = await self.generate_embedding_async(text)
+        except Exception as e:
+            logger.error(f"Error adding document to vector store: {e}")
+            return False
+        return await asyncio.to_thread(self.add_document, collection_name, document_id, text, metadata, embedding)
+    
     def add_documents_batch(
         self,
         collection_name: str,
@@ -179,7 +226,8 @@ class VectorStore:
         collection_name: str,
         query: str,
         n_results: int = 5,
-        filter_metadata: Optional[Dict[str, Any]] = None
+        filter_metadata: Optional[Dict[str, Any]] = None,
+        query_embedding: Optional[List[float]] = None
     ) -> List[Dict[str, Any]]:
         """Search for similar documents"""
         try:
@@ -189,7 +237,8 @@ class VectorStore:
             collection = self.collections[collection_name]
             
             # Generate query embedding
-            query_embedding = self.generate_embedding(query)
+            if query_embedding is None:
+                query_embedding = self.generate_embedding(query)
             
             # Format metadata filter for ChromaDB
             where_clause = None
@@ -233,6 +282,23 @@ class VectorStore:
             logger.error(f"Error searching vector store: {e}")
             return []
     
+    async def search_similar_async(
+        self,
+        collection_name: str,
+        query: str,
+        n_results: int = 5,
+        filter_metadata: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """Search for similar documents without blocking the event loop"""
+        try:
+            query_embedding = await self.generate_embedding_async(query)
+        except Exception as e:
+            logger.error(f"Error searching vector store: {e}")
+            return []
+        return await asyncio.to_thread(
+            self.search_similar, collection_name, query, n_results, filter_metadata, query_embedding
+        )
+    
     def search_by_metadata(
         self,
         collection_name: str,
@@ -404,6 +470,18 @@ class VectorStore:
             logger.error(f"Error searching similar screenings: {e}")
             return []
     
+    async def search_similar_screenings_async(
+        self,
+        screening_data: Dict[str, Any],
+        n_results: int = 5
+    ) -> List[Dict[str, Any]]:
+        """Search for similar screening results without blocking the event loop"""
+        return await self.search_similar_async(
+            collection_name="screening_results",
+            query=self._create_screening_query(screening_data),
+            n_results=n_results
+        )
+    
     def _create_screening_query(self, screening_data: Dict[str, Any]) -> str:
         """Create search query from screening data"""
         query_parts = []
@@ -434,17 +512,9 @@ class VectorStore:
     ) -> bool:
         """Add a screening result to the vector store"""
         try:
-            # Create text representation
+            # Create text representation and metadata
             text = self._create_screening_text(screening_data, patient_info)
-            
-            # Prepare metadata
-            metadata = {
-                "screening_id": screening_id,
-                "screening_type": screening_data.get("screening_type", "unknown"),
-                "patient_id": patient_info.get("patient_id") if patient_info else None,
-                "assessment": screening_data.get("overall_assessment", "unknown"),
-                "academic_impact": screening_data.get("academic_impact", "unknown")
-            }
+            metadata = self._create_screening_metadata(screening_id, screening_data, patient_info)
             
             # Add to vector store
             return self.add_document(
@@ -458,6 +528,41 @@ class VectorStore:
             logger.error(f"Error adding screening result to vector store: {e}")
             return False
     
+    async def add_screening_result_async(
+        self,
+        screening_id: str,
+        screening_data: Dict[str, Any],
+        patient_info: Optional[Dict[str, Any]] = None
+    ) -> bool:
+        """Add a screening result to the vector store without blocking the event loop"""
+        try:
+            text = self._create_screening_text(screening_data, patient_info)
+            metadata = self._create_screening_metadata(screening_id, screening_data, patient_info)
+        except Exception as e:
+            logger.error(f"Error adding screening result to vector store: {e}")
+            return False
+        return await self.add_document_async(
+            collection_name="screening_results",
+            document_id=screening_id,
+            text=text,
+            metadata=metadata
+        )
+    
+    def _create_screening_metadata(
+        self,
+        screening_id: str,
+        screening_data: Dict[str, Any],
+        patient_info: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Create metadata for a screening result document"""
+        return {
+            "screening_id": screening_id,
+            "screening_type": screening_data.get("screening_type", "unknown"),
+            "patient_id": patient_info.get("patient_id") if patient_info else None,
+            "assessment": screening_data.get("overall_assessment", "unknown"),
+            "academic_impact": screening_data.get("academic_impact", "unknown")
+        }
+    
     def _create_screening_text(
         self,
         screening_data: Dict[str, Any],
@@ -13,6 +13,7 @@ from openai import AsyncOpenAI
 
 from app.core.database import get_database
 from app.core.config import Config
+from app.core.metrics import track_llm_call
 
 class AIService:
     """AI Service for LLM integration and analysis"""
@@ -234,22 +235,25 @@ class AIService:
         try:
             start_time = datetime.utcnow()
             
-            if isinstance(prompt, str):
-                # Single prompt
-                response = await self.client.chat.completions.create(
-                    model=self.config.get("config", {}).get("model_name", "gpt-4"),
-                    messages=[{"role": "user", "content": prompt}],
-                    max_tokens=self.config.get("config", {}).get("max_tokens", 2000),
-                    temperature=self.config.get("config", {}).get("temperature", 0.7)
-                )
-            else:
-                # Conversation messages
-                response = await self.client.chat.completions.create(
-                    model=self.config.get("config", {}).get("model_name", "gpt-4"),
-                    messages=prompt,
-                    max_tokens=self.config.get("config", {}).get("max_tokens", 2000),
-                    temperature=self.config.get("config", {}).get("temperature", 0.7)
-                )
+            model_name = self.config.get("config", {}).get("model_name", "gpt-4")
+            with track_llm_call("openai", model_name) as call:
+                if isinstance(prompt, str):
+                    # Single prompt
+                    response = await self.client.chat.completions.create(
+                        model=model_name,
+                        messages=[{"role": "user", "content": prompt}],
+                        max_tokens=self.config.get("config", {}).get("max_tokens", 2000),
+                        temperature=self.config.get("config", {}).get("temperature", 0.7)
+                    )
+                else:
+                    # Conversation messages
+                    response = await self.client.chat.completions.create(
+                        model=model_name,
+                        messages=prompt,
+                        max_tokens=self.config.get("config", {}).get("max_tokens", 2000),
+                        temperature=self.config.get("config", {}).get("temperature", 0.7)
+                    )
+                call.record_usage(response.usage)
             
             # Update metrics
             self.performance_metrics["total_requests"] += 1
@@ -13,6 +13,7 @@ import asyncio
 
 from app.core.database import get_database
 from app.modules.auth.services.auth_service import AuthService
+from app.modules.line_integration.keyword_index import keyword_index
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/bot", tags=["Bot Manager"])
@@ -134,11 +135,11 @@ async def update_bot_settings(settings: BotSettings):
         settings_dict = settings.dict()
         settings_dict["updated_at"] = datetime.utcnow()
         
-                    await db.bot_settings.update_one(
-                        {},
+        await db.bot_settings.update_one(
+            {},
             {"$set": settings_dict},
-                        upsert=True
-                    )
+            upsert=True
+        )
         
         return {
             "status": "success",
@@ -155,7 +156,7 @@ async def get_keyword_replies():
     try:
         db = await get_db()
         keywords = await db.keyword_replies.find().sort("priority", -1).to_list(None)
-            return {
+        return {
             "status": "success",
             "data": [serialize_mongo_doc(kw) for kw in keywords]
         }
@@ -173,6 +174,7 @@ async def create_keyword_reply(keyword: KeywordReply):
         keyword_dict["updated_at"] = datetime.utcnow()
         
         result = await db.keyword_replies.insert_one(keyword_dict)
+        keyword_index.invalidate()
         
         return {
             "status": "success",
@@ -180,8 +182,8 @@ async def create_keyword_reply(keyword: KeywordReply):
                 "id": str(result.inserted_id),
                 **keyword_dict
             }
-                }
-        except Exception as e:
+        }
+    except Exception as e:
         logger.error(f"Error creating keyword reply: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -203,6 +205,7 @@ async def update_keyword_reply(
             {"_id": ObjectId(keyword_id)},
             {"$set": keyword_dict}
         )
+        keyword_index.invalidate()
         
         if result.modified_count == 0:
             raise HTTPException(status_code=404, detail="Keyword reply not found")
@@ -226,6 +229,7 @@ async def delete_keyword_reply(
         db = await get_db()
         
         result = await db.keyword_replies.delete_one({"_id": ObjectId(keyword_id)})
+        keyword_index.invalidate()
         
         if result.deleted_count == 0:
             raise HTTPException(status_code=404, detail="Keyword reply not found")
@@ -274,7 +278,7 @@ async def create_flex_message(
                 **message_dict
             }
         }
-        except Exception as e:
+    except Exception as e:
         logger.error(f"Error creating flex message: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -315,7 +319,7 @@ async def delete_flex_message(
 ):
     """Delete Flex Message"""
     try:
-            from bson import ObjectId
+        from bson import ObjectId
         db = await get_db()
         
         result = await db.system_flex_messages.delete_one({"_id": ObjectId(message_id)})
@@ -428,8 +432,8 @@ async def get_bot_analytics(
         active_users = await db.line_users.count_documents({
             "last_activity": {"$gte": start_date}
         })
-            
-            return {
+        
+        return {
             "status": "success",
             "data": {
                 "time_period": time_period,
@@ -0,0 +1,120 @@
+"""
+Keyword Reply Index for EVEP Platform
+In-process index over the active keyword_replies documents. Every trigger is
+loaded into one Aho-Corasick automaton, so matching a LINE message costs a
+single pass over its text however many keywords the admins have configured.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.keyword_automaton import KeywordAutomaton
+
+logger = logging.getLogger(__name__)
+
+# Seconds between checks of the keyword_replies change stamp
+KEYWORD_INDEX_REFRESH_SECONDS = 5.0
+
+
+class CompiledKeywords:
+    """Active keyword replies ranked by priority with an automaton over their triggers"""
+
+    def __init__(self, keywords: List[Dict[str, Any]], stamp: Any = None):
+        self.stamp = stamp
+        # Rank 0 is the highest priority; ties keep creation order
+        self.keywords = keywords
+        self.trigger_count = 0
+        self._always: Optional[int] = None
+        triggers: List[Tuple[str, int]] = []
+        for rank, keyword in enumerate(keywords):
+            for trigger in keyword.get("keywords", []):
+                trigger = str(trigger).lower()
+                self.trigger_count += 1
+                if not trigger:
+                    # An empty trigger is contained in every message
+                    self._always = rank if self._always is None else min(self._always, rank)
+                else:
+                    triggers.append((trigger, rank))
+        self._automaton: KeywordAutomaton[int] = KeywordAutomaton(triggers)
+
+    def match(self, text: str) -> Optional[Dict[str, Any]]:
+        """Highest priority keyword with a trigger contained in the text"""
+        ranks = self._automaton.find_all(text.lower())
+        if self._always is not None:
+            ranks.add(self._always)
+        return self.keywords[min(ranks)] if ranks else None
+
+
+class KeywordReplyIndex:
+    """Keyword index shared by every webhook task in the process
+
+    The index is rebuilt only when the collection's change stamp (document
+    count and newest updated_at) moves. The stamp is read at most once per
+    refresh interval, and concurrent messages share a single refresh.
+    Admin writes call invalidate() so this worker sees them on the next message.
+    """
+
+    def __init__(self, refresh_seconds: float = KEYWORD_INDEX_REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self._compiled: Optional[CompiledKeywords] = None
+        self._checked_at = float("-inf")
+        self._refreshing: Optional[asyncio.Future] = None
+        self._stats = {"lookups": 0, "matches": 0, "rebuilds": 0, "stamp_checks": 0}
+
+    def invalidate(self):
+        """Check the change stamp on the next message"""
+        self._checked_at = float("-inf")
+
+    async def find(self, collection, text: str) -> Optional[Dict[str, Any]]:
+        """Highest priority active keyword reply matching the text"""
+        compiled = await self.get(collection)
+        keyword = compiled.match(text)
+        self._stats["lookups"] += 1
+        if keyword is not None:
+            self._stats["matches"] += 1
+        return keyword
+
+    async def get(self, collection) -> CompiledKeywords:
+        if self._compiled is not None and time.monotonic() - self._checked_at < self.refresh_seconds:
+            return self._compiled
+        if self._refreshing is None or self._refreshing.done():
+            self._refreshing = asyncio.ensure_future(self._refresh(collection))
+        try:
+            await asyncio.shield(self._refreshing)
+        except Exception as e:
+            if self._compiled is None:
+                raise
+            # Keep answering from the last good index until the database is back
+            logger.error(f"Error refreshing keyword index, serving previous index: {e}")
+        return self._compiled
+
+    async def _refresh(self, collection):
+        self._stats["stamp_checks"] += 1
+        stamp = await self._stamp(collection)
+        self._checked_at = time.monotonic()
+        if self._compiled is not None and stamp == self._compiled.stamp:
+            return
+        keywords = await collection.find({"is_active": True}).sort([("priority", -1), ("_id", 1)]).to_list(None)
+        self._compiled = CompiledKeywords(keywords, stamp)
+        self._stats["rebuilds"] += 1
+        logger.info(f"Keyword index rebuilt: {len(keywords)} replies, {self._compiled.trigger_count} triggers")
+
+    @staticmethod
+    async def _stamp(collection) -> Tuple[int, Any]:
+        # Inserts and deletes change the count; updates move the newest updated_at
+        count = await collection.count_documents({})
+        newest = await collection.find({}, {"updated_at": 1}).sort("updated_at", -1).limit(1).to_list(1)
+        return count, newest[0].get("updated_at") if newest else None
+
+    def get_stats(self) -> Dict[str, Any]:
+        compiled = self._compiled
+        return {
+            **self._stats,
+            "replies": len(compiled.keywords) if compiled else 0,
+            "triggers": compiled.trigger_count if compiled else 0,
+        }
+
+
+keyword_index = KeywordReplyIndex()
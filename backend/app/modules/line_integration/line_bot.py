@@ -18,6 +18,8 @@ from .db import db
 from .security import get_current_user
 from .schemas import ReadingOut
 from .onboarding_manager import OnboardingManager
+from .keyword_index import keyword_index
+from app.services.notification_dispatcher import notification_dispatcher
 
 logger = logging.getLogger(__name__)
 
@@ -30,6 +32,8 @@ handler = None
 # Telegram Bot configuration - will be initialized from MongoDB
 TELEGRAM_BOT_TOKEN = ""
 TELEGRAM_ADMIN_CHAT_ID = ""
+# Dispatcher account for the admin bot configured here, which may differ from settings.TELEGRAM_BOT_TOKEN
+TELEGRAM_ACCOUNT = "line_bot_telegram"
 
 async def initialize_line_bot():
     """Initialize LINE Bot API and handler from MongoDB settings"""
@@ -46,6 +50,7 @@ async def initialize_line_bot():
         if line_settings["channel_access_token"] and line_settings["channel_secret"]:
             line_bot_api = LineBotApi(line_settings["channel_access_token"])
             handler = WebhookHandler(line_settings["channel_secret"])
+            notification_dispatcher.configure("line", line_settings["channel_access_token"])
             logger.info("LINE Bot initialized successfully from MongoDB settings")
         else:
             logger.warning("LINE Bot not initialized - missing credentials in MongoDB")
@@ -53,6 +58,7 @@ async def initialize_line_bot():
         # Initialize Telegram settings
         TELEGRAM_BOT_TOKEN = telegram_settings["telegram_bot_token"]
         TELEGRAM_ADMIN_CHAT_ID = telegram_settings["telegram_admin_chat_id"]
+        notification_dispatcher.configure(TELEGRAM_ACCOUNT, TELEGRAM_BOT_TOKEN)
         
     except Exception as e:
         logger.error(f"Error initializing LINE Bot from MongoDB: {str(e)}")
@@ -72,27 +78,18 @@ def get_webhook_handler():
     return handler
 
 def send_telegram_notification(message: str):
-    """Send notification to Telegram admin bot"""
+    """Queue a notification to the Telegram admin bot; returns without waiting for Telegram"""
     if not TELEGRAM_BOT_TOKEN or not TELEGRAM_ADMIN_CHAT_ID:
         logger.warning("Telegram notification skipped - missing credentials")
         return
     
-    import requests
-    url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
-    data = {
-        "chat_id": TELEGRAM_ADMIN_CHAT_ID,
-        "text": message,
-        "parse_mode": "HTML"
-    }
-    try:
-        logger.debug(f"Sending Telegram notification to {TELEGRAM_ADMIN_CHAT_ID}")
-        response = requests.post(url, json=data)
-        if response.status_code == 200:
-            logger.info("Telegram notification sent successfully")
-        else:
-            logger.error(f"Telegram notification failed with status {response.status_code}")
-    except Exception as e:
-        logger.error(f"Failed to send Telegram notification: {e}")
+    logger.debug(f"Queueing Telegram notification to {TELEGRAM_ADMIN_CHAT_ID}")
+    notification_dispatcher.submit(
+        "telegram",
+        "sendMessage",
+        {"chat_id": TELEGRAM_ADMIN_CHAT_ID, "text": message, "parse_mode": "HTML"},
+        account=TELEGRAM_ACCOUNT,
+    )
 
 def create_glucose_summary_flex(reading: Dict[str, Any]) -> FlexSendMessage:
     """Create Flex message for glucose reading summary"""
@@ -1015,10 +1012,10 @@ async def handle_follow(event):
                 # Create custom Flex message with quick replies
                 from .bot_manager import create_custom_welcome_flex_message
                 welcome_flex = create_custom_welcome_flex_message(user_info, welcome_msg)
-                api.reply_message(event.reply_token, welcome_flex)
+                await notification_dispatcher.line_reply(event.reply_token, welcome_flex)
             else:
                 # Send simple text message
-                api.reply_message(
+                await notification_dispatcher.line_reply(
                     event.reply_token,
                     TextSendMessage(text=welcome_msg.get("text", "Welcome to DiaCare Buddy!"))
                 )
@@ -1029,7 +1026,7 @@ async def handle_follow(event):
         else:
             # Use default welcome message
             welcome_flex = await create_welcome_flex_message(user_info)
-            api.reply_message(event.reply_token, welcome_flex)
+            await notification_dispatcher.line_reply(event.reply_token, welcome_flex)
         
         logger.info(f"Welcome message sent to user: {user_id}")
         
@@ -1046,7 +1043,7 @@ async def handle_follow(event):
         # Send simple welcome message as fallback
         api = get_line_bot_api()
         if api is not None:
-            api.reply_message(
+            await notification_dispatcher.line_reply(
                 event.reply_token,
                 TextSendMessage(text="สวัสดี! ยินดีต้อนรับสู่ DiaCare Buddy 🤖\n\nพิมพ์ 'ข้อมูลปริมาณน้ำตาลในเลือดย้อนหลัง' เพื่อดูประวัติการตรวจของคุณ")
             )
@@ -1160,7 +1157,7 @@ async def send_onboarding_step(user_id: str, step: dict):
         else:
             message = TextSendMessage(text=content.get("text", ""))
         
-        api.push_message(user_id, message)
+        await notification_dispatcher.line_push(user_id, message)
         logger.info(f"Onboarding step {step.get('step', 0)} sent to user: {user_id}")
         
     except Exception as e:
@@ -1236,11 +1233,11 @@ async def handle_onboarding_response(event, user_id: str, text: str, onboarding_
                 completion_message = TextSendMessage(
                     text="🎉 ขอบคุณสำหรับการให้ข้อมูล! การตั้งค่าเสร็จสิ้นแล้ว\n\nตอนนี้คุณสามารถใช้บริการของเราได้แล้ว"
                 )
-                api.reply_message(event.reply_token, completion_message)
+                await notification_dispatcher.line_reply(event.reply_token, completion_message)
                 
                 # Send welcome message with main menu
                 flex_message = create_history_selection_flex()
-                api.push_message(user_id, flex_message)
+                await notification_dispatcher.line_push(user_id, flex_message)
             
             logger.info(f"Onboarding completed for user: {user_id}")
         else:
@@ -1252,7 +1249,7 @@ async def handle_onboarding_response(event, user_id: str, text: str, onboarding_
             api = get_line_bot_api()
             if api:
                 ack_message = TextSendMessage(text="✅ ได้รับข้อมูลแล้ว! ขั้นตอนถัดไป...")
-                api.reply_message(event.reply_token, ack_message)
+                await notification_dispatcher.line_reply(event.reply_token, ack_message)
         
     except Exception as e:
         logger.error(f"Error handling onboarding response for user {user_id}: {e}")
@@ -1260,16 +1257,11 @@ async def handle_onboarding_response(event, user_id: str, text: str, onboarding_
 async def find_matching_keyword(user_text: str) -> Optional[dict]:
     """Find the highest priority keyword that matches user text"""
     try:
-        # Get all active keywords sorted by priority (highest first)
-        keywords = await db.keyword_replies.find({"is_active": True}).sort("priority", -1).to_list(None)
-        
-        for keyword in keywords:
-            for trigger in keyword.get("keywords", []):
-                if trigger.lower() in user_text.lower():
-                    logger.info(f"Keyword match found: '{trigger}' in user text")
-                    return keyword
-        
-        return None
+        # Served from the shared in-process index, rebuilt only when keyword replies change
+        keyword = await keyword_index.find(db.keyword_replies, user_text)
+        if keyword:
+            logger.info(f"Keyword match found: {keyword.get('keywords', [])} in user text")
+        return keyword
     except Exception as e:
         logger.error(f"Error finding matching keyword: {str(e)}")
         return None
@@ -1386,13 +1378,13 @@ async def send_keyword_response(api, reply_token: str, keyword: dict):
             logger.warning(f"Invalid message type: {message_type}")
             message = TextSendMessage(text="Invalid message type")
         
-        api.reply_message(reply_token, message)
+        await notification_dispatcher.line_reply(reply_token, message)
         logger.info(f"Keyword response sent successfully - Type: {message_type}")
         
     except Exception as e:
         logger.error(f"Error sending keyword response: {str(e)}")
         # Fallback to text message
-        api.reply_message(reply_token, TextSendMessage(text="เกิดข้อผิดพลาดในการส่งข้อความ"))
+        await notification_dispatcher.line_reply(reply_token, TextSendMessage(text="เกิดข้อผิดพลาดในการส่งข้อความ"))
 
 async def handle_regular_message(event, user_id: str, text: str, api):
     """Handle regular (non-onboarding) messages with keyword matching"""
@@ -1411,7 +1403,7 @@ async def handle_regular_message(event, user_id: str, text: str, api):
         # Send history selection flex message
         logger.info(f"History request from user {user_id}")
         flex_message = create_history_selection_flex()
-        api.reply_message(event.reply_token, flex_message)
+        await notification_dispatcher.line_reply(event.reply_token, flex_message)
         logger.info(f"History selection sent to user {user_id}")
         
         # Track message statistics for analytics
@@ -1419,7 +1411,7 @@ async def handle_regular_message(event, user_id: str, text: str, api):
     else:
         # Default response
         logger.debug(f"Default response sent to user {user_id}")
-        api.reply_message(
+        await notification_dispatcher.line_reply(
             event.reply_token,
             TextSendMessage(text="พิมพ์ 'ข้อมูลปริมาณน้ำตาลในเลือดย้อนหลัง' เพื่อดูประวัติการตรวจของคุณ")
         )
@@ -1443,7 +1435,7 @@ async def handle_postback(event):
         # Send history selection message
         logger.info(f"Welcome start button clicked by user {user_id}")
         flex_message = create_history_selection_flex()
-        api.reply_message(event.reply_token, flex_message)
+        await notification_dispatcher.line_reply(event.reply_token, flex_message)
         logger.info(f"History selection sent to user {user_id} after welcome start")
     elif data.startswith("history_"):
         # Schedule async processing
@@ -1454,13 +1446,13 @@ async def handle_postback(event):
         # Send LIFF apps selection
         logger.info(f"LIFF apps request from user {user_id}")
         liff_flex = await create_liff_buttons_flex()
-        api.reply_message(event.reply_token, liff_flex)
+        await notification_dispatcher.line_reply(event.reply_token, liff_flex)
         logger.info(f"LIFF apps selection sent to user {user_id}")
     elif data == "main_menu":
         # Send main menu
         logger.info(f"Main menu request from user {user_id}")
         main_menu_flex = create_main_menu_flex()
-        api.reply_message(event.reply_token, main_menu_flex)
+        await notification_dispatcher.line_reply(event.reply_token, main_menu_flex)
         logger.info(f"Main menu sent to user {user_id}")
 
 async def process_history_request(event, user_id: str, data: str):
@@ -1513,7 +1505,7 @@ async def process_history_request(event, user_id: str, data: str):
     flex_message = create_history_summary_flex(user_id, period, readings_list, stats)
     api = get_line_bot_api()
     if api is not None:
-        api.reply_message(event.reply_token, flex_message)
+        await notification_dispatcher.line_reply(event.reply_token, flex_message)
         logger.info(f"History summary sent to user {user_id} for period {period}")
     else:
         logger.error("LINE Bot API not initialized for history summary")
@@ -1526,7 +1518,7 @@ async def send_glucose_summary_to_user(user_id: str, reading: Dict[str, Any]):
         flex_message = create_glucose_summary_flex(reading)
         api = get_line_bot_api()
         if api is not None:
-            api.push_message(user_id, flex_message)
+            await notification_dispatcher.line_push(user_id, flex_message)
             logger.info(f"Glucose summary sent to user {user_id}")
             
             # Track message statistics for analytics
@@ -17,6 +17,7 @@ from linebot.models import (
 
 from app.core.database import get_database
 from app.core.config import Config
+from app.services.notification_dispatcher import notification_dispatcher
 
 class LineBotService:
     """LINE Bot Service for EVEP Platform"""
@@ -40,6 +41,7 @@ class LineBotService:
         
         if self.channel_access_token:
             self.line_bot_api = LineBotApi(self.channel_access_token)
+            notification_dispatcher.configure("line", self.channel_access_token)
             print("✅ LINE Bot API initialized")
         else:
             print("⚠️  LINE Channel Access Token not found. LINE features will be limited.")
@@ -62,15 +64,17 @@ class LineBotService:
             else:
                 line_message = TextSendMessage(text=message)
             
-            # Send message
-            response = self.line_bot_api.push_message(user_id, line_message)
+            # Send message (rate limited and retried; failures are dead-lettered)
+            sent = await notification_dispatcher.line_push(user_id, line_message)
             
             # Log message
-            await self._log_message(user_id, message, message_type, "sent")
+            await self._log_message(user_id, message, message_type, "sent" if sent else "failed")
+            if not sent:
+                return {"error": "LINE message could not be delivered"}
             
             return {
                 "status": "success",
-                "message_id": response.message_id if hasattr(response, 'message_id') else None,
+                "message_id": None,
                 "sent_at": datetime.utcnow().isoformat()
             }
             
@@ -93,8 +97,10 @@ class LineBotService:
             else:
                 line_message = TextSendMessage(text=message)
             
-            # Broadcast message
-            response = self.line_bot_api.multicast(user_ids, line_message)
+            # Broadcast message, split into multicasts of up to 500 recipients
+            sent = await notification_dispatcher.line_multicast(user_ids, line_message)
+            if not sent:
+                return {"error": "LINE broadcast could not be delivered to every recipient"}
             
             # Log broadcast
             await self._log_broadcast(message, message_type, len(user_ids))
@@ -0,0 +1,389 @@
+"""
+Thai address autocomplete for EVEP Platform
+Prefix tries over the folded Thai and English words of every province,
+district and subdistrict name, one trie per level, plus a trie of subdistrict
+zipcodes for reverse lookup. One call returns fully qualified matches
+(subdistrict, district, province, zipcode), so address entry no longer walks
+province -> district -> subdistrict through separate regex searches. The
+index is built from the master data cache snapshots and rebuilt in a worker
+thread when their versions change, serving the previous index meanwhile.
+"""
+
+import asyncio
+import heapq
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from app.services.master_data import MasterDataCache, MasterTable, master_data_cache
+from app.services.search_index import fold, words
+
+logger = logging.getLogger(__name__)
+
+PROVINCE, DISTRICT, SUBDISTRICT = 0, 1, 2
+LEVELS = ("province", "district", "subdistrict")
+
+# Administrative words written in front of a name, with or without a space
+# ("ต.บางรัก", "อำเภอเมืองเชียงใหม่", "Amphoe Mueang"); names are also indexed
+# without them and queries drop them
+ADMIN_PREFIXES = tuple(fold(prefix) for prefix in ("จังหวัด", "อำเภอ", "ตำบล", "แขวง", "เขต"))
+ADMIN_WORDS = frozenset(fold(word) for word in (
+    "จังหวัด", "อำเภอ", "ตำบล", "แขวง", "เขต", "จ", "อ", "ต",
+    "changwat", "amphoe", "tambon", "khet", "khwaeng", "province", "district", "subdistrict"))
+# "เมือง" leads the name of every capital district, which is also found by the rest of its name
+INDEX_PREFIXES = ADMIN_PREFIXES + (fold("เมือง"),)
+
+# Trie nodes covering this many places keep the set, so short prefixes and
+# common province names do not union hundreds of descendant sets per keystroke
+COVERED_CACHE_MIN_PLACES = 256
+
+# Query words whose matches are kept per index; every keystroke repeats the earlier words
+WORD_CACHE_SIZE = 2048
+
+# Words of a query that are matched; a full address never needs more and pasted text is cut off
+MAX_QUERY_WORDS = 6
+
+
+def name_parts(name: Any) -> Tuple[str, Optional[str]]:
+    """Thai and English name of a document stored as a string or as {"th": ..., "en": ...}"""
+    if isinstance(name, dict):
+        return str(name.get("th") or name.get("en") or ""), name.get("en")
+    return str(name or ""), None
+
+
+def index_keys(*texts: Optional[str]) -> Tuple[str, ...]:
+    """Folded words of names, plus each word without a leading administrative prefix"""
+    keys: List[str] = []
+    for text in texts:
+        for word in words(text):
+            while word:
+                if word not in keys:
+                    keys.append(word)
+                word = next((word[len(prefix):] for prefix in INDEX_PREFIXES if word.startswith(prefix)), "")
+    return tuple(keys)
+
+
+def address_tokens(text: str) -> List[str]:
+    """Folded query tokens without administrative words"""
+    tokens: List[str] = []
+    for word in words(text):
+        for prefix in ADMIN_PREFIXES:
+            if word.startswith(prefix) and len(word) > len(prefix):
+                word = word[len(prefix):]
+                break
+        if word not in tokens:
+            tokens.append(word)
+    return [token for token in tokens if token not in ADMIN_WORDS] or tokens
+
+
+class TrieNode:
+    """Node of a prefix trie; places are the ones with a key ending here"""
+
+    __slots__ = ("children", "places", "subtree", "covered")
+
+    def __init__(self):
+        self.children: Optional[Dict[str, "TrieNode"]] = None
+        self.places: Any = []
+        # Places of every key under this node, exact keys first, then in key order
+        self.subtree: Tuple[int, ...] = ()
+        # Subtree places and everything under them, kept once computed for short prefixes
+        self.covered: Optional[FrozenSet[int]] = None
+
+
+class PrefixTrie:
+    """Character trie from folded keys to place positions"""
+
+    __slots__ = ("root", "nodes")
+
+    def __init__(self):
+        self.root = TrieNode()
+        self.nodes = 1
+
+    def insert(self, key: str, place: int) -> None:
+        node = self.root
+        for char in key:
+            if node.children is None:
+                node.children = {}
+            child = node.children.get(char)
+            if child is None:
+                child = node.children[char] = TrieNode()
+                self.nodes += 1
+            node = child
+        node.places.append(place)
+
+    def find(self, prefix: str) -> Optional[TrieNode]:
+        node = self.root
+        for char in prefix:
+            if node.children is None:
+                return None
+            node = node.children.get(char)
+            if node is None:
+                return None
+        return node
+
+    def finalize(self) -> None:
+        """Sort children, freeze place lists and collect each subtree in key order"""
+
+        def visit(node: TrieNode) -> Tuple[int, ...]:
+            node.places = tuple(node.places)
+            subtree = list(node.places)
+            if node.children:
+                node.children = dict(sorted(node.children.items()))
+                for child in node.children.values():
+                    subtree.extend(visit(child))
+            node.subtree = tuple(subtree)
+            return node.subtree
+
+        visit(self.root)
+
+
+class Place:
+    """A province, district or subdistrict with its ancestors and descendants"""
+
+    __slots__ = ("level", "id", "name", "name_en", "zipcode", "chain", "descendants", "keys")
+
+    def __init__(self, level: int, document: Dict[str, Any]):
+        self.level = level
+        self.id = str(document["_id"])
+        self.name, self.name_en = name_parts(document.get("name"))
+        self.zipcode = str(document.get("zipcode") or "") if level == SUBDISTRICT else ""
+        # Positions of this place and its district and province, most specific first
+        self.chain: Tuple[int, ...] = ()
+        self.descendants: Any = []
+        self.keys = index_keys(self.name, self.name_en) + ((self.zipcode,) if self.zipcode else ())
+
+
+class WordMatch(NamedTuple):
+    """Places a query word prefix-matches, exactly matches, and covers with their descendants"""
+    direct: FrozenSet[int]
+    exact: FrozenSet[int]
+    covered: FrozenSet[int]
+
+
+class AddressIndex:
+    """Autocomplete index over one version of the Thai geographic hierarchy"""
+
+    def __init__(
+        self,
+        provinces: Iterable[Dict[str, Any]],
+        districts: Iterable[Dict[str, Any]],
+        subdistricts: Iterable[Dict[str, Any]],
+        tables: Tuple[MasterTable, ...] = (),
+    ):
+        started = time.perf_counter()
+        self.tables = tables
+        self.places: List[Place] = []
+        positions: Dict[Tuple[int, str], int] = {}
+        # Places are numbered by level, then name, so position order is the ranking tie-break
+        self.levels: List[FrozenSet[int]] = []
+        for level, documents in ((PROVINCE, provinces), (DISTRICT, districts), (SUBDISTRICT, subdistricts)):
+            first = len(self.places)
+            for place, document in sorted(((Place(level, document), document) for document in documents), key=lambda pair: pair[0].name):
+                positions[level, place.id] = len(self.places)
+                self.places.append(place)
+                parents = []
+                if level == SUBDISTRICT:
+                    parents.append(positions.get((DISTRICT, str(document.get("districtId")))))
+                if level >= DISTRICT:
+                    province = positions.get((PROVINCE, str(document.get("provinceId"))))
+                    if province is None and parents and parents[0] is not None:
+                        province = self.places[parents[0]].chain[1] if len(self.places[parents[0]].chain) > 1 else None
+                    parents.append(province)
+                place.chain = (positions[level, place.id],) + tuple(parent for parent in parents if parent is not None)
+                for ancestor in place.chain[1:]:
+                    self.places[ancestor].descendants.append(place.chain[0])
+            self.levels.append(frozenset(range(first, len(self.places))))
+
+        self.tries = [PrefixTrie() for _ in LEVELS]
+        self.zipcodes = PrefixTrie()
+        for position, place in enumerate(self.places):
+            for key in place.keys:
+                if key == place.zipcode:
+                    self.zipcodes.insert(key, position)
+                else:
+                    self.tries[place.level].insert(key, position)
+        for trie in self.tries + [self.zipcodes]:
+            trie.finalize()
+        for place in self.places:
+            place.descendants = frozenset(place.descendants)
+        self._matches: "OrderedDict[str, WordMatch]" = OrderedDict()
+        self.build_seconds = time.perf_counter() - started
+
+    @classmethod
+    def from_tables(cls, provinces: MasterTable, districts: MasterTable, subdistricts: MasterTable) -> "AddressIndex":
+        return cls(
+            (record.document for record in provinces.records),
+            (record.document for record in districts.records),
+            (record.document for record in subdistricts.records),
+            tables=(provinces, districts, subdistricts),
+        )
+
+    def __len__(self) -> int:
+        return len(self.places)
+
+    def _nodes(self, token: str, levels: Tuple[int, ...]) -> List[Tuple[int, TrieNode]]:
+        """Trie nodes of a token by level; digits are looked up as subdistrict zipcodes"""
+        if token.isdigit():
+            node = self.zipcodes.find(token) if SUBDISTRICT in levels else None
+            return [(SUBDISTRICT, node)] if node is not None else []
+        return [(level, node) for level, node in ((level, self.tries[level].find(token)) for level in levels) if node is not None]
+
+    def _covered(self, node: TrieNode) -> FrozenSet[int]:
+        """Places under a trie node and every place below them in the hierarchy"""
+        if node.covered is not None:
+            return node.covered
+        covered = frozenset(node.subtree).union(*(self.places[position].descendants for position in node.subtree))
+        if len(covered) >= COVERED_CACHE_MIN_PLACES:
+            node.covered = covered
+        return covered
+
+    def _match(self, token: str) -> Optional[WordMatch]:
+        """Places a query word matches, from the word cache; None when it matches nothing"""
+        match = self._matches.get(token)
+        if match is not None:
+            self._matches.move_to_end(token)
+            return match
+        nodes = [node for _, node in self._nodes(token, (PROVINCE, DISTRICT, SUBDISTRICT))]
+        if not nodes:
+            return None
+        match = WordMatch(
+            direct=frozenset().union(*(node.subtree for node in nodes)),
+            covered=frozenset().union(*(self._covered(node) for node in nodes)),
+            exact=frozenset().union(*(node.places for node in nodes)),
+        )
+        self._matches[token] = match
+        if len(self._matches) > WORD_CACHE_SIZE:
+            self._matches.popitem(last=False)
+        return match
+
+    def search(self, text: str, limit: int = 10, level: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Ranked fully qualified matches of a typed address
+
+        Every word has to prefix-match the place or one of its ancestors, and
+        the place itself at least one word, so "บางรัก" lists places named
+        บางรัก and "ban chiang mai" the places named Ban... in Chiang Mai.
+        Places matching more of the words themselves come first, then ones
+        with an exact word, then provinces before districts before
+        subdistricts, then by name. Only the first MAX_QUERY_WORDS words count.
+        """
+        tokens = address_tokens(text)[:MAX_QUERY_WORDS]
+        if not tokens:
+            return []
+        levels = (LEVELS.index(level),) if level else (PROVINCE, DISTRICT, SUBDISTRICT)
+
+        if len(tokens) == 1:
+            token = tokens[0]
+            ranked: List[Tuple[bool, int, int, int]] = []
+            for _, node in self._nodes(token, levels):
+                seen: Set[int] = set()
+                for position in node.subtree:
+                    if position in seen:
+                        continue
+                    seen.add(position)
+                    ranked.append((token not in self.places[position].keys, self.places[position].level, len(ranked), position))
+                    if len(seen) >= limit:
+                        break
+            return [self.describe(position) for *_, position in sorted(ranked)[:limit]]
+
+        matches = [self._match(token) for token in tokens]
+        if any(match is None for match in matches):
+            return []
+        direct = [match.direct for match in matches]
+        exact = frozenset().union(*(match.exact for match in matches))
+        valid = set().union(*direct).intersection(*(match.covered for match in matches))
+        if level:
+            valid &= self.levels[levels[0]]
+        if not valid:
+            return []
+
+        # How many words match each place itself; positions already follow level and name
+        counts = dict.fromkeys(valid, 0)
+        for places in direct:
+            for position in valid.intersection(places):
+                counts[position] += 1
+        results = heapq.nsmallest(limit, valid, key=lambda position: (-counts[position], position not in exact, position))
+        return [self.describe(position) for position in results]
+
+    def by_zipcode(self, zipcode: str) -> List[Dict[str, Any]]:
+        """Subdistricts with exactly this zipcode"""
+        node = self.zipcodes.find(fold(zipcode.strip()))
+        return [self.describe(position) for position in node.places] if node is not None else []
+
+    def _reference(self, place: Optional[Place]) -> Optional[Dict[str, Any]]:
+        if place is None:
+            return None
+        return {"id": place.id, "name": place.name, "name_en": place.name_en}
+
+    def describe(self, position: int) -> Dict[str, Any]:
+        """Fully qualified match of a place"""
+        place = self.places[position]
+        by_level: List[Optional[Place]] = [None, None, None]
+        for ancestor in place.chain:
+            by_level[self.places[ancestor].level] = self.places[ancestor]
+        names = [link.name for link in reversed(by_level) if link is not None]
+        return {
+            "level": LEVELS[place.level],
+            "province": self._reference(by_level[PROVINCE]),
+            "district": self._reference(by_level[DISTRICT]),
+            "subdistrict": self._reference(by_level[SUBDISTRICT]),
+            "zipcode": place.zipcode or None,
+            "label": " ".join([", ".join(names)] + ([place.zipcode] if place.zipcode else [])),
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "places": {name: sum(1 for place in self.places if place.level == level) for level, name in enumerate(LEVELS)},
+            "trie_nodes": sum(trie.nodes for trie in self.tries),
+            "zipcode_nodes": self.zipcodes.nodes,
+            "cached_words": len(self._matches),
+            "build_seconds": round(self.build_seconds, 3),
+        }
+
+
+class AddressAutocomplete:
+    """Keeps an AddressIndex built from the current master data snapshots"""
+
+    def __init__(self, cache: MasterDataCache):
+        self.cache = cache
+        self._index: Optional[AddressIndex] = None
+        self._building: Optional[asyncio.Task] = None
+        self._builds = 0
+
+    async def index(self) -> Optional[AddressIndex]:
+        """
+        Current index; None until the master data is loaded
+
+        When a snapshot changed the index is rebuilt off the event loop and
+        the previous one keeps being served until the new one is ready. Only
+        the first build is waited for.
+        """
+        tables = tuple(self.cache.table(kind) for kind in ("provinces", "districts", "subdistricts"))
+        if any(table is None for table in tables):
+            return None
+        if self._index is None or any(built is not table for built, table in zip(self._index.tables, tables)):
+            if self._building is None:
+                self._building = asyncio.get_running_loop().create_task(self._build(tables))
+            if self._index is None:
+                await asyncio.shield(self._building)
+        return self._index
+
+    async def _build(self, tables: Tuple[MasterTable, ...]) -> None:
+        try:
+            index = await asyncio.to_thread(AddressIndex.from_tables, *tables)
+        except Exception as e:
+            logger.error(f"Address index build failed: {e}")
+            return
+        finally:
+            self._building = None
+        self._index = index
+        self._builds += 1
+        logger.info(f"Address index built over {len(index)} places in {index.build_seconds:.2f}s")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"builds": self._builds, **(self._index.get_stats() if self._index is not None else {})}
+
+
+# Global address autocomplete instance
+address_autocomplete = AddressAutocomplete(master_data_cache)
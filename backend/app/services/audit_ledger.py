@@ -0,0 +1,365 @@
+"""
+Audit ledger for EVEP Platform
+Append-only, hash-chained ledger over audit_logs. A background sealer takes
+unsealed events in _id order and hashes the stored BSON of each event into a
+leaf of a Merkle tree. It records the tree's root in audit_ledger as the next block,
+chained to the previous block's hash. Every sealed event is stamped with its
+block and leaf index. One event can then be proved with O(log n) sibling
+hashes, and a range of blocks can be verified incrementally from a trusted
+checkpoint, with the rehashing spread across worker processes.
+"""
+
+import asyncio
+import logging
+import os
+import socket
+import struct
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import bson
+from bson import ObjectId
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.database import get_audit_ledger_collection, get_audit_logs_collection
+from app.utils.blockchain import (
+    GENESIS_HASH,
+    chain_hash,
+    leaf_hash,
+    merkle_levels,
+    merkle_proof,
+    merkle_root,
+    verify_merkle_proof,
+)
+
+logger = logging.getLogger(__name__)
+
+LEASE_ID = "sealer"
+RAW_CODEC_OPTIONS = CodecOptions(document_class=RawBSONDocument)
+# Element header and embedded document header of ledger_stamp(), 27 bytes long
+STAMP_PREFIX = b"\x03ledger\x00" + struct.pack("<i", 27) + b"\x10block\x00"
+# Blocks handed to one verification worker call
+VERIFY_CHUNK_BLOCKS = 16
+
+
+def raw_event_id(raw: bytes) -> Any:
+    """_id of a raw BSON event without decoding the rest of it"""
+    # MongoDB stores _id first, so an ObjectId _id sits at a fixed offset
+    if raw[4:9] == b"\x07_id\x00":
+        return ObjectId(raw[9:21])
+    return bson.decode(raw)["_id"]
+
+
+def ledger_stamp(block: int, index: int) -> bytes:
+    """BSON element that sealing appends to an event: ledger: {block, index}"""
+    # Same bytes as bson.encode({"block": block, "index": index}) with int32 values, built directly
+    return STAMP_PREFIX + struct.pack("<i", block) + b"\x10index\x00" + struct.pack("<i", index) + b"\x00"
+
+
+def event_leaf(raw: bytes, stamp: Optional[bytes] = None) -> Optional[bytes]:
+    """
+    Leaf hash of an audit event's stored BSON, as it was when sealed
+
+    Sealing appends the ledger stamp as the event's last field; passing the
+    expected stamp cuts it off again. Returns None when the event does not end
+    with that stamp.
+    """
+    if stamp is not None:
+        if raw[-1 - len(stamp):-1] != stamp:
+            return None
+        raw = struct.pack("<i", len(raw) - len(stamp)) + raw[4:-1 - len(stamp)] + b"\x00"
+    return leaf_hash(raw)
+
+
+def verify_blocks(blocks: Sequence[Dict[str, Any]], raw_events: Sequence[bytes]) -> List[Dict[str, Any]]:
+    """
+    Recompute the Merkle roots of ledger blocks from the raw BSON of their events
+
+    Runs in a worker process. Returns one error entry per block whose events
+    are missing or altered.
+    """
+    stored = {raw_event_id(raw): raw for raw in raw_events}
+    errors = []
+    for block in blocks:
+        missing = [str(event_id) for event_id in block["event_ids"] if event_id not in stored]
+        if missing:
+            errors.append({"block": block["_id"], "error": "missing_events", "event_ids": missing})
+            continue
+        leaves = [
+            event_leaf(stored[event_id], ledger_stamp(block["_id"], index))
+            for index, event_id in enumerate(block["event_ids"])
+        ]
+        if None in leaves:
+            errors.append({"block": block["_id"], "error": "stamp_mismatch", "index": leaves.index(None)})
+        elif merkle_root(leaves).hex() != block["merkle_root"]:
+            errors.append({"block": block["_id"], "error": "merkle_root_mismatch"})
+    return errors
+
+
+class AuditLedger:
+    """Seals audit_logs into hash-chained Merkle blocks and verifies them"""
+
+    def __init__(
+        self,
+        get_events: Callable[[], Any] = get_audit_logs_collection,
+        get_ledger: Callable[[], Any] = get_audit_ledger_collection,
+        block_size: int = settings.AUDIT_LEDGER_BLOCK_SIZE,
+        seal_interval_seconds: float = settings.AUDIT_LEDGER_SEAL_INTERVAL_SECONDS,
+        lease_seconds: float = settings.AUDIT_LEDGER_LEASE_SECONDS,
+        verify_workers: int = settings.AUDIT_LEDGER_VERIFY_WORKERS,
+    ):
+        self.get_events = get_events
+        self.get_ledger = get_ledger
+        self.block_size = max(1, block_size)
+        self.seal_interval_seconds = seal_interval_seconds
+        self.lease_seconds = lease_seconds
+        self.verify_workers = verify_workers
+        self.instance_id = f"{socket.gethostname()}:{os.getpid()}:{id(self)}"
+        self._task: Optional[asyncio.Task] = None
+        self._stats = {"blocks_sealed": 0, "events_sealed": 0, "last_block": None, "seal_errors": 0}
+
+    async def _acquire_lease(self) -> bool:
+        """Only one worker process seals at a time; the lease lapses if its holder dies"""
+        now = datetime.utcnow()
+        try:
+            await self.get_ledger().find_one_and_update(
+                {"_id": LEASE_ID, "$or": [{"holder": self.instance_id}, {"expires_at": {"$lt": now}}]},
+                {"$set": {"holder": self.instance_id, "expires_at": now + timedelta(seconds=self.lease_seconds)}},
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            return False
+        return True
+
+    def _raw_events(self) -> Any:
+        # Events are hashed exactly as stored, so they are read as undecoded BSON
+        return self.get_events().with_options(codec_options=RAW_CODEC_OPTIONS)
+
+    async def head(self) -> Optional[Dict[str, Any]]:
+        """Latest block, or None for an empty ledger"""
+        # Numeric _id comparison skips the lease document
+        return await self.get_ledger().find_one({"_id": {"$gte": 0}}, sort=[("_id", -1)])
+
+    async def _stamp(self, block: Dict[str, Any]) -> None:
+        """Record each event's block and leaf index, then mark the block complete"""
+        await self.get_events().bulk_write([
+            UpdateOne({"_id": event_id}, {"$set": {"ledger": {"block": block["_id"], "index": index}}})
+            for index, event_id in enumerate(block["event_ids"])
+        ], ordered=False)
+        await self.get_ledger().update_one({"_id": block["_id"]}, {"$set": {"complete": True}})
+
+    async def seal_block(self) -> int:
+        """Seal the oldest unsealed events into one block; returns how many were sealed"""
+        head = await self.head()
+        if head and not head.get("complete"):
+            # The previous sealer stopped between writing the block and stamping its events
+            await self._stamp(head)
+
+        events = await (self._raw_events().find({"ledger.block": None}).sort("_id", 1)
+                        .limit(self.block_size).to_list(None))
+        if not events:
+            return 0
+
+        seq = head["_id"] + 1 if head else 0
+        prev_hash = head["block_hash"] if head else GENESIS_HASH
+        root = merkle_root([event_leaf(event.raw) for event in events]).hex()
+        block = {
+            "_id": seq,
+            "prev_hash": prev_hash,
+            "merkle_root": root,
+            "block_hash": chain_hash(prev_hash, root, seq, len(events)),
+            "count": len(events),
+            "event_ids": [raw_event_id(event.raw) for event in events],
+            "sealed_at": datetime.utcnow(),
+            "complete": False,
+        }
+        try:
+            await self.get_ledger().insert_one(block)
+        except DuplicateKeyError:
+            # Another sealer took this sequence number; its lease had lapsed under us
+            logger.warning(f"Audit ledger block {seq} already sealed elsewhere")
+            return 0
+        await self._stamp(block)
+
+        self._stats["blocks_sealed"] += 1
+        self._stats["events_sealed"] += len(events)
+        self._stats["last_block"] = seq
+        metrics.AUDIT_LEDGER_SEALED.inc(len(events))
+        return len(events)
+
+    async def seal(self) -> int:
+        """Seal every unsealed event, one block at a time, if this process holds the lease"""
+        sealed = 0
+        while await self._acquire_lease():
+            count = await self.seal_block()
+            sealed += count
+            if count < self.block_size:
+                break
+        return sealed
+
+    async def prove(self, event_id: ObjectId) -> Optional[Dict[str, Any]]:
+        """Inclusion proof for one sealed event; None if it does not exist or is not sealed yet"""
+        event = await self.get_events().find_one({"_id": event_id}, {"ledger": 1})
+        if not event or not event.get("ledger"):
+            return None
+        block = await self.get_ledger().find_one({"_id": event["ledger"]["block"]})
+        events = await self._raw_events().find({"_id": {"$in": block["event_ids"]}}).to_list(None)
+        stored = {raw_event_id(document.raw): document.raw for document in events}
+        leaves = [
+            event_leaf(stored[stored_id], ledger_stamp(block["_id"], index)) if stored_id in stored else None
+            for index, stored_id in enumerate(block["event_ids"])
+        ]
+        index = event["ledger"]["index"]
+        if None in leaves:
+            # Siblings are missing or altered; the full verification reports which
+            leaves = [leaf or bytes(32) for leaf in leaves]
+        levels = merkle_levels(leaves)
+        return {
+            "event_id": str(event_id),
+            "block": block["_id"],
+            "index": index,
+            "leaf": levels[0][index].hex(),
+            "proof": merkle_proof(levels, index),
+            "merkle_root": block["merkle_root"],
+            "prev_hash": block["prev_hash"],
+            "block_hash": block["block_hash"],
+            "count": block["count"],
+        }
+
+    @staticmethod
+    def verify_proof(proof: Dict[str, Any], raw_event: Optional[bytes] = None) -> bool:
+        """
+        Check an inclusion proof without reading the rest of the block
+
+        With the event's stored BSON, also checks that it still hashes to the proved leaf.
+        """
+        leaf = bytes.fromhex(proof["leaf"])
+        if raw_event is not None and event_leaf(raw_event, ledger_stamp(proof["block"], proof["index"])) != leaf:
+            return False
+        if not verify_merkle_proof(leaf, proof["proof"], proof["merkle_root"]):
+            return False
+        return chain_hash(proof["prev_hash"], proof["merkle_root"], proof["block"], proof["count"]) == proof["block_hash"]
+
+    async def verify(
+        self,
+        from_block: int = 0,
+        to_block: Optional[int] = None,
+        checkpoint: Optional[str] = None,
+        workers: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """
+        Verify the chain and every event of blocks from_block..to_block
+
+        Args:
+            from_block: First block to verify
+            to_block: Last block to verify, the head if None
+            checkpoint: Trusted block_hash of block from_block - 1, from an
+                earlier verification; without it the stored hash is used
+            workers: Processes recomputing Merkle roots; 0 verifies in-process
+
+        Returns:
+            Report with the errors found and head_hash, the checkpoint for
+            verifying the blocks that follow
+        """
+        started = time.perf_counter()
+        workers = self.verify_workers if workers is None else workers
+        query: Dict[str, Any] = {"$gte": from_block}
+        if to_block is not None:
+            query["$lte"] = to_block
+        blocks = await self.get_ledger().find({"_id": query}).sort("_id", 1).to_list(None)
+
+        if checkpoint is None:
+            previous = await self.get_ledger().find_one({"_id": from_block - 1}) if from_block > 0 else None
+            checkpoint = previous["block_hash"] if previous else GENESIS_HASH
+        errors = []
+        expected_prev = checkpoint
+        for seq, block in enumerate(blocks, start=from_block):
+            if block["_id"] != seq:
+                errors.append({"block": seq, "error": "missing_block"})
+                break
+            if block["prev_hash"] != expected_prev:
+                errors.append({"block": seq, "error": "chain_broken"})
+            if chain_hash(block["prev_hash"], block["merkle_root"], seq, block["count"]) != block["block_hash"]:
+                errors.append({"block": seq, "error": "block_hash_mismatch"})
+            expected_prev = block["block_hash"]
+
+        async def load(chunk):
+            event_ids = [event_id for block in chunk for event_id in block["event_ids"]]
+            documents = await self._raw_events().find({"_id": {"$in": event_ids}}).to_list(None)
+            return [document.raw for document in documents]
+
+        chunks = [
+            [{key: block[key] for key in ("_id", "event_ids", "merkle_root")} for block in blocks[start:start + VERIFY_CHUNK_BLOCKS]]
+            for start in range(0, len(blocks), VERIFY_CHUNK_BLOCKS)
+        ]
+        if workers > 0 and len(chunks) > 1:
+            loop = asyncio.get_running_loop()
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                # Read the next chunks from MongoDB while workers hash the earlier ones,
+                # keeping only a couple of chunks per worker in memory
+                pending = []
+                for chunk in chunks:
+                    pending.append(loop.run_in_executor(pool, verify_blocks, chunk, await load(chunk)))
+                    if len(pending) >= workers * 2:
+                        errors.extend(await pending.pop(0))
+                for future in pending:
+                    errors.extend(await future)
+        else:
+            for chunk in chunks:
+                errors.extend(verify_blocks(chunk, await load(chunk)))
+
+        seconds = time.perf_counter() - started
+        metrics.AUDIT_LEDGER_VERIFY_DURATION.observe(seconds)
+        errors.sort(key=lambda error: error["block"])
+        return {
+            "valid": not errors,
+            "from_block": from_block,
+            "to_block": blocks[-1]["_id"] if blocks else None,
+            "blocks": len(blocks),
+            "events": sum(block["count"] for block in blocks),
+            "head_hash": expected_prev,
+            "errors": errors,
+            "seconds": round(seconds, 3),
+        }
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.seal()
+            except Exception as e:
+                self._stats["seal_errors"] += 1
+                logger.error(f"Audit ledger sealing failed: {e}")
+            await asyncio.sleep(self.seal_interval_seconds)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "block_size": self.block_size,
+            "seal_interval_seconds": self.seal_interval_seconds,
+            "verify_workers": self.verify_workers,
+            "running": self._task is not None and not self._task.done(),
+        }
+
+
+# Global audit ledger instance
+audit_ledger = AuditLedger()
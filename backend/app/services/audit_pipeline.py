@@ -0,0 +1,264 @@
+"""
+Audit pipeline for EVEP Platform
+Write-behind queue for audit_logs. Requests hand their events to a bounded
+in-process buffer and return; a background flusher writes them with unordered
+insert_many calls when a batch fills up or the flush interval passes. Batches
+that cannot be written while MongoDB is unavailable are appended to a local
+spill file and replayed once writes succeed again, and shutdown flushes
+whatever is still buffered. Each worker process spills to its own file, and
+the files of workers that have exited are taken over by a running one.
+"""
+
+import asyncio
+import glob
+import logging
+import os
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from bson import json_util
+from pymongo.errors import BulkWriteError
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.database import get_audit_logs_collection
+
+logger = logging.getLogger(__name__)
+
+PID_PLACEHOLDER = "{pid}"
+
+
+def worker_spill_template(path: str) -> str:
+    """Spill path with a {pid} placeholder, inserted before the extension when the path has none"""
+    if PID_PLACEHOLDER in path:
+        return path
+    root, extension = os.path.splitext(path)
+    return f"{root}.{PID_PLACEHOLDER}{extension}"
+
+
+def _process_running(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class AuditPipeline:
+    """Bounded buffer of audit events flushed to MongoDB in batches"""
+
+    def __init__(
+        self,
+        get_collection: Callable[[], Any] = get_audit_logs_collection,
+        max_queue_size: int = settings.AUDIT_QUEUE_MAX_SIZE,
+        batch_size: int = settings.AUDIT_BATCH_SIZE,
+        flush_interval_seconds: float = settings.AUDIT_FLUSH_INTERVAL_SECONDS,
+        spill_path: str = settings.AUDIT_SPILL_PATH,
+    ):
+        self.get_collection = get_collection
+        self.max_queue_size = max_queue_size
+        self.batch_size = max(1, batch_size)
+        self.flush_interval_seconds = flush_interval_seconds
+        self.spill_template = worker_spill_template(spill_path)
+        self._buffer: Deque[Dict[str, Any]] = deque()
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self._stats = {
+            "queued": 0, "written": 0, "dropped": 0, "spilled": 0, "replayed": 0, "batches": 0, "write_errors": 0, "corrupt_spill_lines": 0
+        }
+
+    def submit(self, event: Dict[str, Any]) -> bool:
+        """Queue an event for writing; False when the buffer is full and the event was dropped"""
+        if len(self._buffer) >= self.max_queue_size:
+            self._count("dropped")
+            logger.warning(f"Audit queue full ({self.max_queue_size}), dropped {event.get('event_type') or event.get('action')} event")
+            return False
+        self._buffer.append(event)
+        self._count("queued")
+        metrics.AUDIT_QUEUE_DEPTH.set(len(self._buffer))
+        if len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+        self._ensure_started()
+        return True
+
+    def _ensure_started(self) -> None:
+        # Events submitted outside app startup (scripts, tests) still get a flusher
+        if self._task is None and not self._closing:
+            try:
+                self.start()
+            except RuntimeError:
+                pass
+
+    def _count(self, outcome: str, count: int = 1) -> None:
+        self._stats[outcome] += count
+        metrics.AUDIT_EVENTS.labels(outcome).inc(count)
+
+    async def _run(self) -> None:
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Audit flush failed: {e}")
+
+    async def flush(self) -> int:
+        """Write every buffered event now; returns how many were taken from the buffer"""
+        taken = 0
+        async with self._flush_lock:
+            writable = False
+            while self._buffer:
+                batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+                metrics.AUDIT_QUEUE_DEPTH.set(len(self._buffer))
+                taken += len(batch)
+                writable = await self._write(batch)
+                if not writable:
+                    await asyncio.to_thread(self._spill, batch)
+            # One replay pass per flush, once the last write went through
+            if writable:
+                await self._replay_spill()
+        return taken
+
+    async def _write(self, batch: List[Dict[str, Any]]) -> bool:
+        """Insert a batch; False when MongoDB could not be reached and the batch should be spilled"""
+        try:
+            await self.get_collection().insert_many(batch, ordered=False)
+        except BulkWriteError as e:
+            # Unordered: the other documents were written; duplicates from a replay are expected
+            written = e.details.get("nInserted", 0)
+            self._count("written", written)
+            self._stats["write_errors"] += 1
+            logger.warning(f"Audit batch partially written: {len(batch) - written} of {len(batch)} events rejected")
+            return True
+        except Exception as e:
+            self._stats["write_errors"] += 1
+            logger.error(f"Audit batch of {len(batch)} events not written: {e}")
+            return False
+        self._count("written", len(batch))
+        self._stats["batches"] += 1
+        metrics.AUDIT_BATCH_SIZE.observe(len(batch))
+        return True
+
+    @property
+    def spill_path(self) -> str:
+        # Resolved on use so workers forked after import each get their own file
+        return self.spill_template.replace(PID_PLACEHOLDER, str(os.getpid()))
+
+    def _adopt_orphans(self) -> None:
+        """Append spill files left by exited workers to this worker's spill file"""
+        prefix, suffix = self.spill_template.split(PID_PLACEHOLDER, 1)
+        own = str(os.getpid())
+        for path in glob.glob(f"{glob.escape(prefix)}*{glob.escape(suffix)}*"):
+            pid, _, rest = path[len(prefix):].partition(suffix)
+            if not pid.isdigit() or pid == own or rest not in ("", ".replaying") or _process_running(int(pid)):
+                continue
+            claimed = f"{self.spill_path}.adopting"
+            try:
+                # Only one worker wins the rename when several find the same orphan
+                os.replace(path, claimed)
+            except FileNotFoundError:
+                continue
+            try:
+                with open(claimed, encoding="utf-8") as orphan, open(self.spill_path, "a", encoding="utf-8") as spill:
+                    for line in orphan:
+                        spill.write(line)
+                os.remove(claimed)
+                logger.info(f"Adopted audit spill file of exited worker {pid}")
+            except OSError as e:
+                logger.error(f"Audit spill file {path} could not be adopted, left at {claimed}: {e}")
+
+    def _spill(self, batch: List[Dict[str, Any]]) -> None:
+        try:
+            with open(self.spill_path, "a", encoding="utf-8") as spill:
+                for event in batch:
+                    spill.write(json_util.dumps(event, ensure_ascii=False) + "\n")
+            self._count("spilled", len(batch))
+        except OSError as e:
+            self._count("dropped", len(batch))
+            logger.error(f"Audit spill to {self.spill_path} failed, {len(batch)} events lost: {e}")
+
+    def _read_spill(self, path: str) -> List[Dict[str, Any]]:
+        """Events of a spill file; lines that do not parse are moved to a .bad file instead of blocking the replay"""
+        events, bad = [], []
+        with open(path, encoding="utf-8") as spill:
+            for line in spill:
+                if not line.strip():
+                    continue
+                try:
+                    events.append(json_util.loads(line))
+                except ValueError:
+                    bad.append(line if line.endswith("\n") else line + "\n")
+        if bad:
+            with open(f"{self.spill_path}.bad", "a", encoding="utf-8") as quarantine:
+                quarantine.writelines(bad)
+            self._stats["corrupt_spill_lines"] += len(bad)
+            logger.error(f"{len(bad)} unreadable audit spill lines moved to {self.spill_path}.bad")
+        return events
+
+    async def _replay_spill(self) -> None:
+        await asyncio.to_thread(self._adopt_orphans)
+        replaying = f"{self.spill_path}.replaying"
+        # A file left over from a replay cut short by a restart is resumed first
+        if not os.path.exists(replaying):
+            if not os.path.exists(self.spill_path):
+                return
+            # Moved aside so batches spilled during the replay land in a fresh file
+            os.replace(self.spill_path, replaying)
+        try:
+            events = await asyncio.to_thread(self._read_spill, replaying)
+        except OSError as e:
+            logger.error(f"Audit spill file could not be read: {e}")
+            return
+        replayed = 0
+        for start in range(0, len(events), self.batch_size):
+            batch = events[start:start + self.batch_size]
+            if not await self._write(batch):
+                # Still unavailable: put the rest back for the next successful flush
+                await asyncio.to_thread(self._spill, events[start:])
+                break
+            replayed += len(batch)
+            self._count("replayed", len(batch))
+        os.remove(replaying)
+        logger.info(f"Replayed {replayed} spilled audit events")
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._closing = False
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the flusher and write everything still buffered"""
+        self._closing = True
+        self._wakeup.set()
+        if self._task is not None:
+            try:
+                await self._task
+            except Exception as e:
+                logger.error(f"Audit flusher stopped with error: {e}")
+            self._task = None
+        await self.flush()
+
+    def __len__(self) -> int:
+        return len(self._buffer)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "queue_depth": len(self._buffer),
+            "max_queue_size": self.max_queue_size,
+            "batch_size": self.batch_size,
+            "flush_interval_seconds": self.flush_interval_seconds,
+            "spill_pending": os.path.exists(self.spill_path),
+            "running": self._task is not None and not self._task.done(),
+        }
+
+
+# Global audit pipeline instance
+audit_pipeline = AuditPipeline()
@@ -0,0 +1,359 @@
+"""
+Content-addressed blob store for EVEP Platform
+Stores patient and student photos on the CDN file store, deduplicated by
+SHA-256, with JPEG thumbnails generated off the event loop. Photos are never
+public: documents keep a stable path and responses hand out signed URLs that
+expire, since an <img> tag cannot send the Authorization header.
+"""
+
+import asyncio
+import base64
+import binascii
+import hashlib
+import hmac
+import io
+import logging
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Tuple
+
+import aiofiles
+from pymongo import ReturnDocument
+
+from app.api.cdn import STORAGE_PATH
+from app.core.config import settings
+from app.core.database import get_files_collection
+
+logger = logging.getLogger(__name__)
+
+# Thumbnail bounding boxes (pixels) generated for every image blob
+THUMBNAIL_SIZES = (64, 256, 512)
+
+# Thumbnail size returned by list endpoints
+LIST_THUMBNAIL_SIZE = 256
+
+# Blobs are served by the signed photo route; documents store this path without a signature
+PHOTO_URL_PREFIX = "/api/v1/cdn/photos"
+
+# Blob URLs written before photos were made private point at the public route
+LEGACY_URL_PREFIX = "/api/v1/cdn/public"
+
+EXTENSIONS = {
+    "image/jpeg": "jpg",
+    "image/jpg": "jpg",
+    "image/png": "png",
+    "image/gif": "gif",
+    "image/webp": "webp",
+}
+
+
+# Longest string treated as a URL; inline payloads are far larger
+MAX_URL_LENGTH = 2048
+
+
+def is_blob_url(value: Any) -> bool:
+    """Check whether a stored photo value is a URL rather than an inline payload"""
+    if not isinstance(value, str) or len(value) > MAX_URL_LENGTH:
+        return False
+    # Base64-encoded JPEG data starts with "/9j/", which is not a path
+    return value.startswith(("/", "http://", "https://")) and not value.startswith("/9j/")
+
+
+def decode_inline_photo(value: str) -> Tuple[bytes, str]:
+    """Decode a legacy base64 (optionally data: URI) photo into bytes and a content type"""
+    content_type = "image/jpeg"
+    if value.startswith("data:"):
+        header, _, value = value.partition(",")
+        content_type = header[5:].split(";")[0] or content_type
+    try:
+        return base64.b64decode(value, validate=False), content_type
+    except (binascii.Error, ValueError) as e:
+        raise ValueError(f"Invalid inline photo payload: {e}")
+
+
+def photo_signature(file_id: str, expires: int) -> str:
+    """HMAC of a photo file id and its expiry time"""
+    message = f"{file_id}:{expires}".encode("utf-8")
+    return hmac.new(settings.JWT_SECRET_KEY.encode("utf-8"), message, hashlib.sha256).hexdigest()
+
+
+def verify_photo_signature(file_id: str, expires: int, signature: str, now: Optional[float] = None) -> bool:
+    """Whether a signed photo URL is genuine and not yet expired"""
+    if expires < (time.time() if now is None else now):
+        return False
+    return hmac.compare_digest(photo_signature(file_id, expires), signature)
+
+
+def photo_file_id(url: Any) -> Optional[str]:
+    """File id of a stored photo path, signed or not; None for inline payloads and other values"""
+    if not is_blob_url(url):
+        return None
+    for prefix in (PHOTO_URL_PREFIX, LEGACY_URL_PREFIX):
+        if url.startswith(f"{prefix}/"):
+            return url[len(prefix) + 1:].split("?", 1)[0]
+    return None
+
+
+def pop_photo_blob(blobs: List[Dict[str, Any]], photo: Any) -> Optional[Dict[str, Any]]:
+    """Remove and return the blob reference a photo URL points to; None when no blob backs it"""
+    file_id = photo_file_id(photo)
+    if file_id is None:
+        return None
+    for index, blob in enumerate(blobs):
+        if isinstance(blob, dict) and blob.get("file_id") == file_id:
+            return blobs.pop(index)
+    return None
+
+
+def sign_photo_url(url: Any, now: Optional[float] = None) -> Any:
+    """Signed, expiring URL of a stored photo path; any other value is returned unchanged"""
+    file_id = photo_file_id(url)
+    if file_id is None:
+        return url
+    # Expiry is rounded up to the next window so a URL stays the same, and cacheable, for a while
+    ttl = settings.PHOTO_URL_TTL_SECONDS
+    expires = (int(time.time() if now is None else now) // ttl + 2) * ttl
+    return f"{PHOTO_URL_PREFIX}/{file_id}?expires={expires}&signature={photo_signature(file_id, expires)}"
+
+
+def sign_blob(blob: Any) -> Any:
+    """Copy of a blob reference with its URL and thumbnail URLs signed"""
+    if not isinstance(blob, dict):
+        return blob
+    signed = dict(blob)
+    if "url" in signed:
+        signed["url"] = sign_photo_url(signed["url"])
+    if isinstance(signed.get("thumbnails"), dict):
+        signed["thumbnails"] = {size: sign_photo_url(url) for size, url in signed["thumbnails"].items()}
+    return signed
+
+
+def signed_photos(document: Dict[str, Any]) -> Dict[str, Any]:
+    """Photo fields of a patient or student for the photos endpoints, with signed URLs"""
+    return {
+        "profile_photo": sign_photo_url(document.get("profile_photo")),
+        "extra_photos": [sign_photo_url(photo) for photo in document.get("extra_photos", [])],
+        "photo_metadata": document.get("photo_metadata", {}),
+        "profile_photo_blob": sign_blob(document.get("profile_photo_blob")),
+        "extra_photo_blobs": [sign_blob(blob) for blob in document.get("extra_photo_blobs", [])],
+    }
+
+
+def photo_urls(document: Dict[str, Any]) -> Dict[str, Any]:
+    """URL-only photo fields for list responses, signed; inline payloads are never shipped"""
+    profile_photo = document.get("profile_photo")
+    blob = document.get("profile_photo_blob") or {}
+    thumbnails = blob.get("thumbnails", {})
+    return {
+        "profile_photo": sign_photo_url(profile_photo) if is_blob_url(profile_photo) else "",
+        "profile_photo_thumbnail": sign_photo_url(thumbnails.get(str(LIST_THUMBNAIL_SIZE)) or (profile_photo if is_blob_url(profile_photo) else "")),
+        "extra_photos": [sign_photo_url(photo) for photo in document.get("extra_photos", []) if is_blob_url(photo)],
+        "photo_metadata": document.get("photo_metadata", {}),
+    }
+
+
+class BlobStore:
+    """Content-addressed image store on top of the CDN storage directory"""
+
+    def __init__(self, storage_path: Path, thumbnail_sizes: Tuple[int, ...] = THUMBNAIL_SIZES):
+        self.storage_path = Path(storage_path)
+        self.thumbnail_sizes = thumbnail_sizes
+
+    @staticmethod
+    def content_hash(content: bytes) -> str:
+        """SHA-256 hex digest used as the blob identifier"""
+        return hashlib.sha256(content).hexdigest()
+
+    def blob_path(self, file_id: str) -> Path:
+        """Path of a stored blob or thumbnail"""
+        return self.storage_path / file_id
+
+    @staticmethod
+    def url_for(file_id: str) -> str:
+        """Stored (unsigned) path of a blob or thumbnail"""
+        return f"{PHOTO_URL_PREFIX}/{file_id}"
+
+    async def put_image(
+        self,
+        content: bytes,
+        content_type: str,
+        uploaded_by: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Store an image once per content hash and return its URL reference"""
+        blob_id = self.content_hash(content)
+        file_id = f"{blob_id}.{EXTENSIONS.get(content_type.lower(), 'bin')}"
+        path = self.blob_path(file_id)
+
+        deduplicated = path.exists()
+        if not deduplicated:
+            self.storage_path.mkdir(parents=True, exist_ok=True)
+            # Write to a temporary name first so readers never see a partial blob
+            tmp_path = path.with_name(f".{file_id}.{os.getpid()}.tmp")
+            async with aiofiles.open(tmp_path, "wb") as f:
+                await f.write(content)
+            os.replace(tmp_path, path)
+
+        thumbnails = await asyncio.to_thread(self._make_thumbnails, content, blob_id)
+
+        reference = {
+            "blob_id": blob_id,
+            "file_id": file_id,
+            "url": self.url_for(file_id),
+            "thumbnails": {str(size): self.url_for(thumb_id) for size, thumb_id in thumbnails.items()},
+            "content_type": content_type,
+            "file_size": len(content),
+        }
+        await self._record(reference, uploaded_by)
+        return {**reference, "deduplicated": deduplicated}
+
+    def _make_thumbnails(self, content: bytes, blob_id: str) -> Dict[int, str]:
+        """Generate missing JPEG thumbnails; runs in a worker thread"""
+        from PIL import Image, ImageOps
+
+        thumbnails = {}
+        missing = []
+        for size in self.thumbnail_sizes:
+            thumb_id = f"{blob_id}_{size}.jpg"
+            thumbnails[size] = thumb_id
+            if not self.blob_path(thumb_id).exists():
+                missing.append((size, thumb_id))
+        if not missing:
+            return thumbnails
+
+        try:
+            with Image.open(io.BytesIO(content)) as image:
+                image = ImageOps.exif_transpose(image).convert("RGB")
+                for size, thumb_id in missing:
+                    thumb = image.copy()
+                    thumb.thumbnail((size, size))
+                    path = self.blob_path(thumb_id)
+                    tmp_path = path.with_name(f".{thumb_id}.{os.getpid()}.tmp")
+                    thumb.save(tmp_path, format="JPEG", quality=85, optimize=True)
+                    os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"Could not generate thumbnails for blob {blob_id}: {e}")
+            return {}
+        return thumbnails
+
+    async def _record(self, reference: Dict[str, Any], uploaded_by: Optional[str]) -> None:
+        """Upsert blob metadata and count references to it"""
+        try:
+            await get_files_collection().update_one(
+                {"file_id": reference["file_id"]},
+                {
+                    "$setOnInsert": {
+                        "file_id": reference["file_id"],
+                        "blob_id": reference["blob_id"],
+                        "mime_type": reference["content_type"],
+                        "file_size": reference["file_size"],
+                        "thumbnails": reference["thumbnails"],
+                        "upload_date": datetime.utcnow(),
+                        "uploaded_by": uploaded_by,
+                        "access_count": 0,
+                    },
+                    # Also turns off public access on blobs recorded before photos were private
+                    "$set": {"is_public": False},
+                    "$inc": {"ref_count": 1},
+                },
+                upsert=True
+            )
+        except Exception as e:
+            # The blob is already on disk; metadata is best effort like the CDN upload
+            logger.warning(f"Failed to save blob metadata for {reference['file_id']}: {e}")
+
+    async def release(self, blob: Optional[Dict[str, Any]]) -> bool:
+        """Drop one reference to a blob; the last one deletes the blob and its thumbnails"""
+        file_id = (blob or {}).get("file_id")
+        if not file_id:
+            return False
+        files = get_files_collection()
+        try:
+            document = await files.find_one_and_update(
+                {"file_id": file_id, "blob_id": {"$exists": True}},
+                {"$inc": {"ref_count": -1}},
+                return_document=ReturnDocument.AFTER,
+            )
+            if document is None or document.get("ref_count", 0) > 0:
+                return False
+            # Only the release that removes the metadata deletes the files
+            deleted = await files.delete_one({"file_id": file_id, "ref_count": {"$lte": 0}})
+            if not deleted.deleted_count:
+                return False
+        except Exception as e:
+            logger.warning(f"Failed to release blob {file_id}: {e}")
+            return False
+
+        names = [file_id] + [f"{document['blob_id']}_{size}.jpg" for size in self.thumbnail_sizes]
+        for name in names:
+            try:
+                self.blob_path(name).unlink(missing_ok=True)
+            except OSError as e:
+                logger.warning(f"Failed to delete blob file {name}: {e}")
+        return True
+
+
+async def migrate_inline_photos(
+    collection,
+    store: BlobStore,
+    batch_size: int = 50,
+    dry_run: bool = False
+) -> Dict[str, int]:
+    """Stream documents with inline base64 photos and move them into the blob store"""
+    stats = {"scanned": 0, "migrated": 0, "photos": 0, "bytes_moved": 0, "failed": 0}
+    projection = {"profile_photo": 1, "extra_photos": 1, "extra_photo_blobs": 1}
+    query = {"$or": [
+        {"profile_photo": {"$type": "string", "$ne": ""}},
+        {"extra_photos.0": {"$exists": True}},
+    ]}
+
+    # Only the photo fields of one cursor batch are held in memory at a time
+    cursor = collection.find(query, projection, batch_size=batch_size)
+    async for document in cursor:
+        stats["scanned"] += 1
+        update = {}
+        try:
+            profile_photo = document.get("profile_photo")
+            if profile_photo and not is_blob_url(profile_photo):
+                content, content_type = decode_inline_photo(profile_photo)
+                reference = {} if dry_run else await store.put_image(content, content_type)
+                reference.pop("deduplicated", None)
+                update["profile_photo"] = reference.get("url", "")
+                update["profile_photo_blob"] = reference
+                stats["photos"] += 1
+                stats["bytes_moved"] += len(profile_photo)
+
+            extra_photos = document.get("extra_photos") or []
+            if any(not is_blob_url(photo) for photo in extra_photos):
+                existing_blobs = document.get("extra_photo_blobs") or []
+                urls, blobs = [], []
+                for index, photo in enumerate(extra_photos):
+                    if is_blob_url(photo):
+                        urls.append(photo)
+                        blobs.append(existing_blobs[index] if index < len(existing_blobs) else {"url": photo})
+                        continue
+                    content, content_type = decode_inline_photo(photo)
+                    reference = {} if dry_run else await store.put_image(content, content_type)
+                    reference.pop("deduplicated", None)
+                    urls.append(reference.get("url", ""))
+                    blobs.append(reference)
+                    stats["photos"] += 1
+                    stats["bytes_moved"] += len(photo)
+                update["extra_photos"] = urls
+                update["extra_photo_blobs"] = blobs
+        except ValueError as e:
+            logger.warning(f"Skipping document {document['_id']}: {e}")
+            stats["failed"] += 1
+            continue
+
+        if update:
+            if not dry_run:
+                await collection.update_one({"_id": document["_id"]}, {"$set": update})
+            stats["migrated"] += 1
+
+    return stats
+
+
+# Global blob store instance
+blob_store = BlobStore(STORAGE_PATH)
@@ -0,0 +1,243 @@
+"""
+Dashboard statistics engine for EVEP Platform
+Computes scoped counters with one $facet aggregation per collection and
+materializes them in the dashboard_counters collection, which is kept up to
+date incrementally from write events published on the event bus
+"""
+
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from pymongo import UpdateOne
+
+from app.core.config import settings
+from app.core.database import get_database
+from app.core.event_bus import event_bus
+
+logger = logging.getLogger(__name__)
+
+COUNTERS_COLLECTION = "dashboard_counters"
+
+# Published after a write to a tracked collection; payload is
+# {"collection": name, "before": document or None, "after": document or None}
+DOCUMENT_CHANGED_EVENT = "dashboard.document_changed"
+
+# Fields each tracked collection is narrowed by on the dashboard; collections are
+# named as in the evep database, the same names publish_change is called with.
+# The evep student handlers write the "evep.students" collection
+SCOPE_FIELDS = {
+    "patients": ("organization", "created_by"),
+    "screenings": ("organization", "examiner_id"),
+    "school_screenings": ("school_name", "student_id"),
+    "evep.students": ("school_name", "parent_id"),
+    "teachers": ("school_name",),
+    "schools": (),
+}
+
+
+class CounterScope(NamedTuple):
+    """A collection, optionally narrowed to documents where field == value"""
+    collection: str
+    field: Optional[str] = None
+    value: Any = None
+
+    @property
+    def key(self) -> str:
+        """Counter document _id"""
+        if self.field is None:
+            return f"{self.collection}:*"
+        # MongoDB equality is type-sensitive, so the value type is part of the key
+        return f"{self.collection}:{self.field}={type(self.value).__name__}:{self.value}"
+
+    @property
+    def filter(self) -> Dict[str, Any]:
+        """Query selecting the documents counted by this scope"""
+        return {} if self.field is None else {self.field: self.value}
+
+
+class StatQuery(NamedTuple):
+    """A dashboard stat: documents summed over scopes, optionally with one status"""
+    scopes: Tuple[CounterScope, ...]
+    status: Optional[str] = None
+
+
+def status_key(status: Any) -> str:
+    """Counter field name for a status value"""
+    if status is None:
+        return "_none"
+    return str(status).replace(".", "_").replace("$", "_")
+
+
+def scopes_for_document(collection: str, document: Dict[str, Any]) -> List[CounterScope]:
+    """Every counter scope a document of a tracked collection is counted in"""
+    scopes = [CounterScope(collection)]
+    for field in SCOPE_FIELDS.get(collection, ()):
+        value = document.get(field)
+        if value is not None:
+            scopes.append(CounterScope(collection, field, value))
+    return scopes
+
+
+async def publish_change(
+    collection: str,
+    before: Optional[Dict[str, Any]] = None,
+    after: Optional[Dict[str, Any]] = None
+) -> None:
+    """Publish a write to a dashboard-tracked collection on the event bus"""
+    await event_bus.emit(DOCUMENT_CHANGED_EVENT, {
+        "collection": collection,
+        "before": before,
+        "after": after,
+    })
+
+
+class DashboardStatsEngine:
+    """Materialized, incrementally maintained dashboard counters"""
+
+    def __init__(self, max_age_seconds: float = 3600):
+        self.max_age_seconds = max_age_seconds
+
+    @staticmethod
+    def _collection(name: str):
+        return get_database().evep[name]
+
+    def register(self) -> None:
+        """Subscribe to write events so materialized counters stay current"""
+        event_bus.subscribe(DOCUMENT_CHANGED_EVENT, self.apply_change)
+
+    async def compute(self, scopes: Iterable[CounterScope]) -> Dict[str, Dict[str, Any]]:
+        """Count scopes from the source collections, one aggregation per collection"""
+        by_collection: Dict[str, List[CounterScope]] = defaultdict(list)
+        for scope in {scope.key: scope for scope in scopes}.values():
+            by_collection[scope.collection].append(scope)
+
+        results = await asyncio.gather(*(
+            self._compute_collection(collection, collection_scopes)
+            for collection, collection_scopes in by_collection.items()
+        ))
+        counters = {}
+        for result in results:
+            counters.update(result)
+        return counters
+
+    async def _compute_collection(
+        self,
+        collection: str,
+        scopes: List[CounterScope]
+    ) -> Dict[str, Dict[str, Any]]:
+        """Count every scope of one collection in a single $facet aggregation"""
+        facets = {
+            f"s{index}": [
+                {"$match": scope.filter},
+                {"$group": {"_id": "$status", "count": {"$sum": 1}}},
+            ]
+            for index, scope in enumerate(scopes)
+        }
+        rows = await self._collection(collection).aggregate([{"$facet": facets}]).to_list(length=1)
+        row = rows[0] if rows else {}
+
+        counters = {}
+        for index, scope in enumerate(scopes):
+            by_status: Dict[str, int] = defaultdict(int)
+            for group in row.get(f"s{index}", []):
+                by_status[status_key(group["_id"])] += group["count"]
+            counters[scope.key] = {"total": sum(by_status.values()), "by_status": dict(by_status)}
+        return counters
+
+    async def get_counters(
+        self,
+        scopes: Iterable[CounterScope],
+        force: bool = False
+    ) -> Dict[str, Dict[str, Any]]:
+        """Read materialized counters, computing missing, stale or forced ones"""
+        scopes = list({scope.key: scope for scope in scopes}.values())
+        if not scopes:
+            return {}
+        counters_collection = self._collection(COUNTERS_COLLECTION)
+        now = datetime.utcnow()
+
+        counters = {}
+        if not force:
+            documents = await counters_collection.find(
+                {"_id": {"$in": [scope.key for scope in scopes]}}
+            ).to_list(length=None)
+            for document in documents:
+                # Counters nobody refreshed for a while are reconciled against the source
+                computed_at = document.get("computed_at")
+                if computed_at and (now - computed_at).total_seconds() <= self.max_age_seconds:
+                    counters[document["_id"]] = document
+
+        missing = [scope for scope in scopes if scope.key not in counters]
+        if missing:
+            computed = await self.compute(missing)
+            # Increments that land while a recompute runs may be overwritten here;
+            # the drift is bounded by the next reconciliation
+            await counters_collection.bulk_write([
+                UpdateOne(
+                    {"_id": scope.key},
+                    {"$set": {
+                        "collection": scope.collection,
+                        "field": scope.field,
+                        "value": scope.value,
+                        "total": computed[scope.key]["total"],
+                        "by_status": computed[scope.key]["by_status"],
+                        "computed_at": now,
+                        "updated_at": now,
+                    }},
+                    upsert=True
+                )
+                for scope in missing
+            ], ordered=False)
+            counters.update(computed)
+            logger.info(f"Recomputed {len(missing)} dashboard counters")
+        return counters
+
+    async def resolve(self, queries: Dict[str, StatQuery], force: bool = False) -> Dict[str, int]:
+        """Resolve named dashboard stats from materialized counters"""
+        counters = await self.get_counters(
+            (scope for query in queries.values() for scope in query.scopes),
+            force=force
+        )
+        stats = {}
+        for name, query in queries.items():
+            value = 0
+            for scope in query.scopes:
+                counter = counters.get(scope.key, {})
+                if query.status is None:
+                    value += counter.get("total", 0)
+                else:
+                    value += counter.get("by_status", {}).get(status_key(query.status), 0)
+            stats[name] = max(value, 0)
+        return stats
+
+    async def apply_change(self, data: Dict[str, Any]) -> None:
+        """Apply a document write to the materialized counters it affects"""
+        collection = data.get("collection")
+        if collection not in SCOPE_FIELDS:
+            return
+
+        deltas: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        for document, sign in ((data.get("before"), -1), (data.get("after"), 1)):
+            if not document:
+                continue
+            status_field = f"by_status.{status_key(document.get('status'))}"
+            for scope in scopes_for_document(collection, document):
+                deltas[scope.key]["total"] += sign
+                deltas[scope.key][status_field] += sign
+
+        now = datetime.utcnow()
+        operations = []
+        for key, fields in deltas.items():
+            increments = {field: delta for field, delta in fields.items() if delta}
+            if increments:
+                # Scopes never read are not materialized; they are computed on first read
+                operations.append(UpdateOne({"_id": key}, {"$inc": increments, "$set": {"updated_at": now}}))
+        if operations:
+            await self._collection(COUNTERS_COLLECTION).bulk_write(operations, ordered=False)
+
+
+# Global dashboard stats engine instance
+dashboard_stats = DashboardStatsEngine(max_age_seconds=settings.DASHBOARD_COUNTERS_MAX_AGE_SECONDS)
@@ -0,0 +1,459 @@
+"""
+Streaming data export engine for EVEP Platform
+Turns MongoDB cursors into chunked CSV, NDJSON or Parquet output without
+materializing the result set, and runs resumable export jobs to disk
+"""
+
+import asyncio
+import csv
+import io
+import json
+import logging
+import os
+import uuid
+import zlib
+from datetime import datetime
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, List, NamedTuple, Optional
+
+from app.core.database import get_database
+
+logger = logging.getLogger(__name__)
+
+# Format name -> (media type, file extension)
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+# Encoded bytes buffered before a chunk is emitted
+CHUNK_SIZE = 64 * 1024
+
+# Rows per Parquet row group, and per checkpoint of an export job
+ROW_GROUP_SIZE = 5000
+
+# Export jobs with no checkpoint for this long are considered abandoned
+JOB_STALE_SECONDS = 300
+
+
+class ExportColumn(NamedTuple):
+    """One output column read from a document field"""
+    header: str
+    field: str
+    default: Any = ""
+    transform: Optional[Callable[[Any], Any]] = None
+
+
+class ExportSpec:
+    """Collection, columns and query builder for one exportable data type"""
+
+    def __init__(
+        self,
+        name: str,
+        collection: str,
+        columns: List[ExportColumn],
+        build_query: Callable[..., Dict[str, Any]]
+    ):
+        self.name = name
+        self.collection = collection
+        self.columns = columns
+        self.build_query = build_query
+
+    @property
+    def headers(self) -> List[str]:
+        return [column.header for column in self.columns]
+
+    @property
+    def projection(self) -> Dict[str, int]:
+        """Only the fields the columns read are fetched from MongoDB"""
+        return {column.field: 1 for column in self.columns}
+
+    def row(self, document: Dict[str, Any]) -> List[Any]:
+        """Project a document onto the spec's columns"""
+        values = []
+        for column in self.columns:
+            value = document.get(column.field, column.default)
+            values.append(column.transform(value) if column.transform else value)
+        return values
+
+
+async def iter_rows(
+    collection,
+    spec: ExportSpec,
+    query: Dict[str, Any],
+    batch_size: int = 1000,
+    sort: Optional[List] = None
+) -> AsyncIterator[List[Any]]:
+    """Stream projected rows from a cursor, one batch_size network batch at a time"""
+    cursor = collection.find(query, spec.projection, batch_size=batch_size)
+    if sort:
+        cursor = cursor.sort(sort)
+    async for document in cursor:
+        yield spec.row(document)
+
+
+async def encode_csv(headers: List[str], rows: AsyncIterator[List[Any]], include_header: bool = True) -> AsyncIterator[bytes]:
+    """Encode rows as CSV in chunks of about CHUNK_SIZE bytes"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if include_header:
+        writer.writerow(headers)
+    async for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+async def encode_ndjson(headers: List[str], rows: AsyncIterator[List[Any]], include_header: bool = True) -> AsyncIterator[bytes]:
+    """Encode rows as newline-delimited JSON objects in chunks"""
+    lines = []
+    size = 0
+    async for row in rows:
+        line = json.dumps(dict(zip(headers, row)), ensure_ascii=False, default=str) + "\n"
+        lines.append(line)
+        size += len(line)
+        if size >= CHUNK_SIZE:
+            yield "".join(lines).encode("utf-8")
+            lines = []
+            size = 0
+    if lines:
+        yield "".join(lines).encode("utf-8")
+
+
+class _ChunkSink:
+    """Write-only file object that hands Parquet output back in chunks"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _parquet_table(pa, schema, headers: List[str], rows: List[List[Any]]):
+    columns = list(zip(*rows)) if rows else [[] for _ in headers]
+    return pa.Table.from_arrays(
+        [pa.array([None if value is None else str(value) for value in column], pa.string()) for column in columns],
+        schema=schema
+    )
+
+
+async def encode_parquet(headers: List[str], rows: AsyncIterator[List[Any]], include_header: bool = True) -> AsyncIterator[bytes]:
+    """Encode rows as a Parquet file, one row group of ROW_GROUP_SIZE rows at a time"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet export requires pyarrow")
+
+    schema = pa.schema([(header, pa.string()) for header in headers])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="snappy")
+
+    def write_row_group(batch: List[List[Any]]) -> bytes:
+        writer.write_table(_parquet_table(pa, schema, headers, batch))
+        return sink.drain()
+
+    def close() -> bytes:
+        writer.close()
+        return sink.drain()
+
+    # Building and compressing a row group is CPU work; it runs off the event loop
+    batch = []
+    async for row in rows:
+        batch.append(row)
+        if len(batch) >= ROW_GROUP_SIZE:
+            chunk = await asyncio.to_thread(write_row_group, batch)
+            batch = []
+            yield chunk
+    chunk = await asyncio.to_thread(write_row_group, batch) if batch else b""
+    yield chunk + await asyncio.to_thread(close)
+
+
+ENCODERS = {
+    "csv": encode_csv,
+    "ndjson": encode_ndjson,
+    "parquet": encode_parquet,
+}
+
+
+async def gzip_chunks(chunks: AsyncIterator[bytes], level: int = 6) -> AsyncIterator[bytes]:
+    """Compress a chunk stream into a single gzip member"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    async for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def stream_export(
+    collection,
+    spec: ExportSpec,
+    query: Dict[str, Any],
+    export_format: str = "csv",
+    compress: bool = False,
+    batch_size: int = 1000
+) -> AsyncIterator[bytes]:
+    """Byte stream of a whole export, suitable for a StreamingResponse"""
+    chunks = ENCODERS[export_format](spec.headers, iter_rows(collection, spec, query, batch_size))
+    return gzip_chunks(chunks) if compress else chunks
+
+
+def export_filename(name: str, export_format: str, compress: bool = False) -> str:
+    """Timestamped download file name"""
+    extension = EXPORT_FORMATS[export_format][1]
+    suffix = ".gz" if compress else ""
+    return f"{name}_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{extension}{suffix}"
+
+
+def export_media_type(export_format: str, compress: bool = False) -> str:
+    """Media type of the export payload"""
+    return "application/gzip" if compress else EXPORT_FORMATS[export_format][0]
+
+
+def _write_durably(f, data: bytes) -> None:
+    """Append a chunk and sync it to disk, so a checkpoint never points past the data; runs in a worker thread"""
+    f.write(data)
+    f.flush()
+    os.fsync(f.fileno())
+
+
+async def _collect(chunks: AsyncIterator[bytes]) -> bytes:
+    return b"".join([chunk async for chunk in chunks])
+
+
+class ExportJobManager:
+    """Resumable export jobs written to disk and downloaded later.
+
+    CSV and NDJSON jobs checkpoint after every ROW_GROUP_SIZE rows, recording
+    the last exported _id and the file size; a resumed job truncates the file
+    to the checkpoint and continues from that _id. Compressed jobs write one
+    gzip member per checkpoint, which concatenate into a valid gzip file.
+    Parquet files cannot be appended to, so Parquet jobs restart on resume.
+    """
+
+    def __init__(self, specs: Dict[str, ExportSpec], storage_path: str, batch_size: int = 1000):
+        self.specs = specs
+        self.storage_path = Path(storage_path)
+        self.batch_size = batch_size
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    @staticmethod
+    def _jobs():
+        return get_database().evep.export_jobs
+
+    def job_path(self, job: Dict[str, Any]) -> Path:
+        return self.storage_path / job["file_name"]
+
+    async def create_job(
+        self,
+        data_type: str,
+        filters: Dict[str, Any],
+        export_format: str,
+        compress: bool,
+        created_by: Optional[str]
+    ) -> Dict[str, Any]:
+        """Record a new export job and start running it"""
+        if data_type not in self.specs:
+            raise ValueError(f"Unknown export data type: {data_type}")
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown export format: {export_format}")
+
+        job_id = uuid.uuid4().hex
+        now = datetime.utcnow()
+        job = {
+            "_id": job_id,
+            "data_type": data_type,
+            "filters": filters,
+            "format": export_format,
+            "compress": compress,
+            "file_name": f"{data_type}_{job_id}.{EXPORT_FORMATS[export_format][1]}{'.gz' if compress else ''}",
+            "status": "pending",
+            "rows_written": 0,
+            "bytes_written": 0,
+            "last_id": None,
+            "error": None,
+            "created_by": created_by,
+            "created_at": now,
+            "updated_at": now,
+            "completed_at": None,
+        }
+        await self._jobs().insert_one(job)
+        self.start(job_id)
+        return job
+
+    def start(self, job_id: str) -> asyncio.Task:
+        """Run a job in the background on this worker"""
+        task = asyncio.create_task(self.run(job_id))
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job_id, None))
+        return task
+
+    async def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await self._jobs().find_one({"_id": job_id})
+
+    async def resume(self, job_id: str) -> bool:
+        """Resume a failed, interrupted or abandoned job from its last checkpoint"""
+        if job_id in self._tasks:
+            return False
+        job = await self.get_job(job_id)
+        if not job or job["status"] == "completed":
+            return False
+        if job["status"] == "running":
+            idle = (datetime.utcnow() - job["updated_at"]).total_seconds()
+            if idle < JOB_STALE_SECONDS:
+                return False
+        self.start(job_id)
+        return True
+
+    async def run(self, job_id: str) -> None:
+        """Export a job's rows to disk, checkpointing as it goes"""
+        jobs = self._jobs()
+        job = await jobs.find_one_and_update(
+            {"_id": job_id},
+            {"$set": {"status": "running", "error": None, "updated_at": datetime.utcnow()}}
+        )
+        if not job:
+            return
+
+        spec = self.specs[job["data_type"]]
+        path = self.job_path(job)
+        self.storage_path.mkdir(parents=True, exist_ok=True)
+
+        query = spec.build_query(**job["filters"])
+        resume_from = job.get("last_id") if job["format"] != "parquet" else None
+        if resume_from is not None:
+            query = {"$and": [query, {"_id": {"$gt": resume_from}}]}
+            offset = job.get("bytes_written", 0)
+            rows_written = job.get("rows_written", 0)
+        else:
+            offset = 0
+            rows_written = 0
+
+        collection = get_database().evep[spec.collection]
+        try:
+            with open(path, "r+b" if offset and path.exists() else "wb") as f:
+                # Drop anything written after the last checkpoint
+                f.truncate(offset)
+                f.seek(offset)
+                if job["format"] == "parquet":
+                    rows_written = await self._write_parquet(f, job, spec, collection, query)
+                else:
+                    rows_written = await self._write_checkpointed(
+                        f, job, spec, collection, query, offset, rows_written
+                    )
+            await jobs.update_one(
+                {"_id": job_id},
+                {"$set": {
+                    "status": "completed",
+                    "rows_written": rows_written,
+                    "bytes_written": path.stat().st_size,
+                    "completed_at": datetime.utcnow(),
+                    "updated_at": datetime.utcnow(),
+                }}
+            )
+            logger.info(f"Export job {job_id} completed with {rows_written} rows")
+        except asyncio.CancelledError:
+            await jobs.update_one({"_id": job_id}, {"$set": {"status": "interrupted", "updated_at": datetime.utcnow()}})
+            raise
+        except Exception as e:
+            logger.error(f"Export job {job_id} failed: {e}")
+            await jobs.update_one(
+                {"_id": job_id},
+                {"$set": {"status": "failed", "error": str(e), "updated_at": datetime.utcnow()}}
+            )
+
+    async def _write_checkpointed(self, f, job, spec, collection, query, offset, rows_written) -> int:
+        encoder = ENCODERS[job["format"]]
+        include_header = offset == 0
+        batch = []
+        last_id = None
+
+        async def flush_batch():
+            nonlocal include_header, offset, rows_written, batch
+
+            async def batch_rows():
+                for row in batch:
+                    yield row
+
+            chunks = encoder(spec.headers, batch_rows(), include_header)
+            if job["compress"]:
+                chunks = gzip_chunks(chunks)
+            data = await _collect(chunks)
+            # The disk sync takes milliseconds to seconds; the event loop keeps serving meanwhile
+            await asyncio.to_thread(_write_durably, f, data)
+            offset += len(data)
+            rows_written += len(batch)
+            include_header = False
+            batch = []
+            await self._jobs().update_one(
+                {"_id": job["_id"]},
+                {"$set": {
+                    "last_id": last_id,
+                    "bytes_written": offset,
+                    "rows_written": rows_written,
+                    "updated_at": datetime.utcnow(),
+                }}
+            )
+
+        cursor = collection.find(query, spec.projection, batch_size=self.batch_size).sort([("_id", 1)])
+        async for document in cursor:
+            batch.append(spec.row(document))
+            last_id = document["_id"]
+            if len(batch) >= ROW_GROUP_SIZE:
+                await flush_batch()
+        if batch or include_header:
+            await flush_batch()
+        return rows_written
+
+    async def _write_parquet(self, f, job, spec, collection, query) -> int:
+        rows_written = 0
+
+        async def counted_rows():
+            nonlocal rows_written
+            async for row in iter_rows(collection, spec, query, self.batch_size, sort=[("_id", 1)]):
+                rows_written += 1
+                yield row
+
+        chunks = encode_parquet(spec.headers, counted_rows())
+        if job["compress"]:
+            chunks = gzip_chunks(chunks)
+        async for chunk in chunks:
+            await asyncio.to_thread(f.write, chunk)
+            await self._jobs().update_one(
+                {"_id": job["_id"]},
+                {"$set": {"rows_written": rows_written, "updated_at": datetime.utcnow()}}
+            )
+        return rows_written
+
+    async def shutdown(self) -> None:
+        """Cancel running jobs so they are marked interrupted and can be resumed"""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,319 @@
+"""
+Master data cache for EVEP Platform
+Holds the AOC provinces, districts, subdistricts and hospitals in memory so
+address dropdowns are served without a count_documents and a regex find per
+request. Each collection is kept as a snapshot in _id order, indexed by id,
+with parent -> children maps for the filters the list endpoints take. A
+snapshot is versioned by a hash of its content, so every worker hands out the
+same strong ETag for the same response. Every write bumps the kind's version
+document in master_data_versions: the aoc_data handlers through invalidate(),
+which also reloads this worker, and maintenance scripts directly. A periodic
+check of those versions picks up writes made through other workers.
+"""
+
+import asyncio
+import bisect
+import hashlib
+import json
+import logging
+import re
+import time
+from collections import defaultdict
+from datetime import datetime
+from operator import attrgetter
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Pattern, Tuple
+
+from fastapi import Response
+
+from app.core.config import settings
+from app.core.database import (
+    get_allhospitals_collection,
+    get_districts_collection,
+    get_master_data_versions_collection,
+    get_provinces_collection,
+    get_subdistricts_collection,
+)
+from app.core.pagination import Page, decode_cursor, encode_cursor, type_bracket
+from app.core.serialization import BSONJSONResponse, dumps, etag_matches
+
+logger = logging.getLogger(__name__)
+
+# Migration bookkeeping fields left out of every master data response
+MASTER_DATA_PROJECTION = {"_migration_metadata": 0, "_created_at": 0, "_updated_at": 0}
+
+# Master data responses may be stored by the browser but are revalidated on every use
+CACHE_CONTROL = "private, no-cache"
+
+
+class MasterKind(NamedTuple):
+    """Collection of a master data kind and the parent fields it is filtered by"""
+    get_collection: Callable[[], Any]
+    parent_fields: Tuple[str, ...]
+
+
+KINDS = {
+    "provinces": MasterKind(get_provinces_collection, ()),
+    "districts": MasterKind(get_districts_collection, ("provinceId",)),
+    "subdistricts": MasterKind(get_subdistricts_collection, ("provinceId", "districtId")),
+    "hospitals": MasterKind(get_allhospitals_collection, ("provinceId", "districtId", "subDistrictId", "hospitalType")),
+}
+
+
+def name_values(name: Any) -> Tuple[str, ...]:
+    """Text of a name stored as a string or as {"th": ..., "en": ...}"""
+    if isinstance(name, str):
+        return (name,)
+    if isinstance(name, dict):
+        return tuple(value for value in name.values() if isinstance(value, str))
+    return ()
+
+
+def search_pattern(text: str) -> Pattern:
+    """Case-insensitive substring pattern for the `search` parameter; the text is never read as a regex"""
+    return re.compile(re.escape(text), re.IGNORECASE)
+
+
+def version_update() -> Dict[str, Any]:
+    """Update that bumps a kind's document in master_data_versions (upsert it)"""
+    return {"$inc": {"version": 1}, "$set": {"updated_at": datetime.utcnow()}}
+
+
+def sort_key(value: Any) -> Tuple[int, Any]:
+    """Position of an _id in MongoDB's ascending sort order"""
+    return type_bracket(value), value
+
+
+class MasterRecord:
+    """One cached master data document with the fields the filters read"""
+
+    __slots__ = ("id", "key", "names", "active", "parents", "document")
+
+    def __init__(self, document: Dict[str, Any], parent_fields: Tuple[str, ...]):
+        self.id = str(document["_id"])
+        self.key = sort_key(document["_id"])
+        self.names = name_values(document.get("name"))
+        self.active = document.get("active")
+        # Parent ids are ObjectIds on migrated documents and strings on ones created through the API
+        self.parents = tuple(None if document.get(field) is None else str(document[field]) for field in parent_fields)
+        self.document = document
+
+
+class MasterTable:
+    """Snapshot of one master data collection"""
+
+    __slots__ = ("kind", "parent_fields", "records", "keys", "by_id", "children", "version", "loaded_at")
+
+    def __init__(self, kind: str, documents: Iterable[Dict[str, Any]], parent_fields: Tuple[str, ...] = ()):
+        self.kind = kind
+        self.parent_fields = parent_fields
+        self.records: List[MasterRecord] = sorted(
+            (MasterRecord(document, parent_fields) for document in documents), key=attrgetter("key")
+        )
+        self.keys = [record.key for record in self.records]
+        self.by_id = {record.id: position for position, record in enumerate(self.records)}
+        # children[parent field index][parent id] -> positions, ascending
+        self.children: List[Dict[str, List[int]]] = [defaultdict(list) for _ in parent_fields]
+        for position, record in enumerate(self.records):
+            for index, parent in enumerate(record.parents):
+                if parent is not None:
+                    self.children[index][parent].append(position)
+        self.version = hashlib.sha256(dumps([record.document for record in self.records])).hexdigest()[:24]
+        self.loaded_at = time.time()
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def get(self, document_id: Any) -> Optional[Dict[str, Any]]:
+        """Cached document by _id, given as an ObjectId or its string"""
+        position = self.by_id.get(str(document_id))
+        return None if position is None else self.records[position].document
+
+    def select(
+        self,
+        parents: Optional[Dict[str, Optional[str]]] = None,
+        search: Optional[str] = None,
+        active: Optional[bool] = None,
+    ) -> List[int]:
+        """Positions of the documents matching the list endpoint filters, in _id order"""
+        wanted = [(self.parent_fields.index(field), str(value)) for field, value in (parents or {}).items() if value]
+        if wanted:
+            # Walk the smallest child list and check the other parents on each record
+            index, value = min(wanted, key=lambda parent: len(self.children[parent[0]].get(parent[1], ())))
+            candidates: Iterable[int] = self.children[index].get(value, ())
+        else:
+            candidates = range(len(self.records))
+        pattern = search_pattern(search) if search else None
+
+        positions = []
+        for position in candidates:
+            record = self.records[position]
+            if any(record.parents[index] != value for index, value in wanted):
+                continue
+            if active is not None and record.active is not active:
+                continue
+            if pattern is not None and not any(pattern.search(name) for name in record.names):
+                continue
+            positions.append(position)
+        return positions
+
+    def page(
+        self,
+        positions: List[int],
+        limit: int,
+        cursor: Optional[str] = None,
+        skip: int = 0,
+        count: str = "cached",
+    ) -> Page:
+        """One page of selected positions, with the same cursors as pagination.paginate on _id"""
+        start = 0
+        if cursor:
+            _, document_id = decode_cursor(cursor, "_id")
+            start = bisect.bisect_right(positions, sort_key(document_id), key=self.keys.__getitem__)
+            skip = 0
+        window = positions[start + skip:start + skip + limit + 1]
+        has_more = len(window) > limit
+        documents = [self.records[position].document for position in window[:limit]]
+        next_cursor = encode_cursor("_id", documents[-1]) if has_more else None
+        total_count = None if count == "none" else len(positions)
+        return Page(documents, next_cursor, has_more, total_count)
+
+
+class MasterDataCache:
+    """In-memory snapshots of the master data collections with ETag revalidation"""
+
+    def __init__(
+        self,
+        kinds: Optional[Dict[str, MasterKind]] = None,
+        refresh_interval_seconds: Optional[float] = None,
+        get_versions: Callable[[], Any] = get_master_data_versions_collection,
+    ):
+        self.kinds = kinds if kinds is not None else KINDS
+        self.get_versions = get_versions
+        self.refresh_interval_seconds = refresh_interval_seconds or settings.MASTER_DATA_REFRESH_SECONDS
+        self.tables: Dict[str, MasterTable] = {}
+        self._fingerprints: Dict[str, Tuple[int, Any]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._stats = {
+            "loads": 0,
+            "invalidations": 0,
+            "refreshes": 0,
+            "refresh_reloads": 0,
+            "refresh_errors": 0,
+            "responses": 0,
+            "not_modified": 0,
+        }
+
+    def table(self, kind: str) -> Optional[MasterTable]:
+        """Loaded snapshot of a kind, or None while it is (re)loading"""
+        return self.tables.get(kind)
+
+    async def _fingerprint(self, kind: str) -> Tuple[Any, int]:
+        # The count also catches inserts made without a version bump
+        stamp = await self.get_versions().find_one({"_id": kind})
+        return stamp["version"] if stamp else None, await self.kinds[kind].get_collection().estimated_document_count()
+
+    async def bump_version(self, kind: str) -> None:
+        """Mark a kind as changed for the caches of every worker"""
+        await self.get_versions().update_one({"_id": kind}, version_update(), upsert=True)
+
+    async def load_kind(self, kind: str) -> MasterTable:
+        """Replace the snapshot of one kind from MongoDB"""
+        spec = self.kinds[kind]
+        collection = spec.get_collection()
+        # Taken before the read, so a write racing the load is seen by the next refresh
+        fingerprint = await self._fingerprint(kind)
+        documents = await collection.find({}, MASTER_DATA_PROJECTION).to_list(length=None)
+        table = MasterTable(kind, documents, spec.parent_fields)
+        self.tables[kind] = table
+        self._fingerprints[kind] = fingerprint
+        self._stats["loads"] += 1
+        return table
+
+    async def load(self) -> int:
+        """Load every kind; returns the number of cached documents"""
+        started = time.perf_counter()
+        loaded = 0
+        for kind in self.kinds:
+            loaded += len(await self.load_kind(kind))
+        logger.info(f"Master data cache loaded {loaded} documents in {time.perf_counter() - started:.2f}s")
+        return loaded
+
+    async def invalidate(self, kind: str) -> None:
+        """Drop a kind after a write, bump its version for the other workers and load it again; requests use MongoDB meanwhile"""
+        self._stats["invalidations"] += 1
+        self.tables.pop(kind, None)
+        try:
+            await self.bump_version(kind)
+            await self.load_kind(kind)
+        except Exception as e:
+            logger.error(f"Master data cache reload of {kind} failed: {e}")
+
+    async def refresh(self) -> int:
+        """Reload the kinds whose fingerprint changed; returns how many were reloaded"""
+        reloaded = 0
+        for kind in self.kinds:
+            if kind in self.tables and await self._fingerprint(kind) == self._fingerprints.get(kind):
+                continue
+            await self.load_kind(kind)
+            reloaded += 1
+        self._stats["refreshes"] += 1
+        self._stats["refresh_reloads"] += reloaded
+        return reloaded
+
+    def etag(self, tables: Iterable[MasterTable], params: Dict[str, Any]) -> str:
+        """Strong ETag of a response built from these snapshots with these request parameters"""
+        digest = hashlib.sha256()
+        for table in tables:
+            digest.update(f"{table.kind}:{table.version};".encode("utf-8"))
+        digest.update(json.dumps(params, sort_keys=True, default=str).encode("utf-8"))
+        return f'"{digest.hexdigest()[:32]}"'
+
+    def respond(self, if_none_match: Optional[str], etag: str, build: Callable[[], Any]) -> Response:
+        """304 when the client already holds this representation, otherwise the built body"""
+        headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+        if etag_matches(if_none_match, etag):
+            self._stats["not_modified"] += 1
+            return Response(status_code=304, headers=headers)
+        self._stats["responses"] += 1
+        return BSONJSONResponse(build(), headers=headers)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                if len(self.tables) < len(self.kinds):
+                    await self.load()
+                else:
+                    await self.refresh()
+            except Exception as e:
+                self._stats["refresh_errors"] += 1
+                logger.error(f"Master data cache refresh failed: {e}")
+            await asyncio.sleep(self.refresh_interval_seconds)
+
+    def start(self) -> None:
+        if not settings.MASTER_DATA_CACHE_ENABLED:
+            return
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "tables": {
+                kind: {"documents": len(table), "version": table.version, "loaded_at": table.loaded_at}
+                for kind, table in self.tables.items()
+            },
+            "running": self._task is not None and not self._task.done(),
+        }
+
+
+# Global master data cache instance
+master_data_cache = MasterDataCache()
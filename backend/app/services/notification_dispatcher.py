@@ -0,0 +1,386 @@
+"""
+Notification dispatcher for EVEP Platform
+Single path for outbound LINE, Telegram and email messages. Every delivery
+shares one pooled async HTTP client and passes through a per-channel token
+bucket and concurrency limit. A burst of notifications or a slow provider
+therefore never blocks the event loop or exceeds the provider's rate limits.
+Transient failures (timeouts, connection errors, 429 and 5xx) are retried
+with exponential backoff. Messages that still fail, or that the provider
+rejects outright, are kept in notification_dead_letters for redelivery.
+LINE push and multicast requests carry an X-Line-Retry-Key that stays the
+same across retries and redelivery, so LINE never delivers a message twice.
+"""
+
+import asyncio
+import logging
+import random
+import smtplib
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Union
+
+import httpx
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.database import get_notification_dead_letters_collection
+
+logger = logging.getLogger(__name__)
+
+# LINE accepts at most 5 messages per request and 500 recipients per multicast
+LINE_MAX_MESSAGES = 5
+LINE_MULTICAST_MAX_RECIPIENTS = 500
+
+# LINE operations that accept X-Line-Retry-Key; a retried request with the same key is not delivered again
+LINE_RETRY_KEY_OPERATIONS = ("push", "multicast")
+
+# How long a redelivery run holds a dead letter before another run may pick it up
+DEAD_LETTER_CLAIM_SECONDS = 300
+
+
+class DeliveryError(Exception):
+    """A failed delivery attempt; retryable unless the provider rejected the message itself"""
+
+    def __init__(self, message: str, retryable: bool = True, status_code: Optional[int] = None,
+                 retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retryable = retryable
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Allows `rate` acquisitions per second on average and up to `burst` at once"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+
+    async def acquire(self) -> None:
+        while True:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+@dataclass
+class ChannelLimits:
+    rate_per_second: float
+    burst: int
+    concurrency: int
+
+
+DEFAULT_LIMITS = {
+    "line": ChannelLimits(settings.NOTIFY_LINE_RATE_PER_SECOND, settings.NOTIFY_LINE_BURST, settings.NOTIFY_LINE_CONCURRENCY),
+    "telegram": ChannelLimits(settings.NOTIFY_TELEGRAM_RATE_PER_SECOND, settings.NOTIFY_TELEGRAM_BURST, settings.NOTIFY_TELEGRAM_CONCURRENCY),
+    "email": ChannelLimits(settings.NOTIFY_EMAIL_RATE_PER_SECOND, settings.NOTIFY_EMAIL_BURST, settings.NOTIFY_EMAIL_CONCURRENCY),
+}
+
+
+def line_messages(messages: Union[Any, List[Any]]) -> List[Dict[str, Any]]:
+    """LINE message payloads from SDK message objects or plain dicts"""
+    if not isinstance(messages, (list, tuple)):
+        messages = [messages]
+    return [message.as_json_dict() if hasattr(message, "as_json_dict") else message for message in messages]
+
+
+def line_push_payload(to: str, messages: Union[Any, List[Any]]) -> Dict[str, Any]:
+    return {"to": to, "messages": line_messages(messages)[:LINE_MAX_MESSAGES]}
+
+
+class NotificationDispatcher:
+    """Rate-limited, retrying delivery of outbound LINE, Telegram and email messages"""
+
+    def __init__(
+        self,
+        get_dead_letters: Callable[[], Any] = get_notification_dead_letters_collection,
+        limits: Optional[Dict[str, ChannelLimits]] = None,
+        max_attempts: int = settings.NOTIFY_MAX_ATTEMPTS,
+        backoff_base_seconds: float = settings.NOTIFY_BACKOFF_BASE_SECONDS,
+        backoff_max_seconds: float = settings.NOTIFY_BACKOFF_MAX_SECONDS,
+        timeout_seconds: float = settings.NOTIFY_HTTP_TIMEOUT_SECONDS,
+        max_connections: int = settings.NOTIFY_HTTP_MAX_CONNECTIONS,
+        line_api_base_url: str = settings.LINE_API_BASE_URL,
+        telegram_api_base_url: str = settings.TELEGRAM_API_BASE_URL,
+    ):
+        self.get_dead_letters = get_dead_letters
+        self.limits = {**DEFAULT_LIMITS, **(limits or {})}
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base_seconds = backoff_base_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self.timeout_seconds = timeout_seconds
+        self.max_connections = max_connections
+        self.line_api_base_url = line_api_base_url.rstrip("/")
+        self.telegram_api_base_url = telegram_api_base_url.rstrip("/")
+        # Tokens can be replaced at runtime, e.g. from the bot settings stored in MongoDB
+        self.credentials = {"line": settings.LINE_CHANNEL_ACCESS_TOKEN, "telegram": settings.TELEGRAM_BOT_TOKEN}
+        self._buckets = {channel: TokenBucket(limit.rate_per_second, limit.burst) for channel, limit in self.limits.items()}
+        self._semaphores = {channel: asyncio.Semaphore(limit.concurrency) for channel, limit in self.limits.items()}
+        self._client: Optional[httpx.AsyncClient] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self._stats = {channel: {"sent": 0, "retried": 0, "dead_lettered": 0, "in_flight": 0} for channel in self.limits}
+
+    def configure(self, account: str, token: str) -> None:
+        """Set the access token of an account; a channel's default account has the channel's name"""
+        self.credentials[account] = token
+
+    def _http(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout_seconds,
+                limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections),
+            )
+        return self._client
+
+    def _count(self, channel: str, outcome: str) -> None:
+        self._stats[channel][outcome] += 1
+        metrics.NOTIFICATIONS.labels(channel, outcome).inc()
+
+    def _backoff(self, attempt: int, retry_after: Optional[float]) -> float:
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max_seconds)
+        delay = min(self.backoff_max_seconds, self.backoff_base_seconds * 2 ** (attempt - 1))
+        # Jitter so a provider outage does not end in a synchronized retry storm
+        return random.uniform(delay / 2, delay)
+
+    async def deliver(self, channel: str, operation: str, payload: Dict[str, Any], account: Optional[str] = None,
+                      retry_key: Optional[str] = None) -> bool:
+        """
+        Deliver one message, retrying transient failures
+
+        Args:
+            channel: "line", "telegram" or "email"
+            operation: Provider operation, e.g. "push" or "reply" for LINE,
+                "sendMessage" for Telegram, "send" for email
+            payload: Request body for the provider
+            account: Credentials to send with, when not the channel's default
+            retry_key: X-Line-Retry-Key for LINE push and multicast; a new
+                one is generated when omitted
+
+        Returns:
+            True once delivered; False if the message was dead-lettered
+        """
+        return await self._deliver(channel, operation, payload, account, retry_key)
+
+    async def _deliver(self, channel: str, operation: str, payload: Dict[str, Any], account: Optional[str],
+                       retry_key: Optional[str], letter_id: Any = None) -> bool:
+        if retry_key is None and channel == "line" and operation in LINE_RETRY_KEY_OPERATIONS:
+            retry_key = str(uuid.uuid4())
+        started = time.perf_counter()
+        self._stats[channel]["in_flight"] += 1
+        metrics.NOTIFICATIONS_IN_FLIGHT.labels(channel).inc()
+        try:
+            attempt = 0
+            while True:
+                attempt += 1
+                try:
+                    async with self._semaphores[channel]:
+                        await self._buckets[channel].acquire()
+                        await self._send(channel, operation, payload, account or channel, retry_key)
+                except DeliveryError as e:
+                    if not e.retryable or attempt >= self.max_attempts:
+                        await self._dead_letter(channel, operation, payload, account, retry_key, e, attempt, letter_id)
+                        return False
+                    self._count(channel, "retried")
+                    logger.info(f"{channel} {operation} attempt {attempt} failed ({e}), retrying")
+                    await asyncio.sleep(self._backoff(attempt, e.retry_after))
+                    continue
+                self._count(channel, "sent")
+                return True
+        finally:
+            self._stats[channel]["in_flight"] -= 1
+            metrics.NOTIFICATIONS_IN_FLIGHT.labels(channel).dec()
+            metrics.NOTIFICATION_DURATION.labels(channel).observe(time.perf_counter() - started)
+
+    def submit(self, channel: str, operation: str, payload: Dict[str, Any], account: Optional[str] = None,
+               on_result: Optional[Callable[[bool], Awaitable[None]]] = None) -> asyncio.Task:
+        """Deliver in the background, for callers that should not wait; on_result gets the outcome and shutdown waits for both"""
+        task = asyncio.get_running_loop().create_task(self._deliver_and_report(channel, operation, payload, account, on_result))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _deliver_and_report(self, channel: str, operation: str, payload: Dict[str, Any], account: Optional[str],
+                                  on_result: Optional[Callable[[bool], Awaitable[None]]]) -> bool:
+        delivered = await self.deliver(channel, operation, payload, account)
+        if on_result is not None:
+            try:
+                await on_result(delivered)
+            except Exception as e:
+                logger.error(f"Could not record {channel} {operation} delivery result: {e}")
+        return delivered
+
+    async def _send(self, channel: str, operation: str, payload: Dict[str, Any], account: str,
+                    retry_key: Optional[str] = None) -> None:
+        if channel == "line":
+            token = self.credentials.get(account)
+            if not token:
+                raise DeliveryError("LINE channel access token not configured", retryable=False)
+            headers = {"Authorization": f"Bearer {token}"}
+            if retry_key:
+                headers["X-Line-Retry-Key"] = retry_key
+            try:
+                await self._post(f"{self.line_api_base_url}/v2/bot/message/{operation}", payload, headers)
+            except DeliveryError as e:
+                # 409: LINE already accepted a request with this retry key, e.g. one whose response timed out
+                if not (retry_key and e.status_code == 409):
+                    raise
+        elif channel == "telegram":
+            token = self.credentials.get(account)
+            if not token:
+                raise DeliveryError("Telegram bot token not configured", retryable=False)
+            await self._post(f"{self.telegram_api_base_url}/bot{token}/{operation}", payload)
+        elif channel == "email":
+            await asyncio.to_thread(self._send_email, payload)
+        else:
+            raise DeliveryError(f"Unknown notification channel {channel}", retryable=False)
+
+    async def _post(self, url: str, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+        try:
+            response = await self._http().post(url, json=payload, headers=headers)
+        except httpx.TransportError as e:
+            # Connection failures and timeouts
+            raise DeliveryError(f"{type(e).__name__}: {e}")
+        if response.status_code < 300:
+            return
+        retry_after = None
+        try:
+            retry_after = float(response.headers["Retry-After"])
+        except (KeyError, ValueError):
+            pass
+        raise DeliveryError(
+            f"HTTP {response.status_code}: {response.text[:200]}",
+            retryable=response.status_code == 429 or response.status_code >= 500,
+            status_code=response.status_code,
+            retry_after=retry_after,
+        )
+
+    def _send_email(self, payload: Dict[str, Any]) -> None:
+        """Blocking SMTP send, run in a worker thread"""
+        if not settings.SMTP_HOST:
+            raise DeliveryError("SMTP host not configured", retryable=False)
+        message = EmailMessage()
+        message["From"] = payload.get("from") or settings.EMAIL_FROM
+        message["To"] = ", ".join(payload["to"])
+        message["Subject"] = payload["subject"]
+        message.set_content(payload["body"], subtype="html" if payload.get("html") else "plain")
+        try:
+            with smtplib.SMTP(settings.SMTP_HOST, settings.SMTP_PORT, timeout=self.timeout_seconds) as smtp:
+                if settings.SMTP_USE_TLS:
+                    smtp.starttls()
+                if settings.SMTP_USERNAME:
+                    smtp.login(settings.SMTP_USERNAME, settings.SMTP_PASSWORD)
+                smtp.send_message(message)
+        except smtplib.SMTPRecipientsRefused as e:
+            raise DeliveryError(f"Recipients refused: {list(e.recipients)}", retryable=False)
+        except smtplib.SMTPResponseException as e:
+            # 4xx replies are temporary, 5xx permanent
+            raise DeliveryError(f"SMTP {e.smtp_code}: {e.smtp_error!r}", retryable=e.smtp_code < 500, status_code=e.smtp_code)
+        except (smtplib.SMTPException, OSError) as e:
+            raise DeliveryError(f"{type(e).__name__}: {e}")
+
+    async def _dead_letter(self, channel: str, operation: str, payload: Dict[str, Any], account: Optional[str],
+                           retry_key: Optional[str], error: DeliveryError, attempts: int, letter_id: Any = None) -> None:
+        self._count(channel, "dead_lettered")
+        logger.error(f"{channel} {operation} dead-lettered after {attempts} attempt(s): {error}")
+        try:
+            if letter_id is not None:
+                # A failed redelivery stays in its letter and releases the claim on it
+                await self.get_dead_letters().update_one(
+                    {"_id": letter_id},
+                    {"$set": {"error": str(error), "status_code": error.status_code, "claimed_until": None},
+                     "$inc": {"attempts": attempts}},
+                )
+                return
+            # Stored without credentials; redelivery uses the tokens current at the time
+            await self.get_dead_letters().insert_one({
+                "channel": channel,
+                "operation": operation,
+                "payload": payload,
+                "account": account,
+                "retry_key": retry_key,
+                "error": str(error),
+                "status_code": error.status_code,
+                "attempts": attempts,
+                "claimed_until": None,
+                "created_at": datetime.utcnow(),
+            })
+        except Exception as e:
+            logger.error(f"Could not store dead-lettered {channel} notification: {e}")
+
+    async def redeliver_dead_letters(self, limit: int = 100) -> Dict[str, int]:
+        """Try dead-lettered notifications again; a letter is removed only once its message is delivered"""
+        collection = self.get_dead_letters()
+        now = datetime.utcnow()
+        unclaimed = {"$or": [{"claimed_until": None}, {"claimed_until": {"$lte": now}}]}
+        letters = await collection.find(unclaimed).sort("created_at", 1).limit(limit).to_list(None)
+
+        async def redeliver(letter):
+            # Claimed atomically so concurrent runs on other workers skip it
+            claimed = await collection.find_one_and_update(
+                {"_id": letter["_id"], **unclaimed},
+                {"$set": {"claimed_until": now + timedelta(seconds=DEAD_LETTER_CLAIM_SECONDS)}},
+            )
+            if claimed is None:
+                return None
+            delivered = await self._deliver(claimed["channel"], claimed["operation"], claimed["payload"],
+                                            claimed.get("account"), claimed.get("retry_key"), letter_id=claimed["_id"])
+            if delivered:
+                await collection.delete_one({"_id": claimed["_id"]})
+            return delivered
+
+        results = [result for result in await asyncio.gather(*(redeliver(letter) for letter in letters)) if result is not None]
+        return {"attempted": len(results), "delivered": sum(results)}
+
+    async def line_push(self, to: str, messages: Union[Any, List[Any]]) -> bool:
+        return await self.deliver("line", "push", line_push_payload(to, messages))
+
+    async def line_reply(self, reply_token: str, messages: Union[Any, List[Any]]) -> bool:
+        return await self.deliver("line", "reply", {"replyToken": reply_token, "messages": line_messages(messages)[:LINE_MAX_MESSAGES]})
+
+    async def line_multicast(self, to: List[str], messages: Union[Any, List[Any]]) -> bool:
+        """Send the same messages to many users, LINE_MULTICAST_MAX_RECIPIENTS per request"""
+        payload_messages = line_messages(messages)[:LINE_MAX_MESSAGES]
+        results = await asyncio.gather(*(
+            self.deliver("line", "multicast", {"to": to[start:start + LINE_MULTICAST_MAX_RECIPIENTS], "messages": payload_messages})
+            for start in range(0, len(to), LINE_MULTICAST_MAX_RECIPIENTS)
+        ))
+        return all(results)
+
+    async def telegram_message(self, chat_id: str, text: str, parse_mode: str = "HTML", account: Optional[str] = None) -> bool:
+        return await self.deliver("telegram", "sendMessage", {"chat_id": chat_id, "text": text, "parse_mode": parse_mode}, account)
+
+    async def email(self, to: Union[str, List[str]], subject: str, body: str, html: bool = False) -> bool:
+        return await self.deliver("email", "send", {"to": [to] if isinstance(to, str) else list(to), "subject": subject, "body": body, "html": html})
+
+    async def stop(self) -> None:
+        """Wait for background deliveries and close the HTTP connection pool"""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            channel: {
+                **self._stats[channel],
+                "rate_per_second": limit.rate_per_second,
+                "burst": limit.burst,
+                "concurrency": limit.concurrency,
+            }
+            for channel, limit in self.limits.items()
+        }
+
+
+# Global notification dispatcher instance
+notification_dispatcher = NotificationDispatcher()
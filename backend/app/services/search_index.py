@@ -0,0 +1,583 @@
+"""
+Patient and student search index for EVEP Platform
+In-memory inverted index over normalized Thai/Latin name prefixes, name
+trigrams and CID digit prefixes. Each worker loads it from MongoDB at startup,
+applies its own writes from the event bus as they happen and picks up other
+workers' writes with a periodic catch-up on updated_at. Matches are ranked by
+how well each query token matched (exact, prefix, infix) and on which field.
+"""
+
+import asyncio
+import bisect
+import heapq
+import logging
+import re
+import sys
+import time
+import unicodedata
+from array import array
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple, Union
+
+from bson import ObjectId
+
+from app.core import metrics
+from app.core.config import settings
+from app.core.database import get_patients_collection, get_students_collection
+from app.core.event_bus import event_bus
+from app.services.dashboard_stats import DOCUMENT_CHANGED_EVENT
+
+logger = logging.getLogger(__name__)
+
+NGRAM = 3
+
+# Term fields, one character per indexed term, and the weight of a match on each
+NAME, FULL_NAME, CID, CODE, EMAIL, SCHOOL = "n", "f", "c", "k", "e", "s"
+FIELD_WEIGHTS = {NAME: 4, FULL_NAME: 3, CID: 4, CODE: 4, EMAIL: 2, SCHOOL: 1}
+# Fields matched inside a word through trigrams; the others only by prefix
+INFIX_FIELDS = NAME + EMAIL + SCHOOL
+
+# How a query token matched a term
+EXACT, PREFIX, INFIX = 3, 2, 1
+
+# Prefix ranges up to this many terms are walked shortest term first; wider
+# ranges (one or two letter queries) are walked in sorted order
+RANKED_PREFIX_TERMS = 2000
+# Postings counted per token when choosing which token of a multi-word query
+# drives the candidate walk
+DRIVING_TOKEN_COST_CAP = 50000
+# Typeahead stops collecting once it has this many times the requested matches,
+# or after looking at this many candidates
+TYPEAHEAD_OVERSCAN = 3
+TYPEAHEAD_SCAN_LIMIT = 20000
+# Catch-up overlap for clock differences between the workers stamping updated_at
+CLOCK_SKEW = timedelta(seconds=30)
+
+# Thai tone marks, mai taikhu and thanthakhat are often left out when typing,
+# so they are folded away on both sides; Thai digits become ASCII digits.
+# NFKC already maps sara am to nikhahit + sara aa, however it was typed.
+THAI_MARKS = "\u0e47\u0e48\u0e49\u0e4a\u0e4b\u0e4c"
+ZERO_WIDTH = "\u200b\u200c\u200d\u2060\ufeff"
+FOLD_TABLE = str.maketrans({
+    **{mark: None for mark in THAI_MARKS + ZERO_WIDTH},
+    **{chr(0x0E50 + digit): str(digit) for digit in range(10)},
+})
+# Thai vowels and marks are not \w, so the Thai block is kept explicitly
+SEPARATORS = re.compile(r"(?:[^\w\u0e00-\u0e7f]|_)+")
+NON_DIGITS = re.compile(r"\D+")
+DASHED_DIGITS = re.compile(r"\d[\d.\-]*\d")
+
+
+class SearchSource(NamedTuple):
+    """Where an indexed kind keeps the fields the index reads"""
+    school_field: str
+    grade_field: str
+    owner_field: str
+    email_field: Optional[str]
+    code_field: Optional[str]
+
+
+SOURCES = {
+    "patients": SearchSource("school", "grade", "parent_email", "parent_email", None),
+    "students": SearchSource("school_name", "grade_level", "parent_id", None, "student_code"),
+}
+# Event bus collection names of the indexed kinds
+EVENT_COLLECTIONS = {"patients": "patients", "evep.students": "students"}
+
+
+def projection(kind: str) -> Dict[str, int]:
+    """Fields loaded from MongoDB for one kind"""
+    source = SOURCES[kind]
+    fields = ["first_name", "last_name", "cid", "citizen_id", "is_active", "status",
+              source.school_field, source.grade_field, source.owner_field, source.email_field, source.code_field]
+    return {field: 1 for field in fields if field}
+
+
+def fold(text: str) -> str:
+    """Case, width, tone mark and digit folded form of a text"""
+    return unicodedata.normalize("NFKC", text).casefold().translate(FOLD_TABLE)
+
+
+def words(text: Any) -> List[str]:
+    """Folded words of a field value"""
+    if not text:
+        return []
+    return [word for word in SEPARATORS.split(fold(str(text))) if word]
+
+
+# Honorifics dropped from queries, whole or as a dotted abbreviation in front of a name
+TITLES = frozenset(fold(title) for title in (
+    "นาย", "นาง", "นางสาว", "เด็กชาย", "เด็กหญิง", "ด.ช.", "ด.ญ.", "น.ส.", "mr", "mr.", "mrs", "mrs.", "ms", "ms.", "miss"))
+TITLE_ABBREVIATION = re.compile(r"^(?:ด\.ช\.|ด\.ญ\.|น\.ส\.)")
+
+
+def ngrams(term: str) -> Set[str]:
+    """Distinct character trigrams of a term"""
+    return {term[start:start + NGRAM] for start in range(len(term) - NGRAM + 1)}
+
+
+def query_tokens(text: str) -> List[str]:
+    """Folded query tokens, without honorifics or the domain of an email address"""
+    chunks = [TITLE_ABBREVIATION.sub("", fold(chunk)).split("@", 1)[0] for chunk in text.split()]
+    if len(chunks) > 1:
+        chunks = [chunk for chunk in chunks if chunk not in TITLES] or chunks
+    tokens: List[str] = []
+    for chunk in chunks:
+        # A CID typed with dashes or dots is one token
+        if DASHED_DIGITS.fullmatch(chunk):
+            chunk = NON_DIGITS.sub("", chunk)
+        for word in SEPARATORS.split(chunk):
+            if word and word not in tokens:
+                tokens.append(word)
+    return tokens
+
+
+class SearchEntry(NamedTuple):
+    """A patient or student as held by the index"""
+    kind: str
+    id: str
+    label: str
+    terms: Tuple[str, ...]
+    fields: str
+    school: Optional[str]
+    grade: Optional[str]
+    owner: Optional[str]
+    active: bool
+
+    def value(self, field: str) -> Optional[str]:
+        """First indexed term of a field, e.g. the CID digits"""
+        index = self.fields.find(field)
+        return self.terms[index] if index >= 0 else None
+
+
+class SearchHit(NamedTuple):
+    entry: SearchEntry
+    score: int
+
+
+def _intern(value: Any) -> Optional[str]:
+    return sys.intern(str(value)) if value is not None else None
+
+
+def entry_for(kind: str, document: Dict[str, Any]) -> SearchEntry:
+    """Index entry of a patient or student document"""
+    source = SOURCES[kind]
+    terms: Dict[str, str] = {}
+
+    def add(term: str, field: str) -> None:
+        if term and FIELD_WEIGHTS[field] > FIELD_WEIGHTS.get(terms.get(term), 0):
+            terms[term] = field
+
+    first_name = str(document.get("first_name") or "").strip()
+    last_name = str(document.get("last_name") or "").strip()
+    names = words(first_name) + words(last_name)
+    for name in names:
+        add(sys.intern(name), NAME)
+    # Thai names are often typed without the space between first and last name
+    if len(names) > 1:
+        add("".join(names), FULL_NAME)
+    # Older patient records keep the CID in citizen_id
+    add(NON_DIGITS.sub("", fold(str(document.get("cid") or document.get("citizen_id") or ""))), CID)
+    if source.code_field:
+        add("".join(words(document.get(source.code_field))), CODE)
+    if source.email_field:
+        for word in words(str(document.get(source.email_field) or "").split("@", 1)[0]):
+            add(word, EMAIL)
+    for word in words(document.get(source.school_field)):
+        add(sys.intern(word), SCHOOL)
+
+    if kind == "students":
+        active = document.get("status", "active") == "active"
+    else:
+        active = document.get("is_active", True) is not False
+    return SearchEntry(
+        kind=kind,
+        id=str(document["_id"]),
+        label=f"{first_name} {last_name}".strip(),
+        terms=tuple(terms),
+        fields=sys.intern("".join(terms.values())),
+        school=_intern(document.get(source.school_field)),
+        grade=_intern(document.get(source.grade_field)),
+        owner=_intern(document.get(source.owner_field)),
+        active=active,
+    )
+
+
+def score_entry(tokens: List[str], entry: SearchEntry) -> int:
+    """Rank score of an entry, 0 unless every token matches one of its terms"""
+    total = 0
+    for token in tokens:
+        infix = len(token) >= NGRAM and not token.isdigit()
+        best = 0
+        for term, field in zip(entry.terms, entry.fields):
+            if term.startswith(token):
+                match = EXACT if len(term) == len(token) else PREFIX
+            elif infix and field in INFIX_FIELDS and token in term:
+                match = INFIX
+            else:
+                continue
+            best = max(best, match * FIELD_WEIGHTS[field])
+        if not best:
+            return 0
+        total += best
+    return total
+
+
+class SearchIndex:
+    """In-memory inverted index over patients and students"""
+
+    def __init__(
+        self,
+        sources: Optional[Dict[str, Callable[[], Any]]] = None,
+        refresh_interval_seconds: Optional[float] = None,
+        load_batch_size: Optional[int] = None,
+    ):
+        self.sources = sources if sources is not None else {"patients": get_patients_collection, "students": get_students_collection}
+        self.refresh_interval_seconds = (
+            refresh_interval_seconds if refresh_interval_seconds is not None else settings.SEARCH_INDEX_REFRESH_SECONDS
+        )
+        self.load_batch_size = load_batch_size or settings.SEARCH_INDEX_LOAD_BATCH_SIZE
+        self.ready = False
+        # Entries by slot; postings hold slots and are never rewritten, so a
+        # posting whose entry no longer has the term is skipped at query time
+        self._entries: List[Optional[SearchEntry]] = []
+        self._slots: Dict[Tuple[str, str], int] = {}
+        self._free: List[int] = []
+        self._groups: Dict[Tuple[str, str], Set[int]] = defaultdict(set)
+        self._terms: List[str] = []
+        self._term_ids: Dict[str, int] = {}
+        # A term found in one document keeps that slot as a plain int
+        self._postings: List[Union[int, array]] = []
+        self._grammed = bytearray()
+        self._sorted_terms: List[str] = []
+        self._grams: Dict[str, array] = {}
+        self._bulk = False
+        self._synced_at: Optional[datetime] = None
+        self._subscribed = False
+        self._task: Optional[asyncio.Task] = None
+        self._stats: Dict[str, Any] = {
+            "load_seconds": None, "refreshes": 0, "refreshed_documents": 0, "refresh_errors": 0, "events": 0,
+        }
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def _index_term(self, term: str, field: str, slot: Optional[int]) -> None:
+        """Add a slot to a term's posting list, creating the term on first use"""
+        term_id = self._term_ids.get(term)
+        if term_id is None:
+            term_id = len(self._terms)
+            self._terms.append(term)
+            self._term_ids[term] = term_id
+            self._postings.append(slot)
+            self._grammed.append(0)
+            if self._bulk:
+                self._sorted_terms.append(term)
+            else:
+                bisect.insort(self._sorted_terms, term)
+        elif slot is not None:
+            posting = self._postings[term_id]
+            if type(posting) is int:
+                self._postings[term_id] = array("i", (posting, slot))
+            else:
+                posting.append(slot)
+        if field in INFIX_FIELDS and not self._grammed[term_id] and not term.isdigit():
+            self._grammed[term_id] = 1
+            for gram in ngrams(term):
+                self._grams.setdefault(gram, array("i")).append(term_id)
+
+    def _group_keys(self, entry: SearchEntry) -> List[Tuple[str, str]]:
+        keys = []
+        if entry.owner is not None:
+            keys.append(("owner", entry.owner))
+        if entry.school is not None:
+            keys.append(("school", entry.school))
+        return keys
+
+    def add(self, entry: SearchEntry) -> None:
+        """Index an entry, replacing the entry of the same document"""
+        key = (entry.kind, entry.id)
+        slot = self._slots.get(key)
+        previous = None
+        if slot is None:
+            if self._free:
+                slot = self._free.pop()
+            else:
+                slot = len(self._entries)
+                self._entries.append(None)
+            self._slots[key] = slot
+        else:
+            previous = self._entries[slot]
+            for group in self._group_keys(previous):
+                self._groups[group].discard(slot)
+        self._entries[slot] = entry
+        for group in self._group_keys(entry):
+            self._groups[group].add(slot)
+
+        known = set(previous.terms) if previous is not None else ()
+        for term, field in zip(entry.terms, entry.fields):
+            self._index_term(term, field, slot if term not in known else None)
+
+    def add_many(self, entries: List[SearchEntry]) -> None:
+        """Index a batch of entries, sorting the term list once at the end"""
+        if self._bulk or len(entries) < 100:
+            for entry in entries:
+                self.add(entry)
+            return
+        self._bulk = True
+        try:
+            for entry in entries:
+                self.add(entry)
+        finally:
+            self._bulk = False
+            self._sorted_terms.sort()
+
+    def remove(self, kind: str, document_id: str) -> bool:
+        """Drop a document from the index"""
+        slot = self._slots.pop((kind, document_id), None)
+        if slot is None:
+            return False
+        for group in self._group_keys(self._entries[slot]):
+            self._groups[group].discard(slot)
+        self._entries[slot] = None
+        self._free.append(slot)
+        return True
+
+    def _term_matches(self, token: str) -> Iterator[int]:
+        """Ids of terms a query token matches, exact match first, then prefixes, then infixes"""
+        lo = bisect.bisect_left(self._sorted_terms, token)
+        hi = bisect.bisect_left(self._sorted_terms, token + "\U0010ffff", lo)
+        if hi - lo <= RANKED_PREFIX_TERMS:
+            prefixed: Iterable[str] = sorted(self._sorted_terms[lo:hi], key=len)
+        else:
+            prefixed = (self._sorted_terms[position] for position in range(lo, hi))
+        for term in prefixed:
+            yield self._term_ids[term]
+
+        if len(token) >= NGRAM and not token.isdigit():
+            grams = [self._grams.get(gram) for gram in ngrams(token)]
+            if all(grams):
+                for term_id in min(grams, key=len):
+                    term = self._terms[term_id]
+                    if token in term and not term.startswith(token):
+                        yield term_id
+
+    def _cost(self, token: str, cap: int) -> int:
+        """Estimated number of candidates of a token, exact up to a cap for narrow prefixes"""
+        lo = bisect.bisect_left(self._sorted_terms, token)
+        hi = bisect.bisect_left(self._sorted_terms, token + "\U0010ffff", lo)
+        if hi - lo > RANKED_PREFIX_TERMS:
+            # Terms in the range, a lower bound on their postings
+            return hi - lo
+        cost = 0
+        for position in range(lo, hi):
+            posting = self._postings[self._term_ids[self._sorted_terms[position]]]
+            cost += 1 if type(posting) is int else len(posting)
+            if cost > cap:
+                return cost
+        if len(token) >= NGRAM and not token.isdigit():
+            # Terms sharing the rarest trigram bound the infix matches
+            cost += min(len(self._grams.get(gram, ())) for gram in ngrams(token))
+        return cost
+
+    def _driving_token(self, tokens: List[str]) -> str:
+        """The query token with the fewest candidates, longest tokens tried first"""
+        ordered = sorted(tokens, key=len, reverse=True)
+        best, best_cost = ordered[0], None
+        for token in ordered:
+            cost = self._cost(token, best_cost if best_cost is not None else DRIVING_TOKEN_COST_CAP)
+            if best_cost is None or cost < best_cost:
+                best, best_cost = token, cost
+        return best
+
+    def _candidates(self, token: str) -> Iterator[int]:
+        for term_id in self._term_matches(token):
+            posting = self._postings[term_id]
+            if type(posting) is int:
+                yield posting
+            else:
+                yield from posting
+
+    def search(
+        self,
+        text: str,
+        kind: Optional[str] = None,
+        owner: Optional[str] = None,
+        school: Optional[str] = None,
+        grade: Optional[str] = None,
+        active: Optional[bool] = None,
+        limit: int = 10,
+        skip: int = 0,
+        exhaustive: bool = True,
+    ) -> Tuple[List[SearchHit], int]:
+        """
+        Ranked matches of a query and how many there are
+
+        Every query token has to match a term of an entry. Exhaustive searches
+        score every candidate, so the count is exact. Otherwise (typeahead)
+        collection stops after a few times the requested number of matches, and
+        the count only says how many were found before it stopped.
+        """
+        started = time.perf_counter()
+        tokens = query_tokens(text)
+        if not tokens:
+            return [], 0
+
+        groups = [self._groups.get(group, set()) for group in (("owner", owner), ("school", school)) if group[1] is not None]
+        if groups:
+            candidates: Iterable[int] = min(groups, key=len)
+        else:
+            candidates = self._candidates(self._driving_token(tokens) if len(tokens) > 1 else tokens[0])
+
+        wanted = skip + limit
+        budget = None if exhaustive else wanted * TYPEAHEAD_OVERSCAN
+        ranked: List[Tuple[int, int, str, int]] = []
+        seen: Set[int] = set()
+        for slot in candidates:
+            if slot in seen:
+                continue
+            seen.add(slot)
+            if budget is not None and len(seen) > TYPEAHEAD_SCAN_LIMIT:
+                break
+            entry = self._entries[slot]
+            if (entry is None
+                    or (kind is not None and entry.kind != kind)
+                    or (owner is not None and entry.owner != owner)
+                    or (school is not None and entry.school != school)
+                    or (grade is not None and entry.grade != grade)
+                    or (active is not None and entry.active != active)):
+                continue
+            score = score_entry(tokens, entry)
+            if score:
+                ranked.append((-score, len(entry.label), entry.label, slot))
+                if budget is not None and len(ranked) >= budget:
+                    break
+
+        hits = [SearchHit(self._entries[slot], -negative_score)
+                for negative_score, _, _, slot in heapq.nsmallest(wanted, ranked)[skip:]]
+        metrics.SEARCH_DURATION.labels(endpoint="search" if exhaustive else "typeahead").observe(
+            time.perf_counter() - started)
+        return hits, len(ranked)
+
+    async def apply_change(self, payload: Dict[str, Any]) -> None:
+        """Apply a write published on the event bus"""
+        kind = EVENT_COLLECTIONS.get(payload.get("collection"))
+        if kind is None:
+            return
+        self._stats["events"] += 1
+        after, before = payload.get("after"), payload.get("before")
+        if after is not None and after.get("_id") is not None:
+            self.add(entry_for(kind, after))
+        elif after is None and before is not None and before.get("_id") is not None:
+            self.remove(kind, str(before["_id"]))
+        metrics.SEARCH_INDEX_ENTRIES.set(len(self._slots))
+
+    async def load(self) -> int:
+        """Index every patient and student from MongoDB"""
+        started_at = datetime.utcnow()
+        started = time.perf_counter()
+        loaded = 0
+        # New terms are appended during the load and the term list sorted once
+        self._bulk = True
+        try:
+            for kind, get_collection in self.sources.items():
+                batch: List[SearchEntry] = []
+                async for document in get_collection().find({}, projection(kind)).batch_size(self.load_batch_size):
+                    batch.append(entry_for(kind, document))
+                    if len(batch) >= self.load_batch_size:
+                        self.add_many(batch)
+                        loaded += len(batch)
+                        batch = []
+                        # Let requests run between batches
+                        await asyncio.sleep(0)
+                self.add_many(batch)
+                loaded += len(batch)
+        finally:
+            self._bulk = False
+            self._sorted_terms.sort()
+        self._synced_at = started_at
+        self.ready = True
+        self._stats["load_seconds"] = round(time.perf_counter() - started, 3)
+        metrics.SEARCH_INDEX_ENTRIES.set(len(self._slots))
+        logger.info(f"Search index loaded {loaded} documents in {self._stats['load_seconds']}s")
+        return loaded
+
+    async def refresh(self) -> int:
+        """Re-index documents updated since the last sync, written by any worker"""
+        started_at = datetime.utcnow()
+        since = self._synced_at - CLOCK_SKEW
+        # updated_at is a BSON date on some writes and an ISO string on others
+        changed = {"$or": [{"updated_at": {"$gte": since}}, {"updated_at": {"$gte": since.isoformat()}}]}
+        refreshed = 0
+        for kind, get_collection in self.sources.items():
+            documents = await get_collection().find(changed, projection(kind)).to_list(length=None)
+            self.add_many([entry_for(kind, document) for document in documents])
+            refreshed += len(documents)
+        self._synced_at = started_at
+        self._stats["refreshes"] += 1
+        self._stats["refreshed_documents"] += refreshed
+        metrics.SEARCH_INDEX_ENTRIES.set(len(self._slots))
+        return refreshed
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                if self.ready:
+                    await self.refresh()
+                else:
+                    await self.load()
+            except Exception as e:
+                self._stats["refresh_errors"] += 1
+                logger.error(f"Search index {'refresh' if self.ready else 'load'} failed: {e}")
+            await asyncio.sleep(self.refresh_interval_seconds)
+
+    def start(self) -> None:
+        if not settings.SEARCH_INDEX_ENABLED:
+            return
+        if not self._subscribed:
+            event_bus.subscribe(DOCUMENT_CHANGED_EVENT, self.apply_change)
+            self._subscribed = True
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "ready": self.ready,
+            "entries": len(self._slots),
+            "terms": len(self._terms),
+            "trigrams": len(self._grams),
+            "postings": sum(1 if type(posting) is int else len(posting) for posting in self._postings),
+            "synced_at": self._synced_at.isoformat() if self._synced_at else None,
+            "running": self._task is not None and not self._task.done(),
+        }
+
+
+def regex_filter(text: str, fields: Iterable[str]) -> Dict[str, Any]:
+    """Escaped case-insensitive $regex filter used while the index is not loaded"""
+    pattern = re.escape(text.strip())
+    return {"$or": [{field: {"$regex": pattern, "$options": "i"}} for field in fields]}
+
+
+async def fetch_hits(collection, hits: List[SearchHit], projection: Optional[Dict[str, int]] = None) -> List[Dict[str, Any]]:
+    """Load the documents of ranked hits in one query, in rank order"""
+    if not hits:
+        return []
+    ids = [ObjectId(hit.entry.id) if ObjectId.is_valid(hit.entry.id) else hit.entry.id for hit in hits]
+    documents = await collection.find({"_id": {"$in": ids}}, projection).to_list(length=None)
+    by_id = {str(document["_id"]): document for document in documents}
+    return [by_id[hit.entry.id] for hit in hits if hit.entry.id in by_id]
+
+
+# Global search index instance
+search_index = SearchIndex()
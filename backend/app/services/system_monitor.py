@@ -0,0 +1,301 @@
+"""
+System monitor for EVEP Platform
+Samples process and host resources and MongoDB statistics on a background
+interval, together with the event loop lag the /metrics probe measures, and
+keeps a ring buffer of recent samples, so the admin
+monitoring endpoints serve the latest values and chart history without doing
+any measurement per request
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Any, Deque, Dict, List, Optional
+
+import psutil
+
+from app.core.config import settings
+from app.core.database import get_database
+from app.core.metrics import event_loop_lag_monitor
+
+logger = logging.getLogger(__name__)
+
+# Numeric sample fields that can be charted through the time-series endpoint
+TIMESERIES_METRICS = (
+    "cpu_usage",
+    "memory_usage",
+    "disk_usage",
+    "network_usage",
+    "network_bytes_sent_per_sec",
+    "network_bytes_recv_per_sec",
+    "process_cpu_percent",
+    "process_rss_bytes",
+    "process_open_fds",
+    "process_threads",
+    "active_connections",
+    "event_loop_lag_ms",
+    "db_connections",
+    "db_operations_per_sec",
+    "db_data_size",
+    "db_storage_size",
+    "db_index_size",
+)
+
+BACKUP_FILE_PREFIX = "evep_mongodb_backup_"
+
+WARNING_USAGE_PERCENT = 75
+CRITICAL_USAGE_PERCENT = 90
+WARNING_LOOP_LAG_MS = 250
+CRITICAL_LOOP_LAG_MS = 1000
+
+
+def system_health(sample: Dict[str, Any]) -> str:
+    """Classify a sample as healthy, warning or critical"""
+    usage = max(sample.get("cpu_usage", 0), sample.get("memory_usage", 0), sample.get("disk_usage", 0))
+    lag = sample.get("event_loop_lag_ms", 0)
+    if usage >= CRITICAL_USAGE_PERCENT or lag >= CRITICAL_LOOP_LAG_MS or sample.get("database_status") == "offline":
+        return "critical"
+    if usage >= WARNING_USAGE_PERCENT or lag >= WARNING_LOOP_LAG_MS:
+        return "warning"
+    return "healthy"
+
+
+def list_backups(backup_path: str) -> List[Dict[str, Any]]:
+    """Describe the mongodump archives in the backup directory, newest first"""
+    try:
+        entries = list(os.scandir(backup_path))
+    except OSError:
+        return []
+    backups = []
+    for entry in entries:
+        if not entry.is_file() or not entry.name.startswith(BACKUP_FILE_PREFIX):
+            continue
+        stat = entry.stat()
+        backups.append({
+            "id": entry.name,
+            "name": entry.name.split(".", 1)[0],
+            "size": stat.st_size,
+            "created_at": datetime.utcfromtimestamp(stat.st_mtime).isoformat() + "Z",
+            "status": "completed",
+            "type": "full"
+        })
+    backups.sort(key=lambda backup: backup["created_at"], reverse=True)
+    return backups
+
+
+class SystemMonitor:
+    """Background collector keeping a ring buffer of system samples"""
+
+    def __init__(
+        self,
+        interval_seconds: float = settings.SYSTEM_MONITOR_INTERVAL_SECONDS,
+        history_size: int = settings.SYSTEM_MONITOR_HISTORY_SIZE,
+        db_interval_seconds: float = settings.SYSTEM_MONITOR_DB_INTERVAL_SECONDS,
+        backup_path: str = settings.BACKUP_STORAGE_PATH,
+        disk_path: str = "/",
+    ):
+        self.interval_seconds = interval_seconds
+        self.db_interval_seconds = db_interval_seconds
+        self.backup_path = backup_path
+        self.disk_path = disk_path
+        self.history: Deque[Dict[str, Any]] = deque(maxlen=history_size)
+        self.database_stats: Optional[Dict[str, Any]] = None
+        self.backups: List[Dict[str, Any]] = []
+        self._process = psutil.Process()
+        self._network: Optional[tuple] = None
+        self._opcounters: Optional[tuple] = None
+        self._db_sampled_at = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def _link_speed_bytes(self) -> float:
+        """Combined speed of the non-loopback interfaces that are up, in bytes per second"""
+        speed_mbps = sum(
+            stats.speed for name, stats in psutil.net_if_stats().items()
+            if stats.isup and stats.speed > 0 and not name.startswith("lo")
+        )
+        return speed_mbps * 1_000_000 / 8
+
+    def _sample_host(self) -> Dict[str, Any]:
+        """Process and host resource usage; blocking, so it runs in a worker thread"""
+        now = time.monotonic()
+        process = self._process
+        with process.oneshot():
+            process_cpu = process.cpu_percent(None)
+            rss = process.memory_info().rss
+            open_fds = process.num_fds() if hasattr(process, "num_fds") else process.num_handles()
+            threads = process.num_threads()
+            started_at = process.create_time()
+        get_connections = getattr(process, "net_connections", None) or process.connections
+        active_connections = sum(1 for conn in get_connections(kind="inet") if conn.status == psutil.CONN_ESTABLISHED)
+
+        counters = psutil.net_io_counters()
+        sent_rate = recv_rate = 0.0
+        if self._network is not None:
+            elapsed = max(now - self._network[0], 1e-6)
+            sent_rate = max(counters.bytes_sent - self._network[1], 0) / elapsed
+            recv_rate = max(counters.bytes_recv - self._network[2], 0) / elapsed
+        self._network = (now, counters.bytes_sent, counters.bytes_recv)
+        link_speed = self._link_speed_bytes()
+
+        return {
+            "cpu_usage": psutil.cpu_percent(None),
+            "memory_usage": psutil.virtual_memory().percent,
+            "disk_usage": psutil.disk_usage(self.disk_path).percent,
+            "network_usage": round(min(100.0, (sent_rate + recv_rate) * 100 / link_speed), 2) if link_speed else 0.0,
+            "network_bytes_sent_per_sec": round(sent_rate, 1),
+            "network_bytes_recv_per_sec": round(recv_rate, 1),
+            "process_cpu_percent": process_cpu,
+            "process_rss_bytes": rss,
+            "process_open_fds": open_fds,
+            "process_threads": threads,
+            "active_connections": active_connections,
+            "uptime": int(time.time() - started_at),
+        }
+
+    async def _sample_database(self) -> Dict[str, Any]:
+        """dbStats, serverStatus and collStats for the application database"""
+        db = get_database().evep
+        db_stats = await db.command("dbStats")
+        try:
+            server_status = await db.command("serverStatus")
+        except Exception as e:
+            # serverStatus needs the clusterMonitor role, which restricted users may lack
+            logger.warning(f"serverStatus unavailable: {e}")
+            server_status = {}
+
+        names = sorted(await db.list_collection_names())
+        results = await asyncio.gather(*(db.command("collStats", name) for name in names), return_exceptions=True)
+        collections = []
+        for name, result in zip(names, results):
+            if isinstance(result, Exception):
+                continue
+            collections.append({
+                "name": name,
+                "count": result.get("count", 0),
+                "size": result.get("size", 0),
+                "avg_obj_size": result.get("avgObjSize", 0),
+                "indexes": result.get("nindexes", 0),
+                "storage_size": result.get("storageSize", 0),
+                "index_size": result.get("totalIndexSize", 0),
+            })
+
+        operations_per_sec = 0.0
+        opcounters = server_status.get("opcounters")
+        if opcounters:
+            now = time.monotonic()
+            total_ops = sum(value for value in opcounters.values() if isinstance(value, (int, float)))
+            if self._opcounters is not None:
+                operations_per_sec = max(total_ops - self._opcounters[1], 0) / max(now - self._opcounters[0], 1e-6)
+            self._opcounters = (now, total_ops)
+
+        connections = server_status.get("connections", {})
+        mem = server_status.get("mem", {})
+        return {
+            "name": db_stats.get("db", "evep"),
+            "size": db_stats.get("storageSize", 0) + db_stats.get("indexSize", 0),
+            "collections": db_stats.get("collections", len(names)),
+            "indexes": db_stats.get("indexes", 0),
+            "status": "online",
+            "connections": connections.get("current", 0),
+            "available_connections": connections.get("available", 0),
+            "operations_per_sec": round(operations_per_sec, 1),
+            "opcounters": opcounters or {},
+            "resident_memory_mb": mem.get("resident", 0),
+            "data_size": db_stats.get("dataSize", 0),
+            "index_size": db_stats.get("indexSize", 0),
+            "storage_size": db_stats.get("storageSize", 0),
+            "objects": db_stats.get("objects", 0),
+            "collection_stats": collections,
+            "uptime": server_status.get("uptime", 0),
+            "version": server_status.get("version"),
+            "sampled_at": datetime.utcnow().isoformat(),
+        }
+
+    async def sample(self) -> Dict[str, Any]:
+        """Take one sample and append it to the history"""
+        sample = await asyncio.to_thread(self._sample_host)
+
+        if self.database_stats is None or time.monotonic() - self._db_sampled_at >= self.db_interval_seconds:
+            self._db_sampled_at = time.monotonic()
+            try:
+                self.database_stats = await self._sample_database()
+            except Exception as e:
+                logger.error(f"Database stats sampling failed: {e}")
+                self.database_stats = {"status": "offline", "error": str(e), "sampled_at": datetime.utcnow().isoformat()}
+            self.backups = await asyncio.to_thread(list_backups, self.backup_path)
+
+        database = self.database_stats
+        sample.update({
+            "timestamp": datetime.utcnow().isoformat(),
+            # Measured by the /metrics loop-lag probe; the peak since the last sample
+            "event_loop_lag_ms": round(event_loop_lag_monitor.take_peak() * 1000, 2),
+            "database_status": database.get("status", "offline"),
+            "db_connections": database.get("connections", 0),
+            "db_operations_per_sec": database.get("operations_per_sec", 0),
+            "db_data_size": database.get("data_size", 0),
+            "db_storage_size": database.get("storage_size", 0),
+            "db_index_size": database.get("index_size", 0),
+            "last_backup": self.backups[0]["created_at"] if self.backups else None,
+        })
+        sample["system_health"] = system_health(sample)
+        self.history.append(sample)
+        return sample
+
+    async def latest(self) -> Dict[str, Any]:
+        """Most recent sample, taking a first one if the collector has not run yet"""
+        if not self.history:
+            return await self.sample()
+        return self.history[-1]
+
+    async def latest_database_stats(self) -> Dict[str, Any]:
+        if self.database_stats is None:
+            await self.sample()
+        return self.database_stats
+
+    async def latest_backups(self) -> List[Dict[str, Any]]:
+        if self.database_stats is None:
+            await self.sample()
+        return self.backups
+
+    def timeseries(self, metrics: List[str], minutes: Optional[float] = None) -> Dict[str, Any]:
+        """Column-oriented history for charting, optionally limited to the last N minutes"""
+        samples = list(self.history)
+        if minutes is not None and samples:
+            cutoff = (datetime.utcnow() - timedelta(minutes=minutes)).isoformat()
+            samples = [s for s in samples if s["timestamp"] >= cutoff]
+        return {
+            "interval_seconds": self.interval_seconds,
+            "timestamps": [s["timestamp"] for s in samples],
+            "series": {metric: [s.get(metric) for s in samples] for metric in metrics},
+        }
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.sample()
+            except Exception as e:
+                logger.error(f"System monitor sampling failed: {e}")
+            await asyncio.sleep(self.interval_seconds)
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            # Prime the percentage counters, which measure since the previous call
+            self._process.cpu_percent(None)
+            psutil.cpu_percent(None)
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# Global system monitor instance
+system_monitor = SystemMonitor()
@@ -4,7 +4,6 @@ Handles notifications and user approval commands
 """
 
 import asyncio
-import aiohttp
 import json
 from typing import Optional, Dict, Any, List
 from datetime import datetime
@@ -13,35 +12,18 @@ from bson import ObjectId
 from app.core.config import settings
 from app.core.database import get_users_collection, get_audit_logs_collection
 from app.core.security import generate_blockchain_hash
+from app.services.notification_dispatcher import notification_dispatcher
 
 
 class TelegramService:
     def __init__(self):
         self.bot_token = settings.TELEGRAM_BOT_TOKEN
         self.chat_id = settings.TELEGRAM_CHAT_ID
-        self.base_url = f"https://api.telegram.org/bot{self.bot_token}"
         
     async def send_message(self, text: str, parse_mode: str = "HTML") -> bool:
         """Send a message to the configured Telegram chat"""
-        try:
-            url = f"{self.base_url}/sendMessage"
-            payload = {
-                "chat_id": self.chat_id,
-                "text": text,
-                "parse_mode": parse_mode
-            }
-            
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, json=payload) as response:
-                    if response.status == 200:
-                        return True
-                    else:
-                        print(f"Telegram API error: {response.status}")
-                        return False
-                        
-        except Exception as e:
-            print(f"Error sending Telegram message: {e}")
-            return False
+        # Rate limited and retried by the dispatcher; undeliverable messages are dead-lettered
+        return await notification_dispatcher.telegram_message(self.chat_id, text, parse_mode)
     
     async def send_user_registration_notification(self, user_data: Dict[str, Any]) -> bool:
         """Send notification about new user registration"""
@@ -5,80 +5,122 @@ Handles real-time updates, notifications, and live data streaming
 
 import asyncio
 import json
-from datetime import datetime
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any
 from dataclasses import dataclass, asdict
 
 import socketio
 from fastapi import FastAPI
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import DeleteOne, ReplaceOne
 
-from app.core.config import Config
+from app.core.config import Config, settings
 from app.core.database import get_database
+from app.core import metrics
+from app.core.patient_queue import PriorityQueue
+from app.core.presence_store import PresenceTimers, create_presence_store
+from app.core.event_bus import event_bus
+from app.services.dashboard_stats import DOCUMENT_CHANGED_EVENT
 
-# Store connected clients and collaboration data
-connected_clients: Dict[str, Dict[str, Any]] = {}
+# A collaborator with no activity for this long is shown as away
+PRESENCE_TIMEOUT_SECONDS = 60
+
+# Presence changes within this window are coalesced into one active_users_updated per room
+ACTIVE_USERS_DEBOUNCE_SECONDS = 0.5
+
+QUEUE_COLLECTION = "patient_queue"
+
+# Room every queue viewer joins; queue_updated deltas carry the shared queue version, so all viewers need all of them
+QUEUE_ROOM = "patient_queue"
+
+# Assumed screening time per patient until real completions have been observed
+QUEUE_DEFAULT_SERVICE_SECONDS = 600
+
+# Weight of the latest completion in the moving average service time
+QUEUE_SERVICE_SMOOTHING = 0.2
+
+# Patients whose screening was never completed or cancelled leave the queue after this long
+QUEUE_ENTRY_MAX_AGE_SECONDS = 12 * 3600
+
+# How often expired queue entries are looked for
+QUEUE_PRUNE_INTERVAL_SECONDS = 300
+
+# Screening statuses that take the patient off the queue
+QUEUE_FINISHED_STATUSES = ('completed', 'cancelled')
 
 @dataclass
 class PatientQueueItem:
     """Patient queue item data structure"""
     patient_id: str
-    queue_position: int
     current_step: int
     priority: str  # 'high', 'normal', 'low'
     staff_working: List[str]
-    estimated_completion: Optional[datetime]
     created_at: datetime
+    seq: int  # arrival order, FIFO within a priority
     
 class FIFOQueueManager:
-    """FIFO Queue Manager for Patient Screening Workflow"""
+    """FIFO Queue Manager for Patient Screening Workflow
     
-    def __init__(self):
-        self.queue: List[PatientQueueItem] = []
+    Patients are held in a priority queue mirrored to the patient_queue
+    collection. Changes are recorded as they happen so only the changed
+    entries are written back and broadcast
+    """
+    
+    def __init__(self, collection=None):
+        self.queue: PriorityQueue[PatientQueueItem] = PriorityQueue()
         self.step_assignments: Dict[str, List[str]] = {}  # patient_id -> [staff_ids]
+        self.version: Optional[int] = None  # shared queue version this copy reflects
+        self.average_service_seconds = QUEUE_DEFAULT_SERVICE_SECONDS
+        self._collection = collection
+        self._next_seq = 1
+        self._last_served_at: Optional[datetime] = None
+        self._changes: Dict[str, Optional[PatientQueueItem]] = {}  # patient_id -> item, None when removed
     
     def add_patient(self, patient_id: str, priority: str = 'normal') -> int:
         """Add patient to queue and return position"""
         # Check if patient already in queue
-        existing = self.get_patient_in_queue(patient_id)
-        if existing:
-            return existing.queue_position
-        
-        # Determine position based on priority
-        if priority == 'high':
-            # Insert at beginning after other high priority
-            high_priority_count = len([item for item in self.queue if item.priority == 'high'])
-            position = high_priority_count
-        else:
-            # Add to end
-            position = len(self.queue)
+        existing = self.queue.position(patient_id)
+        if existing is not None:
+            return existing
         
         queue_item = PatientQueueItem(
             patient_id=patient_id,
-            queue_position=position + 1,
             current_step=3,  # Start at screening step
             priority=priority,
             staff_working=[],
-            estimated_completion=None,
-            created_at=datetime.now()
+            created_at=datetime.now(),
+            seq=self._next_seq
         )
-        
-        self.queue.insert(position, queue_item)
-        self._update_positions()
-        
-        return queue_item.queue_position
+        self._next_seq += 1
+        self._changes[patient_id] = queue_item
+        return self.queue.push(patient_id, queue_item, priority)
     
-    def remove_patient(self, patient_id: str) -> bool:
-        """Remove patient from queue"""
-        self.queue = [item for item in self.queue if item.patient_id != patient_id]
-        self._update_positions()
+    def remove_patient(self, patient_id: str, served: bool = True) -> bool:
+        """Remove patient from queue; only served patients count toward the service time"""
+        queue_item = self.queue.remove(patient_id)
+        if queue_item is None:
+            return False
+        if served:
+            self._record_service(queue_item)
+        self._changes[patient_id] = None
         return True
     
+    def prune(self, max_age_seconds: float = QUEUE_ENTRY_MAX_AGE_SECONDS, now: Optional[datetime] = None) -> int:
+        """Drop patients queued longer ago than max_age_seconds, e.g. after an abandoned screening"""
+        cutoff = (now or datetime.now()) - timedelta(seconds=max_age_seconds)
+        expired = [item.patient_id for item in self.queue if item.created_at < cutoff]
+        for patient_id in expired:
+            self.remove_patient(patient_id, served=False)
+        return len(expired)
+    
     def assign_staff_to_patient(self, patient_id: str, staff_id: str) -> bool:
         """Assign staff member to patient"""
         queue_item = self.get_patient_in_queue(patient_id)
         if queue_item and staff_id not in queue_item.staff_working:
             queue_item.staff_working.append(staff_id)
+            self._changes[patient_id] = queue_item
             return True
         return False
     
@@ -87,6 +129,7 @@ class FIFOQueueManager:
         queue_item = self.get_patient_in_queue(patient_id)
         if queue_item and staff_id in queue_item.staff_working:
             queue_item.staff_working.remove(staff_id)
+            self._changes[patient_id] = queue_item
             return True
         return False
     
@@ -95,24 +138,124 @@ class FIFOQueueManager:
         queue_item = self.get_patient_in_queue(patient_id)
         if queue_item:
             queue_item.current_step = step
+            self._changes[patient_id] = queue_item
             return True
         return False
     
     def get_patient_in_queue(self, patient_id: str) -> Optional[PatientQueueItem]:
         """Get patient queue item by ID"""
-        return next((item for item in self.queue if item.patient_id == patient_id), None)
+        return self.queue.get(patient_id)
+    
+    def get_patient_position(self, patient_id: str) -> Optional[int]:
+        """1-based queue position of a patient"""
+        return self.queue.position(patient_id)
+    
+    def get_patient_eta(self, patient_id: str, position: Optional[int] = None) -> Optional[datetime]:
+        """Estimated completion from the patient's position and the recent service rate"""
+        position = position or self.queue.position(patient_id)
+        if position is None:
+            return None
+        return datetime.now() + timedelta(seconds=position * self.average_service_seconds)
     
     def get_queue_data(self) -> List[Dict[str, Any]]:
         """Get queue data as serializable dictionaries"""
-        return [asdict(item) for item in self.queue]
+        return [self._serialize(item, position) for position, item in enumerate(self.queue, start=1)]
+    
+    def drain_changes(self) -> Dict[str, Optional[PatientQueueItem]]:
+        """Changes recorded since the last drain"""
+        changes, self._changes = self._changes, {}
+        return changes
+    
+    def discard_changes(self):
+        """Forget unsaved changes; the next transaction reloads the stored queue"""
+        self._changes = {}
+        self.version = None
+    
+    def describe_changes(self, changes: Dict[str, Optional[PatientQueueItem]]) -> List[Dict[str, Any]]:
+        """Delta entries for queue_updated; positions of other patients follow from priority and seq"""
+        delta = []
+        for patient_id, item in changes.items():
+            if item is None:
+                delta.append({'op': 'remove', 'patient_id': patient_id})
+            else:
+                delta.append({'op': 'upsert', 'item': self._serialize(item, self.queue.position(patient_id))})
+        return delta
     
-    def _update_positions(self):
-        """Update queue positions after changes"""
-        for i, item in enumerate(self.queue):
-            item.queue_position = i + 1
+    async def reload(self):
+        """Rebuild the queue from the patient_queue collection"""
+        documents = await self._get_collection().find({}, {'_id': 0}).sort('seq', 1).to_list(length=None)
+        self.queue.clear()
+        self._changes = {}
+        for document in documents:
+            item = PatientQueueItem(
+                patient_id=document['patient_id'],
+                current_step=document.get('current_step', 3),
+                priority=document.get('priority', 'normal'),
+                staff_working=document.get('staff_working', []),
+                created_at=document.get('created_at') or datetime.now(),
+                seq=document['seq']
+            )
+            self.queue.push(item.patient_id, item, item.priority)
+        self._next_seq = documents[-1]['seq'] + 1 if documents else 1
+    
+    async def persist(self, changes: Dict[str, Optional[PatientQueueItem]]):
+        """Write changed entries to the patient_queue collection in one round trip"""
+        operations = [
+            DeleteOne({'_id': patient_id}) if item is None
+            else ReplaceOne({'_id': patient_id}, {'_id': patient_id, **asdict(item)}, upsert=True)
+            for patient_id, item in changes.items()
+        ]
+        if operations:
+            await self._get_collection().bulk_write(operations, ordered=False)
+    
+    def _get_collection(self):
+        if self._collection is None:
+            self._collection = get_database().evep[QUEUE_COLLECTION]
+        return self._collection
+    
+    def _record_service(self, item: PatientQueueItem):
+        """Fold a finished patient into the moving average service time"""
+        now = datetime.now()
+        started = max(item.created_at, self._last_served_at or item.created_at)
+        elapsed = (now - started).total_seconds()
+        self.average_service_seconds += QUEUE_SERVICE_SMOOTHING * (elapsed - self.average_service_seconds)
+        self._last_served_at = now
+    
+    def _serialize(self, item: PatientQueueItem, position: Optional[int]) -> Dict[str, Any]:
+        data = asdict(item)
+        data['queue_position'] = position
+        data['created_at'] = item.created_at.isoformat()
+        eta = self.get_patient_eta(item.patient_id, position)
+        data['estimated_completion'] = eta.isoformat() if eta else None
+        return data
+
+class InstrumentedAsyncServer(socketio.AsyncServer):
+    """Socket.IO server counting emits and room operations for /metrics"""
+
+    async def emit(self, event, data=None, to=None, room=None, skip_sid=None,
+                   namespace=None, callback=None, ignore_queue=False):
+        target = to if to is not None else room
+        metrics.SOCKETIO_EMITS.labels(event, "broadcast" if target is None else "room").inc()
+        return await super().emit(event, data=data, to=to, room=room, skip_sid=skip_sid,
+                                  namespace=namespace, callback=callback, ignore_queue=ignore_queue)
+
+    async def enter_room(self, sid, room, namespace=None):
+        metrics.SOCKETIO_ROOM_OPERATIONS.labels("join").inc()
+        return await super().enter_room(sid, room, namespace=namespace)
+
+    async def leave_room(self, sid, room, namespace=None):
+        metrics.SOCKETIO_ROOM_OPERATIONS.labels("leave").inc()
+        return await super().leave_room(sid, room, namespace=namespace)
+
+def create_client_manager() -> Optional[socketio.AsyncManager]:
+    """Redis pub/sub manager fanning emits out across workers, or None for the in-process default"""
+    if settings.SOCKETIO_REDIS_URL:
+        return socketio.AsyncRedisManager(settings.SOCKETIO_REDIS_URL, channel=settings.SOCKETIO_REDIS_CHANNEL)
+    return None
 
 # Initialize Socket.IO server
-sio = socketio.AsyncServer(
+sio = InstrumentedAsyncServer(
+    client_manager=create_client_manager(),
     async_mode='asgi',
     cors_allowed_origins="*",
     logger=True,
@@ -135,9 +278,13 @@ class RealTimeEvent:
 class SocketIOService:
     """Socket.IO service for managing real-time communication"""
     
-    def __init__(self):
-        self.sio = sio
-        self.connected_clients = connected_clients
+    def __init__(self, server: Optional[socketio.AsyncServer] = None, presence=None):
+        self.sio = server or sio
+        # Clients connected to this worker; the presence store holds every worker's clients
+        self.connected_clients: Dict[str, Dict[str, Any]] = {}
+        self.presence = presence or create_presence_store()
+        self.presence_timers = PresenceTimers(PRESENCE_TIMEOUT_SECONDS)
+        self._pending_active_users: Dict[str, asyncio.Task] = {}
         self.db = None
         self.queue_manager = FIFOQueueManager()  # Add queue manager
     
@@ -147,10 +294,14 @@ class SocketIOService:
         
         # Register event handlers
         self.register_handlers()
+        self.register_collaboration_handlers()
+        self.register_queue_events()
         
         # Start background tasks
         asyncio.create_task(self.health_check_loop())
         asyncio.create_task(self.cleanup_disconnected_clients())
+        asyncio.create_task(self.presence_expiry_loop())
+        asyncio.create_task(self.queue_expiry_loop())
     
     def register_handlers(self):
         """Register Socket.IO event handlers"""
@@ -159,6 +310,7 @@ class SocketIOService:
         async def connect(sid, environ, auth):
             """Handle client connection"""
             print(f"Client connected: {sid}")
+            metrics.SOCKETIO_CONNECTIONS.labels("connect").inc()
             
             # Extract user info from auth
             user_info = self.extract_user_info(auth)
@@ -167,10 +319,14 @@ class SocketIOService:
             self.connected_clients[sid] = {
                 'user_id': user_info.get('user_id'),
                 'role': user_info.get('role'),
-                'rooms': [],
+                'rooms': set(),
                 'connected_at': datetime.now(),
-                'last_activity': datetime.now()
+                'last_activity': datetime.now(),
+                'status': 'active'
             }
+            self.presence_timers.touch(sid)
+            metrics.SOCKETIO_CONNECTED_CLIENTS.inc()
+            await self.publish_presence(sid)
             
             # Join default room based on role
             if user_info.get('role'):
@@ -187,6 +343,7 @@ class SocketIOService:
         async def disconnect(sid):
             """Handle client disconnection"""
             print(f"Client disconnected: {sid}")
+            metrics.SOCKETIO_CONNECTIONS.labels("disconnect").inc()
             
             if sid in self.connected_clients:
                 # Clean up client data
@@ -198,6 +355,12 @@ class SocketIOService:
                 
                 # Remove from connected clients
                 del self.connected_clients[sid]
+                self.presence_timers.discard(sid)
+                metrics.SOCKETIO_CONNECTED_CLIENTS.dec()
+                await self.presence.remove_client(sid)
+                
+                if client_info.get('patient_id'):
+                    self.schedule_active_users_update(client_info['patient_id'])
         
         @self.sio.event
         async def join_room(sid, data):
@@ -207,8 +370,9 @@ class SocketIOService:
                 await self.sio.enter_room(sid, room)
                 
                 if sid in self.connected_clients:
-                    self.connected_clients[sid]['rooms'].append(room)
-                    self.connected_clients[sid]['last_activity'] = datetime.now()
+                    self.connected_clients[sid]['rooms'].add(room)
+                    self.touch_presence(sid)
+                    await self.presence.join_room(sid, room)
                 
                 await self.sio.emit('room_joined', {
                     'room': room,
@@ -223,9 +387,9 @@ class SocketIOService:
                 await self.sio.leave_room(sid, room)
                 
                 if sid in self.connected_clients:
-                    if room in self.connected_clients[sid]['rooms']:
-                        self.connected_clients[sid]['rooms'].remove(room)
-                    self.connected_clients[sid]['last_activity'] = datetime.now()
+                    self.connected_clients[sid]['rooms'].discard(room)
+                    self.touch_presence(sid)
+                    await self.presence.leave_room(sid, room)
                 
                 await self.sio.emit('room_left', {
                     'room': room,
@@ -239,7 +403,7 @@ class SocketIOService:
             filters = data.get('filters', {})
             
             if sid in self.connected_clients:
-                self.connected_clients[sid]['last_activity'] = datetime.now()
+                self.touch_presence(sid)
         
         # === LIVE COLLABORATIVE EDITING EVENTS ===
         
@@ -248,7 +412,7 @@ class SocketIOService:
             """Handle live typing events for collaborative editing"""
             if sid in self.connected_clients:
                 client_info = self.connected_clients[sid]
-                self.connected_clients[sid]['last_activity'] = datetime.now()
+                self.touch_presence(sid)
                 
                 # Validate required data
                 required_fields = ['session_id', 'step', 'field_name', 'current_value', 'user_name']
@@ -289,7 +453,7 @@ class SocketIOService:
             """Handle field completion events"""
             if sid in self.connected_clients:
                 client_info = self.connected_clients[sid]
-                self.connected_clients[sid]['last_activity'] = datetime.now()
+                self.touch_presence(sid)
                 
                 # Add metadata
                 completion_event = {
@@ -308,7 +472,7 @@ class SocketIOService:
             """Handle cursor position/field focus events"""
             if sid in self.connected_clients:
                 client_info = self.connected_clients[sid]
-                self.connected_clients[sid]['last_activity'] = datetime.now()
+                self.touch_presence(sid)
                 
                 # Add metadata
                 cursor_event = {
@@ -364,6 +528,7 @@ class SocketIOService:
                     'authenticated': True,
                     'auth_time': datetime.now()
                 })
+                await self.publish_presence(sid)
                 
                 await self.sio.emit('authentication_success', {
                     'user_id': user_id,
@@ -374,7 +539,8 @@ class SocketIOService:
                 # Create subscription room
                 subscription_room = f"updates_{subscription_type}_{sid}"
                 await self.sio.enter_room(sid, subscription_room)
-                self.connected_clients[sid]['rooms'].append(subscription_room)
+                self.connected_clients[sid]['rooms'].add(subscription_room)
+                await self.presence.join_room(sid, subscription_room)
                 
                 await self.sio.emit('subscription_confirmed', {
                     'type': subscription_type,
@@ -390,10 +556,10 @@ class SocketIOService:
             
             if sid in self.connected_clients:
                 sender_info = self.connected_clients[sid]
-                self.connected_clients[sid]['last_activity'] = datetime.now()
+                self.touch_presence(sid)
                 
-                # Find target user's session
-                target_sid = self.find_user_session(target_user)
+                # Find target user's session on any worker
+                target_sid = await self.find_user_session(target_user)
                 
                 if target_sid:
                     await self.sio.emit('new_message', {
@@ -419,7 +585,7 @@ class SocketIOService:
         async def ping(sid):
             """Handle ping for connection health check"""
             if sid in self.connected_clients:
-                self.connected_clients[sid]['last_activity'] = datetime.now()
+                self.touch_presence(sid)
             await self.sio.emit('pong', room=sid)
     
     async def log_collaborative_activity(self, activity_data: Dict[str, Any]):
@@ -447,20 +613,124 @@ class SocketIOService:
         except Exception as e:
             print(f"Error logging collaborative activity: {e}")
     
-    def find_users_in_session(self, session_id: str) -> List[str]:
+    async def publish_presence(self, sid: str):
+        """Write a local client's record to the shared presence store"""
+        client_info = self.connected_clients.get(sid)
+        if client_info is not None:
+            # Room membership lives in the store's room index, not in the record
+            await self.presence.save_client(sid, {k: v for k, v in client_info.items() if k != 'rooms'})
+    
+    def touch_presence(self, sid: str):
+        """Record activity for a local client and restart its away timer"""
+        client_info = self.connected_clients[sid]
+        client_info['last_activity'] = datetime.now()
+        self.presence_timers.touch(sid)
+        if client_info.get('status') == 'away':
+            client_info['status'] = 'active'
+            asyncio.create_task(self._presence_status_changed(sid))
+    
+    async def _presence_status_changed(self, sid: str):
+        await self.publish_presence(sid)
+        client_info = self.connected_clients.get(sid)
+        if client_info and client_info.get('patient_id'):
+            self.schedule_active_users_update(client_info['patient_id'])
+    
+    async def expire_presence(self, now: Optional[float] = None):
+        """Mark local clients whose away timer ran out as away"""
+        for sid in self.presence_timers.expired(now):
+            client_info = self.connected_clients.get(sid)
+            if client_info is not None and client_info.get('status') != 'away':
+                client_info['status'] = 'away'
+                await self._presence_status_changed(sid)
+    
+    async def presence_expiry_loop(self):
+        """Sleep until the earliest away deadline instead of polling every client"""
+        while True:
+            try:
+                deadline = self.presence_timers.next_deadline()
+                delay = PRESENCE_TIMEOUT_SECONDS if deadline is None else deadline - time.monotonic()
+                await asyncio.sleep(min(max(delay, 0.0), PRESENCE_TIMEOUT_SECONDS))
+                await self.expire_presence()
+            except Exception as e:
+                print(f"Error in presence expiry loop: {e}")
+                await asyncio.sleep(1)
+    
+    def schedule_active_users_update(self, patient_id: str):
+        """Broadcast the room's active users once the current burst of changes settles"""
+        if patient_id not in self._pending_active_users:
+            self._pending_active_users[patient_id] = asyncio.create_task(self._send_active_users_update(patient_id))
+    
+    async def _send_active_users_update(self, patient_id: str):
+        try:
+            await asyncio.sleep(ACTIVE_USERS_DEBOUNCE_SECONDS)
+        finally:
+            self._pending_active_users.pop(patient_id, None)
+        active_users = await self.get_screening_active_users(patient_id)
+        await self.sio.emit('active_users_updated', active_users, room=f"screening_{patient_id}")
+    
+    async def sync_queue(self):
+        """Reload the queue if another worker changed it since this copy was loaded"""
+        version = await self.presence.queue_version()
+        if self.queue_manager.version != version:
+            await self.queue_manager.reload()
+            self.queue_manager.version = version
+    
+    @asynccontextmanager
+    async def queue_transaction(self):
+        """Change the shared queue under its lock, save what changed and send the delta to the queue room"""
+        queue = self.queue_manager
+        async with self.presence.lock('patient_queue'):
+            await self.sync_queue()
+            try:
+                yield queue
+            except BaseException:
+                queue.discard_changes()
+                raise
+            changes = queue.drain_changes()
+            if changes:
+                try:
+                    await queue.persist(changes)
+                except BaseException:
+                    queue.discard_changes()
+                    raise
+                queue.version = await self.presence.bump_queue_version()
+        
+        if changes:
+            await self.sio.emit('queue_updated', {
+                'version': queue.version,
+                'total': len(queue.queue),
+                'changes': queue.describe_changes(changes)
+            }, room=QUEUE_ROOM)
+    
+    async def prune_queue(self) -> int:
+        """Drop queue entries whose screening was abandoned"""
+        async with self.queue_transaction() as queue:
+            return queue.prune()
+    
+    async def queue_expiry_loop(self):
+        """Expire abandoned queue entries periodically rather than scanning the queue on every change"""
+        while True:
+            try:
+                await asyncio.sleep(QUEUE_PRUNE_INTERVAL_SECONDS)
+                pruned = await self.prune_queue()
+                if pruned:
+                    print(f"Pruned {pruned} expired queue entries")
+            except Exception as e:
+                print(f"Error in queue expiry loop: {e}")
+    
+    async def find_users_in_session(self, session_id: str) -> List[Dict[str, Any]]:
         """Find all connected users in a specific session"""
         session_users = []
         room_name = f"hospital_mobile_session_{session_id}"
         
-        for sid, client_info in self.connected_clients.items():
-            if room_name in client_info.get('rooms', []):
-                session_users.append({
-                    'sid': sid,
-                    'user_id': client_info.get('user_id'),
-                    'user_role': client_info.get('role'),
-                    'connected_at': client_info.get('connected_at'),
-                    'last_activity': client_info.get('last_activity')
-                })
+        for sid, client_info in (await self.presence.room_members(room_name)).items():
+            session_users.append({
+                'sid': sid,
+                'user_id': client_info.get('user_id'),
+                'user_role': client_info.get('role'),
+                'connected_at': client_info.get('connected_at'),
+                'last_activity': client_info.get('last_activity')
+            })
         
         return session_users
     
@@ -479,8 +749,33 @@ class SocketIOService:
             await self.sio.emit('session_updated', broadcast_event, room=room_name, skip_sid=exclude_sid)
         else:
             await self.sio.emit('session_updated', broadcast_event, room=room_name)
+    
+    def register_queue_events(self):
+        """Take patients off the queue when the screening handlers complete, cancel or delete their screening"""
+        event_bus.subscribe(DOCUMENT_CHANGED_EVENT, self.screening_changed)
+    
+    async def screening_changed(self, data: Dict[str, Any]):
+        """Dequeue the patient of a screening that just finished"""
+        if data.get('collection') != 'screenings':
+            return
+        before, after = data.get('before') or {}, data.get('after')
+        if after is not None:
+            status = after.get('status')
+            if status not in QUEUE_FINISHED_STATUSES or before.get('status') == status:
+                return
+        patient_id = (after or before).get('patient_id')
+        if patient_id is not None:
+            await self.dequeue_patient(str(patient_id), served=after is not None and after.get('status') == 'completed')
+    
+    async def dequeue_patient(self, patient_id: str, served: bool = True) -> bool:
+        """Remove a patient from the shared queue and send the delta to queue viewers"""
+        async with self.queue_transaction() as queue:
+            removed = queue.remove_patient(patient_id, served=served)
+        return removed
+    
+    def register_collaboration_handlers(self):
+        """Register real-time screening collaboration event handlers"""
         
-        # Real-time Collaboration Event Handlers
         @self.sio.event
         async def join_screening(sid, data):
             """Handle joining a screening collaboration session"""
@@ -503,11 +798,12 @@ class SocketIOService:
                 self.connected_clients[sid].update({
                     'patient_id': patient_id,
                     'collaboration_session': session_id,
-                    'screening_step': user.get('step', 0),
-                    'last_activity': datetime.now()
+                    'screening_step': user.get('step', 0)
                 })
-                if room_name not in self.connected_clients[sid]['rooms']:
-                    self.connected_clients[sid]['rooms'].append(room_name)
+                self.connected_clients[sid]['rooms'].add(room_name)
+                self.touch_presence(sid)
+                await self.publish_presence(sid)
+                await self.presence.join_room(sid, room_name)
             
             # Notify other users in the session
             await self.sio.emit('user_joined', user, room=room_name, skip_sid=sid)
@@ -516,11 +812,12 @@ class SocketIOService:
             active_users = await self.get_screening_active_users(patient_id)
             await self.sio.emit('active_users_updated', active_users, room=sid)
             
-            # Add patient to queue and update queue data
-            self.queue_manager.add_patient(patient_id, 'normal')
-            self.queue_manager.assign_staff_to_patient(patient_id, user.get('user_id'))
-            queue_data = await self.get_patient_queue()
-            await self.sio.emit('queue_updated', queue_data, room=room_name)
+            # Add patient to queue, then give the joining user the full queue to apply later deltas to
+            await self.join_queue_room(sid)
+            async with self.queue_transaction() as queue:
+                queue.add_patient(patient_id, 'normal')
+                queue.assign_staff_to_patient(patient_id, user.get('user_id'))
+            await self.send_queue_snapshot(sid)
             
             print(f"👥 User {user.get('name')} joined screening for patient {patient_id}")
         
@@ -538,13 +835,15 @@ class SocketIOService:
             # Update client step info
             if sid in self.connected_clients:
                 self.connected_clients[sid]['screening_step'] = step
-                self.connected_clients[sid]['last_activity'] = datetime.now()
+                self.touch_presence(sid)
+                await self.publish_presence(sid)
             
             # Update patient step in queue
-            self.queue_manager.update_patient_step(patient_id, step)
+            room_name = f"screening_{patient_id}"
+            async with self.queue_transaction() as queue:
+                queue.update_patient_step(patient_id, step)
             
             # Broadcast step change to screening room
-            room_name = f"screening_{patient_id}"
             await self.sio.emit('step_changed', {
                 'user_id': user_id,
                 'step': step,
@@ -553,13 +852,10 @@ class SocketIOService:
                 'timestamp': datetime.now().isoformat()
             }, room=room_name, skip_sid=sid)
             
-            # Update step status tracking and queue
+            # Update step status tracking
             step_statuses = await self.get_step_statuses(patient_id)
             await self.sio.emit('step_status_updated', step_statuses, room=room_name)
             
-            queue_data = await self.get_patient_queue()
-            await self.sio.emit('queue_updated', queue_data, room=room_name)
-            
             print(f"🔄 Step changed: User {user_id} moved to step {step} for patient {patient_id}")
         
         @self.sio.event
@@ -570,17 +866,14 @@ class SocketIOService:
             last_activity = data.get('last_activity')
             
             if sid in self.connected_clients:
-                self.connected_clients[sid].update({
-                    'screening_step': step,
-                    'last_activity': datetime.now()
-                })
+                self.connected_clients[sid]['screening_step'] = step
+                self.touch_presence(sid)
+                await self.publish_presence(sid)
                 
                 # Update presence in screening room if applicable
                 patient_id = self.connected_clients[sid].get('patient_id')
                 if patient_id:
-                    room_name = f"screening_{patient_id}"
-                    active_users = await self.get_screening_active_users(patient_id)
-                    await self.sio.emit('active_users_updated', active_users, room=room_name)
+                    self.schedule_active_users_update(patient_id)
         
         @self.sio.event
         async def leave_screening(sid, data):
@@ -593,50 +886,87 @@ class SocketIOService:
                 await self.sio.leave_room(sid, room_name)
                 
                 # Remove from client info
-                if room_name in self.connected_clients[sid]['rooms']:
-                    self.connected_clients[sid]['rooms'].remove(room_name)
+                self.connected_clients[sid]['rooms'].discard(room_name)
+                await self.presence.leave_room(sid, room_name)
                 
                 # Remove staff from patient and clean up queue
-                self.queue_manager.remove_staff_from_patient(patient_id, user_id)
+                async with self.queue_transaction() as queue:
+                    queue.remove_staff_from_patient(patient_id, user_id)
                 
                 self.connected_clients[sid].pop('patient_id', None)
                 self.connected_clients[sid].pop('collaboration_session', None)
+                await self.publish_presence(sid)
                 
                 # Notify other users
                 await self.sio.emit('user_left', user_id, room=room_name)
                 
-                # Update active users list and queue
-                active_users = await self.get_screening_active_users(patient_id)
-                await self.sio.emit('active_users_updated', active_users, room=room_name)
-                
-                queue_data = await self.get_patient_queue()
-                await self.sio.emit('queue_updated', queue_data, room=room_name)
+                # Update active users list
+                self.schedule_active_users_update(patient_id)
                 
                 print(f"👋 User {user_id} left screening for patient {patient_id}")
+        
+        @self.sio.event
+        async def get_queue_snapshot(sid, data=None):
+            """Send the full queue to a client whose queue_updated versions skipped ahead"""
+            await self.join_queue_room(sid)
+            await self.send_queue_snapshot(sid)
+        
+        @self.sio.event
+        async def get_queue_position(sid, data):
+            """Send a patient's queue position and estimated completion"""
+            patient_id = data.get('patient_id')
+            if patient_id:
+                await self.sio.emit('queue_position', await self.get_queue_position(patient_id), room=sid)
     
     async def get_screening_active_users(self, patient_id: str) -> List[Dict[str, Any]]:
         """Get list of active users for a specific patient screening"""
         room_name = f"screening_{patient_id}"
         active_users = []
         
-        for sid, client_info in self.connected_clients.items():
-            if (room_name in client_info.get('rooms', []) and 
-                client_info.get('patient_id') == patient_id):
+        for sid, client_info in (await self.presence.room_members(room_name)).items():
+            if client_info.get('patient_id') == patient_id:
                 active_users.append({
                     'user_id': client_info.get('user_id'),
                     'name': client_info.get('username', 'Unknown'),
                     'role': client_info.get('role'),
                     'step': client_info.get('screening_step', 0),
                     'last_activity': client_info.get('last_activity').isoformat() if client_info.get('last_activity') else None,
-                    'status': 'active' if (datetime.now() - client_info.get('last_activity', datetime.now())).seconds < 60 else 'away'
+                    'status': client_info.get('status', 'active')
                 })
         
         return active_users
     
     async def get_patient_queue(self) -> List[Dict[str, Any]]:
         """Get current patient queue data"""
+        await self.sync_queue()
         return self.queue_manager.get_queue_data()
     
+    async def join_queue_room(self, sid: str):
+        """Subscribe a client to queue_updated deltas"""
+        await self.sio.enter_room(sid, QUEUE_ROOM)
+        if sid in self.connected_clients:
+            self.connected_clients[sid]['rooms'].add(QUEUE_ROOM)
+    
+    async def send_queue_snapshot(self, sid: str):
+        """Send the whole queue and its version to one client"""
+        items = await self.get_patient_queue()
+        await self.sio.emit('queue_snapshot', {
+            'version': self.queue_manager.version,
+            'items': items
+        }, room=sid)
+    
+    async def get_queue_position(self, patient_id: str) -> Dict[str, Any]:
+        """Position, queue length and estimated completion for one patient"""
+        await self.sync_queue()
+        position = self.queue_manager.get_patient_position(patient_id)
+        eta = self.queue_manager.get_patient_eta(patient_id, position)
+        return {
+            'patient_id': patient_id,
+            'queue_position': position,
+            'total': len(self.queue_manager.queue),
+            'estimated_completion': eta.isoformat() if eta else None
+        }
+    
     async def get_step_statuses(self, patient_id: str) -> List[Dict[str, Any]]:
         """Get current step statuses for a patient"""
         # This would integrate with actual workflow tracking
@@ -751,12 +1081,9 @@ class SocketIOService:
         except Exception as e:
             print(f"Error sending executive data: {e}")
     
-    def find_user_session(self, user_id: str) -> Optional[str]:
-        """Find session ID for a specific user"""
-        for sid, client_info in self.connected_clients.items():
-            if client_info.get('user_id') == user_id:
-                return sid
-        return None
+    async def find_user_session(self, user_id: str) -> Optional[str]:
+        """Find session ID for a specific user on any worker"""
+        return await self.presence.find_user(user_id)
     
     async def broadcast_event(self, event: RealTimeEvent):
         """Broadcast real-time event to relevant clients"""
@@ -777,7 +1104,7 @@ class SocketIOService:
     async def send_notification(self, user_id: str, notification: Dict[str, Any]):
         """Send notification to specific user"""
         try:
-            target_sid = self.find_user_session(user_id)
+            target_sid = await self.find_user_session(user_id)
             if target_sid:
                 await self.sio.emit('notification', {
                     **notification,
@@ -833,7 +1160,7 @@ class SocketIOService:
                 # Send health check to all clients
                 await self.sio.emit('health_check', {
                     'timestamp': current_time.isoformat(),
-                    'active_connections': len(self.connected_clients)
+                    'active_connections': await self.presence.client_count()
                 })
                 
                 await asyncio.sleep(60)  # Check every minute
@@ -842,12 +1169,24 @@ class SocketIOService:
                 print(f"Error in health check loop: {e}")
                 await asyncio.sleep(60)
     
+    async def shutdown(self):
+        """Withdraw this worker's clients from the shared presence store"""
+        for task in list(self._pending_active_users.values()):
+            task.cancel()
+        for sid in list(self.connected_clients):
+            await self.presence.remove_client(sid)
+        await self.presence.close()
+    
     async def cleanup_disconnected_clients(self):
         """Clean up disconnected clients"""
         while True:
             try:
-                # Remove any clients that are no longer in the connected list
-                # This handles edge cases where disconnect events might be missed
+                # Remove presence records left behind by workers that stopped
+                # without delivering their disconnect events
+                await self.presence.heartbeat()
+                pruned = await self.presence.prune_stale_servers()
+                if pruned:
+                    print(f"Pruned {len(pruned)} stale presence records")
                 await asyncio.sleep(30)  # Clean up every 30 seconds
                 
             except Exception as e:
@@ -1,42 +1,118 @@
 import hashlib
 import json
 from datetime import datetime
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
-def generate_blockchain_hash(data: str) -> str:
+# Domain separation prefixes (RFC 6962 style) so a leaf can never be passed off as an inner node
+LEAF_PREFIX = b"\x00"
+NODE_PREFIX = b"\x01"
+CHAIN_PREFIX = b"\x02"
+
+# prev_hash of the first block in a chain
+GENESIS_HASH = "0" * 64
+
+def generate_blockchain_hash(data: str, timestamp: Optional[str] = None) -> str:
     """
     Generate a blockchain-style hash for audit trail verification
     
     Args:
         data: String data to hash
+        timestamp: Timestamp to bind into the hash; store it with the
+            hash, because verification needs the same value
         
     Returns:
-        SHA-256 hash of the data
+        SHA-256 hash of the data, or of data and timestamp
     """
-    # Create a timestamped hash
-    timestamp = datetime.utcnow().isoformat()
-    hash_data = f"{data}:{timestamp}"
+    hash_data = f"{data}:{timestamp}" if timestamp is not None else data
     
     # Generate SHA-256 hash
     hash_object = hashlib.sha256(hash_data.encode('utf-8'))
     return hash_object.hexdigest()
 
-def verify_blockchain_hash(data: str, expected_hash: str) -> bool:
+def verify_blockchain_hash(data: str, expected_hash: str, timestamp: Optional[str] = None) -> bool:
     """
-    Verify a blockchain hash (simplified version)
+    Verify a blockchain hash
     
     Args:
         data: Original data string
         expected_hash: Expected hash to verify against
+        timestamp: Timestamp the hash was generated with, if any
         
     Returns:
         True if hash matches, False otherwise
     """
-    # For now, we'll just generate a new hash and compare
-    # In a real implementation, you'd want to store the timestamp
-    # and verify the exact hash
-    current_hash = generate_blockchain_hash(data)
-    return current_hash == expected_hash
+    return generate_blockchain_hash(data, timestamp) == expected_hash
+
+def hash_audit_event(event: Dict[str, Any]) -> str:
+    """
+    Content hash of an audit event, verifiable later from the stored event
+    
+    Args:
+        event: Audit event; its own audit_hash and ledger fields are left out
+        
+    Returns:
+        SHA-256 hash of the event's canonical JSON
+    """
+    content = {key: value for key, value in event.items() if key not in ("_id", "audit_hash", "ledger")}
+    return generate_blockchain_hash(json.dumps(content, sort_keys=True, default=str))
+
+def leaf_hash(data: bytes) -> bytes:
+    """Merkle leaf hash of one record's bytes"""
+    return hashlib.sha256(LEAF_PREFIX + data).digest()
+
+def node_hash(left: bytes, right: bytes) -> bytes:
+    """Merkle inner node hash"""
+    return hashlib.sha256(NODE_PREFIX + left + right).digest()
+
+def merkle_levels(leaves: Sequence[bytes]) -> List[List[bytes]]:
+    """
+    Every level of the Merkle tree over the leaf hashes, leaves first
+    
+    A node without a sibling is promoted to the next level unchanged rather
+    than paired with itself, so two different leaf lists never share a root.
+    """
+    if not leaves:
+        raise ValueError("Merkle tree needs at least one leaf")
+    levels = [list(leaves)]
+    while len(levels[-1]) > 1:
+        level = levels[-1]
+        parents = [node_hash(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            parents.append(level[-1])
+        levels.append(parents)
+    return levels
+
+def merkle_root(leaves: Sequence[bytes]) -> bytes:
+    """Merkle root over the leaf hashes"""
+    return merkle_levels(leaves)[-1][0]
+
+def merkle_proof(levels: List[List[bytes]], index: int) -> List[Tuple[str, str]]:
+    """
+    Inclusion proof for leaf `index`: the sibling hashes from leaf to root
+    
+    Returns:
+        (side, hex hash) pairs, side being "L" or "R" for where the sibling sits
+    """
+    proof = []
+    for level in levels[:-1]:
+        sibling = index ^ 1
+        if sibling < len(level):
+            proof.append(("L" if sibling < index else "R", level[sibling].hex()))
+        index //= 2
+    return proof
+
+def verify_merkle_proof(leaf: bytes, proof: Sequence[Tuple[str, str]], root: str) -> bool:
+    """Check an inclusion proof from merkle_proof() against a hex root in O(log n)"""
+    current = leaf
+    for side, sibling in proof:
+        sibling_bytes = bytes.fromhex(sibling)
+        current = node_hash(sibling_bytes, current) if side == "L" else node_hash(current, sibling_bytes)
+    return current.hex() == root
+
+def chain_hash(prev_hash: str, merkle_root_hex: str, seq: int, count: int) -> str:
+    """Hash linking a block (its sequence number, size and Merkle root) to the previous block"""
+    content = f"{prev_hash}:{merkle_root_hex}:{seq}:{count}".encode("utf-8")
+    return hashlib.sha256(CHAIN_PREFIX + content).hexdigest()
 
 def create_audit_block(action: str, user_id: str, details: Dict[str, Any]) -> Dict[str, Any]:
     """
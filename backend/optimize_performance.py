@@ -84,7 +84,34 @@ async def optimize_performance():
             print("✅ Added index on screenings.patient_id")
         except Exception as e:
             print(f"⚠️ Index on screenings.patient_id already exists or failed: {e}")
-        
+
+        # Students ready for patient registration: latest completed screening per student
+        try:
+            await db.school_screenings.create_index(
+                [("status", 1), ("student_id", 1), ("created_at", -1)],
+                name="completed_screenings_by_student"
+            )
+            print("✅ Added index on school_screenings (status, student_id, created_at)")
+        except Exception as e:
+            print(f"⚠️ Index on school_screenings (status, student_id, created_at) already exists or failed: {e}")
+
+        try:
+            await db.student_patient_mapping.create_index(
+                [("student_id", 1), ("status", 1)],
+                name="student_mapping_by_status"
+            )
+            print("✅ Added index on student_patient_mapping (student_id, status)")
+        except Exception as e:
+            print(f"⚠️ Index on student_patient_mapping (student_id, status) already exists or failed: {e}")
+
+        # Search index refresh: documents updated since the last sync, polled by every worker
+        for collection_name in ('patients', 'evep.students'):
+            try:
+                await db[collection_name].create_index("updated_at")
+                print(f"✅ Added index on {collection_name}.updated_at")
+            except Exception as e:
+                print(f"⚠️ Index on {collection_name}.updated_at already exists or failed: {e}")
+
         # Check collection sizes
         print("\n📊 Collection Sizes:")
         for collection_name in collections:
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Migration script to move inline base64 patient and student photos out of
+MongoDB documents into the content-addressed blob store.
+Documents are streamed in batches and rewritten to hold only blob URLs.
+"""
+
+import sys
+import os
+import asyncio
+import argparse
+import logging
+
+# Add the backend directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.database import get_database
+from app.services.blob_store import blob_store, migrate_inline_photos
+
+# Setup logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Collections holding inline photos (uploads write "students", lists read "evep.students")
+PHOTO_COLLECTIONS = ["patients", "evep.students", "students"]
+
+async def main(batch_size: int, dry_run: bool):
+    """Migrate every photo-bearing collection"""
+    db = get_database()
+    
+    try:
+        for collection_name in PHOTO_COLLECTIONS:
+            logger.info(f"Migrating photos in {collection_name}...")
+            stats = await migrate_inline_photos(
+                db.evep[collection_name],
+                blob_store,
+                batch_size=batch_size,
+                dry_run=dry_run
+            )
+            logger.info(f"{collection_name}: {stats}")
+        
+        print("✅ Photo migration completed successfully!")
+    except Exception as e:
+        print(f"❌ Error during photo migration: {e}")
+        raise
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move inline base64 photos into the blob store")
+    parser.add_argument("--batch-size", type=int, default=50, help="Cursor batch size")
+    parser.add_argument("--dry-run", action="store_true", help="Report what would be migrated without writing")
+    args = parser.parse_args()
+    asyncio.run(main(args.batch_size, args.dry_run))
@@ -896,6 +896,63 @@ async def seed_comprehensive_screening_data(db):
     
     print(f"✅ Seeded {len(screening_data)} comprehensive screening sessions across {len(screening_types)} screening types")
 
+async def seed_registration_workload(
+    db,
+    student_count: int = 1000,
+    screenings_per_student: int = 2,
+    registered_every: int = 4
+) -> Dict[str, int]:
+    """Seed students with completed school screenings, every Nth one already registered as a patient"""
+    first_names = ["สมชาย", "สมหญิง", "ดวงใจ", "วิชัย", "มาลี", "ประเสริฐ", "สุดา", "อนันต์"]
+    last_names = ["ใจดี", "รักเรียน", "สวยงาม", "มั่นคง", "ศรีสุข", "ทองดี", "แสงทอง", "บุญมา"]
+    schools = ["โรงเรียนนานาชาติกรุงเทพ", "โรงเรียนนานาชาติเซนต์แอนดรูว์", "โรงเรียนวัดสุทธิวราราม"]
+    now = datetime.utcnow()
+
+    students = [
+        {
+            "title": "เด็กชาย" if i % 2 == 0 else "เด็กหญิง",
+            "first_name": first_names[i % len(first_names)],
+            "last_name": last_names[(i // len(first_names)) % len(last_names)],
+            "cid": f"{1100000000000 + i}",
+            "student_code": f"LOAD{i:06d}",
+            "school_name": schools[i % len(schools)],
+            "grade_level": "ประถมศึกษา",
+            "grade_number": str(1 + i % 6),
+            "consent_document": True,
+            "status": "active" if i % 50 else "inactive",
+            "created_at": now
+        }
+        for i in range(student_count)
+    ]
+    result = await db.evep["evep.students"].insert_many(students)
+    student_ids = result.inserted_ids
+
+    screenings = []
+    for i, student_id in enumerate(student_ids):
+        for n in range(screenings_per_student):
+            screenings.append({
+                "screening_id": f"school_screening_{student_id}_{n}",
+                # The screening API stores student_id as a string
+                "student_id": str(student_id),
+                "school_name": students[i]["school_name"],
+                "screening_type": "basic_school",
+                "status": "completed" if (i + n) % 5 else "pending",
+                "results": generate_standard_screening_results(),
+                "created_at": now - timedelta(days=(i * 7 + n) % 180)
+            })
+    await db.evep.school_screenings.insert_many(screenings)
+
+    mappings = [
+        {"student_id": student_id, "patient_id": f"patient_{i}", "status": "active", "created_at": now}
+        for i, student_id in enumerate(student_ids)
+        if i % registered_every == 0
+    ]
+    if mappings:
+        await db.evep.student_patient_mapping.insert_many(mappings)
+
+    print(f"✅ Seeded {len(students)} students, {len(screenings)} school screenings and {len(mappings)} patient mappings")
+    return {"students": len(students), "school_screenings": len(screenings), "mappings": len(mappings)}
+
 def generate_standard_screening_results():
     """Generate realistic standard vision screening results"""
     import random
@@ -4,6 +4,7 @@ Simple script to update subdistrict documents with zipcode fields
 """
 
 import os
+from datetime import datetime
 from pymongo import MongoClient
 
 # Database connection
@@ -122,6 +123,14 @@ def update_subdistricts():
                         updated_count += 1
                         print(f"Updated subdistrict {subdistrict.get('name', 'Unknown')} with zipcode {zipcode}")
         
+        if updated_count:
+            # Same bump as app.services.master_data.version_update, so running API workers reload their cache
+            db.master_data_versions.update_one(
+                {"_id": "subdistricts"},
+                {"$inc": {"version": 1}, "$set": {"updated_at": datetime.utcnow()}},
+                upsert=True
+            )
+        
         print(f"Migration completed! Updated {updated_count} subdistricts")
         
     except Exception as e:
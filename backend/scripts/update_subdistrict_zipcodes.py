@@ -7,6 +7,7 @@ based on the JSON data structure from IMPRT_JSON folder.
 import asyncio
 import json
 import os
+from datetime import datetime
 from pathlib import Path
 from motor.motor_asyncio import AsyncIOMotorClient
 from bson import ObjectId
@@ -219,6 +220,14 @@ async def update_subdistricts():
                 updated_count += 1
                 logger.info(f"Updated subdistrict {subdistrict_name} with code {json_data['code']} and zipcode {zipcode}")
         
+        if updated_count:
+            # Same bump as app.services.master_data.version_update, so running API workers reload their cache
+            await db.master_data_versions.update_one(
+                {"_id": "subdistricts"},
+                {"$inc": {"version": 1}, "$set": {"updated_at": datetime.utcnow()}},
+                upsert=True
+            )
+        
         logger.info(f"Migration completed!")
         logger.info(f"Updated: {updated_count} subdistricts")
         logger.info(f"Not found in JSON: {not_found_count} subdistricts")
@@ -0,0 +1,179 @@
+"""
+Minimal Motor-compatible async wrapper around mongomock for unit tests
+that need a database but not a running MongoDB server
+"""
+
+import bson
+import mongomock
+
+
+class AsyncCursor:
+    """Async view over a mongomock cursor or aggregation result"""
+
+    def __init__(self, cursor, document_class=None):
+        self._cursor = cursor
+        self._iterator = None
+        self._document_class = document_class
+
+    def _convert(self, document):
+        # mongomock only returns dicts; RawBSONDocument is rebuilt from their BSON
+        if self._document_class is None:
+            return document
+        return self._document_class(bson.encode(document))
+
+    def sort(self, *args, **kwargs):
+        self._cursor = self._cursor.sort(*args, **kwargs)
+        return self
+
+    def skip(self, count):
+        self._cursor = self._cursor.skip(count)
+        return self
+
+    def limit(self, count):
+        self._cursor = self._cursor.limit(count)
+        return self
+
+    def batch_size(self, size):
+        return self
+
+    async def to_list(self, length=None):
+        documents = [self._convert(document) for document in self._cursor]
+        return documents if length is None else documents[:length]
+
+    def __aiter__(self):
+        self._iterator = iter(self._cursor)
+        return self
+
+    async def __anext__(self):
+        try:
+            return self._convert(next(self._iterator))
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class AsyncCollection:
+    """Async facade for the subset of the Motor collection API used by the app"""
+
+    def __init__(self, collection, recorder=None, document_class=None):
+        self._collection = collection
+        self._recorder = recorder
+        self._document_class = document_class
+
+    def _record(self, operation):
+        if self._recorder is not None:
+            self._recorder.append((self._collection.name, operation))
+
+    @property
+    def name(self):
+        return self._collection.name
+
+    def find(self, *args, **kwargs):
+        self._record("find")
+        kwargs.pop("batch_size", None)
+        return AsyncCursor(self._collection.find(*args, **kwargs), self._document_class)
+
+    def with_options(self, codec_options=None, **kwargs):
+        document_class = codec_options.document_class if codec_options is not None else None
+        return AsyncCollection(self._collection, self._recorder, None if document_class is dict else document_class)
+
+    def aggregate(self, pipeline, **kwargs):
+        self._record("aggregate")
+        return AsyncCursor(self._collection.aggregate(pipeline))
+
+    async def find_one(self, *args, **kwargs):
+        self._record("find_one")
+        return self._collection.find_one(*args, **kwargs)
+
+    async def count_documents(self, filter, **kwargs):
+        self._record("count_documents")
+        return self._collection.count_documents(filter, **kwargs)
+
+    async def estimated_document_count(self, **kwargs):
+        self._record("estimated_document_count")
+        return self._collection.estimated_document_count()
+
+    async def insert_one(self, document, **kwargs):
+        self._record("insert_one")
+        return self._collection.insert_one(document)
+
+    async def insert_many(self, documents, **kwargs):
+        self._record("insert_many")
+        return self._collection.insert_many(documents, ordered=kwargs.get("ordered", True))
+
+    async def update_one(self, *args, **kwargs):
+        self._record("update_one")
+        return self._collection.update_one(*args, **kwargs)
+
+    async def update_many(self, *args, **kwargs):
+        self._record("update_many")
+        return self._collection.update_many(*args, **kwargs)
+
+    async def replace_one(self, *args, **kwargs):
+        self._record("replace_one")
+        return self._collection.replace_one(*args, **kwargs)
+
+    async def delete_one(self, *args, **kwargs):
+        self._record("delete_one")
+        return self._collection.delete_one(*args, **kwargs)
+
+    async def delete_many(self, *args, **kwargs):
+        self._record("delete_many")
+        return self._collection.delete_many(*args, **kwargs)
+
+    async def find_one_and_update(self, *args, **kwargs):
+        self._record("find_one_and_update")
+        return self._collection.find_one_and_update(*args, **kwargs)
+
+    async def bulk_write(self, requests, **kwargs):
+        self._record("bulk_write")
+        return self._collection.bulk_write(requests, ordered=kwargs.get("ordered", True))
+
+    async def create_index(self, *args, **kwargs):
+        return self._collection.create_index(*args, **kwargs)
+
+    async def distinct(self, *args, **kwargs):
+        self._record("distinct")
+        return self._collection.distinct(*args, **kwargs)
+
+
+class AsyncDatabase:
+    """Async facade for a mongomock database"""
+
+    def __init__(self, database, recorder=None):
+        self._database = database
+        self._recorder = recorder
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    def __getitem__(self, name):
+        return AsyncCollection(self._database[name], self._recorder)
+
+    async def command(self, *args, **kwargs):
+        return self._database.command(*args, **kwargs)
+
+    async def list_collection_names(self):
+        return self._database.list_collection_names()
+
+
+class AsyncMongoClient:
+    """Async facade for a mongomock client; records every collection operation"""
+
+    def __init__(self):
+        self._client = mongomock.MongoClient()
+        self.operations = []
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    def __getitem__(self, name):
+        return AsyncDatabase(self._client[name], self.operations)
+
+    @property
+    def sync(self):
+        """Direct synchronous access for seeding test data"""
+        return self._client
@@ -0,0 +1,193 @@
+import random
+import time
+
+import pytest
+from bson import ObjectId
+
+from app.services.address_index import MAX_QUERY_WORDS, AddressAutocomplete, AddressIndex, address_tokens, index_keys
+from app.services.master_data import MasterTable
+from app.services.search_index import fold
+
+# Size of the AOC master data for the whole country
+PROVINCES, DISTRICTS, SUBDISTRICTS = 77, 928, 7436
+
+
+def place(name, **fields):
+    return {"_id": ObjectId(), "name": name, **fields}
+
+
+def hierarchy():
+    """Bangkok and Chiang Mai with a few districts and subdistricts, names as strings and as {th, en}"""
+    bangkok = place({"th": "กรุงเทพมหานคร", "en": "Bangkok"})
+    chiang_mai = place({"th": "เชียงใหม่", "en": "Chiang Mai"})
+    bang_rak = place({"th": "เขตบางรัก", "en": "Khet Bang Rak"}, provinceId=bangkok["_id"])
+    pathum_wan = place("ปทุมวัน", provinceId=str(bangkok["_id"]))
+    mueang = place({"th": "อำเภอเมืองเชียงใหม่", "en": "Mueang Chiang Mai"}, provinceId=chiang_mai["_id"])
+    san_sai = place({"th": "สันทราย", "en": "San Sai"}, provinceId=chiang_mai["_id"])
+    subdistricts = [
+        place({"th": "แขวงบางรัก", "en": "Bang Rak"}, provinceId=bangkok["_id"], districtId=bang_rak["_id"], zipcode="10500"),
+        place({"th": "สีลม", "en": "Si Lom"}, provinceId=bangkok["_id"], districtId=bang_rak["_id"], zipcode="10500"),
+        place("ลุมพินี", provinceId=str(bangkok["_id"]), districtId=str(pathum_wan["_id"]), zipcode="10330"),
+        place({"th": "ศรีภูมิ", "en": "Si Phum"}, provinceId=chiang_mai["_id"], districtId=mueang["_id"], zipcode="50200"),
+        place({"th": "สันทรายหลวง", "en": "San Sai Luang"}, provinceId=chiang_mai["_id"], districtId=san_sai["_id"], zipcode="50210"),
+        place({"th": "บ้านแม", "en": "Ban Mae"}, districtId=san_sai["_id"], zipcode="50210"),
+    ]
+    return [bangkok, chiang_mai], [bang_rak, pathum_wan, mueang, san_sai], subdistricts
+
+
+def labels(matches):
+    return [match["label"] for match in matches]
+
+
+class TestAddressIndex:
+    """Test suite for the Thai address autocomplete index."""
+
+    def test_keys_and_tokens(self):
+        """Names are indexed with and without administrative prefixes; queries drop them."""
+        assert index_keys("อำเภอเมืองเชียงใหม่", "Mueang Chiang Mai") == tuple(
+            fold(key) for key in ("อำเภอเมืองเชียงใหม่", "เมืองเชียงใหม่", "เชียงใหม่", "mueang", "chiang", "mai"))
+        assert address_tokens("ต.บางรัก") == [fold("บางรัก")]
+        assert address_tokens("ตำบลบางรัก อ. เมือง") == [fold("บางรัก"), fold("เมือง")]
+        assert address_tokens("Amphoe San Sai") == ["san", "sai"]
+        assert address_tokens("เขต") == ["เขต"]
+
+    def test_single_word_prefixes(self):
+        """Exact names rank first, then provinces before districts before subdistricts, in Thai or English."""
+        index = AddressIndex(*hierarchy())
+
+        assert labels(index.search("บางรัก")) == ["เขตบางรัก, กรุงเทพมหานคร", "แขวงบางรัก, เขตบางรัก, กรุงเทพมหานคร 10500"]
+        assert labels(index.search("สันทราย")) == ["สันทราย, เชียงใหม่", "สันทรายหลวง, สันทราย, เชียงใหม่ 50210"]
+        assert labels(index.search("เชียง")) == ["เชียงใหม่", "อำเภอเมืองเชียงใหม่, เชียงใหม่"]
+        assert labels(index.search("si")) == ["ศรีภูมิ, อำเภอเมืองเชียงใหม่, เชียงใหม่ 50200", "สีลม, เขตบางรัก, กรุงเทพมหานคร 10500"]
+        assert labels(index.search("ลุม")) == ["ลุมพินี, ปทุมวัน, กรุงเทพมหานคร 10330"]
+        assert index.search("sa", level="district")[0]["district"]["name_en"] == "San Sai"
+        assert index.search("ไม่มี") == []
+
+        match = index.search("lumphini") or index.search("ลุมพินี")
+        assert match[0]["level"] == "subdistrict" and match[0]["subdistrict"]["name_en"] is None
+        assert match[0]["district"]["name"] == "ปทุมวัน" and match[0]["zipcode"] == "10330"
+
+    def test_words_match_across_the_hierarchy(self):
+        """Later words narrow by district or province; the result is the most specific place they name."""
+        index = AddressIndex(*hierarchy())
+
+        assert labels(index.search("si chiang mai")) == ["ศรีภูมิ, อำเภอเมืองเชียงใหม่, เชียงใหม่ 50200"]
+        assert labels(index.search("chiang mai")) == ["เชียงใหม่", "อำเภอเมืองเชียงใหม่, เชียงใหม่"]
+        assert labels(index.search("สีลม กรุงเทพ")) == ["สีลม, เขตบางรัก, กรุงเทพมหานคร 10500"]
+        assert labels(index.search("ban mae san sai")) == ["บ้านแม, สันทราย, เชียงใหม่ 50210"]
+        assert index.search("สีลม เชียงใหม่") == []
+
+    def test_long_queries_stay_cheap(self):
+        """Pasted text is cut to MAX_QUERY_WORDS words and ranked without enumerating subsets of them."""
+        index = AddressIndex(*hierarchy())
+        prefixes = ["c", "ch", "chi", "chia", "chian", "chiang", "m", "ma", "mu", "mue", "muea", "mueang", "s", "si", "sa", "san"]
+        long_query = " ".join(prefixes + [f"zz{number}" for number in range(40)])
+        assert len(address_tokens(long_query)) > MAX_QUERY_WORDS
+
+        # Each kept word is matched once and the places are ranked from those matches, never per combination of words
+        looked_up = []
+        match = index._match
+        index._match = lambda token: looked_up.append(token) or match(token)
+        matches = index.search(long_query)
+        assert looked_up == address_tokens(long_query)[:MAX_QUERY_WORDS]
+        assert labels(matches)[:2] == ["เชียงใหม่", "อำเภอเมืองเชียงใหม่, เชียงใหม่"]
+        assert matches == index.search(" ".join(prefixes[:MAX_QUERY_WORDS]))
+        assert index.search("si bang zz") == []
+
+    def test_zipcodes(self):
+        """Zipcodes are looked up exactly, by prefix, and as one of the query words."""
+        index = AddressIndex(*hierarchy())
+
+        assert [match["subdistrict"]["name"] for match in index.by_zipcode("10500")] == ["สีลม", "แขวงบางรัก"]
+        assert index.by_zipcode("๑๐๓๓๐")[0]["subdistrict"]["name"] == "ลุมพินี"
+        assert index.by_zipcode("99999") == []
+        assert [match["zipcode"] for match in index.search("502")] == ["50200", "50210", "50210"]
+        assert labels(index.search("สันทราย 50210")) == [
+            "สันทรายหลวง, สันทราย, เชียงใหม่ 50210", "บ้านแม, สันทราย, เชียงใหม่ 50210"]
+
+    @pytest.mark.asyncio
+    async def test_rebuilt_when_master_data_changes(self):
+        """The index follows the master data snapshots off the loop, serving the previous one while it rebuilds."""
+        provinces, districts, subdistricts = hierarchy()
+
+        class Cache:
+            tables = {}
+
+            def table(self, kind):
+                return self.tables.get(kind)
+
+        cache = Cache()
+        autocomplete = AddressAutocomplete(cache)
+        assert await autocomplete.index() is None
+
+        cache.tables = {
+            "provinces": MasterTable("provinces", provinces),
+            "districts": MasterTable("districts", districts, ("provinceId",)),
+            "subdistricts": MasterTable("subdistricts", subdistricts, ("provinceId", "districtId")),
+        }
+        first = await autocomplete.index()
+        assert await autocomplete.index() is first and len(first) == 12
+
+        cache.tables["subdistricts"] = MasterTable(
+            "subdistricts", subdistricts + [place("ลาดยาว", provinceId=provinces[0]["_id"], zipcode="10900")],
+            ("provinceId", "districtId"),
+        )
+        assert await autocomplete.index() is first
+        await autocomplete._building
+        rebuilt = await autocomplete.index()
+        assert rebuilt is not first and autocomplete._building is None
+        assert labels(rebuilt.search("ลาด")) == ["ลาดยาว, กรุงเทพมหานคร 10900"]
+        assert autocomplete.get_stats()["builds"] == 2
+
+    @pytest.mark.slow
+    @pytest.mark.performance
+    def test_autocomplete_benchmark(self):
+        """The whole country: build time and autocomplete latency, p99 under 2 ms."""
+        rng = random.Random(11)
+        syllables = ["บาง", "หนอง", "ท่า", "บ้าน", "โคก", "นา", "ห้วย", "วัง", "สัน", "ดอน", "ทุ่ง", "คลอง",
+                     "ศรี", "แม่", "ป่า", "โพธิ์", "ใหม่", "ใหญ่", "น้อย", "ทอง", "แก้ว", "งาม", "เหนือ", "ใต้"]
+        romanized = ["bang", "nong", "tha", "ban", "khok", "na", "huai", "wang", "san", "don", "thung", "khlong",
+                     "si", "mae", "pa", "pho", "mai", "yai", "noi", "thong", "kaeo", "ngam", "nuea", "tai"]
+
+        def name():
+            parts = rng.sample(range(len(syllables)), rng.randint(2, 3))
+            return {"th": "".join(syllables[part] for part in parts), "en": " ".join(romanized[part] for part in parts).title()}
+
+        provinces = [place(name(), code=f"{10 + number}") for number in range(PROVINCES)]
+        districts = [place(name(), provinceId=provinces[number % PROVINCES]["_id"]) for number in range(DISTRICTS)]
+        subdistricts = []
+        for number in range(SUBDISTRICTS):
+            district = districts[number % DISTRICTS]
+            province = next(province for province in provinces if province["_id"] == district["provinceId"])
+            subdistricts.append(place(name(), provinceId=district["provinceId"], districtId=district["_id"],
+                                      zipcode=f"{province['code']}{number % 1000:03d}"))
+
+        started = time.perf_counter()
+        index = AddressIndex(provinces, districts, subdistricts)
+        build_seconds = time.perf_counter() - started
+
+        queries = ["บ", "บาง", "หนองใหญ่", "แม่", "ท่าทอง", "b", "ban", "nong yai", "mae ngam", "si thong",
+                   "1", "105", "10500", "บางทอง 10", "ban mae tha", "huai khlong nong", "pa", "โคกนา", "wang noi", "น"]
+        queries += [subdistrict["name"]["th"][:rng.randint(2, 6)] for subdistrict in rng.sample(subdistricts, 40)]
+        queries += [f"{subdistrict['name']['en'].split()[0]} {provinces[0]['name']['en'].split()[0]}"
+                    for subdistrict in rng.sample(subdistricts, 20)]
+        latencies = []
+        for _ in range(10):
+            for query in queries:
+                started = time.perf_counter()
+                index.search(query, limit=10)
+                latencies.append(time.perf_counter() - started)
+        latencies.sort()
+        p99 = latencies[int(len(latencies) * 0.99) - 1]
+
+        # Pasted text longer than MAX_QUERY_WORDS costs no more than a full address
+        long_query = " ".join(["ban", "mae", "tha", "nong", "si", "san"] + [f"zz{number}" for number in range(40)])
+        started = time.perf_counter()
+        index.search(long_query)
+        long_query_seconds = time.perf_counter() - started
+
+        print(f"\n{len(index)} places indexed in {build_seconds * 1000:.0f}ms ({index.get_stats()['trie_nodes']} trie nodes); "
+              f"autocomplete p99 {p99 * 1000:.2f}ms, max {latencies[-1] * 1000:.2f}ms")
+        assert len(index.search("บาง")) == 10
+        assert p99 < 0.002
+        assert long_query_seconds < 0.05
@@ -0,0 +1,173 @@
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from openai import AsyncOpenAI
+
+from app.core import metrics
+from app.core.chat_database import ChatDatabase
+from app.modules.ai_agents.agent_manager import AIAgentManager, UserType
+from app.modules.ai_agents.response_cache import ResponseCache
+from tests.async_mongomock import AsyncMongoClient
+from tests.local_server import serve
+
+TOKENS = ["ผล", "ตรวจ", "สายตา", "ของ", "น้องมี", "ค่า ", "20/40 ", "ควร", "พบ", "แพทย์"]
+TOKEN_DELAY = 0.05
+
+
+def fake_openai_app(requests, fail=False):
+    """OpenAI-compatible chat completions endpoint generating one token every TOKEN_DELAY seconds"""
+    app = FastAPI()
+
+    @app.post("/v1/chat/completions")
+    async def completions(request: Request):
+        body = await request.json()
+        requests.append(body)
+        if fail:
+            return JSONResponse({"error": {"message": "overloaded", "type": "server_error"}}, status_code=500)
+
+        if not body.get("stream"):
+            # A blocking completion arrives once every token has been generated
+            await asyncio.sleep(TOKEN_DELAY * len(TOKENS))
+            return JSONResponse({
+                "id": "chatcmpl-test", "object": "chat.completion", "created": 0, "model": body["model"],
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(TOKENS)}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 42, "completion_tokens": len(TOKENS), "total_tokens": 52},
+            })
+
+        def chunk(delta, finish_reason=None, usage=None):
+            return "data: " + json.dumps({
+                "id": "chatcmpl-test", "object": "chat.completion.chunk", "created": 0, "model": body["model"],
+                "choices": [] if usage else [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                "usage": usage,
+            }, ensure_ascii=False) + "\n\n"
+
+        async def stream():
+            yield chunk({"role": "assistant", "content": ""})
+            for token in TOKENS:
+                await asyncio.sleep(TOKEN_DELAY)
+                yield chunk({"content": token})
+            yield chunk({}, "stop")
+            if body.get("stream_options", {}).get("include_usage"):
+                yield chunk(None, usage={"prompt_tokens": 42, "completion_tokens": len(TOKENS), "total_tokens": 52})
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    return app
+
+
+def streaming_manager(base_url):
+    manager = AIAgentManager()
+    manager.openai_client = AsyncOpenAI(base_url=f"{base_url}/v1", api_key="test", max_retries=0)
+    manager.response_cache = ResponseCache("agent")
+    return manager
+
+
+async def timed_events(events):
+    started, timed = time.perf_counter(), []
+    async for event in events:
+        timed.append((time.perf_counter() - started, event))
+    return timed
+
+
+class TestAgentStreaming:
+    """Test suite for streamed AI agent responses against a local OpenAI-compatible server."""
+
+    @pytest.mark.asyncio
+    async def test_tokens_arrive_as_generated_and_fill_cache(self):
+        """The first token arrives long before the answer completes, and the assembled answer is cached."""
+        requests = []
+        with serve(fake_openai_app(requests)) as base_url:
+            manager = streaming_manager(base_url)
+            first_token = metrics.LLM_TIME_TO_FIRST_TOKEN.labels("openai", "gpt-4")
+            observed = first_token._sum.get()
+
+            timed = await timed_events(manager.stream_agent_response(UserType.PARENT, "ผลตรวจสายตาลูก"))
+            tokens = [(at, event["text"]) for at, event in timed if event["type"] == "token"]
+            done = timed[-1][1]
+            assert [text for _, text in tokens] == TOKENS
+            assert done["type"] == "done" and done["response"]["response"] == "".join(TOKENS)
+            assert done["response"]["cached"] is False and done["response"]["agent_type"] == "parent_agent"
+            # Forwarded as generated rather than buffered until the completion ends
+            assert tokens[-1][0] - tokens[0][0] > (len(TOKENS) - 1) * TOKEN_DELAY * 0.8
+            assert requests[0]["stream"] is True and requests[0]["stream_options"] == {"include_usage": True}
+            assert first_token._sum.get() > observed
+
+            # The streamed answer now serves both streaming and blocking requests without the upstream
+            cached = [event async for event in manager.stream_agent_response(UserType.PARENT, "ผลตรวจสายตาลูก")]
+            assert [event["type"] for event in cached] == ["token", "done"]
+            assert cached[-1]["response"]["cached"] is True and cached[0]["text"] == "".join(TOKENS)
+            blocking = await manager.get_agent_response(UserType.PARENT, "ผลตรวจสายตาลูก")
+            assert blocking["cached"] is True and len(requests) == 1
+
+    @pytest.mark.asyncio
+    async def test_upstream_failure_falls_back(self):
+        """An upstream error before any token streams the agent's fallback answer instead."""
+        requests = []
+        with serve(fake_openai_app(requests, fail=True)) as base_url:
+            manager = streaming_manager(base_url)
+            fallback = await manager.agents[UserType.TEACHER].get_fallback_response("สถิตินักเรียน")
+            events = [event async for event in manager.stream_agent_response(UserType.TEACHER, "สถิตินักเรียน")]
+            assert [event["type"] for event in events] == ["token", "done"] and len(requests) == 1
+            assert events[0]["text"] == events[-1]["response"]["response"] == fallback["response"]
+
+    def test_sse_event_format(self):
+        """Events are framed for EventSource with Thai text left unescaped."""
+        from app.api.chat_bot import sse_event
+
+        assert sse_event("token", {"text": "สวัสดี"}) == 'event: token\ndata: {"text": "สวัสดี"}\n\n'
+
+    @pytest.mark.performance
+    @pytest.mark.asyncio
+    async def test_endpoint_time_to_first_byte(self, monkeypatch):
+        """Over HTTP the first token reaches the client long before the blocking endpoint answers."""
+        from app.api import chat_bot
+        from app.api.auth import get_current_user
+
+        requests = []
+        chat_db = ChatDatabase(AsyncMongoClient().evep)
+        with serve(fake_openai_app(requests)) as openai_url:
+            monkeypatch.setattr(chat_bot, "agent_manager", streaming_manager(openai_url))
+            monkeypatch.setattr(chat_bot, "get_chat_database", lambda: chat_db)
+            app = FastAPI()
+            app.include_router(chat_bot.router, prefix="/api/v1/chat-bot")
+            app.dependency_overrides[get_current_user] = lambda: {"user_id": "u1", "role": "doctor"}
+
+            with serve(app) as api_url:
+                async with httpx.AsyncClient(base_url=api_url, timeout=10) as client:
+                    started = time.perf_counter()
+                    response = await client.post("/api/v1/chat-bot/ai-agent", json={"message": "นัดตรวจตา"})
+                    blocking_seconds = time.perf_counter() - started
+                    assert response.json()["response"] == "".join(TOKENS)
+
+                    frames, first_token_seconds = [], None
+                    started = time.perf_counter()
+                    async with client.stream("POST", "/api/v1/chat-bot/ai-agent/stream",
+                                             json={"message": "ผลตรวจตา", "conversation_id": "c1"}) as stream:
+                        assert stream.headers["content-type"].startswith("text/event-stream")
+                        async for line in stream.aiter_lines():
+                            if line.startswith("event: token") and first_token_seconds is None:
+                                first_token_seconds = time.perf_counter() - started
+                            if line.startswith("data: "):
+                                frames.append(json.loads(line[6:]))
+                    streamed_seconds = time.perf_counter() - started
+
+                    conversation = await chat_db.get_conversation("c1")
+                    for _ in range(100):
+                        if conversation and len(conversation["messages"]) == 2:
+                            break
+                        await asyncio.sleep(0.01)
+                        conversation = await chat_db.get_conversation("c1")
+
+        print(f"\nblocking {blocking_seconds * 1000:.0f}ms, streamed first token {first_token_seconds * 1000:.0f}ms "
+              f"of {streamed_seconds * 1000:.0f}ms")
+        assert frames[0] == {"conversation_id": "c1"}
+        assert "".join(frame["text"] for frame in frames[1:-1]) == frames[-1]["response"] == "".join(TOKENS)
+        assert frames[-1]["conversation_id"] == "c1" and frames[-1]["cached"] is False
+        assert [message["message"] for message in conversation["messages"]] == ["ผลตรวจตา", "".join(TOKENS)]
+        assert first_token_seconds < blocking_seconds / 3
@@ -0,0 +1,209 @@
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import bson
+import pytest
+from bson import ObjectId
+
+from app.services.audit_ledger import AuditLedger, event_leaf, ledger_stamp, verify_blocks
+from app.utils.blockchain import (
+    generate_blockchain_hash,
+    hash_audit_event,
+    leaf_hash,
+    merkle_levels,
+    merkle_proof,
+    merkle_root,
+    verify_blockchain_hash,
+    verify_merkle_proof,
+)
+from tests.async_mongomock import AsyncMongoClient
+
+
+def event(index):
+    return {
+        "timestamp": datetime.utcnow().isoformat(), "event_type": "data_access", "portal": "medical",
+        "user_id": f"user-{index % 17}", "ip_address": "10.0.0.7", "resource": f"/api/v1/patients/{index}",
+        "action": "view_patient", "status": "success", "severity": "low",
+    }
+
+
+def ledger_with_events(count, block_size=10):
+    client = AsyncMongoClient()
+    client.sync.evep.audit_logs.insert_many([event(index) for index in range(count)])
+    ledger = AuditLedger(get_events=lambda: client.evep.audit_logs, get_ledger=lambda: client.evep.audit_ledger,
+                         block_size=block_size, verify_workers=0)
+    return client, ledger
+
+
+def raw(client, event_id):
+    return bson.encode(client.sync.evep.audit_logs.find_one({"_id": event_id}))
+
+
+class TestAuditLedger:
+    """Test suite for the hash-chained Merkle audit ledger."""
+
+    def test_blockchain_hash_verifies(self):
+        """Hashes are reproducible from their input, so verification succeeds and catches changes."""
+        digest = generate_blockchain_hash("dashboard_stats_viewed:u1")
+        assert verify_blockchain_hash("dashboard_stats_viewed:u1", digest)
+        assert not verify_blockchain_hash("dashboard_stats_viewed:u2", digest)
+        stamped = generate_blockchain_hash("login", "2024-01-01T00:00:00")
+        assert verify_blockchain_hash("login", stamped, "2024-01-01T00:00:00") and not verify_blockchain_hash("login", stamped)
+
+        security_event = event(1)
+        security_event["audit_hash"] = hash_audit_event(security_event)
+        assert hash_audit_event({**security_event, "_id": ObjectId(), "ledger": {"block": 0, "index": 3}}) == security_event["audit_hash"]
+        assert hash_audit_event({**security_event, "status": "failed"}) != security_event["audit_hash"]
+
+    def test_merkle_proofs_for_every_leaf(self):
+        """Every leaf of trees of any size has a proof of at most ceil(log2 n) hashes that a changed leaf fails."""
+        for size in range(1, 34):
+            leaves = [leaf_hash(f"event {index}".encode()) for index in range(size)]
+            levels = merkle_levels(leaves)
+            root = merkle_root(leaves).hex()
+            for index in range(size):
+                proof = merkle_proof(levels, index)
+                assert len(proof) <= math.ceil(math.log2(size))
+                assert verify_merkle_proof(leaves[index], proof, root)
+                assert not verify_merkle_proof(leaf_hash(b"forged"), proof, root)
+        # An odd node is promoted rather than duplicated, so a repeated last leaf changes the root
+        assert merkle_root(leaves[:3]) != merkle_root(leaves[:3] + leaves[2:3])
+
+    @pytest.mark.asyncio
+    async def test_sealing_chains_blocks(self):
+        """Unsealed events are sealed into chained blocks, stamped with their position, and verify clean."""
+        client, ledger = ledger_with_events(25)
+        assert await ledger.seal() == 25
+        blocks = list(client.sync.evep.audit_ledger.find({"_id": {"$gte": 0}}, sort=[("_id", 1)]))
+        assert [(block["_id"], block["count"], block["complete"]) for block in blocks] == [(0, 10, True), (1, 10, True), (2, 5, True)]
+        assert blocks[0]["prev_hash"] == "0" * 64
+        assert [block["prev_hash"] for block in blocks[1:]] == [block["block_hash"] for block in blocks[:-1]]
+        stamps = [stored["ledger"] for stored in client.sync.evep.audit_logs.find(sort=[("_id", 1)])]
+        assert stamps[12] == {"block": 1, "index": 2}
+
+        # Later events extend the chain; sealed ones are not sealed again
+        client.sync.evep.audit_logs.insert_many([event(index) for index in range(25, 32)])
+        assert await ledger.seal() == 7
+        report = await ledger.verify()
+        assert report["valid"] and (report["blocks"], report["events"]) == (4, 32)
+        assert report["head_hash"] == (await ledger.head())["block_hash"]
+
+        event_id = client.sync.evep.audit_logs.find_one({"resource": "/api/v1/patients/12"})["_id"]
+        proof = await ledger.prove(event_id)
+        assert (proof["block"], proof["index"]) == (1, 2)
+        assert AuditLedger.verify_proof(proof, raw(client, event_id))
+
+    @pytest.mark.asyncio
+    async def test_tampering_is_detected(self):
+        """Edited, deleted and re-rooted blocks are each reported, and an edited event fails its proof."""
+        client, ledger = ledger_with_events(40)
+        await ledger.seal()
+        events = client.sync.evep.audit_logs
+        edited = events.find_one({"resource": "/api/v1/patients/3"})["_id"]
+        events.update_one({"_id": edited}, {"$set": {"status": "failed"}})
+        events.delete_one({"resource": "/api/v1/patients/15"})
+        client.sync.evep.audit_ledger.update_one({"_id": 3}, {"$set": {"merkle_root": "ab" * 32}})
+
+        report = await ledger.verify()
+        assert not report["valid"]
+        assert [(error["block"], error["error"]) for error in report["errors"]] == [
+            (0, "merkle_root_mismatch"), (1, "missing_events"), (3, "block_hash_mismatch"), (3, "merkle_root_mismatch")]
+
+        proof = await ledger.prove(edited)
+        assert not AuditLedger.verify_proof(proof, raw(client, edited))
+
+    @pytest.mark.asyncio
+    async def test_incremental_verification_from_checkpoint(self):
+        """A later range verifies against the head_hash of the earlier one; a wrong checkpoint breaks the chain."""
+        client, ledger = ledger_with_events(50)
+        await ledger.seal()
+        first = await ledger.verify(0, 2)
+        assert first["valid"] and first["to_block"] == 2
+
+        client.sync.evep.audit_logs.insert_many([event(index) for index in range(50, 65)])
+        await ledger.seal()
+        rest = await ledger.verify(from_block=3, checkpoint=first["head_hash"])
+        assert rest["valid"] and (rest["blocks"], rest["events"]) == (4, 35)
+        forked = await ledger.verify(from_block=3, checkpoint="cd" * 32)
+        assert [(error["block"], error["error"]) for error in forked["errors"]] == [(3, "chain_broken")]
+
+    @pytest.mark.asyncio
+    async def test_one_sealer_and_interrupted_blocks(self):
+        """Only the lease holder seals, and a block whose events were not stamped is finished on the next pass."""
+        client, ledger = ledger_with_events(15)
+        other = AuditLedger(get_events=ledger.get_events, get_ledger=ledger.get_ledger, block_size=10)
+        assert await ledger.seal() == 15
+        client.sync.evep.audit_logs.insert_many([event(index) for index in range(15, 20)])
+        assert await other.seal() == 0
+
+        async def crash(block):
+            raise ConnectionError("primary stepped down")
+
+        original_stamp, ledger._stamp = ledger._stamp, crash
+        with pytest.raises(ConnectionError):
+            await ledger.seal_block()
+        ledger._stamp = original_stamp
+        assert client.sync.evep.audit_logs.count_documents({"ledger.block": None}) == 5
+
+        assert await ledger.seal() == 0
+        assert client.sync.evep.audit_logs.count_documents({"ledger.block": None}) == 0
+        assert (await ledger.verify())["valid"]
+
+    @pytest.mark.performance
+    def test_verification_throughput(self):
+        """300k sealed events: parallel block verification, and one proof against rehashing its whole block."""
+        count, block_size = 300_000, 1024
+        events = [{"_id": ObjectId(), **event(index)} for index in range(count)]
+        blocks, stored = [], []
+        for start in range(0, count, block_size):
+            members = events[start:start + block_size]
+            seq = start // block_size
+            blocks.append({"_id": seq, "event_ids": [member["_id"] for member in members],
+                           "merkle_root": merkle_root([event_leaf(bson.encode(member)) for member in members]).hex()})
+            stored.extend(bson.encode({**member, "ledger": {"block": seq, "index": index}}) for index, member in enumerate(members))
+
+        def legacy_rehash():
+            # Without a ledger the only check is rehashing every event's content
+            return [hash_audit_event(bson.decode(document)) for document in stored]
+
+        started = time.perf_counter()
+        legacy_rehash()
+        legacy_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        assert verify_blocks(blocks, stored) == []
+        sequential_seconds = time.perf_counter() - started
+
+        workers = min(4, os.cpu_count() or 1)
+        chunk = len(blocks) // workers + 1
+        started = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(verify_blocks,
+                                    [blocks[start:start + chunk] for start in range(0, len(blocks), chunk)],
+                                    [stored[start * block_size:(start + chunk) * block_size] for start in range(0, len(blocks), chunk)]))
+        parallel_seconds = time.perf_counter() - started
+        assert all(errors == [] for errors in results)
+
+        block = blocks[100]
+        start = 100 * block_size
+        leaves = [event_leaf(document, ledger_stamp(100, index)) for index, document in enumerate(stored[start:start + block_size])]
+        proof = merkle_proof(merkle_levels(leaves), 37)
+        started = time.perf_counter()
+        for _ in range(1000):
+            assert verify_merkle_proof(event_leaf(stored[start + 37], ledger_stamp(100, 37)), proof, block["merkle_root"])
+        proof_seconds = (time.perf_counter() - started) / 1000
+        started = time.perf_counter()
+        for _ in range(10):
+            assert verify_blocks([block], stored[start:start + block_size]) == []
+        block_seconds = (time.perf_counter() - started) / 10
+
+        print(f"\n{count} events: content rehash {legacy_seconds * 1000:.0f}ms, ledger verification "
+              f"{sequential_seconds * 1000:.0f}ms sequential, {parallel_seconds * 1000:.0f}ms on {workers} processes; "
+              f"one event's proof {proof_seconds * 1e6:.0f}us ({len(proof)} hashes) vs its block {block_seconds * 1e6:.0f}us")
+        assert sequential_seconds < legacy_seconds
+        assert proof_seconds * 50 < block_seconds
+        if workers > 1:
+            assert parallel_seconds < sequential_seconds
@@ -0,0 +1,215 @@
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import pytest
+from bson import ObjectId, json_util
+from pymongo.errors import ServerSelectionTimeoutError
+
+from app.services.audit_pipeline import AuditPipeline
+from tests.async_mongomock import AsyncMongoClient
+
+
+class RemoteCollection:
+    """audit_logs behind a network round trip, which can be taken offline"""
+
+    def __init__(self, latency=0.0):
+        self.client = AsyncMongoClient()
+        self.collection = self.client.evep.audit_logs
+        self.latency = latency
+        self.online = True
+
+    async def _call(self, method, *args, **kwargs):
+        await asyncio.sleep(self.latency)
+        if not self.online:
+            raise ServerSelectionTimeoutError("mongo-primary:27017: connection refused")
+        return await getattr(self.collection, method)(*args, **kwargs)
+
+    async def insert_one(self, document):
+        return await self._call("insert_one", document)
+
+    async def insert_many(self, documents, ordered=True):
+        return await self._call("insert_many", documents, ordered=ordered)
+
+    def count(self):
+        return self.client.sync.evep.audit_logs.count_documents({})
+
+
+def event(index):
+    return {"event_type": "data_access", "action": f"view {index}", "user_id": ObjectId(), "timestamp": datetime.utcnow()}
+
+
+def pipeline_for(remote, tmp_path, **kwargs):
+    options = {"batch_size": 10, "flush_interval_seconds": 60, "spill_path": str(tmp_path / "audit_spill.jsonl"), **kwargs}
+    return AuditPipeline(get_collection=lambda: remote, **options)
+
+
+class TestAuditPipeline:
+    """Test suite for the write-behind audit pipeline."""
+
+    @pytest.mark.asyncio
+    async def test_size_and_time_triggered_batches(self, tmp_path):
+        """A full batch wakes the flusher at once; a partial one waits for the flush interval."""
+        remote = RemoteCollection()
+        pipeline = pipeline_for(remote, tmp_path, flush_interval_seconds=0.1)
+        for index in range(5):
+            assert pipeline.submit(event(index))
+        await asyncio.sleep(0.02)
+        assert remote.count() == 0 and len(pipeline) == 5
+
+        await asyncio.sleep(0.15)
+        assert remote.count() == 5
+
+        for index in range(25):
+            pipeline.submit(event(index))
+        await asyncio.sleep(0.02)
+        assert remote.count() == 30 and remote.client.operations.count(("audit_logs", "insert_many")) == 4
+        stats = pipeline.get_stats()
+        assert (stats["queued"], stats["written"], stats["batches"], stats["queue_depth"]) == (30, 30, 4, 0)
+        await pipeline.stop()
+
+    @pytest.mark.asyncio
+    async def test_full_queue_drops_events(self, tmp_path):
+        """Past max_queue_size new events are dropped and counted rather than blocking the request."""
+        remote = RemoteCollection()
+        pipeline = pipeline_for(remote, tmp_path, max_queue_size=5, batch_size=100)
+        results = [pipeline.submit(event(index)) for index in range(8)]
+        assert results == [True] * 5 + [False] * 3
+        assert pipeline.get_stats()["dropped"] == 3
+        await pipeline.stop()
+        assert remote.count() == 5
+
+    @pytest.mark.asyncio
+    async def test_spills_while_mongo_is_down_and_replays(self, tmp_path):
+        """Batches that cannot be written go to the spill file and are replayed after the next good write."""
+        remote = RemoteCollection()
+        pipeline = pipeline_for(remote, tmp_path)
+        remote.online = False
+        for index in range(15):
+            pipeline.submit(event(index))
+        await pipeline.flush()
+        assert remote.count() == 0 and pipeline.get_stats()["spilled"] == 15
+        assert sum(1 for _ in open(pipeline.spill_path)) == 15
+
+        remote.online = True
+        pipeline.submit(event(15))
+        await pipeline.flush()
+        assert remote.count() == 16 and not os.path.exists(pipeline.spill_path)
+        stored = remote.client.sync.evep.audit_logs.find_one({"action": "view 3"})
+        assert isinstance(stored["user_id"], ObjectId) and isinstance(stored["timestamp"], datetime)
+        assert pipeline.get_stats()["replayed"] == 15
+        await pipeline.stop()
+
+    @pytest.mark.asyncio
+    async def test_corrupt_spill_lines_are_set_aside(self, tmp_path):
+        """A line that does not parse goes to a .bad file; the rest replays once per flush, not once per batch."""
+        remote = RemoteCollection()
+        pipeline = pipeline_for(remote, tmp_path)
+        with open(pipeline.spill_path, "w", encoding="utf-8") as spill:
+            spill.write(json_util.dumps(event(0)) + "\n")
+            spill.write('{"event_type": "data_access", "action": "view 1", "timestamp": {"$da\n')
+            spill.write(json_util.dumps(event(2)) + "\n")
+        adoptions = []
+        adopt = pipeline._adopt_orphans
+        pipeline._adopt_orphans = lambda: adoptions.append(1) or adopt()
+
+        for index in range(3, 28):
+            pipeline.submit(event(index))
+        await pipeline.flush()
+        assert len(adoptions) == 1
+        assert remote.count() == 27 and not os.path.exists(pipeline.spill_path)
+        with open(f"{pipeline.spill_path}.bad", encoding="utf-8") as bad:
+            assert [line for line in bad] == ['{"event_type": "data_access", "action": "view 1", "timestamp": {"$da\n']
+        assert pipeline.get_stats()["replayed"] == 2 and pipeline.get_stats()["corrupt_spill_lines"] == 1
+
+        # The .bad file is not taken for a spill file and later flushes do not retry it
+        pipeline.submit(event(28))
+        await pipeline.flush()
+        assert remote.count() == 28 and pipeline.get_stats()["corrupt_spill_lines"] == 1
+        await pipeline.stop()
+
+    @pytest.mark.asyncio
+    async def test_workers_spill_to_their_own_files(self, tmp_path):
+        """Each process spills to a file named after its PID and replays files left by exited workers."""
+        remote = RemoteCollection()
+        pipeline = pipeline_for(remote, tmp_path)
+        assert pipeline.spill_path == str(tmp_path / f"audit_spill.{os.getpid()}.jsonl")
+
+        exited = subprocess.run([sys.executable, "-c", "import os; print(os.getpid())"], capture_output=True, text=True).stdout.strip()
+        running = str(os.getppid())
+        for pid, index in ((exited, 1), (running, 2)):
+            with open(tmp_path / f"audit_spill.{pid}.jsonl", "w", encoding="utf-8") as spill:
+                spill.write(json_util.dumps(event(index)) + "\n")
+
+        pipeline.submit(event(0))
+        await pipeline.flush()
+        assert sorted(document["action"] for document in remote.client.sync.evep.audit_logs.find()) == ["view 0", "view 1"]
+        assert not os.path.exists(tmp_path / f"audit_spill.{exited}.jsonl")
+        assert os.path.exists(tmp_path / f"audit_spill.{running}.jsonl")
+        await pipeline.stop()
+
+    @pytest.mark.asyncio
+    async def test_shutdown_flushes_everything(self, tmp_path):
+        """Events still buffered at shutdown are written before stop() returns."""
+        remote = RemoteCollection(latency=0.01)
+        pipeline = pipeline_for(remote, tmp_path, batch_size=7)
+        for index in range(30):
+            pipeline.submit(event(index))
+        await pipeline.stop()
+        assert remote.count() == 30 and len(pipeline) == 0 and not pipeline.get_stats()["running"]
+
+    @pytest.mark.asyncio
+    async def test_security_events_are_queued(self, tmp_path, monkeypatch):
+        """log_security_event hands the event to the pipeline instead of writing it in the request."""
+        from starlette.requests import Request
+
+        from app.api import admin
+
+        remote = RemoteCollection()
+        pipeline = pipeline_for(remote, tmp_path)
+        monkeypatch.setattr(admin, "audit_pipeline", pipeline)
+        request = Request({"type": "http", "headers": [(b"x-forwarded-for", b"10.0.0.7")], "client": ("127.0.0.1", 1)})
+        logged = await admin.log_security_event(request, {"id": "u1", "email": "a@evep.local", "role": "admin"},
+                                                "data_access", "view_database_stats", "/api/v1/admin/database/stats")
+        assert logged["ip_address"] == "10.0.0.7" and remote.count() == 0 and len(pipeline) == 1
+        await pipeline.stop()
+        assert remote.client.sync.evep.audit_logs.find_one()["action"] == "view_database_stats"
+
+    @pytest.mark.performance
+    @pytest.mark.asyncio
+    async def test_audited_request_latency(self, tmp_path):
+        """500 audited requests against a database 2ms away: inline insert_one vs the pipeline."""
+        requests = 500
+        legacy_remote = RemoteCollection(latency=0.002)
+
+        async def legacy_request(index):
+            # Previous behaviour: the request awaits its audit insert before answering
+            await legacy_remote.insert_one(event(index))
+
+        async def pipelined_request(index):
+            pipeline.submit(event(index))
+            # Let the flusher run between requests as it would under a live server
+            await asyncio.sleep(0)
+
+        started = time.perf_counter()
+        for index in range(requests):
+            await legacy_request(index)
+        legacy_seconds = time.perf_counter() - started
+
+        remote = RemoteCollection(latency=0.002)
+        pipeline = pipeline_for(remote, tmp_path, batch_size=100)
+        started = time.perf_counter()
+        for index in range(requests):
+            await pipelined_request(index)
+        pipelined_seconds = time.perf_counter() - started
+        await pipeline.stop()
+
+        print(f"\n{requests} audited requests: inline insert {legacy_seconds / requests * 1000:.3f}ms/request, "
+              f"pipeline {pipelined_seconds / requests * 1000:.3f}ms/request; "
+              f"{legacy_remote.client.operations.count(('audit_logs', 'insert_one'))} inserts vs "
+              f"{remote.client.operations.count(('audit_logs', 'insert_many'))} batched writes")
+        assert remote.count() == legacy_remote.count() == requests
+        assert pipelined_seconds * 10 < legacy_seconds
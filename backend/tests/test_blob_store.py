@@ -0,0 +1,216 @@
+import base64
+import io
+import json
+import time
+
+import pytest
+from unittest.mock import patch
+from PIL import Image
+
+from app.services.blob_store import (
+    BlobStore,
+    migrate_inline_photos,
+    photo_urls,
+    pop_photo_blob,
+    sign_photo_url,
+    signed_photos,
+    verify_photo_signature,
+)
+from tests.async_mongomock import AsyncMongoClient
+
+
+def make_jpeg(width=1200, height=900, color=(200, 40, 40)) -> bytes:
+    """Generate a JPEG image of the given size."""
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), color).save(buffer, format="JPEG", quality=95)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def mock_db():
+    """Mongomock-backed database used for blob metadata and documents."""
+    client = AsyncMongoClient()
+    with patch("app.services.blob_store.get_files_collection", return_value=client.evep.files):
+        yield client
+
+
+@pytest.fixture
+def store(tmp_path, mock_db):
+    """Blob store rooted in a temporary directory."""
+    return BlobStore(tmp_path)
+
+
+class TestBlobStore:
+    """Test suite for the content-addressed photo blob store."""
+
+    @pytest.mark.asyncio
+    async def test_put_image_deduplicates_and_creates_thumbnails(self, store, mock_db):
+        """Identical content is stored once and gets one thumbnail per size."""
+        content = make_jpeg()
+
+        first = await store.put_image(content, "image/jpeg", "user_1")
+        second = await store.put_image(content, "image/jpeg", "user_2")
+
+        assert first["blob_id"] == second["blob_id"] == store.content_hash(content)
+        assert not first["deduplicated"]
+        assert second["deduplicated"]
+        assert first["url"] == f"/api/v1/cdn/photos/{first['file_id']}"
+        assert set(first["thumbnails"]) == {"64", "256", "512"}
+
+        with Image.open(store.blob_path(f"{first['blob_id']}_256.jpg")) as thumb:
+            assert max(thumb.size) == 256
+
+        file_doc = mock_db.sync.evep.files.find_one({"file_id": first["file_id"]})
+        assert file_doc["ref_count"] == 2
+        assert file_doc["uploaded_by"] == "user_1"
+        assert file_doc["is_public"] is False
+
+    @pytest.mark.asyncio
+    async def test_release_deletes_blob_with_last_reference(self, store, mock_db):
+        """Deleting a photo drops a reference; the last one removes the blob and its thumbnails."""
+        content = make_jpeg(300, 200)
+        first = await store.put_image(content, "image/jpeg")
+        await store.put_image(content, "image/jpeg")
+        thumbnail = store.blob_path(f"{first['blob_id']}_64.jpg")
+
+        assert not await store.release(first)
+        assert store.blob_path(first["file_id"]).exists() and thumbnail.exists()
+        assert mock_db.sync.evep.files.find_one({"file_id": first["file_id"]})["ref_count"] == 1
+
+        assert await store.release(first)
+        assert not store.blob_path(first["file_id"]).exists() and not thumbnail.exists()
+        assert mock_db.sync.evep.files.find_one({"file_id": first["file_id"]}) is None
+        assert not await store.release(first)
+        assert not await store.release(None)
+
+    def test_photo_urls_are_signed_and_expire(self):
+        """Stored photo paths are handed out as signed URLs that stop working after they expire."""
+        signed = sign_photo_url("/api/v1/cdn/photos/abc.jpg", now=1_000_000)
+        path, _, query = signed.partition("?")
+        params = dict(part.split("=") for part in query.split("&"))
+        expires = int(params["expires"])
+
+        assert path == "/api/v1/cdn/photos/abc.jpg"
+        assert 1_000_000 + 3600 <= expires <= 1_000_000 + 7200
+        assert verify_photo_signature("abc.jpg", expires, params["signature"], now=1_000_000)
+        assert not verify_photo_signature("abd.jpg", expires, params["signature"], now=1_000_000)
+        assert not verify_photo_signature("abc.jpg", expires, params["signature"], now=expires + 1)
+        # Blobs recorded under the public route are moved to the signed one
+        assert sign_photo_url("/api/v1/cdn/public/abc.jpg", now=1_000_000) == signed
+
+        photos = signed_photos({
+            "profile_photo": "/api/v1/cdn/photos/abc.jpg",
+            "profile_photo_blob": {"url": "/api/v1/cdn/photos/abc.jpg", "thumbnails": {"64": "/api/v1/cdn/photos/abc_64.jpg"}},
+            "extra_photos": ["https://example.com/a.jpg"],
+        })
+        assert "signature=" in photos["profile_photo"] and "signature=" in photos["profile_photo_blob"]["thumbnails"]["64"]
+        assert photos["extra_photos"] == ["https://example.com/a.jpg"]
+
+    @pytest.mark.asyncio
+    async def test_undecodable_image_is_stored_without_thumbnails(self, store):
+        """Content Pillow cannot read is still stored, just without thumbnails."""
+        reference = await store.put_image(b"not an image", "image/png")
+        assert reference["thumbnails"] == {}
+        assert store.blob_path(reference["file_id"]).read_bytes() == b"not an image"
+
+    def test_photo_urls_drops_inline_payloads(self):
+        """List rows keep URLs and never ship base64 payloads."""
+        document = {
+            "profile_photo": base64.b64encode(b"x" * 1000).decode(),
+            "extra_photos": ["/api/v1/cdn/photos/abc.jpg", "aGVsbG8="],
+        }
+        urls = photo_urls(document)
+        assert urls["profile_photo"] == urls["profile_photo_thumbnail"] == ""
+        assert len(urls["extra_photos"]) == 1 and urls["extra_photos"][0].startswith("/api/v1/cdn/photos/abc.jpg?expires=")
+
+    def test_deleted_photo_releases_only_its_own_blob(self):
+        """The blob is found by the photo's file id, not its position; inline photos have none."""
+        blobs = [{"file_id": "b.jpg"}, {"file_id": "a.jpg"}]
+        # A legacy document: an inline photo first, blobs not aligned with extra_photos
+        assert pop_photo_blob(blobs, "aGVsbG8=") is None
+        assert pop_photo_blob(blobs, "/api/v1/cdn/photos/c.jpg") is None
+        assert pop_photo_blob(blobs, sign_photo_url("/api/v1/cdn/photos/a.jpg")) == {"file_id": "a.jpg"}
+        assert pop_photo_blob(blobs, "/api/v1/cdn/public/b.jpg") == {"file_id": "b.jpg"}
+        assert blobs == []
+
+    @pytest.mark.asyncio
+    async def test_migration_moves_inline_photos(self, store, mock_db):
+        """The streaming migration rewrites documents to hold only blob URLs."""
+        photo = base64.b64encode(make_jpeg()).decode()
+        patients = mock_db.sync.evep.patients
+        patients.insert_many([
+            {"first_name": "A", "profile_photo": photo, "extra_photos": [photo, "data:image/png;base64," + photo]},
+            {"first_name": "B", "profile_photo": "/api/v1/cdn/public/existing.jpg"},
+            {"first_name": "C"},
+        ])
+
+        stats = await migrate_inline_photos(mock_db.evep.patients, store, batch_size=1)
+
+        assert stats["scanned"] == 2
+        assert stats["migrated"] == 1
+        assert stats["photos"] == 3
+        migrated = patients.find_one({"first_name": "A"})
+        assert migrated["profile_photo"].startswith("/api/v1/cdn/photos/")
+        assert len(migrated["extra_photos"]) == 2
+        assert migrated["extra_photos"][0] == migrated["profile_photo"]
+        assert migrated["profile_photo_blob"]["thumbnails"]["256"]
+
+        # Re-running is a no-op
+        again = await migrate_inline_photos(mock_db.evep.patients, store)
+        assert again["migrated"] == 0
+
+    @pytest.mark.asyncio
+    async def test_public_route_serves_only_public_files(self, store, mock_db, tmp_path):
+        """Avatars uploaded as public are served; photo blobs and private uploads are not."""
+        from fastapi import HTTPException
+        from app.api import cdn
+
+        photo = await store.put_image(make_jpeg(), "image/jpeg", "user_1")
+        (tmp_path / "avatar.png").write_bytes(b"avatar")
+        (tmp_path / "private.png").write_bytes(b"private")
+        mock_db.sync.evep.files.insert_many([
+            {"file_id": "avatar.png", "is_public": True},
+            {"file_id": "private.png", "is_public": False},
+        ])
+
+        with patch.object(cdn, "STORAGE_PATH", tmp_path), patch.object(cdn, "get_files_collection", return_value=mock_db.evep.files):
+            response = await cdn.serve_public_file("avatar.png")
+            assert response.path == str(tmp_path / "avatar.png")
+            for file_id in (photo["file_id"], "private.png", "missing.png"):
+                with pytest.raises(HTTPException) as error:
+                    await cdn.serve_public_file(file_id)
+                assert error.value.status_code == 404
+
+    @pytest.mark.performance
+    @pytest.mark.asyncio
+    async def test_benchmark_list_page_payload(self, store, mock_db):
+        """Compare a 100-row student list page before and after migration."""
+        photo = base64.b64encode(make_jpeg(1600, 1200)).decode()
+        students = mock_db.sync.evep["evep.students"]
+        students.insert_many([
+            {"first_name": f"S{i}", "status": "active", "profile_photo": photo, "extra_photos": [photo, photo]}
+            for i in range(100)
+        ])
+
+        def list_page(rows, build):
+            started = time.perf_counter()
+            body = json.dumps([build(row) for row in rows])
+            return len(body), time.perf_counter() - started
+
+        def legacy_row(student):
+            return {
+                "id": str(student["_id"]),
+                "profile_photo": student.get("profile_photo", ""),
+                "extra_photos": student.get("extra_photos", []),
+            }
+
+        def blob_row(student):
+            return {"id": str(student["_id"]), **photo_urls(student)}
+
+        before_bytes, before_seconds = list_page(list(students.find({"status": "active"})), legacy_row)
+        await migrate_inline_photos(mock_db.evep["evep.students"], store)
+        after_bytes, after_seconds = list_page(list(students.find({"status": "active"}, {"extra_photo_blobs": 0})), blob_row)
+
+        print(f"\nlist page payload: {before_bytes} -> {after_bytes} bytes; "
+              f"serialize {before_seconds * 1000:.2f} -> {after_seconds * 1000:.2f} ms")
+        assert after_bytes * 50 < before_bytes
@@ -0,0 +1,160 @@
+import asyncio
+import time
+from datetime import datetime
+
+import pytest
+
+from app.core.chat_database import ChatDatabase
+from tests.async_mongomock import AsyncMongoClient
+
+
+def chat_database(bucket_size=5):
+    client = AsyncMongoClient()
+    chat_db = ChatDatabase(client.evep)
+    chat_db.bucket_size = bucket_size
+    return client, chat_db
+
+
+def turn(chat_db, index, intent="screening_help"):
+    return [
+        chat_db.build_message(f"question {index}", is_user=True),
+        chat_db.build_message(f"answer {index}", is_user=False, intent=intent, confidence=0.8),
+    ]
+
+
+async def legacy_turn(db, conversation_id, user_id, index):
+    """Previous behaviour: every message pushed into the conversation document, one write at a time"""
+    conversations = db.chat_conversations
+    if not await conversations.find_one({"conversation_id": conversation_id}):
+        await conversations.insert_one({
+            "conversation_id": conversation_id, "user_id": user_id, "messages": [],
+            "metadata": {"total_messages": 0, "intents_used": []},
+        })
+    for message, intent in ((f"question {index}", None), (f"answer {index}", "screening_help")):
+        await conversations.update_one(
+            {"conversation_id": conversation_id},
+            {"$push": {"messages": {"message": message, "intent": intent, "timestamp": datetime.utcnow()}},
+             "$set": {"updated_at": datetime.utcnow()}, "$inc": {"metadata.total_messages": 1}},
+        )
+        if intent:
+            await conversations.update_one({"conversation_id": conversation_id}, {"$addToSet": {"metadata.intents_used": intent}})
+    await db.chat_learning_data.insert_one({"user_id": user_id, "message": f"question {index}"})
+
+
+class TestChatStorage:
+    """Test suite for bucketed chat message storage."""
+
+    @pytest.mark.asyncio
+    async def test_messages_fill_fixed_size_buckets(self):
+        """Messages land in buckets of bucket_size and read back in order under a header with counters."""
+        client, chat_db = chat_database()
+        for index in range(6):
+            await chat_db.record_turn("c1", "u1", turn(chat_db, index))
+
+        buckets = list(client.sync.evep.chat_message_buckets.find({}, sort=[("bucket", 1)]))
+        assert [(bucket["bucket"], bucket["count"]) for bucket in buckets] == [(0, 5), (1, 5), (2, 2)]
+        header = client.sync.evep.chat_conversations.find_one({"conversation_id": "c1"})
+        assert "messages" not in header and header["user_id"] == "u1" and header["last_message"] == "answer 5"
+        assert header["metadata"]["total_messages"] == 12 and header["metadata"]["intents_used"] == ["screening_help"]
+
+        conversation = await chat_db.get_conversation("c1")
+        assert [message["seq"] for message in conversation["messages"]] == list(range(12))
+        assert (await chat_db.get_user_conversations("u1"))[0]["last_message"] == "answer 5"
+        assert await chat_db.add_message_to_conversation("missing", "hello", is_user=True) is False
+
+    @pytest.mark.asyncio
+    async def test_turn_is_one_write_per_collection(self):
+        """A turn costs one header update, one bucket bulk_write and one learning insert."""
+        client, chat_db = chat_database()
+        learning = [chat_db.build_learning_record("u1", "question", "answer", "screening_help", 0.8)]
+        # Two messages crossing a bucket boundary still take one bulk_write
+        await chat_db.add_messages("c1", [chat_db.build_message("m", is_user=True)] * 4, user_id="u1")
+        client.operations.clear()
+
+        await chat_db.record_turn("c1", "u1", turn(chat_db, 0), learning)
+        assert client.operations == [
+            ("chat_conversations", "find_one_and_update"),
+            ("chat_message_buckets", "bulk_write"),
+            ("chat_learning_data", "insert_many"),
+        ]
+        assert client.sync.evep.chat_message_buckets.count_documents({}) == 2
+
+    @pytest.mark.asyncio
+    async def test_recent_history_reads_newest_bucket(self):
+        """Recent history is located by the header's counter and read from the newest buckets only."""
+        client, chat_db = chat_database()
+        for index in range(3):
+            await chat_db.record_turn("c1", "u1", turn(chat_db, index))
+        reads = [("chat_conversations", "find_one"), ("chat_message_buckets", "find")]
+
+        client.operations.clear()
+        assert [message["seq"] for message in await chat_db.get_recent_messages("c1", limit=4)] == [2, 3, 4, 5]
+        assert [message["seq"] for message in await chat_db.get_recent_messages("c1", limit=1)] == [5]
+        assert len(await chat_db.get_recent_messages("c1", limit=10)) == 6
+        assert client.operations == reads * 3
+        assert await chat_db.get_recent_messages("missing") == []
+
+    @pytest.mark.asyncio
+    async def test_conversations_stored_before_bucketing(self):
+        """Embedded messages of an existing conversation are kept in front of the bucketed ones."""
+        client, chat_db = chat_database()
+        client.sync.evep.chat_conversations.insert_one({
+            "conversation_id": "old", "user_id": "u1", "updated_at": datetime(2024, 1, 1),
+            "messages": [{"message": f"legacy {index}", "is_user": index % 2 == 0} for index in range(7)],
+            "metadata": {"total_messages": 7, "intents_used": ["reports"], "user_role": "teacher"},
+        })
+        await chat_db.record_turn("old", "u1", turn(chat_db, 0))
+
+        conversation = await chat_db.get_conversation("old")
+        assert [message["message"] for message in conversation["messages"]][6:] == ["legacy 6", "question 0", "answer 0"]
+        assert conversation["metadata"]["total_messages"] == 9
+        assert sorted(conversation["metadata"]["intents_used"]) == ["reports", "screening_help"]
+        assert [message["message"] for message in await chat_db.get_recent_messages("old", limit=4)] == [
+            "legacy 5", "legacy 6", "question 0", "answer 0"]
+
+    @pytest.mark.asyncio
+    async def test_concurrent_turns_keep_sequence(self):
+        """Turns written concurrently to one conversation get distinct, ordered sequence numbers."""
+        client, chat_db = chat_database(bucket_size=7)
+        await asyncio.gather(*(chat_db.record_turn("c1", "u1", turn(chat_db, index)) for index in range(20)))
+        conversation = await chat_db.get_conversation("c1")
+        assert [message["seq"] for message in conversation["messages"]] == list(range(40))
+        assert all(bucket["count"] <= 7 for bucket in client.sync.evep.chat_message_buckets.find())
+
+    @pytest.mark.performance
+    @pytest.mark.asyncio
+    async def test_long_conversation_benchmark(self):
+        """400 turns in one conversation: writes per turn and the cost of reading recent history."""
+        turns = 400
+        legacy_client = AsyncMongoClient()
+        started = time.perf_counter()
+        for index in range(turns):
+            await legacy_turn(legacy_client.evep, "c1", "u1", index)
+        legacy_write_seconds = time.perf_counter() - started
+        legacy_writes = len(legacy_client.operations)
+
+        client, chat_db = chat_database(bucket_size=50)
+        started = time.perf_counter()
+        for index in range(turns):
+            await chat_db.record_turn("c1", "u1", turn(chat_db, index),
+                                      [chat_db.build_learning_record("u1", f"question {index}", "", "", 0.8)])
+        bucket_write_seconds = time.perf_counter() - started
+        bucket_writes = len(client.operations)
+
+        reads = 200
+        started = time.perf_counter()
+        for _ in range(reads):
+            (await legacy_client.evep.chat_conversations.find_one({"conversation_id": "c1"}))["messages"][-10:]
+        legacy_read_seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        for _ in range(reads):
+            recent = await chat_db.get_recent_messages("c1", limit=10)
+        bucket_read_seconds = time.perf_counter() - started
+
+        print(f"\n{turns} turns: embedded {legacy_write_seconds * 1000:.0f}ms ({legacy_writes / turns:.1f} ops/turn), "
+              f"bucketed {bucket_write_seconds * 1000:.0f}ms ({bucket_writes / turns:.1f} ops/turn); "
+              f"{reads} recent-history reads: embedded {legacy_read_seconds * 1000:.0f}ms, bucketed {bucket_read_seconds * 1000:.0f}ms")
+        assert [message["message"] for message in recent][-1] == f"answer {turns - 1}"
+        assert bucket_writes / turns == 3 and legacy_writes / turns > bucket_writes / turns
+        assert bucket_write_seconds < legacy_write_seconds
+        assert bucket_read_seconds < legacy_read_seconds
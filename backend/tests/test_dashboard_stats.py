@@ -0,0 +1,151 @@
+import re
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+from unittest.mock import patch
+from bson import ObjectId
+
+from app.core.event_bus import event_bus
+from app.services.dashboard_stats import (
+    COUNTERS_COLLECTION,
+    SCOPE_FIELDS,
+    CounterScope,
+    DashboardStatsEngine,
+    StatQuery,
+    publish_change,
+)
+from app.services.search_index import EVENT_COLLECTIONS
+from tests.async_mongomock import AsyncMongoClient
+
+
+@pytest.fixture
+def mock_db():
+    """Mongomock-backed database seeded with screenings and students."""
+    client = AsyncMongoClient()
+    evep = client.sync.evep
+    client.examiner_id = ObjectId()
+    evep.screenings.insert_many(
+        [{"organization": "Hospital A", "examiner_id": client.examiner_id, "status": "pending"} for _ in range(3)]
+        + [{"organization": "Hospital A", "status": "completed"} for _ in range(2)]
+        + [{"organization": "Hospital B", "status": "completed"}]
+    )
+    evep["evep.students"].insert_many([
+        {"school_name": "School A", "status": "active"},
+        {"school_name": "School A", "status": "inactive"},
+        {"school_name": "School B", "status": "active"},
+    ])
+    with patch("app.services.dashboard_stats.get_database", return_value=client):
+        yield client
+
+
+@pytest.fixture
+def engine(mock_db):
+    """Dashboard stats engine over the mock database."""
+    return DashboardStatsEngine(max_age_seconds=3600)
+
+
+SCREENING_QUERIES = {
+    "totalScreenings": StatQuery((CounterScope("screenings", "organization", "Hospital A"),)),
+    "pendingScreenings": StatQuery((CounterScope("screenings", "organization", "Hospital A"),), "pending"),
+    "allCompleted": StatQuery((CounterScope("screenings"),), "completed"),
+    "activeStudents": StatQuery((CounterScope("evep.students", "school_name", "School A"),), "active"),
+}
+
+
+class TestDashboardStats:
+    """Test suite for the materialized dashboard counters."""
+
+    @pytest.mark.asyncio
+    async def test_one_aggregation_per_collection_then_counter_reads(self, mock_db, engine):
+        """Cold reads run one $facet per collection; warm reads are a single find."""
+        stats = await engine.resolve(SCREENING_QUERIES)
+        assert stats == {"totalScreenings": 5, "pendingScreenings": 3, "allCompleted": 3, "activeStudents": 1}
+        aggregates = [op for op in mock_db.operations if op[1] == "aggregate"]
+        assert sorted(aggregates) == [("evep.students", "aggregate"), ("screenings", "aggregate")]
+
+        mock_db.operations.clear()
+        assert await engine.resolve(SCREENING_QUERIES) == stats
+        assert mock_db.operations == [(COUNTERS_COLLECTION, "find")]
+
+    @pytest.mark.asyncio
+    async def test_write_events_update_materialized_counters(self, mock_db, engine):
+        """Inserts, status changes and deletes adjust every affected scope."""
+        await engine.resolve(SCREENING_QUERIES)
+        session = {"organization": "Hospital A", "examiner_id": mock_db.examiner_id, "status": "pending"}
+
+        await engine.apply_change({"collection": "screenings", "after": session})
+        await engine.apply_change({
+            "collection": "screenings",
+            "before": {**session, "status": "pending"},
+            "after": {**session, "status": "completed"},
+        })
+        await engine.apply_change({"collection": "screenings", "before": {"organization": "Hospital B", "status": "completed"}})
+
+        stats = await engine.resolve(SCREENING_QUERIES)
+        assert stats["totalScreenings"] == 6
+        assert stats["pendingScreenings"] == 3
+        assert stats["allCompleted"] == 3
+
+        # Scopes nobody has read are left to be computed on first read
+        assert mock_db.sync.evep[COUNTERS_COLLECTION].find_one(
+            {"_id": CounterScope("screenings", "examiner_id", mock_db.examiner_id).key}
+        ) is None
+
+    @pytest.mark.asyncio
+    async def test_events_flow_through_event_bus(self, mock_db, engine):
+        """Write handlers publish on the event bus and the engine applies them."""
+        query = {"students": StatQuery((CounterScope("evep.students", "school_name", "School B"),), "active")}
+        assert await engine.resolve(query) == {"students": 1}
+
+        engine.register()
+        try:
+            await publish_change("evep.students", after={"school_name": "School B", "status": "active"})
+        finally:
+            event_bus.unsubscribe("dashboard.document_changed", engine.apply_change)
+        assert await engine.resolve(query) == {"students": 2}
+
+    def test_handlers_publish_the_collections_the_dashboard_reads(self):
+        """Every collection a handler publishes a write for is a tracked one, under the name of the collection it writes."""
+        api = Path(__file__).resolve().parents[1] / "app" / "api"
+        published = set()
+        for path in api.glob("*.py"):
+            published.update(re.findall(r'publish_change\(\s*"([^"]+)"', path.read_text(encoding="utf-8")))
+        read = set(re.findall(r'CounterScope\(\s*"([^"]+)"', (api / "dashboard.py").read_text(encoding="utf-8")))
+
+        assert published and published <= set(SCOPE_FIELDS)
+        # The evep student handlers write db.evep["evep.students"]; the search index listens for the same name
+        assert "evep.students" in published and "evep.students" in read and "students" not in read
+        assert "evep.students" in EVENT_COLLECTIONS
+
+    @pytest.mark.asyncio
+    async def test_stale_and_forced_counters_are_recomputed(self, mock_db, engine):
+        """Counters older than the max age, or a forced read, reconcile with the source."""
+        query = {"total": StatQuery((CounterScope("screenings"),))}
+        await engine.resolve(query)
+        # A write that bypassed the event bus
+        mock_db.sync.evep.screenings.insert_one({"status": "pending"})
+        assert await engine.resolve(query) == {"total": 6}
+        assert await engine.resolve(query, force=True) == {"total": 7}
+
+        mock_db.sync.evep.screenings.insert_one({"status": "pending"})
+        mock_db.sync.evep[COUNTERS_COLLECTION].update_many(
+            {}, {"$set": {"computed_at": datetime.utcnow() - timedelta(hours=2)}}
+        )
+        assert await engine.resolve(query) == {"total": 8}
+
+    @pytest.mark.asyncio
+    async def test_type_sensitive_scopes_and_multi_scope_sum(self, mock_db, engine):
+        """Counters match MongoDB equality and stats can sum several scopes."""
+        student_ids = [ObjectId(), ObjectId()]
+        mock_db.sync.evep.school_screenings.insert_many([
+            {"student_id": student_ids[0], "status": "pending"},
+            {"student_id": student_ids[1], "status": "completed"},
+            {"student_id": str(student_ids[1]), "status": "completed"},
+        ])
+        scopes = tuple(CounterScope("school_screenings", "student_id", student_id) for student_id in student_ids)
+        stats = await engine.resolve({
+            "total": StatQuery(scopes),
+            "completed": StatQuery(scopes, "completed"),
+        })
+        assert stats == {"total": 2, "completed": 1}
@@ -0,0 +1,89 @@
+import os
+
+import pytest
+from unittest.mock import patch
+
+from app.core.config import settings
+from app.modules.ai_insights import embedding_cache
+from app.modules.ai_insights.embedding_cache import EmbeddingCache, cache_key
+from app.modules.ai_insights.vector_store import VectorStore
+from tests.test_embedding_executor import FakeModel
+
+ADMIN_USER = {"user_id": "admin_1", "role": "admin", "email": "admin@example.com"}
+
+
+class TestEmbeddingCache:
+    """Test suite for the two-tier embedding cache and its admin stats."""
+
+    def test_keys_normalize_whitespace_and_unicode(self):
+        """Texts differing only in whitespace or Unicode composition share a key; models do not."""
+        assert cache_key("m", "  Blurry   vision\n") == cache_key("m", "Blurry vision")
+        assert cache_key("m", "café") == cache_key("m", "café")
+        assert cache_key("m", "Blurry vision") != cache_key("other", "Blurry vision")
+        assert cache_key("m", "Blurry vision") != cache_key("m", "blurry vision")
+
+    def test_memory_budget_and_disk_tier(self, tmp_path):
+        """The memory tier evicts past its byte budget; the file tier serves evicted and restarted lookups."""
+        path = str(tmp_path / "cache" / "embeddings.sqlite3")
+        cache = EmbeddingCache("m", memory_bytes=3 * 16, path=path)
+        cache.put_many([f"text {i}" for i in range(5)], [[float(i)] * 4 for i in range(5)])
+
+        stats = cache.get_stats()
+        assert stats["memory_entries"] == 3 and stats["memory_bytes"] == 48 and stats["evictions"] == 2
+        assert stats["disk_entries"] == 5 and stats["disk_vector_bytes"] == 80
+
+        assert cache.get_memory("text 0") is None
+        assert cache.get("text 0") == [0.0] * 4
+        assert cache.get_memory("text 0") == [0.0] * 4
+        assert cache.get("unknown") is None
+        cache.close()
+
+        restarted = EmbeddingCache("m", path=path)
+        assert restarted.get_many(["text 4", "text  4", "missing"]) == [[4.0] * 4, [4.0] * 4, None]
+        stats = restarted.get_stats()
+        assert (stats["disk_hits"], stats["memory_hits"], stats["misses"]) == (2, 0, 1)
+        assert stats["hit_ratio"] == round(2 / 3, 4)
+        restarted.close()
+
+    def test_memory_tier_does_not_wait_for_disk(self, tmp_path):
+        """Memory hits are served while another thread holds the SQLite tier; the default file is outside the tree."""
+        assert os.path.isabs(settings.EMBEDDING_CACHE_PATH)
+
+        cache = EmbeddingCache("m", path=str(tmp_path / "embeddings.sqlite3"))
+        cache.put("hot", [1.0, 2.0])
+        with cache._disk_lock:
+            assert cache.get_memory("hot") == [1.0, 2.0]
+            assert cache.get_many(["hot"]) == [[1.0, 2.0]]
+        cache.close()
+
+    def test_vector_store_encodes_each_text_once(self, tmp_path):
+        """Repeated and duplicate texts in batches are served from the cache instead of the model."""
+        model = FakeModel()
+        store = VectorStore.__new__(VectorStore)
+        store.embedding_model = model
+        store.embedding_cache = EmbeddingCache("fake", path=str(tmp_path / "embeddings.sqlite3"))
+
+        first = store.generate_embeddings_batch(["ab", "abc", "ab", "a  b"])
+        assert model.batches == [3]
+        assert first[0] == first[2] == [2.0, 0.0]
+
+        assert store.generate_embedding("abc") == first[1]
+        assert store.generate_embeddings_batch(["abcd", "ab"])[1] == first[0]
+        assert model.batches == [3, 1]
+
+    @pytest.mark.asyncio
+    async def test_admin_stats_endpoint(self, tmp_path):
+        """The admin endpoint reports every model's cache."""
+        from app.api import admin
+
+        cache = EmbeddingCache("all-MiniLM-L6-v2", path=str(tmp_path / "embeddings.sqlite3"))
+        cache.put("hello", [1.0, 2.0])
+        cache.get("hello")
+        with patch.dict(embedding_cache._caches, {"all-MiniLM-L6-v2": cache}, clear=True):
+            stats = await admin.get_embedding_cache_stats_endpoint(current_user=ADMIN_USER)
+            with pytest.raises(admin.HTTPException) as error:
+                await admin.get_embedding_cache_stats_endpoint(current_user={"role": "teacher"})
+
+        assert [entry["model"] for entry in stats["caches"]] == ["all-MiniLM-L6-v2"]
+        assert stats["caches"][0]["memory_hits"] == 1 and stats["caches"][0]["disk_entries"] == 1
+        assert error.value.status_code == 403
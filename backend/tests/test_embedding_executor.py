@@ -0,0 +1,141 @@
+import asyncio
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from app.modules.ai_insights.embedding_cache import EmbeddingCache
+from app.modules.ai_insights.embedding_executor import EmbeddingExecutor
+from app.modules.ai_insights.vector_store import VectorStore
+
+
+class FakeModel:
+    """Embedding model stub; sleeping stands in for native kernels that release the GIL"""
+
+    def __init__(self, seconds_per_call=0.0, seconds_per_text=0.0, fail=False):
+        self.seconds_per_call = seconds_per_call
+        self.seconds_per_text = seconds_per_text
+        self.fail = fail
+        self.batches = []
+        self.threads = set()
+
+    def encode(self, texts):
+        self.threads.add(threading.current_thread().name)
+        if self.fail:
+            raise RuntimeError("model crashed")
+        self.batches.append(len(texts))
+        time.sleep(self.seconds_per_call + self.seconds_per_text * len(texts))
+        return np.array([[float(len(text)), float(index)] for index, text in enumerate(texts)])
+
+
+class FakeCollection:
+    def __init__(self):
+        self.added = []
+
+    def add(self, embeddings, documents, metadatas, ids):
+        self.added.append((ids, embeddings, documents))
+
+    def query(self, query_embeddings, n_results, where):
+        return {"ids": [["doc"]], "documents": [["text"]], "metadatas": [[{}]], "distances": [[0.1]]}
+
+
+async def measure_loop_lag(stop: asyncio.Event) -> float:
+    """Largest delay of a 1ms timer while the workload runs"""
+    loop, worst = asyncio.get_running_loop(), 0.0
+    while not stop.is_set():
+        scheduled = loop.time()
+        await asyncio.sleep(0.001)
+        worst = max(worst, loop.time() - scheduled - 0.001)
+    return worst
+
+
+class TestEmbeddingExecutor:
+    """Test suite for the batching, off-loop embedding executor."""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_requests_are_batched_off_loop(self):
+        """Concurrent single-text requests share model calls and each gets its own vector."""
+        model = FakeModel(seconds_per_call=0.01)
+        executor = EmbeddingExecutor(model.encode, model_name="fake", max_batch_size=8, max_wait_ms=5)
+        texts = [f"text {'x' * index}" for index in range(20)]
+        try:
+            results = await asyncio.gather(*(executor.embed(text) for text in texts))
+        finally:
+            await executor.close()
+
+        assert [result[0] for result in results] == [float(len(text)) for text in texts]
+        assert sum(model.batches) == 20
+        assert len(model.batches) <= 4 and max(model.batches) <= 8
+        assert all(name.startswith("embedding") for name in model.threads)
+
+    @pytest.mark.asyncio
+    async def test_batch_api_and_failures(self):
+        """Caller batches are chunked, and a model error reaches every waiting request."""
+        model = FakeModel()
+        executor = EmbeddingExecutor(model.encode, max_batch_size=4, max_wait_ms=1)
+        assert len(await executor.embed_many([str(index) for index in range(10)])) == 10
+        assert model.batches == [4, 4, 2]
+
+        model.fail = True
+        results = await asyncio.gather(executor.embed("a"), executor.embed("b"), return_exceptions=True)
+        assert all(isinstance(result, RuntimeError) for result in results)
+
+        model.fail = False
+        assert await executor.embed("abc") == [3.0, 0.0]
+        await executor.close()
+
+    @pytest.mark.asyncio
+    async def test_vector_store_async_methods_use_executor(self):
+        """VectorStore's async paths embed through the executor and pass the vector to ChromaDB."""
+        model = FakeModel()
+        store = VectorStore.__new__(VectorStore)
+        store.embedding_model = model
+        store.embedding_cache = EmbeddingCache("fake", path=None)
+        store.embedding_executor = EmbeddingExecutor(store.generate_embeddings_batch, max_wait_ms=1)
+        store.collections = {"ai_insights": FakeCollection()}
+
+        assert await store.add_document_async("ai_insights", "insight_1", "hello", {"role": "doctor"})
+        ids, embeddings, documents = store.collections["ai_insights"].added[0]
+        assert ids == ["insight_1"] and embeddings == [[5.0, 0.0]] and documents == ["hello"]
+
+        results = await store.search_similar_async("ai_insights", "query")
+        assert results[0]["id"] == "doc"
+        assert not await store.add_document_async("missing", "x", "text")
+        assert model.batches == [1, 1, 1]
+        await store.embedding_executor.close()
+
+    @pytest.mark.performance
+    @pytest.mark.asyncio
+    async def test_event_loop_lag_benchmark(self):
+        """200 concurrent chat-turn embeddings: inline encode against the executor."""
+        requests = 200
+        texts = [f"question {index}" for index in range(requests)]
+
+        async def inline(model, text):
+            # Previous behaviour: encode directly inside the coroutine
+            return model.encode([text])[0].tolist()
+
+        async def run(embed):
+            stop = asyncio.Event()
+            probe = asyncio.create_task(measure_loop_lag(stop))
+            await asyncio.sleep(0.01)
+            started = time.perf_counter()
+            await asyncio.gather(*(embed(text) for text in texts))
+            elapsed = time.perf_counter() - started
+            stop.set()
+            return elapsed, await probe
+
+        inline_model = FakeModel(seconds_per_call=0.004, seconds_per_text=0.0002)
+        inline_seconds, inline_lag = await run(lambda text: inline(inline_model, text))
+
+        model = FakeModel(seconds_per_call=0.004, seconds_per_text=0.0002)
+        executor = EmbeddingExecutor(model.encode, max_batch_size=32, max_wait_ms=5)
+        executor_seconds, executor_lag = await run(executor.embed)
+        await executor.close()
+
+        print(f"\ninline: {requests / inline_seconds:.0f} texts/s, max loop lag {inline_lag * 1000:.1f}ms; "
+              f"executor: {requests / executor_seconds:.0f} texts/s, max loop lag {executor_lag * 1000:.1f}ms, "
+              f"{len(model.batches)} model calls")
+        assert executor_lag < inline_lag
+        assert executor_seconds < inline_seconds
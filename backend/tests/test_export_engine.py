@@ -0,0 +1,181 @@
+import csv
+import gzip
+import io
+import json
+import tracemalloc
+
+import pytest
+from bson import ObjectId
+from unittest.mock import patch
+
+from app.api.csv_export import EXPORT_SPECS
+from app.services.export_engine import ExportJobManager, ROW_GROUP_SIZE, stream_export
+from tests.async_mongomock import AsyncCollection, AsyncMongoClient
+
+STUDENTS = EXPORT_SPECS["students"]
+
+
+class GeneratedCursor:
+    """Cursor producing documents on demand, so the source holds nothing in memory"""
+
+    def __init__(self, count):
+        self._count = count
+        self._index = 0
+
+    def sort(self, *args, **kwargs):
+        return self
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._index >= self._count:
+            raise StopAsyncIteration
+        self._index += 1
+        return {
+            "_id": ObjectId(),
+            "student_code": f"STU{self._index:07d}",
+            "first_name": "สมชาย",
+            "last_name": "ใจดี",
+            "cid": f"{1100000000000 + self._index}",
+            "school_name": "โรงเรียนนานาชาติกรุงเทพ",
+            "status": "active",
+        }
+
+
+class GeneratedCollection:
+    """Collection stub whose find() streams generated student documents"""
+
+    def __init__(self, count):
+        self.count = count
+
+    def find(self, query, projection=None, batch_size=None):
+        return GeneratedCursor(self.count)
+
+
+async def collect(chunks):
+    return b"".join([chunk async for chunk in chunks])
+
+
+@pytest.fixture
+def mock_db():
+    """Mongomock-backed database with a few students."""
+    client = AsyncMongoClient()
+    client.sync.evep["evep.students"].insert_many([
+        {"student_code": f"STU{i:03d}", "first_name": f"Student {i}", "status": "active", "profile_photo": "x" * 1000}
+        for i in range(20)
+    ] + [{"student_code": "OLD", "status": "inactive"}])
+    with patch("app.services.export_engine.get_database", return_value=client):
+        yield client
+
+
+class TestExportEngine:
+    """Test suite for the streaming export engine and export jobs."""
+
+    @pytest.mark.asyncio
+    async def test_csv_stream_projects_columns(self, mock_db):
+        """CSV output keeps the legacy columns and only the requested rows."""
+        collection = mock_db.evep["evep.students"]
+        body = await collect(stream_export(collection, STUDENTS, STUDENTS.build_query(), "csv"))
+        rows = list(csv.reader(io.StringIO(body.decode("utf-8"))))
+        assert rows[0][:3] == ["Student ID", "Student Code", "Title"]
+        assert len(rows) == 21
+        assert "x" * 1000 not in body.decode("utf-8")
+
+    @pytest.mark.asyncio
+    async def test_gzip_ndjson_and_parquet(self, mock_db):
+        """NDJSON and Parquet carry the same rows, with optional gzip."""
+        import pyarrow.parquet as pq
+
+        collection = mock_db.evep["evep.students"]
+        body = await collect(stream_export(collection, STUDENTS, STUDENTS.build_query(), "ndjson", compress=True))
+        records = [json.loads(line) for line in gzip.decompress(body).decode("utf-8").splitlines()]
+        assert len(records) == 20
+        assert records[0]["Student Code"] == "STU000"
+
+        body = await collect(stream_export(collection, STUDENTS, STUDENTS.build_query(), "parquet"))
+        table = pq.read_table(io.BytesIO(body))
+        assert table.num_rows == 20
+        assert table.column_names == STUDENTS.headers
+
+    @pytest.mark.asyncio
+    async def test_memory_ceiling(self):
+        """Exporting 100k rows stays within a fixed memory ceiling regardless of size."""
+        import pyarrow as pa
+
+        row_count = 100_000
+        for export_format, compress in (("csv", True), ("ndjson", False), ("parquet", False)):
+            total = 0
+            tracemalloc.start()
+            pool = pa.default_memory_pool()
+            arrow_before = pool.max_memory()
+            try:
+                async for chunk in stream_export(GeneratedCollection(row_count), STUDENTS, {}, export_format, compress):
+                    total += len(chunk)
+                _, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+            arrow_peak = pool.max_memory() - arrow_before
+
+            print(f"\n{export_format}{'+gzip' if compress else ''}: {total / 1e6:.1f} MB out, "
+                  f"peak {peak / 1e6:.1f} MB python, {arrow_peak / 1e6:.1f} MB arrow")
+            assert peak < 16 * 1024 * 1024
+            assert arrow_peak < 32 * 1024 * 1024
+            if export_format == "ndjson":
+                # The payload is far larger than what was held in memory
+                assert total > 4 * peak
+
+    @pytest.mark.asyncio
+    async def test_job_resumes_from_checkpoint(self, mock_db, tmp_path):
+        """A job that fails mid-export resumes after its last checkpoint without duplicates."""
+        mock_db.sync.evep["evep.students"].insert_many([
+            {"student_code": f"BULK{i:06d}", "status": "active"} for i in range(2 * ROW_GROUP_SIZE + 500)
+        ])
+        expected_rows = 2 * ROW_GROUP_SIZE + 500 + 20
+        manager = ExportJobManager(EXPORT_SPECS, str(tmp_path), batch_size=500)
+
+        original_find = AsyncCollection.find
+
+        def failing_find(self, *args, **kwargs):
+            cursor = original_find(self, *args, **kwargs)
+            documents = iter(list(cursor._cursor))
+
+            class FailingCursor:
+                def sort(self, *args, **kwargs):
+                    return self
+
+                def __aiter__(self):
+                    self.count = 0
+                    return self
+
+                async def __anext__(self):
+                    self.count += 1
+                    if self.count > ROW_GROUP_SIZE + 100:
+                        raise ConnectionError("connection reset")
+                    try:
+                        return next(documents)
+                    except StopIteration:
+                        raise StopAsyncIteration
+
+            return FailingCursor()
+
+        with patch.object(manager, "start"):
+            job = await manager.create_job("students", {}, "csv", True, "user_1")
+
+        with patch.object(AsyncCollection, "find", failing_find):
+            await manager.run(job["_id"])
+        failed = await manager.get_job(job["_id"])
+        assert failed["status"] == "failed"
+        assert failed["rows_written"] == ROW_GROUP_SIZE
+
+        assert await manager.resume(job["_id"])
+        await manager._tasks[job["_id"]]
+        completed = await manager.get_job(job["_id"])
+        assert completed["status"] == "completed"
+        assert completed["rows_written"] == expected_rows
+
+        content = gzip.decompress(manager.job_path(completed).read_bytes()).decode("utf-8")
+        rows = list(csv.reader(io.StringIO(content)))
+        assert rows[0] == STUDENTS.headers
+        ids = [row[0] for row in rows[1:]]
+        assert len(ids) == len(set(ids)) == expected_rows
@@ -0,0 +1,186 @@
+import random
+import re
+import time
+
+import pytest
+
+from app.core.chat_database import ChatDatabase
+from app.core.intent_matcher import CompiledIntents, IntentMatcher, required_literal
+from app.core.keyword_automaton import KeywordAutomaton
+from tests.async_mongomock import AsyncMongoClient
+
+BASE_PATTERNS = {
+    "screening_help": [r"how.*screen", r"start.*screen", r"vision.*test", r"ตรวจ.*สายตา", r"เริ่ม.*ตรวจ"],
+    "inventory_query": [r"inventory", r"stock", r"glasses", r"คลัง.*สินค้า", r"แว่น.*ตา", r"มี.*อยู่"],
+    "student_info": [r"student", r"find.*student", r"นักเรียน", r"ข้อมูล.*นักเรียน"],
+    "medical_team": [r"doctor", r"nurse", r"schedule", r"แพทย์", r"พยาบาล", r"ตาราง.*งาน"],
+    "system_help": [r"how.*to", r"help", r"where.*is", r"how.*do.*i", r"วิธี.*ใช้", r"ทำ.*ยังไง"],
+    "reports": [r"report", r"statistics", r"summary", r"รายงาน", r"สถิติ", r"สรุป"],
+}
+
+MESSAGES = [
+    "How do I start screening for grade 3?",
+    "ตรวจสายตานักเรียนชั้น ป.3 ยังไง",
+    "how do i view a student record",
+    "มีแว่นตาเหลืออยู่ในคลังสินค้ากี่อัน",
+    "show me the monthly summary",
+    "ตาราง งาน ของพยาบาล",
+    "hello there",
+    "ขอบคุณครับ",
+]
+
+
+def legacy_detect(message, intent_patterns):
+    """Previous behaviour: every pattern of every intent searched in turn"""
+    best_intent, best_confidence = "system_help", 0.0
+    for intent, patterns in intent_patterns.items():
+        for pattern in patterns:
+            if re.search(pattern, message.lower()):
+                if 0.8 > best_confidence:
+                    best_intent, best_confidence = intent, 0.8
+    return best_intent, best_confidence
+
+
+def generated_patterns(intents=40, per_intent=8, seed=11):
+    """A few hundred bilingual patterns in the shapes the admin UI produces"""
+    rng = random.Random(seed)
+    english = ["screen", "vision", "glasses", "student", "report", "nurse", "school", "referral",
+               "appointment", "stock", "result", "parent", "teacher", "hospital", "eye", "test"]
+    thai = ["ตรวจ", "สายตา", "แว่น", "นักเรียน", "รายงาน", "พยาบาล", "โรงเรียน", "ส่งต่อ",
+            "นัดหมาย", "คลัง", "ผล", "ผู้ปกครอง", "ครู", "โรงพยาบาล", "ตา", "ทดสอบ"]
+    patterns = {}
+    for intent in range(intents):
+        words = english if intent % 2 else thai
+        entries = []
+        for index in range(per_intent):
+            first, second = rng.sample(words, 2)
+            entries.append([first + str(intent), rf"{first}.*{second}{intent}", rf"{second}\s*{intent}{first}"][index % 3])
+        patterns[f"intent_{intent}"] = entries
+    patterns.update(BASE_PATTERNS)
+    return patterns
+
+
+class TestIntentMatcher:
+    """Test suite for the compiled, hot-reloading chat bot intent matcher."""
+
+    def test_automaton_finds_overlapping_keywords(self):
+        """Every occurrence is reported, including suffixes and Thai keywords inside words."""
+        automaton = KeywordAutomaton([("he", 1), ("she", 2), ("hers", 3), ("แพทย์", 4), ("ทย", 5)])
+        assert list(automaton.iter_matches("ushers")) == [(1, 4, 2), (2, 4, 1), (2, 6, 3)]
+        assert automaton.find_all("ทีมแพทย์") == {4, 5}
+        assert automaton.find_all("nothing") == set() and len(automaton) == 5
+
+    def test_required_literals(self):
+        """Anchors come from mandatory top-level literal runs only."""
+        assert required_literal(r"how.*screen") == ("screen", False)
+        assert required_literal(r"ข้อมูล.*นักเรียน") == ("นักเรียน", False)
+        assert required_literal(r"inventory") == ("inventory", True)
+        assert required_literal(r"a\.b") == ("a.b", True)
+        assert required_literal(r"cat|dog") == (None, False)
+        assert required_literal(r"(?i)report") == (None, False)
+        assert required_literal(r"[") == (None, False)
+
+    def test_matches_legacy_detection(self):
+        """The compiled index picks the same intent as searching every pattern in turn."""
+        patterns = generated_patterns()
+        patterns["numbers"] = [r"\d{4}", r"(?:grade|ชั้น) ?\d"]
+        compiled = CompiledIntents(patterns)
+        rng = random.Random(5)
+        words = sum((pattern.replace(".*", " ").replace(r"\s*", "").split() for entries in patterns.values() for pattern in entries), [])
+        messages = MESSAGES + [" ".join(rng.sample(words, 3)) for _ in range(500)]
+
+        for message in messages:
+            legacy_intent, _ = legacy_detect(message, patterns)
+            assert (compiled.best(message.lower()) or "system_help") == legacy_intent, message
+
+        scores = compiled.score("how to check glasses stock")
+        assert scores["inventory_query"] == 2 and scores["system_help"] == 1
+
+    def test_invalid_patterns_are_skipped(self):
+        """A broken stored pattern does not take the other patterns down with it."""
+        compiled = CompiledIntents({"broken": ["(unclosed"], "reports": ["report"]})
+        assert compiled.pattern_count == 1 and compiled.best("weekly report") == "reports"
+
+    @pytest.mark.asyncio
+    async def test_reloads_when_version_stamp_changes(self):
+        """Patterns load once, then reload only after a write bumps the version stamp."""
+        chat_db = ChatDatabase(AsyncMongoClient().evep)
+        matcher = IntentMatcher(BASE_PATTERNS, refresh_seconds=3600)
+
+        # An empty collection serves the built-in patterns
+        assert (await matcher.get(chat_db)).best("where is the stock") == "inventory_query"
+
+        await chat_db.create_intent_pattern("greeting", ["hello", "สวัสดี"])
+        assert (await matcher.get(chat_db)).best("hello") is None
+        matcher.invalidate()
+        compiled = await matcher.get(chat_db)
+        assert compiled.version == 1 and compiled.best("สวัสดีครับ") == "greeting"
+
+        for _ in range(5):
+            await matcher.get(chat_db)
+        await chat_db.create_intent_pattern("greeting", ["hi"])
+        matcher.refresh_seconds = 0
+        assert (await matcher.get(chat_db)).best("hello") is None
+        assert matcher.get_stats()["reloads"] == 3 and matcher.get_stats()["version"] == 2
+
+    @pytest.mark.asyncio
+    async def test_detect_intent(self, monkeypatch):
+        """detect_intent keeps its confidences with and without the database."""
+        from app.api import chat_bot
+        from app.api.chat_bot import FALLBACK_INTENT_PATTERNS, detect_intent
+
+        chat_db = ChatDatabase(AsyncMongoClient().evep)
+        monkeypatch.setattr(chat_bot, "intent_matcher", IntentMatcher(FALLBACK_INTENT_PATTERNS))
+        assert await detect_intent("Find student record", chat_db) == ("student_info", 0.8)
+        assert await detect_intent("ขอบคุณ", chat_db) == ("system_help", 0.5)
+        assert await detect_intent("ขอบคุณ", None) == ("system_help", 0.0)
+        assert await detect_intent("พยาบาล", None) == ("medical_team", 0.8)
+
+    @pytest.mark.performance
+    @pytest.mark.asyncio
+    async def test_intent_detection_benchmark(self, monkeypatch):
+        """3,000 Thai and English messages against a few hundred stored patterns."""
+        from app.api import chat_bot
+        from app.api.chat_bot import FALLBACK_INTENT_PATTERNS, detect_intent
+
+        patterns = generated_patterns()
+        client = AsyncMongoClient()
+        chat_db = ChatDatabase(client.evep)
+        for intent, entries in patterns.items():
+            await chat_db.create_intent_pattern(intent, entries)
+        pattern_count = sum(len(entries) for entries in patterns.values())
+
+        rng = random.Random(9)
+        words = ["screen", "vision", "student", "report", "ตรวจ", "สายตา", "นักเรียน", "รายงาน",
+                 "please", "today", "ครับ", "ค่ะ", "school", "โรงเรียน", "7", "12"]
+        messages = [" ".join(rng.choice(words) for _ in range(rng.randint(3, 12))) for _ in range(3000)]
+
+        async def legacy(message):
+            # Previous behaviour: a collection scan and a search per pattern for every message
+            return legacy_detect(message, await chat_db.get_intent_patterns())
+
+        started = time.perf_counter()
+        legacy_results = [await legacy(message) for message in messages]
+        legacy_seconds = time.perf_counter() - started
+
+        monkeypatch.setattr(chat_bot, "intent_matcher", IntentMatcher(FALLBACK_INTENT_PATTERNS))
+        started = time.perf_counter()
+        results = [await detect_intent(message, chat_db) for message in messages]
+        compiled_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for message in messages:
+            legacy_detect(message, patterns)
+        legacy_match_seconds = time.perf_counter() - started
+        compiled = await chat_bot.intent_matcher.get(chat_db)
+        started = time.perf_counter()
+        for message in messages:
+            compiled.best(message.lower())
+        compiled_match_seconds = time.perf_counter() - started
+
+        print(f"\n{len(messages)} messages x {pattern_count} patterns: "
+              f"legacy {legacy_seconds * 1000:.0f}ms ({legacy_match_seconds * 1000:.0f}ms matching), "
+              f"compiled {compiled_seconds * 1000:.0f}ms ({compiled_match_seconds * 1000:.0f}ms matching)")
+        assert [intent for intent, _ in results] == [intent for intent, _ in legacy_results]
+        assert compiled_match_seconds < legacy_match_seconds
+        assert compiled_seconds < legacy_seconds
@@ -0,0 +1,127 @@
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.modules.line_integration.keyword_index import CompiledKeywords, KeywordReplyIndex
+from tests.async_mongomock import AsyncMongoClient
+
+
+def reply(keywords, priority=1, is_active=True, minutes=0, **extra):
+    return {
+        "keywords": keywords,
+        "message_type": "text",
+        "content": {"text": "/".join(keywords)},
+        "priority": priority,
+        "is_active": is_active,
+        "updated_at": datetime(2024, 1, 1) + timedelta(minutes=minutes),
+        **extra,
+    }
+
+
+async def legacy_find(collection, user_text):
+    """Previous behaviour: load every active reply and test each trigger in turn"""
+    keywords = await collection.find({"is_active": True}).sort([("priority", -1), ("_id", 1)]).to_list(None)
+    for keyword in keywords:
+        for trigger in keyword.get("keywords", []):
+            if trigger.lower() in user_text.lower():
+                return keyword
+    return None
+
+
+class TestKeywordIndex:
+    """Test suite for the shared LINE keyword-reply index."""
+
+    def test_priority_resolution(self):
+        """The highest priority reply wins, whichever trigger occurs first in the text."""
+        compiled = CompiledKeywords([
+            reply(["ผลตรวจสายตา"], priority=5, _id=1),
+            reply(["Appointment", "นัด"], priority=3, _id=2),
+            reply(["ตรวจ"], priority=1, _id=3),
+        ])
+        assert compiled.match("ขอดูผลตรวจสายตาของลูก")["_id"] == 1
+        assert compiled.match("ตรวจ วันไหน นัดหมาย")["_id"] == 2
+        assert compiled.match("book an APPOINTMENT")["_id"] == 2
+        assert compiled.match("ตรวจ")["_id"] == 3
+        assert compiled.match("hello") is None
+
+        # An empty trigger matched every message before and still does
+        assert CompiledKeywords([reply(["x"], _id=1), reply([""], _id=2)]).match("anything")["_id"] == 2
+
+    @pytest.mark.asyncio
+    async def test_rebuilds_only_when_replies_change(self):
+        """Messages reuse the index; inserts, updates and deletes trigger a rebuild."""
+        client = AsyncMongoClient()
+        collection = client.evep.keyword_replies
+        await collection.insert_one(reply(["สวัสดี"], priority=1))
+        index = KeywordReplyIndex(refresh_seconds=3600)
+
+        assert (await index.find(collection, "สวัสดีค่ะ"))["keywords"] == ["สวัสดี"]
+        for _ in range(20):
+            await index.find(collection, "สวัสดีค่ะ")
+        assert index.get_stats()["rebuilds"] == 1 and index.get_stats()["stamp_checks"] == 1
+
+        inserted = await collection.insert_one(reply(["สวัสดีค่ะ"], priority=9, minutes=1))
+        index.invalidate()
+        assert (await index.find(collection, "สวัสดีค่ะ"))["priority"] == 9
+
+        await collection.update_one({"_id": inserted.inserted_id}, {"$set": {"is_active": False, "updated_at": datetime(2024, 2, 1)}})
+        index.invalidate()
+        assert (await index.find(collection, "สวัสดีค่ะ"))["priority"] == 1
+
+        await collection.delete_many({})
+        index.invalidate()
+        assert await index.find(collection, "สวัสดีค่ะ") is None
+        assert index.get_stats()["rebuilds"] == 4
+
+        # An unchanged collection only costs the stamp check
+        index.invalidate()
+        await index.find(collection, "hello")
+        assert index.get_stats()["rebuilds"] == 4 and index.get_stats()["stamp_checks"] == 5
+
+    @pytest.mark.asyncio
+    async def test_concurrent_messages_share_one_refresh(self):
+        """A burst of webhook tasks triggers a single load of the collection."""
+        client = AsyncMongoClient()
+        collection = client.evep.keyword_replies
+        await collection.insert_many([reply([f"kw{index}"], priority=index) for index in range(10)])
+        index = KeywordReplyIndex()
+
+        results = await asyncio.gather(*(index.find(collection, f"message kw{n}") for n in range(50)))
+        assert [result["priority"] for result in results] == [int(str(n)[0]) for n in range(50)]
+        assert index.get_stats()["rebuilds"] == 1 and index.get_stats()["lookups"] == 50
+
+    @pytest.mark.performance
+    @pytest.mark.asyncio
+    async def test_keyword_matching_throughput(self):
+        """A broadcast burst of 5,000 replies against 300 keyword replies: per-message scan vs index."""
+        client = AsyncMongoClient()
+        collection = client.evep.keyword_replies
+        rng = random.Random(4)
+        thai = ["ตรวจ", "สายตา", "นัดหมาย", "ผล", "แว่น", "โรงเรียน", "ลูก", "ครู", "ส่งต่อ", "โรงพยาบาล"]
+        english = ["result", "appointment", "glasses", "school", "referral", "status", "help", "cancel"]
+        await collection.insert_many([
+            reply([rng.choice(thai) + rng.choice(thai) + str(index), f"{rng.choice(english)} {index}"],
+                  priority=rng.randint(1, 10), is_active=index % 7 != 0)
+            for index in range(300)
+        ])
+        messages = [
+            " ".join(rng.choice(thai + english + [str(rng.randint(0, 400))]) for _ in range(rng.randint(2, 10)))
+            for _ in range(5000)
+        ]
+
+        started = time.perf_counter()
+        expected = [await legacy_find(collection, message) for message in messages]
+        legacy_seconds = time.perf_counter() - started
+
+        index = KeywordReplyIndex()
+        started = time.perf_counter()
+        results = [await index.find(collection, message) for message in messages]
+        indexed_seconds = time.perf_counter() - started
+
+        print(f"\n{len(messages)} messages x 300 replies: per-message scan {len(messages) / legacy_seconds:.0f} msg/s, "
+              f"index {len(messages) / indexed_seconds:.0f} msg/s, {sum(result is not None for result in results)} matched")
+        assert [result and result["_id"] for result in results] == [result and result["_id"] for result in expected]
+        assert indexed_seconds < legacy_seconds
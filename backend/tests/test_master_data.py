@@ -0,0 +1,158 @@
+import json
+
+import pytest
+from bson import ObjectId
+
+from app.core.pagination import paginate
+from app.core.serialization import etag_matches
+from app.services.master_data import KINDS, MASTER_DATA_PROJECTION, MasterDataCache, MasterKind
+from tests.async_mongomock import AsyncMongoClient
+
+
+def make_cache(client):
+    collections = {"provinces": "provinces", "districts": "districts", "subdistricts": "subdistricts", "hospitals": "allhospitals"}
+    return MasterDataCache(
+        kinds={
+            kind: MasterKind(lambda name=name: client.evep[name], KINDS[kind].parent_fields)
+            for kind, name in collections.items()
+        },
+        refresh_interval_seconds=60,
+        get_versions=lambda: client.evep.master_data_versions,
+    )
+
+
+def seed(client):
+    """Two provinces with districts and subdistricts, parents stored as ObjectIds and as strings"""
+    evep = client.sync.evep
+    bangkok, chiang_mai = ObjectId(), ObjectId()
+    evep.provinces.insert_many([
+        {"_id": bangkok, "name": "กรุงเทพมหานคร", "active": True, "_migration_metadata": {"source": "aoc"}},
+        {"_id": chiang_mai, "name": "เชียงใหม่", "active": True},
+    ])
+    districts = []
+    for number in range(12):
+        province = bangkok if number % 3 else chiang_mai
+        districts.append({
+            "_id": ObjectId(),
+            "name": f"เขต {number}" if number % 2 else {"th": f"อำเภอ {number}", "en": f"Amphoe {number}"},
+            "provinceId": province if number < 8 else str(province),
+            "active": number != 5,
+        })
+    evep.districts.insert_many(districts)
+    evep.subdistricts.insert_many([
+        {"_id": ObjectId(), "name": f"แขวง {number}", "provinceId": bangkok, "districtId": districts[1]["_id"],
+         "code": f"1001{number:02d}", "zipcode": "10200" if number == 0 else None, "active": True}
+        for number in range(4)
+    ])
+    return bangkok, chiang_mai, districts
+
+
+class TestMasterDataCache:
+    """Test suite for the in-memory AOC master data cache."""
+
+    @pytest.mark.asyncio
+    async def test_pages_match_the_mongodb_path(self):
+        """Cached pages hold the same documents and cursors as paginate, and cursors work across both."""
+        client = AsyncMongoClient()
+        bangkok, _, _ = seed(client)
+        cache = make_cache(client)
+        assert await cache.load() == 18
+
+        provinces = cache.table("provinces")
+        page = provinces.page(provinces.select(), 100)
+        assert page.items == await client.evep.provinces.find({}, MASTER_DATA_PROJECTION).sort("_id", 1).to_list(None)
+        assert "_migration_metadata" not in page.items[0]
+
+        districts = cache.table("districts")
+        query = {"provinceId": bangkok}
+        first = await paginate(client.evep.districts, query, 3, projection=MASTER_DATA_PROJECTION)
+        cached_first = districts.page(districts.select({"provinceId": str(bangkok)}), 3, count="exact")
+        # The cache also matches parents stored as strings by the create handlers
+        assert cached_first.items == first.items and cached_first.next_cursor == first.next_cursor
+        assert cached_first.total_count == 8 and first.total_count == 5
+
+        second = await paginate(client.evep.districts, query, 3, cursor=cached_first.next_cursor, projection=MASTER_DATA_PROJECTION)
+        cached_second = districts.page(districts.select({"provinceId": str(bangkok)}), 3, cursor=first.next_cursor)
+        assert cached_second.items[:2] == second.items
+        assert districts.page(districts.select({"provinceId": str(bangkok)}), 3, skip=3).items == cached_second.items
+
+    @pytest.mark.asyncio
+    async def test_filters(self):
+        """Search reads Thai and English names, status filters on active, parents narrow through the child maps."""
+        client = AsyncMongoClient()
+        bangkok, chiang_mai, districts = seed(client)
+        cache = make_cache(client)
+        await cache.load()
+        table = cache.table("districts")
+
+        def names(positions):
+            return [json.dumps(table.records[position].document["name"], ensure_ascii=False) for position in positions]
+
+        assert len(table.select(search="amphoe")) == 6
+        assert len(table.select({"provinceId": str(chiang_mai)}, search="อำเภอ")) == 2
+        assert names(table.select(search="เขต 1")) == ['"เขต 1"', '"เขต 11"']
+        # Search text is matched literally, never compiled as a regex
+        assert table.select(search="เขต 1$") == [] and table.select(search="(") == []
+        assert table.select(search="(a+)+$") == []
+        assert len(table.select(active=False)) == 1
+        assert table.select({"provinceId": str(ObjectId())}) == []
+        assert table.get(districts[4]["_id"])["name"]["en"] == "Amphoe 4"
+
+        subdistricts = cache.table("subdistricts")
+        assert len(subdistricts.select({"provinceId": str(bangkok), "districtId": str(districts[1]["_id"])})) == 4
+        assert subdistricts.select({"provinceId": str(chiang_mai), "districtId": str(districts[1]["_id"])}) == []
+
+    @pytest.mark.asyncio
+    async def test_etags_and_revalidation(self):
+        """ETags are the same on every worker for the same data and change once a write reloads the kind."""
+        client = AsyncMongoClient()
+        seed(client)
+        first, second = make_cache(client), make_cache(client)
+        await first.load()
+        await second.load()
+        params = {"skip": 0, "limit": 100, "search": None}
+
+        etag = first.etag([first.table("provinces")], params)
+        assert etag == second.etag([second.table("provinces")], params)
+        assert etag != first.etag([first.table("provinces")], {**params, "limit": 50})
+        assert etag != first.etag([first.table("districts")], params)
+
+        response = first.respond(None, etag, lambda: {"provinces": first.table("provinces").page(first.table("provinces").select(), 100).items})
+        assert response.status_code == 200 and response.headers["etag"] == etag
+        assert len(json.loads(response.body)["provinces"]) == 2
+        not_modified = first.respond(f'W/"stale", {etag}', etag, lambda: pytest.fail("body built for a 304"))
+        assert not_modified.status_code == 304 and not_modified.headers["etag"] == etag
+        assert first.get_stats()["not_modified"] == 1
+
+        await client.evep.provinces.insert_one({"name": "ภูเก็ต", "active": True})
+        await first.invalidate("provinces")
+        assert len(first.table("provinces")) == 3
+        assert first.etag([first.table("provinces")], params) != etag
+        assert first.etag([first.table("districts")], params) == second.etag([second.table("districts")], params)
+
+    @pytest.mark.asyncio
+    async def test_refresh_reloads_only_changed_kinds(self):
+        """Writes made through another worker are picked up by the version stamp or count; unchanged kinds stay."""
+        client = AsyncMongoClient()
+        _, _, districts = seed(client)
+        cache, other_worker = make_cache(client), make_cache(client)
+        await cache.load()
+        assert await cache.refresh() == 0
+
+        # A same-count update without modifiedAt, as the maintenance scripts make, is seen through the bumped version
+        client.sync.evep.districts.update_one({"_id": districts[0]["_id"]}, {"$set": {"name": "อำเภอเมือง"}})
+        await other_worker.invalidate("districts")
+        client.sync.evep.allhospitals.insert_one({"name": "โรงพยาบาลศิริราช"})
+        assert await cache.refresh() == 2
+        assert cache.table("districts").get(districts[0]["_id"])["name"] == "อำเภอเมือง"
+        assert len(cache.table("hospitals")) == 1
+        assert cache.get_stats()["loads"] == 6
+        assert client.sync.evep.master_data_versions.find_one({"_id": "districts"})["version"] == 1
+
+    def test_if_none_match_parsing(self):
+        """Lists, weak validators and * match; other tags do not."""
+        assert etag_matches('"a", "b"', '"b"')
+        assert etag_matches('W/"b"', '"b"')
+        assert etag_matches("*", '"b"')
+        assert not etag_matches('"a"', '"b"')
+        assert not etag_matches(None, '"b"')
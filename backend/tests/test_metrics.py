@@ -0,0 +1,140 @@
+import asyncio
+import os
+import subprocess
+import sys
+import textwrap
+import time
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from app.core import metrics
+
+
+def sample(name, labels=None):
+    return REGISTRY.get_sample_value(name, labels or {}) or 0.0
+
+
+def command_event(name, command, request_id, duration_micros=0):
+    return SimpleNamespace(
+        command_name=name,
+        command=command,
+        connection_id=("localhost", 27017),
+        request_id=request_id,
+        duration_micros=duration_micros,
+    )
+
+
+class TestMetrics:
+    """Test suite for the Prometheus instrumentation."""
+
+    def test_route_template_label(self):
+        """Requests are labelled by the matched route template, never the raw path."""
+        app = FastAPI()
+
+        @app.middleware("http")
+        async def record_route(request: Request, call_next):
+            response = await call_next(request)
+            response.headers["X-Route"] = metrics.route_template(request.scope)
+            return response
+
+        @app.get("/api/v1/patients/{patient_id}")
+        async def get_patient(patient_id: str):
+            return {"id": patient_id}
+
+        client = TestClient(app)
+        assert client.get("/api/v1/patients/65a1").headers["X-Route"] == "/api/v1/patients/{patient_id}"
+        assert client.get("/does/not/exist").headers["X-Route"] == metrics.UNMATCHED_ROUTE
+
+    def test_mongo_command_listener(self):
+        """Commands are timed per collection and operation; failures are counted."""
+        listener = metrics.MongoCommandMetrics()
+        labels = {"collection": "patients", "operation": "find"}
+        before_count = sample("evep_mongo_command_duration_seconds_count", labels)
+        before_sum = sample("evep_mongo_command_duration_seconds_sum", labels)
+
+        listener.started(command_event("find", {"find": "patients", "filter": {}}, 1))
+        listener.succeeded(command_event("find", {}, 1, duration_micros=250_000))
+        listener.started(command_event("getMore", {"getMore": 123, "collection": "patients"}, 2))
+        listener.failed(command_event("getMore", {}, 2, duration_micros=1_000))
+        listener.started(command_event("ping", {"ping": 1}, 3))
+        listener.succeeded(command_event("ping", {}, 3))
+
+        assert sample("evep_mongo_command_duration_seconds_count", labels) == before_count + 1
+        assert sample("evep_mongo_command_duration_seconds_sum", labels) == pytest.approx(before_sum + 0.25)
+        assert sample("evep_mongo_command_failures_total",
+                      {"collection": "patients", "operation": "getMore"}) >= 1
+        assert sample("evep_mongo_command_duration_seconds_count",
+                      {"collection": "", "operation": "ping"}) == 0
+        assert listener._pending == {}
+
+    def test_llm_call_tracking(self):
+        """LLM calls record latency by outcome and tokens from either provider's usage shape."""
+        openai_usage = SimpleNamespace(prompt_tokens=12, completion_tokens=30, total_tokens=42)
+        anthropic_usage = SimpleNamespace(input_tokens=7, output_tokens=9)
+        prompt_before = sample("evep_llm_tokens_total", {"provider": "openai", "model": "gpt-test", "direction": "prompt"})
+        output_before = sample("evep_llm_tokens_total", {"provider": "anthropic", "model": "claude-test", "direction": "completion"})
+        errors_before = sample("evep_llm_request_duration_seconds_count",
+                               {"provider": "openai", "model": "gpt-test", "outcome": "error"})
+
+        with metrics.track_llm_call("openai", "gpt-test") as call:
+            call.record_usage(openai_usage)
+        with metrics.track_llm_call("anthropic", "claude-test") as call:
+            call.record_usage(anthropic_usage)
+        with pytest.raises(TimeoutError):
+            with metrics.track_llm_call("openai", "gpt-test"):
+                raise TimeoutError()
+
+        assert sample("evep_llm_tokens_total", {"provider": "openai", "model": "gpt-test", "direction": "prompt"}) == prompt_before + 12
+        assert sample("evep_llm_tokens_total", {"provider": "anthropic", "model": "claude-test", "direction": "completion"}) == output_before + 9
+        assert sample("evep_llm_request_duration_seconds_count",
+                      {"provider": "openai", "model": "gpt-test", "outcome": "error"}) == errors_before + 1
+
+    @pytest.mark.asyncio
+    async def test_event_loop_lag(self):
+        """A blocking call on the loop shows up as lag."""
+        monitor = metrics.EventLoopLagMonitor(interval=0.05)
+        monitor.start()
+        await asyncio.sleep(0.06)
+        time.sleep(0.2)
+        await asyncio.sleep(0.1)
+        await monitor.stop()
+        assert sample("evep_event_loop_lag_current_seconds") < 0.2
+        assert sample("evep_event_loop_lag_seconds_bucket", {"le": "0.1"}) < sample("evep_event_loop_lag_seconds_count")
+
+    @pytest.mark.asyncio
+    async def test_socketio_emit_and_room_counters(self):
+        """The instrumented server counts emits by event and room operations."""
+        from app.socketio_service import InstrumentedAsyncServer
+
+        server = InstrumentedAsyncServer(async_mode="asgi")
+        emits_before = sample("evep_socketio_emits_total", {"event": "queue_update", "target": "broadcast"})
+        room_emits_before = sample("evep_socketio_emits_total", {"event": "queue_update", "target": "room"})
+        await server.emit("queue_update", {"queue": []})
+        await server.emit("queue_update", {"queue": []}, room="doctors")
+        assert sample("evep_socketio_emits_total", {"event": "queue_update", "target": "broadcast"}) == emits_before + 1
+        assert sample("evep_socketio_emits_total", {"event": "queue_update", "target": "room"}) == room_emits_before + 1
+
+    def test_multiprocess_exposition(self, tmp_path):
+        """With PROMETHEUS_MULTIPROC_DIR set, /metrics aggregates every worker process."""
+        worker = textwrap.dedent("""
+            from app.core import metrics
+            metrics.observe_request("GET", "/api/v1/patients", 200, 0.01)
+            metrics.SOCKETIO_CONNECTED_CLIENTS.inc(3)
+        """)
+        render = textwrap.dedent("""
+            from app.core import metrics
+            print(metrics.render_metrics()[0].decode())
+        """)
+        env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=str(tmp_path))
+        backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        for _ in range(2):
+            subprocess.run([sys.executable, "-c", worker], env=env, cwd=backend_dir, check=True)
+        output = subprocess.run([sys.executable, "-c", render], env=env, cwd=backend_dir,
+                                check=True, capture_output=True, text=True).stdout
+
+        assert 'evep_http_requests_total{method="GET",route="/api/v1/patients",status="200"} 2.0' in output
+        assert "evep_socketio_connected_clients 6.0" in output
@@ -0,0 +1,251 @@
+import asyncio
+import socket
+import time
+from datetime import datetime, timedelta
+
+import pytest
+import requests
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from app.core.config import settings
+from app.services.notification_dispatcher import ChannelLimits, NotificationDispatcher
+from tests.async_mongomock import AsyncMongoClient
+from tests.local_server import serve
+
+UPSTREAM_DELAY = 0.02
+
+
+class FakeProvider:
+    """LINE Messaging API and Telegram Bot API stand-ins with scripted failures"""
+
+    def __init__(self, delay=UPSTREAM_DELAY):
+        self.delay = delay
+        self.requests = []
+        self.retry_keys = []
+        self.failures = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.app = FastAPI()
+        self.app.post("/v2/bot/message/{operation}")(self.handle)
+        self.app.post("/bot{token}/{operation}")(self.handle)
+
+    async def handle(self, request: Request):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+            self.requests.append((request.url.path, request.headers.get("authorization"), await request.json()))
+            self.retry_keys.append(request.headers.get("x-line-retry-key"))
+            if self.failures:
+                status_code, headers = self.failures.pop(0)
+                return JSONResponse({"message": "unavailable"}, status_code=status_code, headers=headers)
+            return JSONResponse({"ok": True})
+        finally:
+            self.in_flight -= 1
+
+
+def dispatcher_for(base_url, client=None, **limits):
+    client = client or AsyncMongoClient()
+    dispatcher = NotificationDispatcher(
+        get_dead_letters=lambda: client.evep.notification_dead_letters,
+        limits={channel: ChannelLimits(*limit) for channel, limit in limits.items()},
+        max_attempts=3, backoff_base_seconds=0.01, backoff_max_seconds=0.05, timeout_seconds=2,
+        line_api_base_url=base_url, telegram_api_base_url=base_url,
+    )
+    dispatcher.configure("line", "line-token")
+    dispatcher.configure("telegram", "telegram-token")
+    return client, dispatcher
+
+
+class TestNotificationDispatcher:
+    """Test suite for outbound notification delivery against local fake providers."""
+
+    @pytest.mark.asyncio
+    async def test_delivers_to_line_and_telegram(self):
+        """LINE calls carry the channel token; Telegram uses the account's bot token in the path."""
+        provider = FakeProvider()
+        with serve(provider.app) as base_url:
+            client, dispatcher = dispatcher_for(base_url)
+            dispatcher.configure("line_bot_telegram", "admin-bot-token")
+            assert await dispatcher.line_push("U1", {"type": "text", "text": "นัดตรวจสายตา"})
+            assert await dispatcher.line_reply("reply-token", [{"type": "text", "text": "รับทราบ"}])
+            assert await dispatcher.telegram_message("-100", "<b>New user</b>")
+            await dispatcher.submit("telegram", "sendMessage", {"chat_id": "-200", "text": "unfollow"}, account="line_bot_telegram")
+            recipients = [f"U{index}" for index in range(1100)]
+            assert await dispatcher.line_multicast(recipients, {"type": "text", "text": "ประกาศ"})
+            await dispatcher.stop()
+
+        paths = [(path, auth) for path, auth, _ in provider.requests]
+        assert paths[:4] == [("/v2/bot/message/push", "Bearer line-token"), ("/v2/bot/message/reply", "Bearer line-token"),
+                             ("/bottelegram-token/sendMessage", None), ("/botadmin-bot-token/sendMessage", None)]
+        assert provider.requests[0][2] == {"to": "U1", "messages": [{"type": "text", "text": "นัดตรวจสายตา"}]}
+        assert sorted(len(body["to"]) for path, _, body in provider.requests if path.endswith("multicast")) == [100, 500, 500]
+        assert dispatcher.get_stats()["line"]["sent"] == 5
+
+    @pytest.mark.asyncio
+    async def test_retries_transient_failures(self):
+        """503s and a 429 with Retry-After are retried until the message goes through."""
+        provider = FakeProvider()
+        provider.failures = [(503, {}), (429, {"Retry-After": "0"})]
+        with serve(provider.app) as base_url:
+            client, dispatcher = dispatcher_for(base_url)
+            assert await dispatcher.line_push("U1", {"type": "text", "text": "ผลตรวจ"})
+            await dispatcher.stop()
+        assert len(provider.requests) == 3
+        assert dispatcher.get_stats()["line"]["retried"] == 2
+        assert client.sync.evep.notification_dead_letters.count_documents({}) == 0
+        assert provider.retry_keys[0] and len(set(provider.retry_keys)) == 1
+
+    @pytest.mark.asyncio
+    async def test_retry_keys_make_line_retries_idempotent(self):
+        """Each push or multicast request keeps one retry key across attempts; a 409 for it means LINE already has it."""
+        provider = FakeProvider()
+        with serve(provider.app) as base_url:
+            client, dispatcher = dispatcher_for(base_url)
+            assert await dispatcher.line_push("U1", {"type": "text", "text": "a"})
+            assert await dispatcher.line_reply("reply-token", {"type": "text", "text": "b"})
+            provider.failures = [(503, {}), (409, {})]
+            assert await dispatcher.line_multicast(["U2", "U3"], {"type": "text", "text": "c"})
+            await dispatcher.stop()
+        push_key, reply_key, *multicast_keys = provider.retry_keys
+        assert push_key and reply_key is None
+        assert len(multicast_keys) == 2 and len(set(multicast_keys)) == 1 and push_key not in multicast_keys
+        assert client.sync.evep.notification_dead_letters.count_documents({}) == 0
+
+    @pytest.mark.asyncio
+    async def test_submit_reports_the_outcome(self):
+        """Background deliveries hand their result to on_result before shutdown completes."""
+        provider = FakeProvider()
+        outcomes = []
+
+        async def record(delivered):
+            outcomes.append(delivered)
+
+        with serve(provider.app) as base_url:
+            client, dispatcher = dispatcher_for(base_url)
+            provider.failures = [(400, {})]
+            dispatcher.submit("line", "push", {"to": "U1", "messages": []}, on_result=record)
+            dispatcher.submit("line", "push", {"to": "U2", "messages": []}, on_result=record)
+            assert outcomes == []
+            await dispatcher.stop()
+        assert sorted(outcomes) == [False, True]
+
+    @pytest.mark.asyncio
+    async def test_dead_letters_and_redelivery(self, monkeypatch):
+        """Rejected and exhausted messages are dead-lettered without credentials and redelivered later."""
+        provider = FakeProvider()
+        provider.failures = [(400, {})] + [(500, {})] * 3
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            closed_port = probe.getsockname()[1]
+        monkeypatch.setattr(settings, "SMTP_HOST", "127.0.0.1")
+        monkeypatch.setattr(settings, "SMTP_PORT", closed_port)
+        with serve(provider.app) as base_url:
+            client, dispatcher = dispatcher_for(base_url)
+            assert not await dispatcher.line_push("U1", {"type": "text", "text": "bad"})
+            assert not await dispatcher.telegram_message("-100", "down")
+            assert not await dispatcher.email("parent@example.com", "ผลตรวจสายตา", "รายละเอียด")
+
+            letters = {letter["channel"]: letter for letter in client.sync.evep.notification_dead_letters.find()}
+            assert (letters["line"]["status_code"], letters["line"]["attempts"]) == (400, 1)
+            assert (letters["telegram"]["status_code"], letters["telegram"]["attempts"]) == (500, 3)
+            assert letters["email"]["attempts"] == 3 and "Connection" in letters["email"]["error"]
+            assert "telegram-token" not in str(letters["telegram"])
+            assert len(provider.requests) == 4
+
+            monkeypatch.setattr(settings, "SMTP_HOST", "")
+            result = await dispatcher.redeliver_dead_letters()
+            assert await dispatcher.redeliver_dead_letters() == {"attempted": 1, "delivered": 0}
+            await dispatcher.stop()
+        assert result == {"attempted": 3, "delivered": 2}
+        # Redelivery reuses the original retry key
+        line_keys = [key for (path, _, _), key in zip(provider.requests, provider.retry_keys) if path.endswith("push")]
+        assert line_keys == [letters["line"]["retry_key"]] * 2
+        # Email without an SMTP host is rejected at once and stays in its letter
+        remaining = list(client.sync.evep.notification_dead_letters.find())
+        assert [letter["channel"] for letter in remaining] == ["email"]
+        assert remaining[0]["_id"] == letters["email"]["_id"] and remaining[0]["attempts"] == 5
+        assert "not configured" in remaining[0]["error"] and remaining[0]["claimed_until"] is None
+
+    @pytest.mark.asyncio
+    async def test_redelivery_claims_letters(self):
+        """A letter claimed by another run is skipped, and one whose send fails is never lost."""
+        client = AsyncMongoClient()
+        client.sync.evep.notification_dead_letters.insert_many([
+            {"channel": "line", "operation": "push", "payload": {"to": "U1", "messages": []}, "retry_key": "k1",
+             "attempts": 1, "claimed_until": datetime.utcnow() + timedelta(minutes=5), "created_at": datetime.utcnow()},
+            {"channel": "line", "operation": "push", "payload": {"to": "U2", "messages": []}, "retry_key": "k2",
+             "attempts": 1, "created_at": datetime.utcnow()},
+        ])
+        _, dispatcher = dispatcher_for("http://127.0.0.1:9", client)
+        dispatcher.max_attempts = 1
+        assert await dispatcher.redeliver_dead_letters() == {"attempted": 1, "delivered": 0}
+        await dispatcher.stop()
+        letters = {letter["retry_key"]: letter for letter in client.sync.evep.notification_dead_letters.find()}
+        assert letters["k1"]["attempts"] == 1 and letters["k2"]["attempts"] == 2 and letters["k2"]["claimed_until"] is None
+
+    @pytest.mark.asyncio
+    async def test_rate_and_concurrency_limits(self):
+        """A channel never exceeds its token bucket rate or its concurrent request limit."""
+        provider = FakeProvider(delay=0.05)
+        with serve(provider.app) as base_url:
+            client, dispatcher = dispatcher_for(base_url, line=(40, 5, 3))
+            started = time.perf_counter()
+            results = await asyncio.gather(*(dispatcher.line_push(f"U{index}", {"type": "text", "text": "hi"}) for index in range(25)))
+            elapsed = time.perf_counter() - started
+            await dispatcher.stop()
+        assert all(results) and provider.max_in_flight == 3
+        # 5 sent on the burst, the other 20 at 40 per second
+        assert elapsed >= 20 / 40 * 0.9
+
+    @pytest.mark.performance
+    @pytest.mark.asyncio
+    async def test_slow_provider_does_not_stall_the_server(self):
+        """A slow Telegram API blocks the event loop under requests.post but not through the dispatcher; 200 LINE pushes pooled vs one at a time."""
+        provider = FakeProvider(delay=0.3)
+        with serve(provider.app) as base_url:
+            ticks = []
+
+            async def ticker():
+                while True:
+                    ticks.append(time.perf_counter())
+                    await asyncio.sleep(0.01)
+
+            def max_gap():
+                return max(later - earlier for earlier, later in zip(ticks, ticks[1:]))
+
+            # Previous behaviour: a blocking requests.post inside an async handler
+            ticking = asyncio.create_task(ticker())
+            await asyncio.sleep(0.05)
+            requests.post(f"{base_url}/bottoken/sendMessage", json={"chat_id": "-100", "text": "unfollow"})
+            await asyncio.sleep(0.05)
+            ticking.cancel()
+            legacy_gap = max_gap()
+
+            ticks.clear()
+            client, dispatcher = dispatcher_for(base_url)
+            ticking = asyncio.create_task(ticker())
+            await asyncio.sleep(0.05)
+            await dispatcher.telegram_message("-100", "unfollow")
+            ticking.cancel()
+            dispatcher_gap = max_gap()
+
+            provider.delay = UPSTREAM_DELAY
+            pushes = 200
+            started = time.perf_counter()
+            with requests.Session() as session:
+                for index in range(pushes):
+                    session.post(f"{base_url}/v2/bot/message/push", json={"to": f"U{index}", "messages": []})
+            legacy_seconds = time.perf_counter() - started
+
+            started = time.perf_counter()
+            results = await asyncio.gather(*(dispatcher.line_push(f"U{index}", {"type": "text", "text": "reminder"}) for index in range(pushes)))
+            dispatched_seconds = time.perf_counter() - started
+            await dispatcher.stop()
+
+        print(f"\nevent loop stalled {legacy_gap * 1000:.0f}ms by requests.post, {dispatcher_gap * 1000:.0f}ms through the dispatcher; "
+              f"{pushes} LINE pushes: one at a time {legacy_seconds * 1000:.0f}ms, dispatcher {dispatched_seconds * 1000:.0f}ms")
+        assert all(results)
+        assert legacy_gap > 0.25 and dispatcher_gap < 0.1
+        assert dispatched_seconds * 3 < legacy_seconds
@@ -0,0 +1,124 @@
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from pymongo import DESCENDING
+from unittest.mock import patch
+
+from app.core.pagination import CountCache, count_documents, decode_cursor, encode_cursor, paginate
+from tests.async_mongomock import AsyncMongoClient
+
+
+@pytest.fixture
+def client():
+    """Mongomock-backed database; count cache entries live for the whole test."""
+    client = AsyncMongoClient()
+    with patch("app.core.pagination.count_cache", CountCache(ttl_seconds=60, max_size=100)):
+        yield client
+
+
+async def walk(collection, query, limit, **kwargs):
+    """Every page of a filter, following next_cursor"""
+    pages, cursor = [], None
+    while True:
+        page = await paginate(collection, query, limit, cursor=cursor, **kwargs)
+        pages.append(page)
+        if not page.has_more:
+            return pages
+        cursor = page.next_cursor
+
+
+class TestPagination:
+    """Test suite for keyset pagination and cached counts."""
+
+    @pytest.mark.asyncio
+    async def test_cursor_pages_cover_every_document_once(self, client):
+        """Following next_cursor returns each matching document once, in _id order."""
+        client.sync.evep.schools.insert_many(
+            [{"name": f"School {number}", "status": "active" if number % 4 else "inactive"} for number in range(23)]
+        )
+        expected = [school["_id"] for school in client.sync.evep.schools.find({"status": "active"}).sort("_id", 1)]
+
+        pages = await walk(client.evep.schools, {"status": "active"}, 5)
+        assert [school["_id"] for page in pages for school in page.items] == expected
+        assert [len(page.items) for page in pages] == [5, 5, 5, 2]
+        assert [page.has_more for page in pages] == [True, True, True, False]
+        assert pages[-1].next_cursor is None
+        assert {page.total_count for page in pages} == {17}
+
+    @pytest.mark.asyncio
+    async def test_descending_sort_key_with_ties_and_mixed_types(self, client):
+        """Equal keys are split by _id, and keys of different BSON types or missing keys are not skipped."""
+        started = datetime(2025, 1, 1)
+        screenings = [{"created_at": started + timedelta(days=number // 3)} for number in range(9)]
+        screenings += [{"created_at": (started + timedelta(days=number)).isoformat()} for number in range(4)]
+        screenings += [{"status": "legacy"}, {"created_at": None}]
+        client.sync.evep.screenings.insert_many(screenings)
+        expected = [
+            screening["_id"]
+            for screening in client.sync.evep.screenings.find({}).sort([("created_at", DESCENDING), ("_id", DESCENDING)])
+        ]
+
+        pages = await walk(client.evep.screenings, {}, 4, sort_field="created_at", direction=DESCENDING, count="none")
+        assert [screening["_id"] for page in pages for screening in page.items] == expected
+        assert len(expected) == 15
+
+    @pytest.mark.asyncio
+    async def test_skip_still_works_and_cursor_takes_over(self, client):
+        """Older clients paging by skip get the same documents, and a cursor ignores skip."""
+        client.sync.evep.teachers.insert_many([{"status": "active", "number": number} for number in range(12)])
+
+        first = await paginate(client.evep.teachers, {"status": "active"}, 4, skip=4)
+        assert [teacher["number"] for teacher in first.items] == [4, 5, 6, 7]
+        second = await paginate(client.evep.teachers, {"status": "active"}, 4, cursor=first.next_cursor, skip=4)
+        assert [teacher["number"] for teacher in second.items] == [8, 9, 10, 11]
+        assert not second.has_more
+
+    @pytest.mark.asyncio
+    async def test_count_modes(self, client):
+        """Cached counts are reused across pages, estimated counts skip the scan, none skips counting."""
+        client.sync.evep.parents.insert_many([{"status": "active"} for _ in range(6)])
+        collection = client.evep.parents
+
+        assert await count_documents(collection, {"status": "active"}) == 6
+        client.sync.evep.parents.insert_one({"status": "active"})
+        assert await count_documents(collection, {"status": "active"}) == 6
+        assert await count_documents(collection, {"status": "active"}, "exact") == 7
+        assert await count_documents(collection, {}, "estimated") == 7
+        assert await count_documents(collection, {"status": "active"}, "none") is None
+
+        operations = [operation for _, operation in client.operations]
+        assert operations.count("count_documents") == 2
+        assert operations.count("estimated_document_count") == 1
+
+    def test_invalid_cursors_are_rejected(self):
+        """Tampered tokens and tokens issued for another sort order are a 400."""
+        token = encode_cursor("created_at", {"_id": ObjectId(), "created_at": datetime(2025, 1, 1)})
+        value, _ = decode_cursor(token, "created_at")
+        assert value.replace(tzinfo=None) == datetime(2025, 1, 1)
+
+        for bad_token, sort_field in [("not-a-cursor", "created_at"), (token[:-3], "created_at"), (token, "_id")]:
+            with pytest.raises(HTTPException) as error:
+                decode_cursor(bad_token, sort_field)
+            assert error.value.status_code == 400
+
+    @pytest.mark.asyncio
+    async def test_limit_must_be_positive(self, client):
+        """paginate rejects an empty page size, and the list endpoints validate limit before querying."""
+        client.sync.evep.schools.insert_many([{"status": "active"} for _ in range(3)])
+        with pytest.raises(HTTPException) as error:
+            await paginate(client.evep.schools, {"status": "active"}, 0)
+        assert error.value.status_code == 400
+
+        from app.api import evep
+        from app.api.auth import get_current_user
+
+        app = FastAPI()
+        app.include_router(evep.router)
+        app.dependency_overrides[get_current_user] = lambda: {"user_id": "u1", "role": "admin"}
+        with TestClient(app) as api:
+            for path in ("/parents", "/students", "/teachers", "/schools"):
+                for params in ({"limit": 0}, {"limit": 1001}, {"skip": -1}):
+                    assert api.get(path, params=params).status_code == 422
@@ -0,0 +1,197 @@
+import random
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+from app.core.event_bus import event_bus
+from app.core.patient_queue import PriorityQueue, priority_rank
+from app.core.presence_store import InMemoryPresenceStore
+from app.services.dashboard_stats import DOCUMENT_CHANGED_EVENT
+from app.socketio_service import QUEUE_DEFAULT_SERVICE_SECONDS, QUEUE_ROOM, FIFOQueueManager, InstrumentedAsyncServer, SocketIOService
+from tests.async_mongomock import AsyncMongoClient
+
+
+def make_service(client, presence=None):
+    server = InstrumentedAsyncServer(async_mode="asgi")
+    service = SocketIOService(server=server, presence=presence or InMemoryPresenceStore())
+    service.queue_manager = FIFOQueueManager(collection=client.evep.patient_queue)
+    emitted = []
+
+    async def emit(event, data=None, room=None, **kwargs):
+        emitted.append((event, data, room))
+
+    server.emit = emit
+    return service, emitted
+
+
+class TestPatientQueue:
+    """Test suite for the priority patient queue and its persisted, delta-broadcasting manager."""
+
+    def test_priority_then_fifo_order(self):
+        """Higher priorities are served first and equal priorities keep arrival order."""
+        queue = PriorityQueue()
+        for key, priority in [("a", "normal"), ("b", "low"), ("c", "high"), ("d", "normal"), ("e", "high"), ("f", "urgent")]:
+            queue.push(key, key, priority)
+
+        assert list(queue) == ["c", "e", "a", "d", "f", "b"]
+        assert [queue.position(key) for key in "abcdef"] == [3, 6, 1, 4, 2, 5]
+        assert queue.at(4) == "d" and queue.peek() == "c" and queue.at(7) is None
+
+        assert queue.remove("e") == "e"
+        assert queue.remove("e") is None
+        assert list(queue) == ["c", "a", "d", "f", "b"]
+        assert queue.position("b") == 5 and "e" not in queue
+        with pytest.raises(KeyError):
+            queue.push("a", "a")
+
+    def test_matches_sorted_reference(self):
+        """Random pushes and removals agree with a list sorted by priority and arrival."""
+        rng = random.Random(7)
+        queue, reference = PriorityQueue(), []
+        for step in range(3000):
+            if reference and rng.random() < 0.45:
+                _, _, key = reference.pop(rng.randrange(len(reference)))
+                queue.remove(key)
+            else:
+                key, priority = f"p{step}", rng.choice(["high", "normal", "low"])
+                queue.push(key, key, priority)
+                reference.append((priority_rank(priority), step, key))
+                reference.sort()
+            if step % 97 == 0:
+                assert list(queue) == [key for _, _, key in reference]
+                for position, (_, _, key) in enumerate(reference, start=1):
+                    assert queue.position(key) == position
+                    assert queue.at(position) == key
+        assert len(queue) == len(reference)
+
+    @pytest.mark.asyncio
+    async def test_transactions_persist_and_broadcast_deltas(self):
+        """Changes are written to Mongo, broadcast as deltas and survive a restart."""
+        client = AsyncMongoClient()
+        service, emitted = make_service(client)
+
+        async with service.queue_transaction() as queue:
+            queue.add_patient("p1")
+            queue.add_patient("p2", "high")
+            queue.assign_staff_to_patient("p1", "nurse_1")
+        event, update, room = emitted[-1]
+        assert (event, room, update["version"], update["total"]) == ("queue_updated", QUEUE_ROOM, 1, 2)
+        assert [(change["item"]["patient_id"], change["item"]["queue_position"]) for change in update["changes"]] == [("p1", 2), ("p2", 1)]
+
+        async with service.queue_transaction() as queue:
+            queue.remove_patient("p2")
+        assert emitted[-1][1]["changes"] == [{"op": "remove", "patient_id": "p2"}]
+
+        emitted.clear()
+        async with service.queue_transaction() as queue:
+            queue.assign_staff_to_patient("p1", "nurse_1")
+        assert emitted == []
+
+        # A fresh manager, as after a restart, loads the queue from Mongo
+        restarted, _ = make_service(client)
+        queue_data = await restarted.get_patient_queue()
+        assert [(item["patient_id"], item["queue_position"], item["staff_working"]) for item in queue_data] == [("p1", 1, ["nurse_1"])]
+        position = await restarted.get_queue_position("p1")
+        assert position["queue_position"] == 1 and position["estimated_completion"]
+
+        async with restarted.queue_transaction() as queue:
+            assert queue.add_patient("p3") == 2
+        assert client.sync.evep.patient_queue.find_one({"_id": "p3"})["seq"] > client.sync.evep.patient_queue.find_one({"_id": "p1"})["seq"]
+
+    @pytest.mark.asyncio
+    async def test_stale_copy_reloads_and_failed_transaction_rolls_back(self):
+        """A worker reloads after another changed the queue and drops changes that failed."""
+        client, presence = AsyncMongoClient(), InMemoryPresenceStore()
+        worker_a, _ = make_service(client, presence)
+        worker_b, _ = make_service(client, presence)
+
+        async with worker_a.queue_transaction() as queue:
+            queue.add_patient("p1")
+        await worker_b.get_patient_queue()
+        async with worker_a.queue_transaction() as queue:
+            queue.add_patient("p2", "high")
+        assert [item["patient_id"] for item in await worker_b.get_patient_queue()] == ["p2", "p1"]
+
+        with pytest.raises(RuntimeError):
+            async with worker_b.queue_transaction() as queue:
+                queue.add_patient("p3")
+                raise RuntimeError("handler failed")
+        assert [item["patient_id"] for item in await worker_b.get_patient_queue()] == ["p2", "p1"]
+        assert client.sync.evep.patient_queue.count_documents({}) == 2
+
+    @pytest.mark.asyncio
+    async def test_finished_screenings_dequeue_patients(self):
+        """Patients join, are served and leave the queue when their screening ends."""
+        client = AsyncMongoClient()
+        service, emitted = make_service(client)
+        service.register_queue_events()
+        served, cancelled, abandoned = ObjectId(), ObjectId(), ObjectId()
+        try:
+            async with service.queue_transaction() as queue:
+                for patient_id in (served, cancelled, abandoned):
+                    queue.add_patient(str(patient_id))
+                queue.assign_staff_to_patient(str(served), "nurse_1")
+
+            session = {"patient_id": served, "status": "in_progress"}
+            await event_bus.emit(DOCUMENT_CHANGED_EVENT, {"collection": "screenings", "before": session, "after": {**session, "status": "completed"}})
+            assert emitted[-1][1]["changes"] == [{"op": "remove", "patient_id": str(served)}]
+            assert emitted[-1][2] == QUEUE_ROOM
+            assert service.queue_manager.average_service_seconds < QUEUE_DEFAULT_SERVICE_SECONDS
+            average = service.queue_manager.average_service_seconds
+
+            # Cancelled and deleted screenings leave the queue without counting as served
+            session = {"patient_id": cancelled, "status": "in_progress"}
+            await event_bus.emit(DOCUMENT_CHANGED_EVENT, {"collection": "screenings", "before": session, "after": {**session, "status": "cancelled"}})
+            await event_bus.emit(DOCUMENT_CHANGED_EVENT, {"collection": "patients", "before": None, "after": {"patient_id": abandoned, "status": "completed"}})
+            assert service.queue_manager.average_service_seconds == average
+            assert [item["patient_id"] for item in await service.get_patient_queue()] == [str(abandoned)]
+            assert client.sync.evep.patient_queue.count_documents({}) == 1
+
+            # A patient whose screening is never closed expires from the queue on the next prune, not on other changes
+            service.queue_manager.queue.at(1).created_at = datetime.now() - timedelta(days=1)
+            async with service.queue_transaction() as queue:
+                queue.update_patient_step(str(abandoned), 4)
+            assert [item["patient_id"] for item in await service.get_patient_queue()] == [str(abandoned)]
+            assert await service.prune_queue() == 1
+            assert emitted[-1][1]["changes"] == [{"op": "remove", "patient_id": str(abandoned)}]
+            assert await service.get_patient_queue() == []
+            assert client.sync.evep.patient_queue.count_documents({}) == 0
+        finally:
+            event_bus.unsubscribe(DOCUMENT_CHANGED_EVENT, service.screening_changed)
+
+    @pytest.mark.performance
+    def test_queue_operation_benchmark(self):
+        """20,000 queued patients: position lookups and removals against the previous list scan."""
+        size = 20000
+        keys = [f"p{index}" for index in range(size)]
+        priorities = ["high" if index % 10 == 0 else "normal" for index in range(size)]
+
+        queue = PriorityQueue()
+        started = time.perf_counter()
+        for key, priority in zip(keys, priorities):
+            queue.push(key, key, priority)
+        push_seconds = time.perf_counter() - started
+
+        legacy = sorted(zip(priorities, range(size), keys), key=lambda entry: (priority_rank(entry[0]), entry[1]))
+        legacy = [key for _, _, key in legacy]
+        sample = random.Random(3).sample(keys, 500)
+
+        started = time.perf_counter()
+        legacy_positions = [legacy.index(key) + 1 for key in sample]
+        for key in sample:
+            legacy = [other for other in legacy if other != key]
+        legacy_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        positions = [queue.position(key) for key in sample]
+        for key in sample:
+            queue.remove(key)
+        indexed_seconds = time.perf_counter() - started
+
+        print(f"\n{size} pushes {push_seconds * 1000:.1f}ms; 500 positions + removals: "
+              f"list scan {legacy_seconds * 1000:.1f}ms, indexed {indexed_seconds * 1000:.1f}ms")
+        assert positions == legacy_positions
+        assert list(queue) == legacy
+        assert indexed_seconds < legacy_seconds
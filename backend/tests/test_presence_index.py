@@ -0,0 +1,173 @@
+import asyncio
+import time
+
+import fakeredis
+import pytest
+from fakeredis import aioredis as fake_aioredis
+from unittest.mock import patch
+
+from app import socketio_service
+from app.core.presence_store import InMemoryPresenceStore, PresenceTimers, RedisPresenceStore, decode_record, encode_state
+from app.socketio_service import InstrumentedAsyncServer, SocketIOService
+from tests.async_mongomock import AsyncMongoClient
+
+
+def make_service(presence=None):
+    server = InstrumentedAsyncServer(async_mode="asgi")
+    service = SocketIOService(server=server, presence=presence or InMemoryPresenceStore())
+    service.register_handlers()
+    service.register_collaboration_handlers()
+    emitted = []
+
+    async def emit(event, data=None, room=None, skip_sid=None, **kwargs):
+        emitted.append((event, room))
+
+    server.emit = emit
+    return service, emitted
+
+
+async def connect(service, eio_sid, user_id):
+    sid = await service.sio.manager.connect(eio_sid, "/")
+    await service.sio._trigger_event("connect", "/", sid, {}, {"user_id": user_id, "role": "nurse"})
+    return sid
+
+
+async def join(service, sid, user_id, patient_id):
+    await service.sio._trigger_event(
+        "join_screening", "/", sid, {"patient_id": patient_id, "user": {"user_id": user_id}}
+    )
+
+
+@pytest.fixture(autouse=True)
+def database():
+    """Mongomock database holding the patient queue that join_screening writes to."""
+    with patch("app.socketio_service.get_database", return_value=AsyncMongoClient()):
+        yield
+
+
+@pytest.fixture(params=["memory", "redis"])
+def store(request):
+    if request.param == "memory":
+        return InMemoryPresenceStore()
+    return RedisPresenceStore(fake_aioredis.FakeRedis(server=fakeredis.FakeServer()))
+
+
+class TestPresenceIndex:
+    """Test suite for the room-indexed presence store, away timers and debounced broadcasts."""
+
+    def test_timers_expire_in_deadline_order(self):
+        """Only clients untouched for the timeout expire, and touching restarts the timer."""
+        timers = PresenceTimers(timeout=10)
+        timers.touch("a", now=0)
+        timers.touch("b", now=5)
+        timers.touch("a", now=8)
+        assert timers.next_deadline() == 15
+        assert timers.expired(now=16) == ["b"]
+        assert timers.expired(now=17) == []
+        timers.discard("a")
+        assert timers.expired(now=100) == []
+        assert timers.next_deadline() is None
+
+        for _ in range(1000):
+            timers.touch("c", now=0)
+        assert len(timers._heap) < 100
+
+    @pytest.mark.asyncio
+    async def test_room_index(self, store):
+        """Room members and user lookups come from the index and follow joins, leaves and removal."""
+        await store.save_client("s1", {"user_id": "u1", "patient_id": "p1"})
+        await store.save_client("s2", {"user_id": "u2", "patient_id": "p1"})
+        await store.save_client("s3", {"user_id": "u3"})
+        await store.join_room("s1", "screening_p1")
+        await store.join_room("s2", "screening_p1")
+        await store.join_room("s2", "hospital_mobile_session_x")
+
+        assert sorted(await store.room_members("screening_p1")) == ["s1", "s2"]
+        assert await store.rooms_of("s2") == {"screening_p1", "hospital_mobile_session_x"}
+        assert await store.find_user("u3") == "s3"
+
+        await store.leave_room("s1", "screening_p1")
+        assert list(await store.room_members("screening_p1")) == ["s2"]
+
+        await store.remove_client("s2")
+        assert await store.room_members("screening_p1") == {}
+        assert await store.room_members("hospital_mobile_session_x") == {}
+        assert await store.find_user("u2") is None
+        await store.close()
+
+    @pytest.mark.asyncio
+    async def test_heartbeats_are_debounced_and_timers_mark_away(self):
+        """A burst of heartbeats yields one active_users_updated per room; idle clients turn away."""
+        service, emitted = make_service()
+        with patch.object(socketio_service, "ACTIVE_USERS_DEBOUNCE_SECONDS", 0.05):
+            sids = [await connect(service, f"eio{index}", f"u{index}") for index in range(4)]
+            for index, sid in enumerate(sids):
+                await join(service, sid, f"u{index}", "p1" if index < 2 else "p2")
+            emitted.clear()
+
+            for _ in range(25):
+                for index, sid in enumerate(sids):
+                    await service.sio._trigger_event("user_heartbeat", "/", sid, {"user_id": f"u{index}", "step": 2})
+            await asyncio.sleep(0.1)
+
+            updates = sorted(room for event, room in emitted if event == "active_users_updated")
+            assert updates == ["screening_p1", "screening_p2"]
+
+            emitted.clear()
+            await service.expire_presence(now=time.monotonic() + socketio_service.PRESENCE_TIMEOUT_SECONDS + 1)
+            users = await service.get_screening_active_users("p1")
+            assert {user["status"] for user in users} == {"away"}
+            await asyncio.sleep(0.1)
+            assert sorted(room for event, room in emitted if event == "active_users_updated") == ["screening_p1", "screening_p2"]
+
+            await service.sio._trigger_event("user_heartbeat", "/", sids[0], {"user_id": "u0", "step": 3})
+            await asyncio.sleep(0.1)
+            statuses = {user["user_id"]: user["status"] for user in await service.get_screening_active_users("p1")}
+            assert statuses == {"u0": "active", "u1": "away"}
+
+    @pytest.mark.performance
+    @pytest.mark.asyncio
+    async def test_presence_lookup_benchmark(self):
+        """2,000 clients across 100 screening rooms: indexed lookups against a full scan."""
+        service, _ = make_service()
+        clients, rooms = 2000, 100
+        with patch.object(socketio_service, "ACTIVE_USERS_DEBOUNCE_SECONDS", 0.01):
+            sids = [await connect(service, f"eio{index}", f"u{index}") for index in range(clients)]
+            for index, sid in enumerate(sids):
+                await join(service, sid, f"u{index}", f"p{index % rooms}")
+
+            legacy_clients = {
+                sid: encode_state({**record, "rooms": sorted(record["rooms"])})
+                for sid, record in service.connected_clients.items()
+            }
+
+            def legacy_active_users(patient_id):
+                # Previous behaviour: decode and test every connected client
+                room_name = f"screening_{patient_id}"
+                users = []
+                for raw in legacy_clients.values():
+                    record = decode_record(raw)
+                    if room_name in record.get("rooms", []) and record.get("patient_id") == patient_id:
+                        users.append(record["user_id"])
+                return users
+
+            started = time.perf_counter()
+            for index in range(rooms):
+                legacy_active_users(f"p{index}")
+            legacy_seconds = time.perf_counter() - started
+
+            started = time.perf_counter()
+            for index in range(rooms):
+                users = await service.get_screening_active_users(f"p{index}")
+            indexed_seconds = time.perf_counter() - started
+            assert len(users) == clients // rooms
+
+            started = time.perf_counter()
+            for index, sid in enumerate(sids):
+                await service.sio._trigger_event("user_heartbeat", "/", sid, {"user_id": f"u{index}", "step": 1})
+            heartbeat_seconds = time.perf_counter() - started
+            await asyncio.sleep(0.05)
+
+        print(f"\nactive users for {rooms} rooms: full scan {legacy_seconds * 1000:.1f}ms, "
+              f"indexed {indexed_seconds * 1000:.1f}ms; {clients} heartbeats {heartbeat_seconds * 1000:.1f}ms")
+        assert indexed_seconds < legacy_seconds
@@ -0,0 +1,127 @@
+import asyncio
+from datetime import datetime
+
+import fakeredis
+import pytest
+from unittest.mock import patch
+from bson import ObjectId
+from fakeredis import aioredis as fake_aioredis
+
+from app.core import db_rbac
+from app.core.principal_cache import PrincipalCache
+from tests.async_mongomock import AsyncMongoClient
+
+
+@pytest.fixture
+def mock_db():
+    """Mongomock-backed database seeded with one admin and one RBAC user."""
+    client = AsyncMongoClient()
+    evep = client.sync.evep
+    admin_id = evep.admin_users.insert_one({"email": "admin@example.com", "role": "super_admin"}).inserted_id
+    teacher_id = evep.users.insert_one({"email": "teacher@school.com", "role": "teacher"}).inserted_id
+    evep.rbac_user_roles.insert_one({"user_id": str(teacher_id), "role_id": "teacher"})
+    evep.rbac_roles.insert_one({"id": "teacher", "permissions": ["view_students", "manage_school_data"]})
+    client.admin_id = str(admin_id)
+    client.teacher_id = str(teacher_id)
+    with patch("app.core.principal_cache.get_database", return_value=client):
+        yield client
+
+
+@pytest.fixture
+def cache():
+    """Fresh principal cache swapped in for the global instance."""
+    fresh = PrincipalCache(ttl_seconds=60, max_size=2)
+    with patch.object(db_rbac, "principal_cache", fresh):
+        yield fresh
+
+
+class TestPrincipalCache:
+    """Test suite for the resolved principal cache."""
+
+    @pytest.mark.asyncio
+    async def test_repeated_checks_hit_database_once(self, mock_db, cache):
+        """Multiple RBAC checks for one user resolve the principal once."""
+        user_id = mock_db.teacher_id
+
+        assert await db_rbac.has_role_db(user_id, "teacher")
+        assert await db_rbac.has_permission_db(user_id, "manage_school_data")
+        assert not await db_rbac.has_permission_db(user_id, "view_all_data")
+        assert await db_rbac.has_any_role_db(user_id, ["doctor", "teacher"])
+        assert await db_rbac.get_user_roles_from_db(user_id) == ["teacher"]
+
+        # users + admin_users + rbac_user_roles + rbac_roles
+        assert len(mock_db.operations) == 4
+        stats = cache.get_stats()
+        assert stats["misses"] == 1
+        assert stats["hits"] == 4
+        assert stats["db_calls_saved"] == 16
+        assert stats["hit_ratio"] == 0.8
+
+    @pytest.mark.asyncio
+    async def test_super_admin_has_wildcard(self, mock_db, cache):
+        """Admin users keep their document role and super_admin gets full access."""
+        assert await db_rbac.has_permission_db(mock_db.admin_id, "anything")
+        assert await db_rbac.get_user_roles_from_db(mock_db.admin_id) == ["super_admin"]
+
+    @pytest.mark.asyncio
+    async def test_unknown_user_gets_default_permissions(self, mock_db, cache):
+        """Users without any assignment fall back to the basic permission set."""
+        user_id = str(ObjectId())
+        assert sorted(await db_rbac.get_user_permissions_from_db(user_id)) == sorted(db_rbac.DEFAULT_PERMISSIONS)
+        assert await db_rbac.get_user_roles_from_db(user_id) == []
+
+    @pytest.mark.asyncio
+    async def test_role_write_invalidates_principal(self, mock_db, cache):
+        """Assigning a role drops the cached principal so the next check sees it."""
+        user_id = mock_db.teacher_id
+        mock_db.sync.evep.rbac_roles.insert_one({"id": "doctor", "permissions": ["view_patients"]})
+        assert not await db_rbac.has_role_db(user_id, "doctor")
+
+        mock_db.sync.evep.rbac_user_roles.insert_one({"user_id": user_id, "role_id": "doctor"})
+        assert not await db_rbac.has_role_db(user_id, "doctor")
+
+        cache.invalidate(user_id)
+        assert await db_rbac.has_role_db(user_id, "doctor")
+        assert await db_rbac.has_permission_db(user_id, "view_patients")
+        assert cache.get_stats()["invalidations"] == 1
+
+    @pytest.mark.asyncio
+    async def test_ttl_expiry_and_lru_eviction(self, mock_db, cache):
+        """Entries expire after the TTL and the least recently used entry is evicted."""
+        await cache.get_principal(mock_db.teacher_id)
+        await cache.get_principal(mock_db.admin_id)
+        await cache.get_principal(str(ObjectId()))
+        assert cache.get_stats()["evictions"] == 1
+        assert cache.get_stats()["size"] == 2
+
+        cache.ttl_seconds = 0
+        await cache.get_principal(mock_db.admin_id)
+        assert cache.get_stats()["expirations"] == 1
+
+    @pytest.mark.asyncio
+    async def test_invalidation_reaches_other_workers(self, mock_db):
+        """A logout handled by one worker drops the principal another worker cached."""
+        server = fakeredis.FakeServer()
+        workers = [PrincipalCache(ttl_seconds=60, redis=fake_aioredis.FakeRedis(server=server)) for _ in range(2)]
+        for worker in workers:
+            worker.start()
+            await asyncio.wait_for(worker._subscribed.wait(), 1)
+        handling, other = workers
+        user_id = mock_db.teacher_id
+        try:
+            assert (await other.get_principal(user_id)).user.get("last_logout") is None
+
+            # What the logout handler does on the worker that receives it
+            mock_db.sync.evep.users.update_one({"_id": ObjectId(user_id)}, {"$set": {"last_logout": datetime.utcnow()}})
+            handling.invalidate(user_id)
+            for _ in range(100):
+                if other.get_stats()["size"] == 0:
+                    break
+                await asyncio.sleep(0.01)
+
+            assert (await other.get_principal(user_id)).user.get("last_logout") is not None
+            assert other.get_stats()["remote_invalidations"] == 1
+            assert handling.get_stats()["remote_invalidations"] == 0
+        finally:
+            for worker in workers:
+                await worker.stop()
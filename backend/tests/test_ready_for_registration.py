@@ -0,0 +1,123 @@
+import os
+import time
+from types import SimpleNamespace
+
+import pytest
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import MongoClient
+from unittest.mock import patch
+
+from app.api import evep
+from scripts.seed_mock_data import seed_registration_workload
+
+# The pipeline relies on $convert and correlated $lookup, so it needs a real MongoDB
+TEST_MONGODB_URL = os.getenv("TEST_MONGODB_URL", "mongodb://localhost:27017")
+BENCHMARK_DATABASE = "evep_registration_benchmark"
+
+ADMIN_USER = {"user_id": str(ObjectId()), "role": "admin", "email": "admin@example.com"}
+
+
+@pytest.fixture
+def mongo_db():
+    """Empty benchmark database on a live MongoDB; skipped when none is reachable."""
+    sync_client = MongoClient(TEST_MONGODB_URL, serverSelectionTimeoutMS=1000)
+    try:
+        sync_client.admin.command("ping")
+    except Exception:
+        sync_client.close()
+        pytest.skip("MongoDB is not available")
+    sync_client.drop_database(BENCHMARK_DATABASE)
+    client = AsyncIOMotorClient(TEST_MONGODB_URL)
+    # The API addresses collections as db.evep.<name>
+    db = SimpleNamespace(evep=client[BENCHMARK_DATABASE])
+    with patch("app.api.evep.get_database", return_value=db):
+        yield db
+    sync_client.drop_database(BENCHMARK_DATABASE)
+    sync_client.close()
+    client.close()
+
+
+async def legacy_ready_for_registration(db, skip: int, limit: int):
+    """The previous implementation: load all screenings, filter in Python, one query per student."""
+    completed_screenings = await db.evep["school_screenings"].find({"status": "completed"}).to_list(length=None)
+    student_ids = [ObjectId(screening["student_id"]) for screening in completed_screenings]
+    existing_patients = await db.evep["student_patient_mapping"].find({
+        "student_id": {"$in": student_ids},
+        "status": "active"
+    }).to_list(length=None)
+    already_registered_ids = [mapping["student_id"] for mapping in existing_patients]
+    available_student_ids = [sid for sid in student_ids if sid not in already_registered_ids]
+    students = await db.evep["evep.students"].find({
+        "_id": {"$in": available_student_ids},
+        "status": "active"
+    }).skip(skip).limit(limit).to_list(length=None)
+    for student in students:
+        await db.evep["school_screenings"].find_one({
+            "student_id": student["_id"],
+            "status": "completed"
+        }, sort=[("created_at", -1)])
+    return students
+
+
+class TestReadyForRegistration:
+    """Test suite for the students-ready-for-patient-registration aggregation."""
+
+    @pytest.mark.asyncio
+    async def test_excludes_registered_inactive_and_unscreened_students(self, mongo_db):
+        """Only active students with a completed screening and no active mapping are listed."""
+        db = mongo_db.evep
+        ready, registered, inactive, unscreened = ObjectId(), ObjectId(), ObjectId(), ObjectId()
+        await db["evep.students"].insert_many([
+            {"_id": ready, "first_name": "A", "status": "active"},
+            {"_id": registered, "first_name": "B", "status": "active"},
+            {"_id": inactive, "first_name": "C", "status": "inactive"},
+            {"_id": unscreened, "first_name": "D", "status": "active"},
+        ])
+        await db.school_screenings.insert_many([
+            {"student_id": str(ready), "status": "completed", "created_at": "2024-01-01", "results": {"va": "20/40"}},
+            {"student_id": ready, "status": "completed", "created_at": "2024-03-01", "results": {"va": "20/20"}},
+            {"student_id": str(ready), "status": "pending", "created_at": "2024-06-01"},
+            {"student_id": str(registered), "status": "completed", "created_at": "2024-01-01"},
+            {"student_id": str(inactive), "status": "completed", "created_at": "2024-01-01"},
+            {"student_id": str(unscreened), "status": "pending", "created_at": "2024-01-01"},
+            {"student_id": "not-an-object-id", "status": "completed", "created_at": "2024-01-01"},
+        ])
+        await db.student_patient_mapping.insert_one({"student_id": registered, "status": "active"})
+
+        response = await evep.get_students_ready_for_patient_registration(current_user=ADMIN_USER, skip=0, limit=10)
+
+        assert response["total_count"] == 1
+        assert [student["id"] for student in response["students"]] == [str(ready)]
+        assert response["students"][0]["screening_completed_at"] == "2024-03-01"
+        assert response["students"][0]["screening_results"] == {"va": "20/20"}
+
+    @pytest.mark.asyncio
+    async def test_pages_cover_every_ready_student_once(self, mongo_db):
+        """Skip/limit pages are disjoint and the total counts distinct students."""
+        await seed_registration_workload(mongo_db, student_count=120)
+
+        seen = []
+        for skip in range(0, 200, 25):
+            response = await evep.get_students_ready_for_patient_registration(current_user=ADMIN_USER, skip=skip, limit=25)
+            seen.extend(student["id"] for student in response["students"])
+        assert len(seen) == len(set(seen)) == response["total_count"]
+
+    @pytest.mark.performance
+    @pytest.mark.asyncio
+    async def test_benchmark_against_legacy_implementation(self, mongo_db):
+        """Regression benchmark on seeded data: one aggregation versus the N+1 version."""
+        await seed_registration_workload(mongo_db, student_count=3000)
+
+        started = time.perf_counter()
+        await legacy_ready_for_registration(mongo_db, skip=0, limit=100)
+        legacy_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        response = await evep.get_students_ready_for_patient_registration(current_user=ADMIN_USER, skip=0, limit=100)
+        pipeline_seconds = time.perf_counter() - started
+
+        print(f"\nready-for-registration page: legacy {legacy_seconds * 1000:.1f} ms, "
+              f"aggregation {pipeline_seconds * 1000:.1f} ms, {response['total_count']} ready students")
+        assert len(response["students"]) == 100
+        assert pipeline_seconds < legacy_seconds
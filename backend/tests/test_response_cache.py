@@ -0,0 +1,160 @@
+import asyncio
+import time
+from datetime import datetime
+
+import fakeredis
+import pytest
+
+from app.modules.ai_agents.agent_manager import AIAgentManager, UserType
+from app.modules.ai_agents.response_cache import ResponseCache, response_size
+
+
+def answer(text):
+    return {"response": text, "agent_type": "parent_agent", "confidence": 0.9}
+
+
+class SlowUpstream:
+    """Stands in for an LLM call: counts calls and takes a while to answer"""
+
+    def __init__(self, seconds=0.05, fail=False):
+        self.seconds = seconds
+        self.fail = fail
+        self.calls = 0
+
+    async def __call__(self, text="answer"):
+        self.calls += 1
+        await asyncio.sleep(self.seconds)
+        if self.fail:
+            raise RuntimeError("upstream down")
+        return answer(text)
+
+
+class TestResponseCache:
+    """Test suite for the AI agent response cache."""
+
+    @pytest.mark.asyncio
+    async def test_lru_ttl_and_byte_budget(self):
+        """Entries expire after the TTL and the least recently used go first past either limit."""
+        cache = ResponseCache("test", ttl_seconds=60, max_entries=3, max_bytes=10_000)
+        for key in "abc":
+            cache.put(key, answer(key))
+        assert cache.get("a")["response"] == "a"
+        cache.put("d", answer("d"))
+        assert cache.get("b") is None and len(cache) == 3
+
+        entry_size = response_size(answer("x" * 100))
+        small = ResponseCache("test", max_entries=100, max_bytes=entry_size * 2)
+        for key in "xyz":
+            small.put(key, answer(key * 100))
+        assert [key for key in "xyz" if small.get(key)] == ["y", "z"]
+        assert small.get_stats()["bytes"] == entry_size * 2 and small.get_stats()["evictions"] == 1
+
+        expiring = ResponseCache("test", ttl_seconds=0.01)
+        expiring.put("old", answer("old"))
+        await asyncio.sleep(0.02)
+        expiring.put("new", answer("new"))
+        assert len(expiring) == 1 and expiring.get_stats()["expirations"] == 1
+
+    @pytest.mark.asyncio
+    async def test_identical_concurrent_requests_share_one_call(self):
+        """Ten identical questions reach the upstream once; a different question does not wait on them."""
+        cache, upstream = ResponseCache("test"), SlowUpstream()
+        results = await asyncio.gather(*(cache.get_or_compute("same", upstream) for _ in range(10)),
+                                       cache.get_or_compute("other", lambda: upstream("other")))
+        assert upstream.calls == 2
+        assert sorted(source for _, source in results) == ["coalesced"] * 9 + ["miss"] * 2
+        assert results[-1][0]["response"] == "other"
+
+        response, source = await cache.get_or_compute("same", upstream)
+        assert source == "hit" and upstream.calls == 2
+        response["response"] = "mutated by caller"
+        assert (await cache.get_or_compute("same", upstream))[0]["response"] == "answer"
+
+        stats = cache.get_stats()
+        assert (stats["requests"], stats["hits"], stats["coalesced"], stats["misses"]) == (13, 2, 9, 2)
+        assert stats["hit_ratio"] == round(11 / 13, 4) and stats["inflight"] == 0
+
+    @pytest.mark.asyncio
+    async def test_failures_and_errors_are_not_cached(self):
+        """Upstream exceptions reach every waiter, and error responses are recomputed next time."""
+        cache, upstream = ResponseCache("test"), SlowUpstream(fail=True)
+        results = await asyncio.gather(*(cache.get_or_compute("q", upstream) for _ in range(3)), return_exceptions=True)
+        assert all(isinstance(result, RuntimeError) for result in results) and upstream.calls == 1
+
+        async def error_response():
+            return {"response": "try later", "error": "openai_error"}
+        await cache.get_or_compute("e", error_response)
+        assert (await cache.get_or_compute("e", error_response))[1] == "miss" and len(cache) == 0
+
+    @pytest.mark.asyncio
+    async def test_cancelled_caller_does_not_cancel_shared_call(self):
+        """A client that disconnects leaves the upstream call running for the others."""
+        cache, upstream = ResponseCache("test"), SlowUpstream()
+        leader = asyncio.ensure_future(cache.get_or_compute("q", upstream))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(cache.get_or_compute("q", upstream))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        response, source = await follower
+        assert source == "coalesced" and response["response"] == "answer" and upstream.calls == 1
+
+    @pytest.mark.asyncio
+    async def test_workers_share_hits_through_redis(self):
+        """A response computed by one worker is a shared hit for another."""
+        server = fakeredis.FakeServer()
+        worker_a = ResponseCache("test", redis=fakeredis.aioredis.FakeRedis(server=server))
+        worker_b = ResponseCache("test", redis=fakeredis.aioredis.FakeRedis(server=server))
+        upstream = SlowUpstream(seconds=0)
+
+        await worker_a.get_or_compute("q", upstream)
+        response, source = await worker_b.get_or_compute("q", upstream)
+        assert source == "shared_hit" and response == answer("answer") and upstream.calls == 1
+        assert (await worker_b.get_or_compute("q", upstream))[1] == "hit"
+
+        worker_a.clear()
+        await asyncio.sleep(0.01)
+        assert await worker_a.redis.keys("evep:ai_response:*") == []
+
+    @pytest.mark.asyncio
+    async def test_agent_manager_uses_cache(self, monkeypatch):
+        """Concurrent identical questions to the agent manager produce one agent call."""
+        manager = AIAgentManager()
+        monkeypatch.setattr(manager, "openai_client", None)
+        monkeypatch.setattr(manager, "response_cache", ResponseCache("agent"))
+        agent = manager.agents[UserType.PARENT]
+        upstream = SlowUpstream()
+        monkeypatch.setattr(agent, "get_fallback_response", lambda message, context: upstream(message))
+
+        responses = await asyncio.gather(*(manager.get_agent_response(UserType.PARENT, "ผลตรวจสายตา") for _ in range(5)))
+        assert upstream.calls == 1
+        assert [response["cached"] for response in responses].count(False) == 1
+        stats = manager.get_performance_metrics()["cache_stats"]
+        assert stats["coalesced"] == 4 and stats["misses"] == 1 and stats["cache_size"] == 1
+
+    @pytest.mark.performance
+    def test_insert_benchmark(self):
+        """Inserting 20,000 responses into a full cache: sort-on-evict against the O(1) LRU."""
+        inserts, capacity = 20000, 1000
+        responses = [answer(f"response {index}") for index in range(inserts)]
+
+        legacy = {}
+        started = time.perf_counter()
+        for index, response in enumerate(responses):
+            # Previous behaviour: sort the whole cache by timestamp to evict
+            if len(legacy) >= capacity:
+                oldest = sorted(legacy, key=lambda key: legacy[key]["timestamp"])[:len(legacy) - capacity + 1]
+                for key in oldest:
+                    del legacy[key]
+            legacy[index] = {"response": response, "timestamp": datetime.utcnow()}
+        legacy_seconds = time.perf_counter() - started
+
+        cache = ResponseCache("bench", max_entries=capacity)
+        started = time.perf_counter()
+        for index, response in enumerate(responses):
+            cache.put(str(index), response)
+        lru_seconds = time.perf_counter() - started
+
+        print(f"\n{inserts} inserts at capacity {capacity}: sort-on-evict {legacy_seconds * 1000:.0f}ms, "
+              f"LRU {lru_seconds * 1000:.0f}ms")
+        assert len(cache) == len(legacy) == capacity
+        assert lru_seconds < legacy_seconds
@@ -0,0 +1,210 @@
+import os
+import random
+import re
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+from app.core.event_bus import event_bus
+from app.services.dashboard_stats import DOCUMENT_CHANGED_EVENT, publish_change
+from app.services.search_index import SearchIndex, entry_for, fold, query_tokens, regex_filter
+from tests.async_mongomock import AsyncMongoClient
+
+BENCHMARK_RECORDS = int(os.getenv("SEARCH_BENCHMARK_RECORDS", "1000000"))
+
+
+def patient(first_name, last_name, cid="", **fields):
+    return {"_id": ObjectId(), "first_name": first_name, "last_name": last_name, "cid": cid, **fields}
+
+
+def make_index(*documents, kind="patients"):
+    index = SearchIndex(sources={})
+    for document in documents:
+        index.add(entry_for(kind, document))
+    return index
+
+
+def ids(hits):
+    return [hit.entry.id for hit in hits]
+
+
+class TestSearchIndex:
+    """Test suite for the in-memory patient and student search index."""
+
+    def test_thai_and_latin_folding(self):
+        """Tone marks, Thai digits, width and case fold away; honorifics and email domains are dropped."""
+        assert fold("ใจดี่") == fold("ใจดี")
+        assert fold("๑๒๓") == "123"
+        assert fold("ＳＯＭ") == "som"
+        assert query_tokens("ด.ช.สมชาย") == ["สมชาย"]
+        assert query_tokens("นาย สมชาย ใจดี") == ["สมชาย", "ใจดี"]
+        assert query_tokens("นาย") == ["นาย"]
+        assert query_tokens("1-1037-00099-88-1") == ["1103700099881"]
+        assert query_tokens("somchai.p@example.com") == ["somchai", "p"]
+
+    def test_ranking_by_match_and_field(self):
+        """Exact name matches rank above prefixes, prefixes above infixes, names above schools."""
+        exact = patient("สมชาย", "ใจดี", "1103700012345")
+        prefix = patient("สมชายศักดิ์", "ทองดี", "3100500067890")
+        infix = patient("ณัฐสมชาย", "ดีมาก", "5200100011111")
+        school = patient("วิชัย", "ใจงาม", "5200100022222", school="โรงเรียนสมชายวิทยา")
+        index = make_index(school, infix, prefix, exact)
+
+        hits, count = index.search("สมชาย")
+        assert ids(hits) == [str(exact["_id"]), str(prefix["_id"]), str(infix["_id"]), str(school["_id"])]
+        assert count == 4
+        assert hits[0].score > hits[1].score > hits[2].score > hits[3].score
+
+        # Every token has to match, in any field
+        assert ids(index.search("สมชาย ใจดี")[0]) == [str(exact["_id"])]
+        # First and last name typed without the space
+        assert ids(index.search("สมชายใจดี")[0]) == [str(exact["_id"])]
+        # CID digit prefixes, with or without dashes; digits never match inside a CID
+        assert ids(index.search("1-1037")[0]) == [str(exact["_id"])]
+        assert sorted(ids(index.search("52001")[0])) == sorted([str(infix["_id"]), str(school["_id"])])
+        assert index.search("0001234")[0] == []
+
+    def test_filters_and_paging(self):
+        """Owner, school, grade and active filters apply; skip and limit page through the ranking."""
+        documents = [
+            patient("Anan", f"Kaew{number}", parent_email=f"parent{number % 2}@example.com",
+                    school="Wat School" if number < 6 else "City School", grade=str(number % 3), is_active=number != 0)
+            for number in range(10)
+        ]
+        index = make_index(*documents)
+
+        hits, count = index.search("anan", owner="parent1@example.com", limit=100)
+        assert count == 5 and {hit.entry.owner for hit in hits} == {"parent1@example.com"}
+        assert index.search("anan", school="City School")[1] == 4
+        assert index.search("anan", school="Wat School", grade="1")[1] == 2
+        assert index.search("anan", active=False)[1] == 1
+
+        first_page, total = index.search("anan", limit=4)
+        second_page, _ = index.search("anan", limit=4, skip=4)
+        everything, _ = index.search("anan", limit=10)
+        assert total == 10
+        assert ids(first_page + second_page) == ids(everything)[:8]
+
+    def test_students_are_indexed_by_code_and_status(self):
+        """Students match on student code and school name; inactive students can be filtered out."""
+        student = {"_id": ObjectId(), "first_name": "Somsri", "last_name": "Jaidee", "cid": "1103700099881",
+                   "student_code": "ST-0042", "school_name": "Wat Suthi", "status": "active"}
+        moved = {**student, "_id": ObjectId(), "student_code": "ST-0043", "status": "inactive"}
+        index = make_index(student, moved, kind="students")
+
+        assert ids(index.search("st004")[0]) == [str(student["_id"]), str(moved["_id"])]
+        assert ids(index.search("st0042")[0]) == [str(student["_id"])]
+        assert ids(index.search("somsri", active=True)[0]) == [str(student["_id"])]
+        assert index.search("suthi", kind="patients")[0] == []
+
+    @pytest.mark.asyncio
+    async def test_writes_on_the_event_bus_update_the_index(self):
+        """Creates, renames, soft deletes and deletes published by write handlers reach the index."""
+        index = SearchIndex(sources={})
+        document = patient("Niran", "Sukjai", "1100000000001", is_active=True)
+        event_bus.subscribe(DOCUMENT_CHANGED_EVENT, index.apply_change)
+        try:
+            await publish_change("patients", after=document)
+            assert ids(index.search("niran")[0]) == [str(document["_id"])]
+
+            renamed = {**document, "first_name": "Narin"}
+            await publish_change("patients", before=document, after=renamed)
+            assert index.search("niran")[0] == []
+            assert ids(index.search("narin")[0]) == [str(document["_id"])]
+
+            await publish_change("patients", before=renamed, after={**renamed, "is_active": False})
+            assert index.search("narin", active=True)[0] == []
+
+            student = {"_id": ObjectId(), "first_name": "Narin", "last_name": "Dee", "status": "active"}
+            await publish_change("evep.students", after=student)
+            await publish_change("screenings", after={"_id": ObjectId(), "first_name": "Narin"})
+            assert index.search("narin")[1] == 2
+
+            await publish_change("evep.students", before=student)
+            assert ids(index.search("narin")[0]) == [str(document["_id"])]
+            assert len(index) == 1
+        finally:
+            event_bus.unsubscribe(DOCUMENT_CHANGED_EVENT, index.apply_change)
+
+    @pytest.mark.asyncio
+    async def test_load_then_refresh_from_mongodb(self):
+        """The index loads both collections and catches up on documents other workers updated."""
+        client = AsyncMongoClient()
+        evep = client.sync.evep
+        evep.patients.insert_many([patient("Kanya", f"Sri{number}", f"11000000000{number:02d}") for number in range(25)])
+        evep["evep.students"].insert_one({"first_name": "Kanya", "last_name": "Dee", "status": "active"})
+        index = SearchIndex(
+            sources={"patients": lambda: client.evep.patients, "students": lambda: client.evep["evep.students"]},
+            load_batch_size=10,
+        )
+
+        assert await index.load() == 26
+        assert index.ready and index.search("kanya")[1] == 26
+
+        updated_at = datetime.utcnow() + timedelta(seconds=1)
+        evep.patients.update_one({"last_name": "Sri3"}, {"$set": {"first_name": "Malee", "updated_at": updated_at.isoformat()}})
+        evep["evep.students"].update_one({}, {"$set": {"status": "inactive", "updated_at": updated_at}})
+        assert await index.refresh() == 2
+        assert index.search("kanya")[1] == 25
+        assert index.search("kanya", active=True)[1] == 24
+        assert [hit.entry.label for hit in index.search("malee")[0]] == ["Malee Sri3"]
+        assert index.get_stats()["refreshed_documents"] == 2
+
+    def test_regex_fallback_escapes_user_input(self):
+        """The fallback filter used before the index loads matches text literally."""
+        assert regex_filter("a.b(", ["first_name"]) == {"$or": [{"first_name": {"$regex": re.escape("a.b("), "$options": "i"}}]}
+
+    @pytest.mark.slow
+    @pytest.mark.performance
+    def test_typeahead_benchmark(self):
+        """A million patients: typeahead latency against the previous unanchored regex scan."""
+        rng = random.Random(7)
+        first_names = ["สมชาย", "สมศรี", "วิชัย", "ประเสริฐ", "ธนพล", "กิตติ", "anan", "niran", "kanya", "malee"]
+        letters = "กขคงจชซดตทนบปพมยรลวสหอabcdefghijklmnop"
+
+        def name():
+            return rng.choice(first_names) + "".join(rng.choice(letters) for _ in range(rng.randint(2, 5)))
+
+        def documents():
+            for number in range(BENCHMARK_RECORDS):
+                yield {"_id": ObjectId(), "first_name": name(), "last_name": name(), "cid": str(1100000000000 + number * 7919),
+                       "parent_email": f"parent{number}@example.com", "school": f"School {number % 500}"}
+
+        index = SearchIndex(sources={})
+        legacy_sample, batch = [], []
+        started = time.perf_counter()
+        for document in documents():
+            if len(legacy_sample) < 100000:
+                legacy_sample.append(document)
+            batch.append(entry_for("patients", document))
+            if len(batch) == 10000:
+                index.add_many(batch)
+                batch = []
+        index.add_many(batch)
+        build_seconds = time.perf_counter() - started
+
+        queries = ["ส", "สม", "สมชาย", "ประเสริฐก", "niran", "kanya niran", "anan abc", "110000", "school 12", "ใจดี"]
+        latencies = []
+        for _ in range(20):
+            for query in queries:
+                started = time.perf_counter()
+                index.search(query, limit=10, exhaustive=False)
+                latencies.append(time.perf_counter() - started)
+        latencies.sort()
+        p99 = latencies[int(len(latencies) * 0.99) - 1]
+
+        # Previous behaviour: every keystroke tests every document against five unanchored regexes
+        pattern = re.compile(re.escape("สมชาย"), re.IGNORECASE)
+        started = time.perf_counter()
+        legacy_matches = [
+            document for document in legacy_sample
+            if any(pattern.search(str(document.get(field) or "")) for field in ("first_name", "last_name", "cid", "parent_email", "school"))
+        ]
+        legacy_seconds = (time.perf_counter() - started) * len(index) / len(legacy_sample)
+
+        print(f"\n{len(index)} patients indexed in {build_seconds:.1f}s; typeahead p99 {p99 * 1000:.2f}ms, "
+              f"max {latencies[-1] * 1000:.2f}ms; regex scan ~{legacy_seconds * 1000:.0f}ms per query")
+        assert legacy_matches
+        assert p99 < 0.010
@@ -0,0 +1,144 @@
+import json
+import time
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+from bson import Decimal128, ObjectId
+
+from app.core.serialization import BSONJSONResponse, DocumentView, dumps, stringify_object_ids
+
+STUDENT_VIEW = DocumentView(
+    ["first_name", "last_name", ("grade_level", ""), "school_name", ("status", "active"), "created_at"],
+    rename={"school_name": "school.name"},
+    extra=lambda student: {"photo_count": len(student.get("photos") or [])},
+    extra_fields=("photos",),
+)
+
+
+def student(number):
+    return {
+        "_id": ObjectId(),
+        "first_name": f"Somchai{number}",
+        "last_name": "Jaidee",
+        "grade_level": None,
+        "school.name": "Wat Suthi",
+        "created_at": datetime(2025, 1, 1, 8, 30),
+        "photos": ["a.jpg"],
+        "medical_history": {"notes": "x" * 200},
+    }
+
+
+class TestSerialization:
+    """Test suite for BSON-aware response rendering."""
+
+    def test_encoder_handles_bson_types(self):
+        """ObjectId, dates, Decimal128 and sets are written without a conversion pass."""
+        object_id = ObjectId()
+        body = json.loads(dumps({
+            "id": object_id,
+            "at": datetime(2025, 3, 1, 9, 0),
+            "day": date(2025, 3, 1),
+            "price": Decimal128("1250.50"),
+            "cost": Decimal("10.25"),
+            "tags": {"a"},
+            "nested": [{"ref": object_id}],
+            "name": "สมชาย",
+        }))
+        assert body == {
+            "id": str(object_id),
+            "at": "2025-03-01T09:00:00",
+            "day": "2025-03-01",
+            "price": 1250.5,
+            "cost": 10.25,
+            "tags": ["a"],
+            "nested": [{"ref": str(object_id)}],
+            "name": "สมชาย",
+        }
+        with pytest.raises(TypeError):
+            dumps({"value": object()})
+
+    def test_view_projection_and_render(self):
+        """The projection covers what render reads; nulls fall back to defaults; the id is renamed."""
+        document = student(1)
+        assert STUDENT_VIEW.projection == {
+            "first_name": 1, "last_name": 1, "grade_level": 1, "school.name": 1, "status": 1, "created_at": 1, "photos": 1,
+        }
+
+        rendered = STUDENT_VIEW.render(document)
+        assert rendered == {
+            "id": document["_id"],
+            "first_name": "Somchai1",
+            "last_name": "Jaidee",
+            "grade_level": "",
+            "school_name": "Wat Suthi",
+            "status": "active",
+            "created_at": document["created_at"],
+            "photo_count": 1,
+        }
+        assert "medical_history" not in rendered
+        assert DocumentView(["name"], id_field=None).render({"_id": 1, "name": "A"}) == {"name": "A"}
+
+    def test_stringify_object_ids_keeps_other_values(self):
+        """Only ObjectIds become strings; datetimes stay for callers that format them later."""
+        object_id, created_at = ObjectId(), datetime(2025, 1, 1)
+        assert stringify_object_ids({"_id": object_id, "roles": [object_id], "at": created_at}) == {
+            "_id": str(object_id), "roles": [str(object_id)], "at": created_at,
+        }
+
+    def test_response_renders_documents(self):
+        """BSONJSONResponse writes rendered documents and keeps custom headers."""
+        documents = [student(number) for number in range(3)]
+        response = BSONJSONResponse(STUDENT_VIEW.render_many(documents), headers={"X-Has-More": "false"})
+        body = json.loads(response.body)
+        assert [item["id"] for item in body] == [str(document["_id"]) for document in documents]
+        assert body[0]["created_at"] == "2025-01-01T08:30:00"
+        assert response.headers["x-has-more"] == "false"
+        assert response.media_type == "application/json"
+
+    @pytest.mark.slow
+    @pytest.mark.performance
+    def test_list_rendering_benchmark(self):
+        """A 1,000 student page: declared view and one-pass encoder against the per-field copy and conversion walk."""
+        documents = [student(number) for number in range(1000)]
+
+        def convert(value):
+            if isinstance(value, ObjectId):
+                return str(value)
+            if isinstance(value, dict):
+                return {key: convert(item) for key, item in value.items()}
+            if isinstance(value, list):
+                return [convert(item) for item in value]
+            return value
+
+        def legacy():
+            # Previous behaviour: full documents, a recursive ObjectId pass, a per-field copy and stdlib json
+            items = []
+            for document in convert(documents):
+                items.append({
+                    "id": document["_id"],
+                    "first_name": document.get("first_name"),
+                    "last_name": document.get("last_name"),
+                    "grade_level": document.get("grade_level") or "",
+                    "school_name": document.get("school.name"),
+                    "status": document.get("status", "active"),
+                    "created_at": document["created_at"].isoformat(),
+                    "photo_count": len(document.get("photos") or []),
+                    "medical_history": document.get("medical_history"),
+                })
+            return json.dumps({"students": items}).encode("utf-8")
+
+        def current():
+            return dumps({"students": STUDENT_VIEW.render_many(documents)})
+
+        timings = {}
+        for name, render in (("legacy", legacy), ("current", current)):
+            render()
+            started = time.perf_counter()
+            for _ in range(20):
+                render()
+            timings[name] = (time.perf_counter() - started) / 20
+
+        print(f"\n1000 students: legacy {timings['legacy'] * 1000:.2f}ms, view + dumps {timings['current'] * 1000:.2f}ms")
+        assert json.loads(current())["students"][0]["first_name"] == "Somchai0"
+        assert timings["current"] < timings["legacy"]
@@ -0,0 +1,142 @@
+import asyncio
+
+import fakeredis
+import pytest
+import socketio
+from fakeredis import aioredis as fake_aioredis
+from unittest.mock import patch
+
+from app.core.presence_store import InMemoryPresenceStore, RedisPresenceStore
+from app.socketio_service import InstrumentedAsyncServer, SocketIOService
+from tests.async_mongomock import AsyncMongoClient
+
+
+class Worker:
+    """One Socket.IO worker: a server on the Redis manager, its service and the packets it delivered"""
+
+    def __init__(self, redis_server):
+        self.server = InstrumentedAsyncServer(
+            async_mode="asgi",
+            client_manager=socketio.AsyncRedisManager("redis://fake", channel="evep-test"),
+        )
+        self.service = SocketIOService(
+            server=self.server,
+            presence=RedisPresenceStore(fake_aioredis.FakeRedis(server=redis_server)),
+        )
+        self.service.register_handlers()
+        self.service.register_collaboration_handlers()
+        self.delivered = []
+
+        async def send_eio_packet(eio_sid, eio_pkt):
+            self.delivered.append((eio_sid, eio_pkt.data))
+
+        self.server._send_eio_packet = send_eio_packet
+        self.server._send_packet = send_eio_packet
+
+    async def start(self):
+        self.server.manager_initialized = True
+        self.server.manager.initialize()
+
+    async def connect(self, eio_sid, user_id):
+        sid = await self.server.manager.connect(eio_sid, "/")
+        await self.server._trigger_event("connect", "/", sid, {}, {"user_id": user_id, "role": "doctor"})
+        return sid
+
+    def events(self, eio_sid):
+        return [data for target, data in self.delivered if target == eio_sid]
+
+    async def stop(self):
+        self.server.manager.thread.cancel()
+        await self.service.presence.close()
+
+
+async def wait_for(condition, timeout=3.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        if asyncio.get_running_loop().time() > deadline:
+            raise AssertionError("condition not met in time")
+        await asyncio.sleep(0.02)
+
+
+@pytest.fixture
+def redis_server():
+    server = fakeredis.FakeServer()
+
+    def from_url(url, **options):
+        return fake_aioredis.FakeRedis(server=server)
+
+    # Workers share one database for the persisted patient queue
+    with patch("socketio.async_redis_manager.aioredis.Redis.from_url", side_effect=from_url), \
+            patch("app.socketio_service.get_database", return_value=AsyncMongoClient()):
+        yield server
+
+
+class TestSocketIOScaling:
+    """Test suite for cross-worker Socket.IO fan-out and shared presence."""
+
+    @pytest.mark.asyncio
+    async def test_room_events_cross_workers(self, redis_server):
+        """An emit on one worker reaches room members connected to another worker."""
+        worker_a, worker_b = Worker(redis_server), Worker(redis_server)
+        await worker_a.start()
+        await worker_b.start()
+        try:
+            sid_b = await worker_b.connect("eio_b", "nurse_1")
+            await worker_b.server.enter_room(sid_b, "screening_p1")
+            # Let both listeners subscribe before publishing
+            await wait_for(lambda: worker_a.server.manager.pubsub.subscribed and worker_b.server.manager.pubsub.subscribed)
+            worker_b.delivered.clear()
+
+            await worker_a.server.emit("step_changed", {"patient_id": "p1", "step": 4}, room="screening_p1")
+            await wait_for(lambda: worker_b.events("eio_b"))
+            assert "step_changed" in worker_b.events("eio_b")[0]
+            assert worker_a.delivered == []
+        finally:
+            await worker_a.stop()
+            await worker_b.stop()
+
+    @pytest.mark.asyncio
+    async def test_presence_and_queue_shared(self, redis_server):
+        """Users and the patient queue joined on one worker are visible from the other."""
+        worker_a, worker_b = Worker(redis_server), Worker(redis_server)
+        try:
+            sid_a = await worker_a.connect("eio_a", "doctor_1")
+            sid_b = await worker_b.connect("eio_b", "nurse_1")
+            await worker_a.server._trigger_event("join_screening", "/", sid_a, {"patient_id": "p1", "user": {"user_id": "doctor_1"}})
+            await worker_b.server._trigger_event("join_screening", "/", sid_b, {"patient_id": "p1", "user": {"user_id": "nurse_1"}})
+            await worker_a.server._trigger_event("join_screening", "/", sid_a, {"patient_id": "p2", "user": {"user_id": "doctor_1"}})
+
+            users = await worker_a.service.get_screening_active_users("p1")
+            assert [user["user_id"] for user in users] == ["nurse_1"]
+            assert await worker_b.service.find_user_session("doctor_1") == sid_a
+
+            queue = await worker_b.service.get_patient_queue()
+            assert [item["patient_id"] for item in queue] == ["p1", "p2"]
+            assert queue[0]["staff_working"] == ["doctor_1", "nurse_1"]
+
+            await worker_a.server._trigger_event("disconnect", "/", sid_a)
+            assert await worker_b.service.find_user_session("doctor_1") is None
+            assert await worker_b.service.presence.client_count() == 1
+        finally:
+            await worker_a.service.presence.close()
+            await worker_b.service.presence.close()
+
+    @pytest.mark.asyncio
+    async def test_stale_worker_records_pruned(self):
+        """Presence left behind by a worker that stopped heartbeating is pruned."""
+        redis = fake_aioredis.FakeRedis(server=fakeredis.FakeServer())
+        live, dead = RedisPresenceStore(redis, server_id="live"), RedisPresenceStore(redis, server_id="dead")
+        await dead.heartbeat()
+        await dead.save_client("sid_dead", {"user_id": "u1", "rooms": []})
+        await live.heartbeat()
+        await live.save_client("sid_live", {"user_id": "u2", "rooms": []})
+        await redis.hset(dead.servers_key, "dead", 0)
+
+        assert await live.prune_stale_servers() == ["sid_dead"]
+        assert list(await live.list_clients()) == ["sid_live"]
+
+        memory = InMemoryPresenceStore(server_id="only")
+        await memory.save_client("sid", {"user_id": "u3"})
+        await memory.heartbeat()
+        assert await memory.prune_stale_servers() == []
+        assert (await memory.get_client("sid"))["server_id"] == "only"
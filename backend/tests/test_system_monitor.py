@@ -0,0 +1,141 @@
+import os
+import time
+from types import SimpleNamespace
+
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from app.core.metrics import event_loop_lag_monitor
+from app.services.system_monitor import SystemMonitor, list_backups, system_health
+
+ADMIN_USER = {"user_id": "admin_1", "role": "admin", "email": "admin@example.com"}
+
+
+class FakeDatabase:
+    """Database stub answering dbStats, serverStatus and collStats with canned documents"""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.calls = 0
+        self.operations = 0
+
+    async def command(self, name, *args):
+        self.calls += 1
+        if self.fail:
+            raise ConnectionError("connection refused")
+        if name == "dbStats":
+            return {"db": "evep", "collections": 2, "indexes": 5, "objects": 150,
+                    "dataSize": 4000, "storageSize": 8000, "indexSize": 1000}
+        if name == "serverStatus":
+            self.operations += 500
+            return {"connections": {"current": 12, "available": 800}, "mem": {"resident": 256},
+                    "opcounters": {"insert": self.operations, "query": 0, "update": 0, "delete": 0,
+                                   "getmore": 0, "command": 0}}
+        if name == "collStats":
+            return {"count": 75, "size": 2000, "avgObjSize": 26, "nindexes": 2,
+                    "storageSize": 4000, "totalIndexSize": 500}
+        raise ValueError(name)
+
+    async def list_collection_names(self):
+        self.calls += 1
+        return ["patients", "screenings"]
+
+
+@pytest.fixture
+def fake_db():
+    database = FakeDatabase()
+    with patch("app.services.system_monitor.get_database", return_value=SimpleNamespace(evep=database)):
+        yield database
+
+
+class TestSystemMonitor:
+    """Test suite for the background system monitor and the admin endpoints it serves."""
+
+    @pytest.mark.asyncio
+    async def test_sample_collects_host_and_database_stats(self, fake_db, tmp_path):
+        """A sample carries live process/host values and the database snapshot."""
+        monitor = SystemMonitor(history_size=3, db_interval_seconds=0, backup_path=str(tmp_path))
+        sample = await monitor.sample()
+
+        assert sample["process_rss_bytes"] > 0
+        assert sample["process_open_fds"] > 0
+        assert 0 <= sample["memory_usage"] <= 100
+        assert sample["db_connections"] == 12
+        assert sample["system_health"] in ("healthy", "warning", "critical")
+        assert [c["name"] for c in monitor.database_stats["collection_stats"]] == ["patients", "screenings"]
+
+        time.sleep(0.05)
+        second = await monitor.sample()
+        assert second["db_operations_per_sec"] > 0
+
+        for _ in range(3):
+            await monitor.sample()
+        assert len(monitor.history) == 3
+
+    @pytest.mark.asyncio
+    async def test_loop_lag_comes_from_the_metrics_probe(self, fake_db, tmp_path):
+        """Samples report the peak lag the /metrics probe saw since the previous sample."""
+        monitor = SystemMonitor(db_interval_seconds=3600, backup_path=str(tmp_path))
+        with patch.object(event_loop_lag_monitor, "current", 0.002), patch.object(event_loop_lag_monitor, "_peak", 0.25):
+            assert (await monitor.sample())["event_loop_lag_ms"] == 250.0
+            assert (await monitor.sample())["event_loop_lag_ms"] == 2.0
+
+    @pytest.mark.asyncio
+    async def test_database_failure_marks_offline(self, tmp_path):
+        """An unreachable database is reported as offline rather than raising."""
+        database = FakeDatabase(fail=True)
+        monitor = SystemMonitor(backup_path=str(tmp_path))
+        with patch("app.services.system_monitor.get_database", return_value=SimpleNamespace(evep=database)):
+            sample = await monitor.sample()
+        assert sample["database_status"] == "offline"
+        assert sample["system_health"] == "critical"
+
+    def test_health_thresholds_and_backups(self, tmp_path):
+        """Health follows the usage and lag thresholds; backups are read from the directory."""
+        assert system_health({"cpu_usage": 10, "memory_usage": 40, "disk_usage": 50}) == "healthy"
+        assert system_health({"cpu_usage": 80, "memory_usage": 40, "disk_usage": 50}) == "warning"
+        assert system_health({"cpu_usage": 10, "event_loop_lag_ms": 1500}) == "critical"
+
+        (tmp_path / "evep_mongodb_backup_20250101_020000.gz").write_bytes(b"x" * 10)
+        newer = tmp_path / "evep_mongodb_backup_20250102_020000.gz"
+        newer.write_bytes(b"x" * 20)
+        os.utime(newer, (time.time() + 60, time.time() + 60))
+        (tmp_path / "evep_redis_backup_20250102_020000.rdb").write_bytes(b"x")
+
+        backups = list_backups(str(tmp_path))
+        assert [b["name"] for b in backups] == ["evep_mongodb_backup_20250102_020000", "evep_mongodb_backup_20250101_020000"]
+        assert backups[0]["size"] == 20
+        assert list_backups(str(tmp_path / "missing")) == []
+
+    @pytest.mark.asyncio
+    async def test_endpoints_serve_from_history(self, fake_db, tmp_path):
+        """Admin endpoints read the collected samples without querying the database again."""
+        from app.api import admin
+
+        monitor = SystemMonitor(backup_path=str(tmp_path))
+        await monitor.sample()
+        await monitor.sample()
+        calls = fake_db.calls
+        request = SimpleNamespace()
+
+        with patch.object(admin, "system_monitor", monitor), \
+                patch.object(admin, "log_security_event", new=AsyncMock()):
+            monitoring = await admin.get_system_monitoring(request=request, current_user=ADMIN_USER)
+            stats = await admin.get_database_stats(request=request, current_user=ADMIN_USER)
+            backups = await admin.get_database_backups(request=request, current_user=ADMIN_USER)
+            series = await admin.get_system_monitoring_timeseries(
+                metrics="cpu_usage,db_connections", minutes=5, current_user=ADMIN_USER
+            )
+
+        assert fake_db.calls == calls
+        assert monitoring["sampled_at"] == monitor.history[-1]["timestamp"]
+        assert stats["connections"] == 12
+        assert stats["size"] == 9000
+        assert backups == {"backups": []}
+        assert len(series["timestamps"]) == 2
+        assert series["series"]["db_connections"] == [12, 12]
+        assert set(series["series"]) == {"cpu_usage", "db_connections"}
+
+        with pytest.raises(admin.HTTPException) as error:
+            await admin.get_system_monitoring_timeseries(metrics="bogus", minutes=None, current_user=ADMIN_USER)
+        assert error.value.status_code == 400
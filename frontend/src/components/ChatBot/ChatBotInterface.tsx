@@ -223,42 +223,68 @@ const ChatBotInterface: React.FC<ChatBotInterfaceProps> = ({
     setIsLoading(true);
     setShowSuggestions(false);
 
+    const botMessageId = (Date.now() + 1).toString();
     try {
-      // Use the new AI agent endpoint for specialized responses
-      const response = await unifiedApi.post('/api/v1/chat-bot/ai-agent', {
+      // Stream the AI agent response so text appears as it is generated
+      let streamError: string | null = null;
+      let started = false;
+      await unifiedApi.postEventStream('/api/v1/chat-bot/ai-agent/stream', {
         message: message.trim(),
         context: {
           user_role: user?.role,
           user_id: user?.user_id,
         },
-      });
+      }, (event, data) => {
+        if (event === 'token') {
+          if (!started) {
+            started = true;
+            setIsLoading(false);
+            setMessages(prev => [...prev, {
+              id: botMessageId,
+              message: data.text,
+              isUser: false,
+              timestamp: new Date().toISOString(),
+            }]);
+          } else {
+            setMessages(prev => prev.map(msg => (
+              msg.id === botMessageId ? { ...msg, message: msg.message + data.text } : msg
+            )));
+          }
+        } else if (event === 'done') {
+          setMessages(prev => prev.map(msg => (
+            msg.id === botMessageId ? {
+              ...msg,
+              message: data.response,
+              timestamp: data.timestamp || msg.timestamp,
+              intent: data.intent,
+              confidence: data.confidence,
+              suggestions: data.suggestions,
+              quick_actions: data.quick_actions,
+            } : msg
+          )));
 
-      const botMessage: ChatMessage = {
-        id: (Date.now() + 1).toString(),
-        message: response.data.response,
-        isUser: false,
-        timestamp: response.data.timestamp || new Date().toISOString(),
-        intent: response.data.intent,
-        confidence: response.data.confidence,
-        suggestions: response.data.suggestions,
-        quick_actions: response.data.quick_actions,
-      };
+          // Update conversation ID if provided
+          if (data.conversation_id) {
+            setConversationId(data.conversation_id);
+          }
 
-      setMessages(prev => [...prev, botMessage]);
-      
-      // Update conversation ID if provided
-      if (response.data.conversation_id) {
-        setConversationId(response.data.conversation_id);
-      }
-      
-      // Show suggestions if available
-      if (response.data.suggestions && response.data.suggestions.length > 0) {
-        setSuggestions(response.data.suggestions);
-        setShowSuggestions(true);
+          // Show suggestions if available
+          if (data.suggestions && data.suggestions.length > 0) {
+            setSuggestions(data.suggestions);
+            setShowSuggestions(true);
+          }
+        } else if (event === 'error') {
+          streamError = data.detail;
+        }
+      });
+      if (streamError) {
+        throw new Error(streamError);
       }
 
     } catch (error) {
       console.error('AI Agent error:', error);
+      // Drop any partially streamed answer before falling back
+      setMessages(prev => prev.filter(msg => msg.id !== botMessageId));
       
       // Fallback to basic chat if AI agent fails
       try {
@@ -108,8 +108,34 @@ interface PatientQueue {
   estimated_completion: string;
   priority: 'normal' | 'urgent';
   staff_working: ActiveUser[];
+  seq: number;
 }
 
+type QueueChange =
+  | { op: 'upsert'; item: PatientQueue }
+  | { op: 'remove'; patient_id: string };
+
+const QUEUE_PRIORITY_ORDER = ['high', 'normal', 'low'];
+
+// Apply queue_updated changes and renumber positions by priority, then arrival
+const applyQueueChanges = (queue: PatientQueue[], changes: QueueChange[]): PatientQueue[] => {
+  const byPatient = new Map(queue.map(item => [item.patient_id, item]));
+  changes.forEach(change => {
+    if (change.op === 'remove') {
+      byPatient.delete(change.patient_id);
+    } else {
+      byPatient.set(change.item.patient_id, change.item);
+    }
+  });
+  const rank = (priority: string) => {
+    const index = QUEUE_PRIORITY_ORDER.indexOf(priority);
+    return index === -1 ? QUEUE_PRIORITY_ORDER.indexOf('normal') : index;
+  };
+  return Array.from(byPatient.values())
+    .sort((a, b) => rank(a.priority) - rank(b.priority) || a.seq - b.seq)
+    .map((item, index) => ({ ...item, queue_position: index + 1 }));
+};
+
 interface StepStatus {
   step_number: number;
   step_name: string;
@@ -272,6 +298,7 @@ const MobileVisionScreeningForm: React.FC<MobileVisionScreeningFormProps> = ({
   const [currentUserPresence, setCurrentUserPresence] = useState<ActiveUser | null>(null);
   const socketRef = useRef<any>(null);
   const heartbeatRef = useRef<any>(null);
+  const queueVersionRef = useRef<number | null>(null);
   
   // Patient selection
   const [selectedPatient, setSelectedPatient] = useState<Patient | null>(null);
@@ -502,9 +529,24 @@ const MobileVisionScreeningForm: React.FC<MobileVisionScreeningFormProps> = ({
       ));
     });
 
-    collaborationSocket.on('queue_updated', (queueData: PatientQueue[]) => {
-      console.log('📋 Queue updated:', queueData);
-      setPatientQueue(queueData);
+    collaborationSocket.on('queue_snapshot', (snapshot: { version: number, items: PatientQueue[] }) => {
+      queueVersionRef.current = snapshot.version;
+      setPatientQueue(snapshot.items);
+    });
+
+    collaborationSocket.on('queue_updated', (update: { version: number, changes: QueueChange[] }) => {
+      console.log('📋 Queue updated:', update);
+      const version = queueVersionRef.current;
+      if (version !== null && update.version <= version) {
+        return;
+      }
+      if (version === null || update.version !== version + 1) {
+        // Missed a change made from another screening room; start again from a snapshot
+        collaborationSocket.emit('get_queue_snapshot');
+        return;
+      }
+      queueVersionRef.current = update.version;
+      setPatientQueue(prev => applyQueueChanges(prev, update.changes));
     });
 
     collaborationSocket.on('step_status_updated', (statusData: StepStatus[]) => {
@@ -544,6 +586,7 @@ const MobileVisionScreeningForm: React.FC<MobileVisionScreeningFormProps> = ({
     }
 
     setActiveUsers([]);
+    queueVersionRef.current = null;
     setCollaborationSession(null);
     setCurrentUserPresence(null);
     
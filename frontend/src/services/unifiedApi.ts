@@ -168,6 +168,66 @@ class UnifiedApiService {
     }
   }
 
+  // POST and read a Server-Sent Events response, calling onEvent for each event as it arrives.
+  // Uses fetch because axios buffers the whole response body in the browser.
+  async postEventStream(
+    url: string,
+    data: any,
+    onEvent: (event: string, data: any) => void,
+    signal?: AbortSignal
+  ): Promise<void> {
+    const headers: Record<string, string> = {
+      'Content-Type': 'application/json',
+      Accept: 'text/event-stream',
+    };
+    const token = unifiedAuth.getToken();
+    if (token) {
+      headers.Authorization = `Bearer ${token}`;
+    }
+    const sessionHash = unifiedAuth.getSessionHash();
+    if (sessionHash) {
+      headers['X-Session-Hash'] = sessionHash;
+    }
+
+    console.log(`📤 API Stream: POST ${url}`);
+    const response = await fetch(`${this.axiosInstance.defaults.baseURL}${url}`, {
+      method: 'POST',
+      headers,
+      body: JSON.stringify(data),
+      signal,
+    });
+    if (!response.ok || !response.body) {
+      throw new Error(`Stream request failed with status ${response.status}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    for (;;) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      let boundary = buffer.indexOf('\n\n');
+      while (boundary !== -1) {
+        const frame = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+        let event = 'message';
+        const dataLines: string[] = [];
+        frame.split('\n').forEach((line) => {
+          if (line.startsWith('event:')) {
+            event = line.slice(6).trim();
+          } else if (line.startsWith('data:')) {
+            dataLines.push(line.slice(5).trimStart());
+          }
+        });
+        if (dataLines.length > 0) {
+          onEvent(event, JSON.parse(dataLines.join('\n')));
+        }
+        boundary = buffer.indexOf('\n\n');
+      }
+    }
+  }
+
   // Get the underlying axios instance for advanced usage
   getAxiosInstance(): AxiosInstance {
     return this.axiosInstance;
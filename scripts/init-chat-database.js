@@ -16,6 +16,10 @@ db.chat_conversations.createIndex({ "user_id": 1 });
 db.chat_conversations.createIndex({ "created_at": 1 });
 db.chat_conversations.createIndex({ "updated_at": 1 });
 
+// Chat Message Buckets Collection (fixed-size message buckets per conversation)
+db.createCollection("chat_message_buckets");
+db.chat_message_buckets.createIndex({ "conversation_id": 1, "bucket": 1 }, { unique: true });
+
 // Chat Suggestions Collection
 db.createCollection("chat_suggestions");
 db.chat_suggestions.createIndex({ "target_roles": 1 });
@@ -448,6 +452,7 @@ print("Suggestions inserted successfully!");
 print("=== Chat Bot Database Initialization Complete! ===");
 print("Collections created:");
 print("- chat_conversations");
+print("- chat_message_buckets");
 print("- chat_suggestions");
 print("- chat_intent_patterns");
 print("- chat_response_templates");
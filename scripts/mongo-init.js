@@ -48,6 +48,8 @@ db.createCollection('screenings');
 db.createCollection('ai_insights');
 db.createCollection('analytics_data');
 db.createCollection('audit_logs');
+db.createCollection('audit_ledger');
+db.createCollection('notification_dead_letters');
 db.createCollection('vector_embeddings');
 db.createCollection('prompt_templates');
 db.createCollection('conversation_history');
@@ -62,6 +64,9 @@ db.patients.createIndex({ "patient_id": 1 }, { unique: true });
 db.patients.createIndex({ "parent_id": 1 });
 db.patients.createIndex({ "school_id": 1 });
 db.patients.createIndex({ "created_at": -1 });
+// Search index refresh polls documents updated since its last sync
+db.patients.createIndex({ "updated_at": 1 });
+db.getCollection('evep.students').createIndex({ "updated_at": 1 });
 
 db.screenings.createIndex({ "screening_id": 1 }, { unique: true });
 db.screenings.createIndex({ "patient_id": 1 });
@@ -79,6 +84,10 @@ db.analytics_data.createIndex({ "type": 1 });
 db.audit_logs.createIndex({ "user_id": 1 });
 db.audit_logs.createIndex({ "action": 1 });
 db.audit_logs.createIndex({ "timestamp": -1 });
+// Unsealed events ({"ledger.block": null}) for the audit ledger sealer
+db.audit_logs.createIndex({ "ledger.block": 1, "_id": 1 });
+
+db.notification_dead_letters.createIndex({ "created_at": 1 });
 
 db.files.createIndex({ "file_id": 1 }, { unique: true });
 db.files.createIndex({ "uploaded_by": 1 });